@@ -207,7 +207,9 @@ _TOOLS = [
             "Estimativa de consórcio com FOCO NO REDUTOR (parcela reduzida até a contemplação). Usa a campanha ativa "
             "da org (ou o padrão). Informe 'valor_credito' quando o cliente quer uma carta específica; OU informe "
             "'parcela_alvo' (valor mensal confortável) quando ele diz quanto pode pagar, e a ferramenta calcula o "
-            "MAIOR crédito que cabe nessa parcela com redutor (maior carta pelo menor valor). É sempre estimativa."
+            "MAIOR crédito que cabe nessa parcela com redutor (maior carta pelo menor valor). É sempre estimativa. "
+            "Quando a org tem histórico, devolve 'referencia_lances' (lance que bastou em ~50%/~80% das assembleias "
+            "dos grupos do produto); use como referência, nunca como promessa de contemplação."
         ),
         "input_schema": {
             "type": "object",
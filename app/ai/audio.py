@@ -6,38 +6,73 @@ abstrata para trocar a voz por ElevenLabs no futuro sem mexer no resto.
 from __future__ import annotations
 
 import logging
-from typing import Optional
-
-import requests
+import struct
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
 
+from app.core import http_client
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-_OPENAI_BASE = "https://api.openai.com/v1"
+_STREAM_PIECE_BYTES = 64 * 1024
+
+
+def _openai_base() -> str:
+    # Configurável para apontar a um servidor STT local (stub) em testes/dev.
+    return settings.OPENAI_API_BASE.rstrip("/")
 
 
 # --------------------------------------------------------------------------- #
 # STT — transcrição do áudio recebido
 # --------------------------------------------------------------------------- #
-def transcrever(audio_bytes: bytes, mime: str = "audio/ogg") -> Optional[str]:
-    """Transcreve áudio para texto (pt-BR). Retorna None em falha."""
+def _ext_for_mime(mime: str) -> str:
+    if "mp3" in mime or "mpeg" in mime:
+        return "mp3"
+    if "wav" in mime:
+        return "wav"
+    if "m4a" in mime or "mp4" in mime:
+        return "m4a"
+    return "ogg"
+
+
+def _multipart_stream(
+    chunks: Iterable[bytes], *, boundary: str, filename: str, mime: str
+) -> Iterator[bytes]:
+    """Corpo multipart/form-data gerado sob demanda (o arquivo não fica inteiro em memória)."""
+    for name, value in (("model", settings.OPENAI_STT_MODEL), ("language", "pt")):
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode()
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {mime}\r\n\r\n"
+    ).encode()
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def _post_transcription(chunks: Iterable[bytes], mime: str) -> Optional[str]:
     key = settings.OPENAI_API_KEY.strip()
-    if not key or not audio_bytes:
+    if not key:
         return None
-    ext = "ogg"
-    if "mp3" in mime or "mpeg" in mime:
-        ext = "mp3"
-    elif "wav" in mime:
-        ext = "wav"
-    elif "m4a" in mime or "mp4" in mime:
-        ext = "m4a"
+    boundary = uuid.uuid4().hex
     try:
-        resp = requests.post(
-            f"{_OPENAI_BASE}/audio/transcriptions",
-            headers={"Authorization": f"Bearer {key}"},
-            files={"file": (f"audio.{ext}", audio_bytes, mime)},
-            data={"model": settings.OPENAI_STT_MODEL, "language": "pt"},
+        resp = http_client.post(
+            f"{_openai_base()}/audio/transcriptions",
+            headers={
+                "Authorization": f"Bearer {key}",
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+            },
+            content=_multipart_stream(
+                chunks, boundary=boundary, filename=f"audio.{_ext_for_mime(mime)}", mime=mime
+            ),
             timeout=60,
         )
         if resp.status_code >= 400:
@@ -50,6 +85,120 @@ def transcrever(audio_bytes: bytes, mime: str = "audio/ogg") -> Optional[str]:
         return None
 
 
+def transcrever(audio_bytes: bytes, mime: str = "audio/ogg") -> Optional[str]:
+    """Transcreve áudio para texto (pt-BR). Retorna None em falha."""
+    if not audio_bytes:
+        return None
+    return transcrever_stream([audio_bytes], mime, total_bytes=len(audio_bytes))
+
+
+# --------------------------------------------------------------------------- #
+# Fatiamento por páginas Ogg (notas de voz do WhatsApp são ogg/opus).
+#
+# Cada fatia repete as páginas de cabeçalho (OpusHead/OpusTags, granule 0) e
+# carrega páginas de áudio inteiras, então é um arquivo decodificável sozinho.
+# --------------------------------------------------------------------------- #
+_OGG_CAPTURE = b"OggS"
+_OGG_HEADER_LEN = 27
+
+
+def _iter_ogg_pages(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Remonta páginas Ogg completas a partir de pedaços arbitrários do download.
+
+    Levanta ValueError se o fluxo não for Ogg (o chamador cai para envio único).
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        while len(buf) >= _OGG_HEADER_LEN:
+            if buf[:4] != _OGG_CAPTURE:
+                raise ValueError("fluxo não é ogg")
+            n_segs = buf[26]
+            if len(buf) < _OGG_HEADER_LEN + n_segs:
+                break
+            body_len = sum(buf[_OGG_HEADER_LEN:_OGG_HEADER_LEN + n_segs])
+            page_len = _OGG_HEADER_LEN + n_segs + body_len
+            if len(buf) < page_len:
+                break
+            yield bytes(buf[:page_len])
+            del buf[:page_len]
+    if buf:
+        raise ValueError("página ogg truncada")
+
+
+def _ogg_granule(page: bytes) -> int:
+    return struct.unpack_from("<q", page, 6)[0]
+
+
+def split_ogg_stream(chunks: Iterable[bytes], max_bytes: int) -> Iterator[bytes]:
+    """Agrupa as páginas de áudio em arquivos Ogg de até ~`max_bytes` cada."""
+    head = bytearray()
+    current = bytearray()
+    in_header = True
+    for page in _iter_ogg_pages(chunks):
+        if in_header and _ogg_granule(page) == 0:
+            head.extend(page)
+            continue
+        in_header = False
+        current.extend(page)
+        if len(current) >= max_bytes:
+            yield bytes(head + current)
+            current = bytearray()
+    if current:
+        yield bytes(head + current)
+
+
+def _buffered(first: list[bytes], rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield from first
+    yield from rest
+
+
+def transcrever_stream(
+    chunks: Iterable[bytes], mime: str = "audio/ogg", *, total_bytes: Optional[int] = None
+) -> Optional[str]:
+    """Transcreve um áudio que chega em pedaços (ex.: download em streaming).
+
+    - Áudio pequeno (ou não-ogg): os pedaços vão direto no corpo da requisição STT.
+    - Áudio ogg longo: é fatiado por páginas e as fatias são transcritas em
+      paralelo enquanto o download continua; os textos são unidos na ordem.
+    Retorna None em falha (basta uma fatia falhar).
+    """
+    if not settings.OPENAI_API_KEY.strip():
+        return None
+    max_bytes = max(settings.OPENAI_STT_CHUNK_BYTES, 0)
+    size_known_small = total_bytes is not None and total_bytes <= max_bytes
+    if not max_bytes or size_known_small or _ext_for_mime(mime) != "ogg":
+        return _post_transcription(chunks, mime)
+
+    # Os pedaços já consumidos pelo fatiador são guardados para permitir o
+    # envio único caso o arquivo não seja um ogg válido.
+    source = iter(chunks)
+    consumed: list[bytes] = []
+
+    def _tee() -> Iterator[bytes]:
+        for chunk in source:
+            consumed.append(chunk)
+            yield chunk
+
+    futures: list[Future] = []
+    workers = max(settings.OPENAI_STT_MAX_PARALLEL, 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt") as pool:
+        try:
+            for part in split_ogg_stream(_tee(), max_bytes):
+                consumed.clear()
+                futures.append(pool.submit(_post_transcription, [part], mime))
+        except ValueError:
+            for fut in futures:
+                fut.cancel()
+            logger.info("stt_ogg_invalido_envio_unico")
+            return _post_transcription(_buffered(consumed, source), mime) if not futures else None
+        textos = [fut.result() for fut in futures]
+
+    if not textos or any(t is None for t in textos):
+        return None
+    return " ".join(textos).strip() or None
+
+
 # --------------------------------------------------------------------------- #
 # Gênero pelo primeiro nome (heurística PT-BR) para escolher a voz invertida.
 # --------------------------------------------------------------------------- #
@@ -106,8 +255,8 @@ def _tts_openai(texto: str, voice: Optional[str] = None) -> Optional[tuple[bytes
     if not key:
         return None
     try:
-        resp = requests.post(
-            f"{_OPENAI_BASE}/audio/speech",
+        resp = http_client.post(
+            f"{_openai_base()}/audio/speech",
             headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
             json={
                 "model": settings.OPENAI_TTS_MODEL,
@@ -133,7 +282,7 @@ def _tts_elevenlabs(texto: str) -> Optional[tuple[bytes, str]]:
         logger.warning("tts_elevenlabs_sem_config")
         return None
     try:
-        resp = requests.post(
+        resp = http_client.post(
             f"https://api.elevenlabs.io/v1/text-to-speech/{voice}",
             headers={"xi-api-key": key, "Content-Type": "application/json", "Accept": "audio/ogg"},
             json={"text": texto, "model_id": "eleven_multilingual_v2", "output_format": "opus_48000_128"},
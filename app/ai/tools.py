@@ -309,9 +309,38 @@ def simular_consorcio(
     if lance_percentual:
         resultado["lance_estimado"] = round(categoria * (lance_percentual / 100.0), 2)
         resultado["lance_percentual"] = lance_percentual
+    referencia = _referencia_lances(supa, org_id, produto)
+    if referencia:
+        resultado["referencia_lances"] = {
+            **referencia,
+            "lance_p50_valor": round(categoria * referencia["lance_p50"] / 100.0, 2),
+            "lance_p80_valor": (
+                round(categoria * referencia["lance_p80"] / 100.0, 2) if referencia.get("lance_p80") is not None else None
+            ),
+            "observacao": "Histórico de lances vencedores dos grupos da org (p50/p80 = suficiente em ~50%/~80% das assembleias). Não é garantia.",
+        }
     return resultado
 
 
+# Nomes de produto usados nas cotas para cada produto do simulador.
+_PRODUTOS_COTA = {"imovel": ["imovel", "imobiliario"], "auto": ["auto"], "pesados": ["pesados"]}
+
+
+def _referencia_lances(supa, org_id: Optional[str], produto: str) -> Optional[dict[str, Any]]:
+    """Lance necessário (p50/p80) do histórico pré-calculado; None sem histórico."""
+    if not supa or not org_id:
+        return None
+    from app.services import lance_estatisticas_service
+
+    try:
+        return lance_estatisticas_service.referencia_produto(
+            supa, org_id=org_id, produtos=_PRODUTOS_COTA.get((produto or "").lower(), [produto])
+        )
+    except Exception:  # noqa: BLE001
+        logger.exception("referencia_lances_falhou", extra={"org_id": org_id})
+        return None
+
+
 # --------------------------------------------------------------------------- #
 # Proposta: a IA monta e envia uma proposta com base na simulação
 # --------------------------------------------------------------------------- #
@@ -0,0 +1,90 @@
+# app/core/cache.py
+"""Cache em processo compartilhado pelos services.
+
+Cada entrada guarda, além do valor:
+
+- `versao`: o marcador que o chamador lê do banco (ex.: versão incrementada por
+  trigger); `get` só devolve a entrada quando a versão pedida é a mesma;
+- `ttl`: prazo em segundos, para dados sem versão no banco.
+
+Quem carrega o valor fora do lock lê `geracao()` antes da carga e passa para
+`put`: se um `discard`/`clear` aconteceu no meio, a escrita é descartada (senão
+um valor lido antes da invalidação voltaria ao cache).
+
+O limite de entradas (`max_items`) descarta as menos usadas. Por padrão o valor
+é copiado na escrita e na leitura, porque os chamadores alteram o que recebem.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Callable, Hashable, Optional
+
+# Devolvido por `get` quando não há entrada válida (`None` pode ser valor cacheado).
+MISS: Any = object()
+
+
+class VersionedCache:
+    def __init__(self, *, copiar: bool = True):
+        self._copiar = copiar
+        self._entries: "OrderedDict[Hashable, tuple[Any, Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+
+    def geracao(self) -> int:
+        """Contador de invalidações (`discard`/`clear`)."""
+        with self._lock:
+            return self._geracao
+
+    def _copia(self, value: Any) -> Any:
+        return deepcopy(value) if self._copiar else value
+
+    def get(self, key: Hashable, *, versao: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            entry_versao, expira_em, value = entry
+            if entry_versao != versao or (expira_em is not None and expira_em <= now):
+                return MISS
+            self._entries.move_to_end(key)
+        return self._copia(value)
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        *,
+        versao: Any = None,
+        ttl: Optional[float] = None,
+        max_items: Optional[int] = None,
+        geracao: Optional[int] = None,
+    ) -> None:
+        expira_em = time.monotonic() + ttl if ttl is not None else None
+        value = self._copia(value)
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                return
+            self._entries[key] = (versao, expira_em, value)
+            self._entries.move_to_end(key)
+            if max_items is not None:
+                while len(self._entries) > max_items:
+                    self._entries.popitem(last=False)
+
+    def discard(self, predicate: Callable[[Any], bool]) -> None:
+        """Remove as entradas cuja chave satisfaz `predicate`."""
+        with self._lock:
+            self._geracao += 1
+            for key in [key for key in self._entries if predicate(key)]:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -41,6 +41,8 @@ class Settings(BaseModel):
         "META_OAUTH_SCOPES",
         "pages_show_list,pages_read_engagement,pages_manage_metadata,leads_retrieval,business_management",
     )
+    # Cache em processo da integração resolvida por page_id/form_id no webhook (0 desliga).
+    META_INTEGRATION_CACHE_TTL_SEC: float = float(os.getenv("META_INTEGRATION_CACHE_TTL_SEC", "60"))
     # WhatsApp Cloud API (oficial). O app do WhatsApp é SEPARADO do app de Lead Ads,
     # então usa credenciais próprias (com fallback para META_APP_* se não definidas).
     # WHATSAPP_VERIFY_TOKEN protege o webhook.
@@ -96,6 +98,30 @@ class Settings(BaseModel):
     WHATSAPP_AUDIO_REPLY: bool = os.getenv("WHATSAPP_AUDIO_REPLY", "true").lower() in ("1", "true", "yes")
     AUDIO_TTS_PROVIDER: str = os.getenv("AUDIO_TTS_PROVIDER", "openai")  # openai | elevenlabs (futuro)
     OPENAI_STT_MODEL: str = os.getenv("OPENAI_STT_MODEL", "whisper-1")
+    # Base da API da OpenAI (trocável por um servidor STT local/stub em dev e testes).
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+    # Áudios ogg maiores que isso são fatiados e transcritos em paralelo (0 desliga).
+    OPENAI_STT_CHUNK_BYTES: int = int(os.getenv("OPENAI_STT_CHUNK_BYTES", str(512 * 1024)))
+    OPENAI_STT_MAX_PARALLEL: int = int(os.getenv("OPENAI_STT_MAX_PARALLEL", "4"))
+    # Workers da etapa assíncrona de transcrição (fora do processamento do webhook).
+    WHATSAPP_TRANSCRIPTION_WORKERS: int = int(os.getenv("WHATSAPP_TRANSCRIPTION_WORKERS", "4"))
+    # Workers do reprocessamento de comissões em massa (pool compartilhado entre jobs).
+    COMISSAO_REPROCESSAMENTO_WORKERS: int = int(os.getenv("COMISSAO_REPROCESSAMENTO_WORKERS", "4"))
+    # Intervalo (s) do worker embutido que processa a comissão dos pagamentos salvos
+    # (outbox comissao_eventos). 0 desliga (usar cron externo).
+    COMISSAO_EVENTOS_INTERVAL_SEC: int = int(os.getenv("COMISSAO_EVENTOS_INTERVAL_SEC", "10"))
+    # Contratos com snapshot financeiro em cache por processo (0 desliga o cache).
+    CONTRATO_SNAPSHOT_CACHE_MAX: int = int(os.getenv("CONTRATO_SNAPSHOT_CACHE_MAX", "500"))
+    # Horizonte do calendário de assembleias materializado, em meses antes/depois do mês atual.
+    ASSEMBLEIA_CALENDARIO_MESES_ANTES: int = int(os.getenv("ASSEMBLEIA_CALENDARIO_MESES_ANTES", "12"))
+    ASSEMBLEIA_CALENDARIO_MESES_DEPOIS: int = int(os.getenv("ASSEMBLEIA_CALENDARIO_MESES_DEPOIS", "24"))
+    # Máximo de resultados da busca textual (cartas, carteira e kanban filtram por esses ids).
+    BUSCA_LIMITE: int = int(os.getenv("BUSCA_LIMITE", "200"))
+    # Competências (com assembleia) usadas nos percentis de lance vencedor por grupo.
+    LANCE_ESTATISTICAS_JANELA_MESES: int = int(os.getenv("LANCE_ESTATISTICAS_JANELA_MESES", "12"))
+    # Intervalo (s) do worker embutido que recalcula os grupos marcados depois das
+    # assembleias (lance_estatisticas_pendencias). 0 desliga (usar cron externo).
+    LANCE_ESTATISTICAS_INTERVAL_SEC: int = int(os.getenv("LANCE_ESTATISTICAS_INTERVAL_SEC", "30"))
     OPENAI_TTS_MODEL: str = os.getenv("OPENAI_TTS_MODEL", "gpt-4o-mini-tts")
     OPENAI_TTS_VOICE: str = os.getenv("OPENAI_TTS_VOICE", "alloy")  # fallback quando gênero indefinido
     # Voz invertida pelo gênero do cliente (homem -> voz feminina; mulher -> voz masculina).
@@ -105,6 +131,14 @@ class Settings(BaseModel):
     ELEVENLABS_API_KEY: str = os.getenv("ELEVENLABS_API_KEY", "")
     ELEVENLABS_VOICE_ID: str = os.getenv("ELEVENLABS_VOICE_ID", "")
 
+    # Cliente HTTP compartilhado (app/core/http_client.py) para Meta, OpenAI e Resend.
+    HTTP_CLIENT_HTTP2: bool = os.getenv("HTTP_CLIENT_HTTP2", "false").lower() in ("1", "true", "yes")
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))
+    # Retentativas só para chamadas idempotentes (GET/PUT/DELETE...), com Retry-After.
+    HTTP_CLIENT_MAX_RETRIES: int = int(os.getenv("HTTP_CLIENT_MAX_RETRIES", "2"))
+    HTTP_CLIENT_MAX_RETRY_AFTER_SEC: float = float(os.getenv("HTTP_CLIENT_MAX_RETRY_AFTER_SEC", "10"))
+
     BACKEND_PUBLIC_URL: str = os.getenv("BACKEND_PUBLIC_URL", "http://localhost:8000")
     FRONTEND_SITE_URL: str = os.getenv("FRONTEND_SITE_URL", "http://localhost:3000")
 
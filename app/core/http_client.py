@@ -0,0 +1,278 @@
+# app/core/http_client.py
+"""Cliente HTTP compartilhado para APIs externas (Meta Graph, OpenAI, Resend...).
+
+- Um `httpx.Client` por host, com pool keep-alive (sem novo TCP+TLS a cada chamada).
+- HTTP/2 opcional (`HTTP_CLIENT_HTTP2`); desligado por padrão, pelo mesmo motivo
+  registrado em `app/deps.py` (instabilidades intermitentes de http2).
+- Retentativas limitadas só para métodos idempotentes (ou quando o chamador
+  declara `idempotent=True`), respeitando `Retry-After`.
+- Leitura dos headers de rate limit (Meta `X-App-Usage`/`X-Business-Use-Case-Usage`
+  e `X-RateLimit-*`) e histograma de latência por endpoint, consultáveis em
+  `metrics_snapshot()`.
+
+A interface devolve `httpx.Response` (status_code, text, json(), content, headers).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_META_USAGE_HEADERS = ("x-app-usage", "x-business-use-case-usage", "x-ad-account-usage")
+_ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-f]{8}-[0-9a-f-]{27,}|[A-Za-z0-9_-]{24,})$")
+
+_clients: dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_histograms: dict[str, dict[str, Any]] = {}
+_rate_limits: dict[str, dict[str, Any]] = {}
+
+
+# --------------------------------------------------------------------------- #
+# Pool por host
+# --------------------------------------------------------------------------- #
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_client(url: str) -> httpx.Client:
+    """Retorna (criando se preciso) o client keep-alive do host da URL."""
+    key = _host_key(url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = httpx.Client(
+                http2=settings.HTTP_CLIENT_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+                    keepalive_expiry=30.0,
+                ),
+                timeout=httpx.Timeout(20.0, connect=10.0),
+                # Mesmo comportamento do `requests`, que seguia redirects (ex.: download de mídia).
+                follow_redirects=True,
+            )
+            _clients[key] = client
+        return client
+
+
+def close_all() -> None:
+    """Fecha todos os pools (shutdown da aplicação / testes)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:  # noqa: BLE001
+            pass
+
+
+# --------------------------------------------------------------------------- #
+# Métricas
+# --------------------------------------------------------------------------- #
+def endpoint_label(url: str) -> str:
+    """host + path com ids trocados por `:id` (sem query string, sem tokens)."""
+    parts = urlsplit(url)
+    segments = [":id" if _ID_SEGMENT.match(seg) else seg for seg in parts.path.split("/") if seg]
+    return f"{parts.netloc}/{'/'.join(segments)}"
+
+
+def _observe(endpoint: str, elapsed_ms: float, status_code: Optional[int]) -> None:
+    with _metrics_lock:
+        hist = _histograms.get(endpoint)
+        if hist is None:
+            hist = {
+                "count": 0,
+                "sum_ms": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                "errors": 0,
+            }
+            _histograms[endpoint] = hist
+        hist["count"] += 1
+        hist["sum_ms"] += elapsed_ms
+        index = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        hist["buckets"][index] += 1
+        if status_code is None or status_code >= 400:
+            hist["errors"] += 1
+
+
+def _parse_json_header(value: Optional[str]) -> Any:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parse_rate_limit_headers(headers: httpx.Headers) -> dict[str, Any]:
+    info: dict[str, Any] = {}
+    for name in _META_USAGE_HEADERS:
+        parsed = _parse_json_header(headers.get(name))
+        if parsed is not None:
+            info[name] = parsed
+    for name in ("x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset"):
+        if headers.get(name) is not None:
+            info[name] = headers.get(name)
+    retry_after = retry_after_seconds(headers)
+    if retry_after is not None:
+        info["retry_after"] = retry_after
+    return info
+
+
+def retry_after_seconds(headers: httpx.Headers) -> Optional[float]:
+    raw = headers.get("retry-after")
+    if not raw:
+        return None
+    raw = raw.strip()
+    try:
+        return max(float(raw), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(raw).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_rate_limit(url: str, response: httpx.Response) -> None:
+    info = parse_rate_limit_headers(response.headers)
+    if not info:
+        return
+    info["observed_at"] = time.time()
+    with _metrics_lock:
+        _rate_limits[urlsplit(url).netloc] = info
+
+
+def metrics_snapshot() -> dict[str, Any]:
+    """Histogramas de latência por endpoint + último rate limit visto por host."""
+    with _metrics_lock:
+        endpoints = {
+            name: {
+                "count": hist["count"],
+                "errors": hist["errors"],
+                "avg_ms": round(hist["sum_ms"] / hist["count"], 2) if hist["count"] else 0.0,
+                "buckets_ms": {
+                    **{str(bound): hist["buckets"][i] for i, bound in enumerate(LATENCY_BUCKETS_MS)},
+                    "+inf": hist["buckets"][-1],
+                },
+            }
+            for name, hist in _histograms.items()
+        }
+        rate_limits = {host: dict(info) for host, info in _rate_limits.items()}
+    return {"endpoints": endpoints, "rate_limits": rate_limits}
+
+
+def reset_metrics() -> None:
+    with _metrics_lock:
+        _histograms.clear()
+        _rate_limits.clear()
+
+
+# --------------------------------------------------------------------------- #
+# Requisições
+# --------------------------------------------------------------------------- #
+def _backoff_seconds(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        retry_after = retry_after_seconds(response.headers)
+        if retry_after is not None:
+            return min(retry_after, settings.HTTP_CLIENT_MAX_RETRY_AFTER_SEC)
+    return min(0.25 * (2 ** attempt), settings.HTTP_CLIENT_MAX_RETRY_AFTER_SEC)
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    endpoint: Optional[str] = None,
+    idempotent: Optional[bool] = None,
+    retries: Optional[int] = None,
+    timeout: Optional[float] = 20.0,
+    **kwargs: Any,
+) -> httpx.Response:
+    """Faz a requisição pelo pool do host. Aceita os kwargs do httpx
+    (params, headers, json, data, files, content).
+
+    Levanta `httpx.HTTPError` só em falha de transporte após as retentativas;
+    status >= 400 é devolvido para o chamador tratar, como antes.
+    """
+    method = method.upper()
+    label = endpoint or endpoint_label(url)
+    can_retry = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    max_retries = (settings.HTTP_CLIENT_MAX_RETRIES if retries is None else retries) if can_retry else 0
+    client = get_client(url)
+
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        response: Optional[httpx.Response] = None
+        try:
+            response = client.request(method, url, timeout=timeout, **kwargs)
+        except httpx.TransportError as exc:
+            _observe(label, (time.perf_counter() - started) * 1000, None)
+            if attempt >= max_retries:
+                raise
+            logger.info("http_client_retry", extra={"endpoint": label, "error": str(exc), "attempt": attempt + 1})
+        else:
+            _observe(label, (time.perf_counter() - started) * 1000, response.status_code)
+            _record_rate_limit(url, response)
+            if response.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+                return response
+            logger.info(
+                "http_client_retry",
+                extra={"endpoint": label, "status": response.status_code, "attempt": attempt + 1},
+            )
+        time.sleep(_backoff_seconds(attempt, response))
+        attempt += 1
+
+
+def get(url: str, **kwargs: Any) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+@contextmanager
+def stream(
+    method: str,
+    url: str,
+    *,
+    endpoint: Optional[str] = None,
+    timeout: Optional[float] = 30.0,
+    **kwargs: Any,
+) -> Iterator[httpx.Response]:
+    """Resposta em streaming (`iter_bytes`) sobre o mesmo pool; sem retentativa."""
+    label = endpoint or endpoint_label(url)
+    started = time.perf_counter()
+    status_code: Optional[int] = None
+    try:
+        with get_client(url).stream(method.upper(), url, timeout=timeout, **kwargs) as response:
+            status_code = response.status_code
+            _record_rate_limit(url, response)
+            yield response
+    finally:
+        _observe(label, (time.perf_counter() - started) * 1000, status_code)
@@ -0,0 +1,173 @@
+# app/core/jobs.py
+"""Jobs em segundo plano com o estado no banco.
+
+Os jobs dos services (reprocessamento de comissões, cronograma em lote,
+importação de carteira) seguem o mesmo desenho:
+
+- o job é uma linha na tabela do service (`status`, contadores, `updated_at`);
+- uma thread coordenadora executa o job, mas só depois de reivindicá-lo com um
+  update condicional (`pendente` -> `executando`): se dois processos disparam o
+  mesmo job, só um recebe a linha de volta;
+- todo update do job renova `updated_at`; um job `executando` sem update há mais
+  de `EXECUTANDO_TIMEOUT_MIN` minutos (processo morto) é tratado como abandonado
+  e pode ser retomado;
+- `WorkerPool` é o pool de threads, criado sob demanda, para o trabalho paralelo.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.supabase_lote import safe_rows
+
+logger = logging.getLogger(__name__)
+
+# Job `executando` sem update por mais que isto pode ser retomado.
+EXECUTANDO_TIMEOUT_MIN = 15
+
+Job = Dict[str, Any]
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_ts(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class WorkerPool:
+    """ThreadPoolExecutor compartilhado, criado no primeiro uso."""
+
+    def __init__(self, nome: str, workers: Callable[[], int]):
+        self._nome = nome
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(self._workers(), 1),
+                    thread_name_prefix=self._nome,
+                )
+            return self._executor
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Encerra o pool; o que ainda estava na fila é cancelado."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+
+class JobRunner:
+    """Dispara, reivindica e acompanha os jobs de uma tabela."""
+
+    def __init__(self, tabela: str, *, nome: str, em_execucao_msg: str):
+        self.tabela = tabela
+        self._nome = nome
+        self.em_execucao_msg = em_execucao_msg
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def update(self, supa: Any, job_id: str, patch: Dict[str, Any]) -> None:
+        supa.table(self.tabela).update({**patch, "updated_at": now_iso()}).eq("id", job_id).execute()
+
+    def abandonado(self, job: Job) -> bool:
+        if job.get("status") != "executando":
+            return False
+        updated_at = _parse_ts(job.get("updated_at"))
+        limite = datetime.now(timezone.utc) - timedelta(minutes=EXECUTANDO_TIMEOUT_MIN)
+        return updated_at is None or updated_at < limite
+
+    def em_execucao(self, job: Job) -> bool:
+        """Job rodando neste processo ou `executando` com updates recentes em outro."""
+        with self._lock:
+            if job["id"] in self._threads:
+                return True
+        return job.get("status") == "executando" and not self.abandonado(job)
+
+    def checar_parado(self, job: Job) -> None:
+        if self.em_execucao(job):
+            raise HTTPException(409, self.em_execucao_msg)
+
+    def reivindicar(self, supa: Any, job_id: str) -> Optional[Job]:
+        """`pendente` -> `executando`; devolve o job só para quem fez a troca."""
+        now = now_iso()
+        resp = (
+            supa.table(self.tabela)
+            .update({"status": "executando", "iniciado_em": now, "erro": None, "updated_at": now})
+            .eq("id", job_id)
+            .eq("status", "pendente")
+            .execute()
+        )
+        return next(iter(safe_rows(resp)), None)
+
+    def reabrir(self, supa: Any, job: Job, patch: Optional[Dict[str, Any]] = None) -> Job:
+        """Volta o job lido para `pendente` (retomada), se ninguém mexeu nele.
+
+        O update é condicional no `status` e no `updated_at` lidos; job em
+        execução (aqui ou em outro processo) ou alterado no meio do caminho é 409.
+        """
+        self.checar_parado(job)
+        query = (
+            supa.table(self.tabela)
+            .update({**(patch or {}), "status": "pendente", "erro": None, "updated_at": now_iso()})
+            .eq("id", job["id"])
+            .eq("status", job["status"])
+        )
+        if job.get("updated_at") is None:
+            query = query.is_("updated_at", "null")
+        else:
+            query = query.eq("updated_at", job["updated_at"])
+        reaberto = next(iter(safe_rows(query.execute())), None)
+        if reaberto is None:
+            raise HTTPException(409, self.em_execucao_msg)
+        return reaberto
+
+    def _rodar(self, supa: Any, job_id: str, executar: Callable[[Any, Job], Any]) -> None:
+        try:
+            job = self.reivindicar(supa, job_id)
+            if job is None:
+                logger.info("job_ja_reivindicado", extra={"tabela": self.tabela, "job_id": job_id})
+                return
+            executar(supa, job)
+        except Exception:  # noqa: BLE001 - a thread não pode morrer com exceção solta
+            logger.exception("job_error", extra={"tabela": self.tabela, "job_id": job_id})
+        finally:
+            with self._lock:
+                self._threads.pop(job_id, None)
+
+    def disparar(self, supa: Any, job_id: str, executar: Callable[[Any, Job], Any]) -> None:
+        """Sobe a thread coordenadora; `executar` recebe o job já reivindicado."""
+        with self._lock:
+            if job_id in self._threads:
+                raise HTTPException(409, self.em_execucao_msg)
+            thread = threading.Thread(
+                target=self._rodar,
+                args=(supa, job_id, executar),
+                name=f"{self._nome}-job-{job_id}",
+                daemon=True,
+            )
+            self._threads[job_id] = thread
+        thread.start()
+
+    def aguardar(self, job_id: str, timeout: Optional[float] = None) -> None:
+        """Espera a thread do job terminar (útil em testes e scripts)."""
+        with self._lock:
+            thread = self._threads.get(job_id)
+        if thread is not None:
+            thread.join(timeout)
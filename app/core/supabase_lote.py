@@ -0,0 +1,114 @@
+# app/core/supabase_lote.py
+"""Leitura e gravação em lote no Supabase.
+
+- `fetch_in` quebra listas grandes de `in.(...)` em blocos (a URL tem limite) e
+  lê cada bloco em páginas: o PostgREST corta a resposta no max-rows sem erro;
+- `select_paginado` pagina qualquer consulta por `id` até vir uma página curta;
+- `gravar_em_blocos` grava em blocos e, se um bloco falhar, regrava linha a
+  linha para que só as linhas com problema voltem como erro.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Tamanho dos blocos de `in.(...)` para não estourar a URL.
+QUERY_CHUNK = 200
+# Linhas por página (igual ao max-rows padrão do PostgREST).
+PAGE_SIZE = 1000
+# Linhas por insert/upsert.
+LOTE_CHUNK = 500
+
+Row = Dict[str, Any]
+
+
+def safe_rows(resp: Any) -> List[Row]:
+    return getattr(resp, "data", None) or []
+
+
+def chunks(values: Sequence[Any], size: Optional[int] = None) -> Iterable[List[Any]]:
+    size = size or QUERY_CHUNK
+    for start in range(0, len(values), size):
+        yield list(values[start:start + size])
+
+
+def select_paginado(
+    consulta: Callable[[], Any],
+    *,
+    order: Optional[str] = None,
+    desc: bool = False,
+    page_size: Optional[int] = None,
+) -> List[Row]:
+    """Lê todas as linhas de `consulta()` em páginas.
+
+    `consulta` monta a query (select + filtros) a cada página. A ordem é
+    `order` (opcional) e depois `id`, para as páginas não repetirem nem pularem linhas.
+    """
+    size = page_size or PAGE_SIZE
+    rows: List[Row] = []
+    start = 0
+    while True:
+        query = consulta()
+        if order and order != "id":
+            query = query.order(order, desc=desc)
+        page = safe_rows(query.order("id").range(start, start + size - 1).execute())
+        rows.extend(page)
+        if len(page) < size:
+            return rows
+        start += size
+
+
+def fetch_in(
+    supa: Any,
+    table: str,
+    org_id: str,
+    field: str,
+    values: Iterable[Any],
+    columns: str = "*",
+    order: Optional[str] = None,
+    desc: bool = False,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> List[Row]:
+    """Linhas da org com `field` em `values`, em blocos e páginas.
+
+    `filtros` são igualdades extras (coluna -> valor). A ordem (`order`) vale
+    dentro de cada bloco de valores.
+    """
+
+    def consulta(chunk: List[Any]) -> Any:
+        query = supa.table(table).select(columns).eq("org_id", org_id).in_(field, chunk)
+        for coluna, valor in (filtros or {}).items():
+            query = query.eq(coluna, valor)
+        return query
+
+    rows: List[Row] = []
+    for chunk in chunks(sorted({str(value) for value in values if value})):
+        rows.extend(select_paginado(lambda chunk=chunk: consulta(chunk), order=order, desc=desc))
+    return rows
+
+
+def gravar_em_blocos(
+    escrever: Callable[[List[Row]], List[Row]],
+    linhas: List[Tuple[Any, Row]],
+    erros: List[Row],
+    erro_de: Callable[[Any, Exception], Row],
+    *,
+    tamanho: Optional[int] = None,
+) -> List[Tuple[Any, Row]]:
+    """Grava `linhas` ((origem, payload)) em blocos de LOTE_CHUNK.
+
+    Se um bloco falha, ele é regravado linha a linha para que só as linhas com
+    problema voltem como erro. Devolve (origem, linha gravada) das que passaram.
+    """
+    gravadas: List[Tuple[Any, Row]] = []
+    for bloco in chunks(linhas, tamanho or LOTE_CHUNK):
+        try:
+            rows = escrever([payload for _, payload in bloco])
+        except Exception:  # noqa: BLE001
+            for origem, payload in bloco:
+                try:
+                    gravadas.extend((origem, row) for row in escrever([payload])[:1])
+                except Exception as exc:  # noqa: BLE001
+                    erros.append(erro_de(origem, exc))
+            continue
+        gravadas.extend(zip([origem for origem, _ in bloco], rows))
+    return gravadas
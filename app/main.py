@@ -124,6 +124,42 @@ async def _whatsapp_dispatch_loop():
         await asyncio.sleep(max(interval, 15))
 
 
+_comissao_logger = logging.getLogger("comissao.eventos")
+_lance_logger = logging.getLogger("lances.estatisticas")
+
+
+async def _comissao_eventos_loop():
+    """Worker embutido do outbox de comissão (pagamentos salvos)."""
+    from app.services import comissao_eventos_service
+
+    interval = settings.COMISSAO_EVENTOS_INTERVAL_SEC
+    while True:
+        try:
+            supa = get_supabase_admin()
+            result = await asyncio.to_thread(comissao_eventos_service.processar_eventos, supa, limit=25)
+            if result.get("processed"):
+                _comissao_logger.info("comissao_eventos_tick", extra={"result": result})
+        except Exception as exc:  # noqa: BLE001
+            _comissao_logger.warning("comissao_eventos_loop_error", extra={"error": str(exc)})
+        await asyncio.sleep(max(interval, 1))
+
+
+async def _lance_estatisticas_loop():
+    """Worker embutido: recalcula as estatísticas dos grupos marcados nas assembleias."""
+    from app.services import lance_estatisticas_service
+
+    interval = settings.LANCE_ESTATISTICAS_INTERVAL_SEC
+    while True:
+        try:
+            supa = get_supabase_admin()
+            result = await asyncio.to_thread(lance_estatisticas_service.processar_pendencias, supa, limit=50)
+            if result.get("processed") or result.get("falhas"):
+                _lance_logger.info("lance_estatisticas_tick", extra={"result": result})
+        except Exception as exc:  # noqa: BLE001
+            _lance_logger.warning("lance_estatisticas_loop_error", extra={"error": str(exc)})
+        await asyncio.sleep(max(interval, 1))
+
+
 @app.on_event("startup")
 async def start_whatsapp_scheduler():
     if settings.WHATSAPP_DISPATCH_INTERVAL_SEC and settings.WHATSAPP_DISPATCH_INTERVAL_SEC > 0:
@@ -131,10 +167,24 @@ async def start_whatsapp_scheduler():
         print(f"[whatsapp] agendador embutido ativo (a cada {settings.WHATSAPP_DISPATCH_INTERVAL_SEC}s)")
     else:
         print("[whatsapp] agendador embutido desligado (WHATSAPP_DISPATCH_INTERVAL_SEC=0)")
+    if settings.COMISSAO_EVENTOS_INTERVAL_SEC and settings.COMISSAO_EVENTOS_INTERVAL_SEC > 0:
+        app.state._comissao_eventos_task = asyncio.create_task(_comissao_eventos_loop())
+    if settings.LANCE_ESTATISTICAS_INTERVAL_SEC and settings.LANCE_ESTATISTICAS_INTERVAL_SEC > 0:
+        app.state._lance_estatisticas_task = asyncio.create_task(_lance_estatisticas_loop())
 
 
 @app.on_event("shutdown")
 async def stop_whatsapp_scheduler():
-    task = getattr(app.state, "_wa_task", None)
-    if task:
-        task.cancel()
+    for attr in ("_wa_task", "_comissao_eventos_task", "_lance_estatisticas_task"):
+        task = getattr(app.state, attr, None)
+        if task:
+            task.cancel()
+    from app.services import whatsapp_transcription_service
+
+    whatsapp_transcription_service.shutdown(wait=False)
+    from app.services import comissao_reprocessamento_service
+
+    comissao_reprocessamento_service.shutdown(wait=False)
+    from app.core import http_client
+
+    http_client.close_all()
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 from typing import Optional, Dict, Any, List
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from pydantic import BaseModel, EmailStr
 from supabase import Client
 
 from app.deps import get_supabase_admin
+from app.services import carteira_service
 from app.services.lead_address_service import apply_lead_address_rules
 from app.services.kanban_service import move_lead_stage
 
@@ -126,6 +127,9 @@ class NovaNegociacaoIn(BaseModel):
 def list_carteira(
     supa: Client = Depends(get_supabase_admin),
     x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+    q: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=carteira_service.CARTEIRA_PAGE_MAX),
+    cursor: Optional[str] = None,
 ):
     if not x_org_id:
         raise HTTPException(
@@ -133,125 +137,17 @@ def list_carteira(
             detail="X-Org-Id header é obrigatório",
         )
 
-    # Base da carteira = carteira_clientes
-    resp = (
-        supa.table("carteira_clientes")
-        .select("""
-            id,
-            org_id,
-            lead_id,
-            status,
-            origem_entrada,
-            entered_at,
-            observacoes,
-            leads!inner (
-                id,
-                nome,
-                telefone,
-                email,
-                etapa,
-                cep,
-                logradouro,
-                numero,
-                complemento,
-                bairro,
-                cidade,
-                estado,
-                latitude,
-                longitude,
-                address_updated_at
-            )
-        """)
-        .eq("org_id", x_org_id)
-        .order("entered_at", desc=True)
-        .execute()
+    # lista inteira ou, com limit/cursor, página por keyset; cota/contrato/administradora em uma consulta por tabela
+    items, next_cursor, total = carteira_service.listar_carteira(
+        supa, x_org_id, limit=limit, cursor=cursor, q=q
     )
 
-    rows = getattr(resp, "data", None) or []
-
-    # Enriquecer com cota/contrato mais recente por lead
-    result: List[Dict[str, Any]] = []
-
-    for row in rows:
-        lead_id = row["lead_id"]
-
-        cotas_resp = (
-            supa.table("cotas")
-            .select("""
-                id,
-                lead_id,
-                administradora_id,
-                numero_cota,
-                grupo_codigo,
-                valor_carta,
-                valor_parcela,
-                prazo,
-                autorizacao_gestao,
-                produto
-            """)
-            .eq("org_id", x_org_id)
-            .eq("lead_id", lead_id)
-            .order("created_at", desc=True)
-            .limit(1)
-            .execute()
-        )
-        cotas = getattr(cotas_resp, "data", None) or []
-        cota = cotas[0] if cotas else None
-
-        contrato = None
-        administradora = None
-
-        if cota:
-            contrato_resp = (
-                supa.table("contratos")
-                .select("""
-                    id,
-                    cota_id,
-                    numero,
-                    status,
-                    data_assinatura,
-                    data_pagamento,
-                    data_alocacao,
-                    data_contemplacao
-                """)
-                .eq("org_id", x_org_id)
-                .eq("cota_id", cota["id"])
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-            )
-            contratos = getattr(contrato_resp, "data", None) or []
-            contrato = contratos[0] if contratos else None
-
-            if cota.get("administradora_id"):
-                adm_resp = (
-                    supa.table("administradoras")
-                    .select("id, nome")
-                    .eq("org_id", x_org_id)
-                    .eq("id", cota["administradora_id"])
-                    .limit(1)
-                    .execute()
-                )
-                adms = getattr(adm_resp, "data", None) or []
-                administradora = adms[0] if adms else None
-
-        result.append({
-            "carteira_id": row["id"],
-            "lead_id": row["lead_id"],
-            "status_carteira": row["status"],
-            "origem_entrada": row["origem_entrada"],
-            "entered_at": row["entered_at"],
-            "observacoes": row.get("observacoes"),
-            "lead": row.get("leads"),
-            "cota": cota,
-            "contrato": contrato,
-            "administradora": administradora,
-        })
-
     return {
         "ok": True,
-        "items": result,
-        "total": len(result),
+        "items": items,
+        "total": total,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
     }
 
 
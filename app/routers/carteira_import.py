@@ -1,17 +1,21 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from supabase import Client
 
 from app.deps import get_supabase_admin
 from app.schemas.carteira_import import (
     CarteiraImportConfirmRequest,
     CarteiraImportConfirmResponse,
+    CarteiraImportJobRetomarRequest,
     CarteiraImportPreviewRequest,
     CarteiraImportPreviewResponse,
+    ImportProduto,
 )
 from app.security.auth import CurrentProfile, get_current_profile
+from app.services import carteira_import_job_service
 from app.services.carteira_import_service import build_import_preview, confirm_import
+from app.services.export_service import ExportColumn, ExportFormato, export_response
 
 
 router = APIRouter(prefix="/carteira/import", tags=["carteira-import"])
@@ -55,3 +59,72 @@ def carteira_import_confirm(
         produto_padrao=body.produto_padrao,
     )
 
+
+ERROS_COLUMNS = [
+    ExportColumn("Linha", "linha"),
+    ExportColumn("Cliente", "cliente_nome"),
+    ExportColumn("Erro", "erro"),
+]
+
+
+@router.post("/jobs")
+def carteira_import_job_create(
+    arquivo: UploadFile = File(...),
+    produto_padrao: ImportProduto = Form("imobiliario"),
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    _require_manager(profile)
+    job = carteira_import_job_service.criar_job(
+        sb,
+        profile=profile,
+        arquivo=arquivo.file,
+        nome_arquivo=arquivo.filename,
+        produto_padrao=produto_padrao,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.get("/jobs/{job_id}")
+def carteira_import_job_status(
+    job_id: str,
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    _require_manager(profile)
+    return carteira_import_job_service.status_importacao(sb, org_id=profile.org_id, job_id=job_id)
+
+
+@router.post("/jobs/{job_id}/retomar")
+def carteira_import_job_retomar(
+    job_id: str,
+    body: CarteiraImportJobRetomarRequest = CarteiraImportJobRetomarRequest(),
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    _require_manager(profile)
+    job = carteira_import_job_service.retomar_importacao(
+        sb,
+        org_id=profile.org_id,
+        job_id=job_id,
+        incluir_erros=body.incluir_erros,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.get("/jobs/{job_id}/erros")
+def carteira_import_job_erros(
+    job_id: str,
+    formato: ExportFormato = Query(default="csv"),
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    _require_manager(profile)
+    rows = carteira_import_job_service.iter_erros(sb, org_id=profile.org_id, job_id=job_id)
+    return export_response(
+        formato,
+        filename=f"importacao-carteira-{job_id}-erros",
+        columns=ERROS_COLUMNS,
+        rows=rows,
+        sheet_name="Erros",
+    )
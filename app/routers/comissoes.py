@@ -7,10 +7,12 @@ from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Uplo
 from supabase import Client
 
 from app.deps import get_supabase_admin
-from app.schemas.comissoes import RepasseLoteCreateIn
+from app.services.export_service import ExportFormato, export_response
+from app.schemas.comissoes import RepasseFechamentoIn, RepasseLoteCreateIn
 from app.services.repasse_lotes_service import (
     create_repasse_comprovante_signed_url,
     create_repasse_lote,
+    fechar_repasses,
     list_repasse_lotes,
     upload_repasse_comprovante,
 )
@@ -26,7 +28,15 @@ from app.schemas.comissoes import (
 )
 
 from app.schemas.comissoes import MarcarRepassePagoIn
+from app.schemas.comissoes import ComissaoReprocessamentoIn, ComissaoReprocessamentoRetomarIn
+from app.schemas.comissoes import ComissaoSimulacaoIn
+from app.services.comissao_reprocessamento_service import (
+    iniciar_reprocessamento,
+    retomar_reprocessamento,
+    status_reprocessamento,
+)
 from app.services.comissao_repasse_service import marcar_repasse_pago
+from app.services.comissao_simulacao_service import simular_comissoes
 from app.services.pagamentos_service import pular_competencia_por_lancamento
 from app.schemas.comissoes import ComissaoModeloUpsertIn
 from app.services.comissao_modelos_service import (
@@ -37,6 +47,7 @@ from app.services.comissao_modelos_service import (
 )
 from app.services.comissao_competencia_service import timeline_contrato
 from app.services.comissao_competencia_service import (
+    financeiro_contrato,
     listar_competencias_contrato,
     processar_pagamento_para_comissao,
     reprocessar_comissoes_contrato,
@@ -46,20 +57,26 @@ from app.schemas.partner_users import PartnerUserInviteIn
 from app.security.auth import AuthContext
 from app.security.permissions import require_manager
 from app.services.comissao_service import (
+    LANCAMENTOS_EXPORT_COLUMNS,
+    LANCAMENTOS_PAGE_MAX,
+    LANCAMENTOS_PAGE_SIZE,
     cancel_comissao_for_cota,
     delete_comissao_for_cota,
     delete_partner_if_allowed,
     fetch_config_by_cota,
     fetch_lancamentos,
+    fetch_lancamentos_page,
     fetch_parceiros_da_cota,
     fetch_regras,
     generate_lancamentos_for_contrato,
     get_delete_comissao_check,
     get_org_record_or_404,
     get_partner_delete_check,
+    iter_lancamentos,
     parceiros_ranking,
     summarize_lancamentos,
     sync_eventos_contrato,
+    totais_lancamentos,
     upsert_config_for_cota,
 )
 from app.services.contract_partner_sync_service import (
@@ -128,6 +145,64 @@ def reprocessar_competencias_contrato(
     )
 
 
+@router.post("/reprocessamentos")
+def post_reprocessamento(
+    body: ComissaoReprocessamentoIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    job = iniciar_reprocessamento(
+        supa,
+        org_id=org_id,
+        filtro=body.model_dump(exclude_none=True),
+        actor_id=ctx.user_id,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.get("/reprocessamentos/{job_id}")
+def get_reprocessamento(
+    job_id: str,
+    erros_limit: int = Query(default=50, ge=0, le=500),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    return status_reprocessamento(supa, org_id=org_id, job_id=job_id, erros_limit=erros_limit)
+
+
+@router.post("/reprocessamentos/{job_id}/retomar")
+def post_reprocessamento_retomar(
+    job_id: str,
+    body: ComissaoReprocessamentoRetomarIn = ComissaoReprocessamentoRetomarIn(),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    job = retomar_reprocessamento(
+        supa,
+        org_id=org_id,
+        job_id=job_id,
+        incluir_erros=body.incluir_erros,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.post("/simulacoes")
+def post_simulacao(
+    body: ComissaoSimulacaoIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    return simular_comissoes(supa, org_id, body)
+
+
 @router.get("/cotas/{cota_id}/delete-check")
 def check_delete_comissao_cota(
     cota_id: str,
@@ -285,6 +360,27 @@ def post_repasse_lote(
     )
 
 
+@router.post("/repasses/fechamento")
+def post_repasse_fechamento(
+    body: RepasseFechamentoIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    return fechar_repasses(
+        supa,
+        org_id=org_id,
+        competencia_de=body.competencia_de,
+        competencia_ate=body.competencia_ate,
+        parceiro_ids=body.parceiro_ids,
+        forma_pagamento=body.forma_pagamento,
+        observacoes=body.observacoes,
+        previa=body.previa,
+        actor_id=ctx.user_id,
+    )
+
+
 @router.post("/repasses/lote/{lote_id}/comprovante")
 async def post_repasse_comprovante(
     lote_id: str,
@@ -384,19 +480,42 @@ def get_parceiros_ranking(
 @router.get("/parceiros/{parceiro_id}/extrato")
 def parceiro_extrato(
     parceiro_id: str,
+    limit: int = Query(default=LANCAMENTOS_PAGE_SIZE, ge=1, le=LANCAMENTOS_PAGE_MAX),
+    cursor: Optional[str] = Query(default=None),
     supa: Client = Depends(get_supabase_admin),
     ctx: AuthContext = Depends(require_manager),
 ):
     parceiro = get_org_record_or_404(supa, "parceiros_corretores", ctx.org_id, parceiro_id)
-    lancamentos = fetch_lancamentos(supa, ctx.org_id, parceiro_id=parceiro_id)
+    lancamentos, next_cursor = fetch_lancamentos_page(
+        supa, ctx.org_id, limit=limit, cursor=cursor, parceiro_id=parceiro_id
+    )
     return {
         "ok": True,
         "parceiro": parceiro,
         "items": lancamentos,
-        "resumo": summarize_lancamentos(lancamentos),
+        **totais_lancamentos(supa, ctx.org_id, parceiro_id=parceiro_id),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
     }
 
 
+@router.get("/parceiros/{parceiro_id}/extrato/export")
+def parceiro_extrato_export(
+    parceiro_id: str,
+    formato: ExportFormato = Query(default="csv"),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+):
+    parceiro = get_org_record_or_404(supa, "parceiros_corretores", ctx.org_id, parceiro_id)
+    return export_response(
+        formato,
+        filename=f"extrato-{parceiro.get('nome') or parceiro_id}",
+        columns=LANCAMENTOS_EXPORT_COLUMNS,
+        rows=iter_lancamentos(supa, ctx.org_id, parceiro_id=parceiro_id),
+        sheet_name="Extrato",
+    )
+
+
 @router.get("/parceiros/{parceiro_id}/delete-check")
 def parceiro_delete_check(
     parceiro_id: str,
@@ -520,6 +639,8 @@ def listar_lancamentos(
     repasse_status: Optional[str] = Query(default=None),
     competencia_de: Optional[str] = Query(default=None),
     competencia_ate: Optional[str] = Query(default=None),
+    limit: int = Query(default=LANCAMENTOS_PAGE_SIZE, ge=1, le=LANCAMENTOS_PAGE_MAX),
+    cursor: Optional[str] = Query(default=None),
     supa: Client = Depends(get_supabase_admin),
     x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
 ):
@@ -533,8 +654,48 @@ def listar_lancamentos(
         competencia_de=competencia_de,
         competencia_ate=competencia_ate,
     )
-    items = fetch_lancamentos(supa, org_id, **filters.model_dump(exclude_none=True))
-    return {"ok": True, "items": items, "resumo": summarize_lancamentos(items)}
+    filter_values = filters.model_dump(exclude_none=True)
+    items, next_cursor = fetch_lancamentos_page(supa, org_id, limit=limit, cursor=cursor, **filter_values)
+    return {
+        "ok": True,
+        "items": items,
+        **totais_lancamentos(supa, org_id, **filter_values),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
+
+
+@router.get("/lancamentos/export")
+def exportar_lancamentos(
+    formato: ExportFormato = Query(default="csv"),
+    parceiro_id: Optional[str] = Query(default=None),
+    contrato_id: Optional[str] = Query(default=None),
+    cota_id: Optional[str] = Query(default=None),
+    status: Optional[str] = Query(default=None),
+    repasse_status: Optional[str] = Query(default=None),
+    competencia_de: Optional[str] = Query(default=None),
+    competencia_ate: Optional[str] = Query(default=None),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    filters = ComissaoListFilters(
+        parceiro_id=parceiro_id,
+        contrato_id=contrato_id,
+        cota_id=cota_id,
+        status=status,
+        repasse_status=repasse_status,
+        competencia_de=competencia_de,
+        competencia_ate=competencia_ate,
+    )
+    return export_response(
+        formato,
+        filename="comissoes-lancamentos",
+        columns=LANCAMENTOS_EXPORT_COLUMNS,
+        rows=iter_lancamentos(supa, org_id, **filters.model_dump(exclude_none=True)),
+        sheet_name="Lancamentos",
+    )
 
 
 @router.patch("/lancamentos/{lancamento_id}/status")
@@ -651,6 +812,21 @@ def get_competencias_contrato(
     )
 
 
+@router.get("/contratos/{contrato_id}/financeiro")
+def get_financeiro_contrato(
+    contrato_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = require_org_id(x_org_id)
+    return financeiro_contrato(
+        supa,
+        org_id=org_id,
+        contrato_id=contrato_id,
+    )
+
+
 @router.get("/contratos/{contrato_id}/resumo-financeiro")
 def get_resumo_financeiro_contrato(
     contrato_id: str,
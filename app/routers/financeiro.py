@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile
 from supabase import Client
 
 from app.deps import get_supabase_admin
 from app.schemas.financeiro import (
+    ConciliacaoConfirmarIn,
     ContratoNumeroUpdateIn,
     CronogramaContratoResponse,
+    CronogramaLoteIn,
     FinanceiroContratoOptionsResponse,
     PagamentoListResponse,
     PagamentoOperacaoResponse,
@@ -14,11 +16,24 @@ from app.schemas.financeiro import (
 )
 from app.security.auth import AuthContext
 from app.security.permissions import require_manager
+from app.services.comissao_eventos_service import status_processamento_pagamento
+from app.services.comissao_service import fetch_contrato_context
+from app.services.conciliacao_bancaria_service import (
+    iniciar_confirmacao,
+    previa_conciliacao,
+    retomar_confirmacao,
+    status_confirmacao,
+)
+from app.services.cronograma_lote_service import iniciar_geracao, retomar_geracao, status_geracao
+from app.services.export_service import ExportFormato, export_response
 from app.services.pagamentos_service import (
+    PAGAMENTOS_EXPORT_COLUMNS,
     cancelar_pagamentos_futuros,
+    contrato_ids_da_cota,
     create_pagamento,
     desfazer_pulo_competencia,
     gerar_cronograma_pagamentos_contrato,
+    iter_pagamentos,
     list_financeiro_contrato_options,
     list_pagamentos_by_contrato,
     list_pagamentos_by_cota,
@@ -76,6 +91,98 @@ def post_cronograma_contrato(
     )
 
 
+@router.post("/conciliacao/previa")
+def post_conciliacao_previa(
+    file: UploadFile = File(...),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    return previa_conciliacao(supa, org_id=org_id, stream=file.file)
+
+
+@router.post("/conciliacao/confirmar")
+def post_conciliacao_confirmar(
+    body: ConciliacaoConfirmarIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    job = iniciar_confirmacao(
+        supa,
+        org_id=org_id,
+        itens=[item.model_dump() for item in body.itens],
+        actor_id=ctx.user_id,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.get("/conciliacao/confirmar/{job_id}")
+def get_conciliacao_confirmar(
+    job_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    return status_confirmacao(supa, org_id=org_id, job_id=job_id)
+
+
+@router.post("/conciliacao/confirmar/{job_id}/retomar")
+def post_conciliacao_confirmar_retomar(
+    job_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    job = retomar_confirmacao(supa, org_id=org_id, job_id=job_id)
+    return {"ok": True, "item": job}
+
+
+@router.post("/cronogramas/lote")
+def post_cronogramas_lote(
+    body: CronogramaLoteIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    job = iniciar_geracao(
+        supa,
+        org_id=org_id,
+        contrato_ids=body.contrato_ids,
+        cota_ids=body.cota_ids,
+        actor_id=ctx.user_id,
+    )
+    return {"ok": True, "item": job}
+
+
+@router.get("/cronogramas/lote/{job_id}")
+def get_cronogramas_lote(
+    job_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    return status_geracao(supa, org_id=org_id, job_id=job_id)
+
+
+@router.post("/cronogramas/lote/{job_id}/retomar")
+def post_cronogramas_lote_retomar(
+    job_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    job = retomar_geracao(supa, org_id=org_id, job_id=job_id)
+    return {"ok": True, "item": job}
+
+
 @router.put("/pagamentos/{pagamento_id}")
 def put_pagamento(
     pagamento_id: str,
@@ -94,6 +201,17 @@ def put_pagamento(
     )
 
 
+@router.get("/pagamentos/{pagamento_id}/processamento")
+def get_pagamento_processamento(
+    pagamento_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    return status_processamento_pagamento(supa, org_id=org_id, pagamento_id=pagamento_id)
+
+
 @router.post("/pagamentos/{pagamento_id}/pular", response_model=PagamentoOperacaoResponse)
 def post_pular_pagamento(
     pagamento_id: str,
@@ -177,6 +295,43 @@ def get_pagamentos_cota(
     return list_pagamentos_by_cota(supa, org_id=org_id, cota_id=cota_id)
 
 
+@router.get("/contratos/{contrato_id}/pagamentos/export")
+def export_pagamentos_contrato(
+    contrato_id: str,
+    formato: ExportFormato = Query(default="csv"),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    contrato = fetch_contrato_context(supa, org_id, contrato_id)
+    return export_response(
+        formato,
+        filename=f"pagamentos-contrato-{contrato.get('numero') or contrato_id}",
+        columns=PAGAMENTOS_EXPORT_COLUMNS,
+        rows=iter_pagamentos(supa, org_id=org_id, contrato_ids=[contrato_id]),
+        sheet_name="Pagamentos",
+    )
+
+
+@router.get("/cotas/{cota_id}/pagamentos/export")
+def export_pagamentos_cota(
+    cota_id: str,
+    formato: ExportFormato = Query(default="csv"),
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+    x_org_id: str | None = Header(default=None, alias="X-Org-Id"),
+):
+    org_id = _resolve_org_id(ctx, x_org_id)
+    return export_response(
+        formato,
+        filename=f"pagamentos-cota-{cota_id}",
+        columns=PAGAMENTOS_EXPORT_COLUMNS,
+        rows=iter_pagamentos(supa, org_id=org_id, contrato_ids=contrato_ids_da_cota(supa, org_id, cota_id)),
+        sheet_name="Pagamentos",
+    )
+
+
 @router.put("/contratos/{contrato_id}/numero")
 def put_contrato_numero(
     contrato_id: str,
@@ -1,8 +1,18 @@
 # app/routers/health.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core import http_client
+from app.security.auth import AuthContext
+from app.security.permissions import require_manager
 
 router = APIRouter(tags=["health"])
 
 @router.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@router.get("/health/http")
+def http_client_metrics(ctx: AuthContext = Depends(require_manager)):
+    """Latência por endpoint externo e último rate limit reportado por host."""
+    return http_client.metrics_snapshot()
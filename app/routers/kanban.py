@@ -19,9 +19,11 @@ def get_kanban(
     show_active: bool = False,
     show_lost: bool = False,
     show_cold: bool = False,
+    q: str | None = None,
 ):
     """
     Retorna o snapshot do Kanban (colunas => leads).
+    `q` filtra por nome do cliente, cota, grupo ou contrato.
     """
     if not x_org_id:
         raise HTTPException(
@@ -35,6 +37,7 @@ def get_kanban(
         show_active=show_active,
         show_lost=show_lost,
         show_cold=show_cold,
+        q=q,
     )
     return snapshot
 
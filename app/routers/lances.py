@@ -6,14 +6,19 @@ from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from supabase import Client
 
 from app.deps import get_supabase_admin
+from app.services import lance_estatisticas_service
 from app.services.porto_pdf_parser import parse_porto_pdf
 from app.schemas.lances import (
     AtualizarCartaPayload,
     AtualizarResultadoLancePayload,
     CancelarCotaPayload,
+    CompetenciaLoteOut,
+    CompetenciaLotePayload,
     ContemplarCotaPayload,
     ControleMensalPayload,
     LanceCartaListResponse,
+    LanceEstatisticaGrupoOut,
+    LanceEstatisticasReconstruirOut,
     LancesCartaDetalheOut,
     RegistrarLancePayload,
     SimpleOkResponse,
@@ -30,6 +35,7 @@ from app.services.lances_service import (
     list_regras_operadora,
     normalize_competencia,
     reativar_cota,
+    registrar_competencia_lote,
     registrar_lance,
     upsert_controle_mensal,
 )
@@ -129,6 +135,22 @@ def patch_atualizar_carta(
     return {"ok": True}
 
 
+@router.post("/cartas/competencia/lote", response_model=CompetenciaLoteOut)
+def post_competencia_lote(
+    payload: CompetenciaLotePayload,
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    """Controle mensal e lances de várias cotas numa chamada (semana de assembleia)."""
+    return registrar_competencia_lote(
+        sb=sb,
+        profile=profile,
+        competencia=payload.competencia,
+        controles=[item.model_dump() for item in payload.controles],
+        lances=[item.model_dump() for item in payload.lances],
+    )
+
+
 @router.post("/cartas/{cota_id}/controle-mensal", response_model=SimpleOkResponse)
 def post_controle_mensal(
     cota_id: str,
@@ -188,9 +210,34 @@ def patch_resultado_lance(
     rows = getattr(resp, "data", None) or []
     if not rows:
         raise HTTPException(404, "Lance não encontrado")
+    lance_estatisticas_service.atualizar_apos_assembleia(
+        sb, org_id=profile.org_id, cota_ids=[rows[0].get("cota_id")]
+    )
     return {"ok": True}
 
 
+@router.get("/estatisticas", response_model=list[LanceEstatisticaGrupoOut])
+def get_estatisticas_lances(
+    administradora_id: str | None = Query(default=None),
+    produto: str | None = Query(default=None),
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    """Lance vencedor por grupo (p50/p80, tendência e taxa de contemplação), pré-calculado."""
+    return lance_estatisticas_service.listar_estatisticas(
+        sb, org_id=profile.org_id, administradora_id=administradora_id, produto=produto
+    )
+
+
+@router.post("/estatisticas/reconstruir", response_model=LanceEstatisticasReconstruirOut)
+def post_reconstruir_estatisticas_lances(
+    sb: Client = Depends(get_supabase_admin),
+    profile: CurrentProfile = Depends(get_current_profile),
+):
+    """Refaz as estatísticas de todos os grupos da org (carga inicial ou correção)."""
+    return lance_estatisticas_service.reconstruir_estatisticas(sb, org_id=profile.org_id)
+
+
 @router.post("/cartas/{cota_id}/contemplar", response_model=SimpleOkResponse)
 def post_contemplar_cota(
     cota_id: str,
@@ -14,6 +14,8 @@ from supabase import Client
 from app.core.config import settings
 from app.deps import get_supabase_admin
 from app.schemas.meta import (
+    MetaBackfillIn,
+    MetaBackfillJobOut,
     MetaIntegrationCreateIn,
     MetaConnectionTestOut,
     MetaDeleteIntegrationOut,
@@ -29,6 +31,7 @@ from app.schemas.meta import (
 )
 from app.security.auth import AuthContext
 from app.security.permissions import require_manager
+from app.services.meta_leads_backfill_service import iniciar_backfill, status_backfill
 from app.services.meta_leads_service import (
     META_CHANNEL,
     META_PROVIDER,
@@ -45,8 +48,9 @@ from app.services.meta_leads_service import (
     get_meta_page_forms_for_user,
     get_meta_oauth_user_diagnostics,
     get_meta_subscription_status,
-    ingest_meta_lead_event,
+    ingest_meta_lead_events,
     insert_audit_log,
+    invalidate_meta_integration_cache,
     list_meta_page_forms,
     list_meta_oauth_pages,
     parse_meta_oauth_state,
@@ -347,38 +351,44 @@ async def receive_meta_webhook(
         )
         return {"ok": True, "processed": 0, "ignored": True}
 
+    payloads: list[dict[str, Any]] = []
     for entry in body.get("entry") or []:
         for change in entry.get("changes") or []:
             if change.get("field") != "leadgen":
                 continue
 
-            payload = {
-                **(change.get("value") or {}),
-                "entry_id": entry.get("id"),
-                "entry_time": entry.get("time"),
+            payloads.append(
+                {
+                    **(change.get("value") or {}),
+                    "entry_id": entry.get("id"),
+                    "entry_time": entry.get("time"),
+                }
+            )
+
+    # Rajadas de leads têm as buscas na Graph agrupadas (Batch API, até 50 por chamada).
+    outcomes = ingest_meta_lead_events(supa, payloads=payloads) if payloads else []
+    for payload, outcome in zip(payloads, outcomes):
+        if not isinstance(outcome, HTTPException):
+            processed.append(outcome)
+            continue
+        logger.warning(
+            "meta_webhook_post_process_error",
+            extra={
+                "path": request.url.path,
+                "page_id": payload.get("page_id"),
+                "form_id": payload.get("form_id"),
+                "leadgen_id": payload.get("leadgen_id"),
+                "status_code": outcome.status_code,
+            },
+        )
+        errors.append(
+            {
+                "page_id": payload.get("page_id"),
+                "form_id": payload.get("form_id"),
+                "leadgen_id": payload.get("leadgen_id"),
+                "detail": outcome.detail,
             }
-            try:
-                result = ingest_meta_lead_event(supa, payload=payload)
-                processed.append(result)
-            except HTTPException as exc:
-                logger.warning(
-                    "meta_webhook_post_process_error",
-                    extra={
-                        "path": request.url.path,
-                        "page_id": payload.get("page_id"),
-                        "form_id": payload.get("form_id"),
-                        "leadgen_id": payload.get("leadgen_id"),
-                        "status_code": exc.status_code,
-                    },
-                )
-                errors.append(
-                    {
-                        "page_id": payload.get("page_id"),
-                        "form_id": payload.get("form_id"),
-                        "leadgen_id": payload.get("leadgen_id"),
-                        "detail": exc.detail,
-                    }
-                )
+        )
 
     logger.info(
         "meta_webhook_post_completed",
@@ -687,6 +697,7 @@ def create_meta_integration(
     }
 
     supa.table("meta_lead_integrations").insert(payload).execute()
+    invalidate_meta_integration_cache(payload["page_id"])
     row = _get_integration_or_404(
         supa,
         org_id=ctx.org_id,
@@ -777,6 +788,9 @@ def patch_meta_integration(
         .eq("org_id", ctx.org_id)
         .execute()
     )
+    invalidate_meta_integration_cache(current.get("page_id"))
+    if payload.get("page_id"):
+        invalidate_meta_integration_cache(payload["page_id"])
     row = _get_integration_or_404(
         supa,
         org_id=ctx.org_id,
@@ -938,6 +952,57 @@ def subscribe_meta_integration_page(
     return result
 
 
+@router.post(
+    "/meta/integrations/{integration_id}/backfill",
+    response_model=MetaBackfillJobOut,
+    status_code=202,
+)
+def backfill_meta_integration_leads(
+    integration_id: str,
+    payload: MetaBackfillIn,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+):
+    """Dispara em segundo plano o repuxe dos leads que o webhook perdeu (retomável, `max_pages` por job)."""
+    integration = _get_integration_or_404(
+        supa,
+        org_id=ctx.org_id,
+        integration_id=integration_id,
+    )
+    job = iniciar_backfill(
+        supa,
+        integration=integration,
+        max_pages=payload.max_pages,
+        page_size=payload.page_size,
+        since=payload.since,
+        restart=payload.restart,
+        actor_id=ctx.user_id,
+    )
+    insert_audit_log(
+        supa,
+        org_id=ctx.org_id,
+        actor_id=ctx.user_id,
+        entity="meta_lead_integration",
+        entity_id=integration_id,
+        action="backfill",
+        diff={"job_id": job["id"], **(job.get("parametros") or {})},
+    )
+    return job
+
+
+@router.get(
+    "/meta/integrations/{integration_id}/backfill/{job_id}",
+    response_model=MetaBackfillJobOut,
+)
+def get_meta_integration_backfill(
+    integration_id: str,
+    job_id: str,
+    supa: Client = Depends(get_supabase_admin),
+    ctx: AuthContext = Depends(require_manager),
+):
+    return status_backfill(supa, org_id=ctx.org_id, integration_id=integration_id, job_id=job_id)
+
+
 @router.get(
     "/meta/integrations/{integration_id}/subscription-status",
     response_model=MetaSubscriptionStatusOut,
@@ -23,6 +23,13 @@ class CarteiraImportConfirmRequest(CarteiraImportPreviewRequest):
     pass
 
 
+class CarteiraImportJobRetomarRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    # também reexecuta os blocos que falharam (além dos pendentes)
+    incluir_erros: bool = False
+
+
 class CarteiraImportPlannedEntities(BaseModel):
     cliente_encontrado: bool = False
     cliente_criar: bool = False
@@ -115,6 +115,23 @@ class RepasseLoteCreateIn(BaseModel):
     observacoes: Optional[str] = None
 
 
+class RepasseFechamentoIn(BaseModel):
+    competencia_de: date
+    competencia_ate: date
+    # vazio = todos os parceiros com repasse pendente no período
+    parceiro_ids: list[str] = []
+    forma_pagamento: Optional[str] = None
+    observacoes: Optional[str] = None
+    # só calcula o resumo por parceiro, sem criar lotes
+    previa: bool = False
+
+    @model_validator(mode="after")
+    def validate_periodo(self) -> "RepasseFechamentoIn":
+        if self.competencia_ate < self.competencia_de:
+            raise ValueError("competencia_ate deve ser igual ou posterior a competencia_de")
+        return self
+
+
 class ComissaoModeloRegraIn(BaseModel):
     ordem: int = Field(ge=1)
     tipo_evento: ComissaoEvento
@@ -240,4 +257,67 @@ class TimelineContratoOut(BaseModel):
     ok: bool
     contrato: dict[str, Any]
     items: list[dict[str, Any]]
-    total: int
\ No newline at end of file
+    total: int
+
+ReprocessamentoEscopo = Literal["contratos", "cotas", "parceiros", "modelo", "todos"]
+
+
+class ComissaoReprocessamentoIn(BaseModel):
+    escopo: ReprocessamentoEscopo
+    contrato_ids: list[str] = []
+    cota_ids: list[str] = []
+    parceiro_ids: list[str] = []
+    modelo_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def validate_filtro(self) -> "ComissaoReprocessamentoIn":
+        obrigatorio = {
+            "contratos": self.contrato_ids,
+            "cotas": self.cota_ids,
+            "parceiros": self.parceiro_ids,
+            "modelo": self.modelo_id,
+        }
+        if self.escopo in obrigatorio and not obrigatorio[self.escopo]:
+            raise ValueError(f"Informe o filtro do escopo '{self.escopo}'")
+        return self
+
+
+class ComissaoReprocessamentoRetomarIn(BaseModel):
+    # também reexecuta os contratos que falharam (além dos pendentes)
+    incluir_erros: bool = False
+
+
+class ComissaoSimulacaoParceiroIn(BaseModel):
+    parceiro_id: str
+    # 0 simula a saída do parceiro das cotas em que está.
+    percentual_parceiro: Decimal = Field(ge=0)
+    imposto_retido_pct: Optional[Decimal] = Field(default=None, ge=0, le=100)
+
+
+class ComissaoSimulacaoIn(BaseModel):
+    # Recorte das cotas avaliadas: as que seguem o modelo, as informadas ou todas.
+    modelo_id: Optional[str] = None
+    cota_ids: list[str] = []
+    # Proposta: novas parcelas (proporção sobre a comissão, como no modelo) e/ou
+    # novo total; sem parcelas, o total reescala as parcelas atuais.
+    percentual_total: Optional[Decimal] = Field(default=None, gt=0)
+    regras: list[ComissaoModeloRegraIn] = []
+    parceiros: list[ComissaoSimulacaoParceiroIn] = []
+    competencia_de: Optional[date] = None
+    competencia_ate: Optional[date] = None
+
+    @model_validator(mode="after")
+    def validate_proposta(self) -> "ComissaoSimulacaoIn":
+        if not self.regras and not self.parceiros and self.percentual_total is None:
+            raise ValueError("Informe parcelas, percentual_total ou parceiros para simular")
+        if self.regras:
+            ordens = [r.ordem for r in self.regras]
+            if len(ordens) != len(set(ordens)):
+                raise ValueError("Há ordens duplicadas nas parcelas simuladas")
+            total_prop = sum((r.proporcao for r in self.regras), start=Decimal("0"))
+            if total_prop.quantize(Decimal("0.01")) != Decimal("100.00"):
+                raise ValueError("A soma das proporções das parcelas deve ser 100%")
+        parceiro_ids = [p.parceiro_id for p in self.parceiros]
+        if len(parceiro_ids) != len(set(parceiro_ids)):
+            raise ValueError("Parceiro repetido na simulação")
+        return self
@@ -103,6 +103,23 @@ class CronogramaContratoResponse(BaseModel):
     competencias_processadas: int = 0
 
 
+class CronogramaLoteIn(BaseModel):
+    # ambos vazios = todos os contratos da org
+    contrato_ids: list[str] = []
+    cota_ids: list[str] = []
+
+
+class ConciliacaoBaixaIn(BaseModel):
+    pagamento_id: str
+    pago_em: date
+    # valor creditado pelo banco (o `valor_pago` da prévia); vazio mantém o valor da parcela
+    valor_pago: Optional[Decimal] = None
+
+
+class ConciliacaoConfirmarIn(BaseModel):
+    itens: list[ConciliacaoBaixaIn] = Field(min_length=1)
+
+
 class PagamentoOperacaoResponse(BaseModel):
     ok: bool = True
     pagamento_id: str
@@ -97,6 +97,72 @@ class RegistrarLancePayload(BaseModel):
     cota_lance_fixo_opcao_id: Optional[UUID] = None
 
 
+class ControleMensalLoteItem(BaseModel):
+    cota_id: UUID
+    status_mes: Literal["pendente", "planejado", "sem_lance"]
+    observacoes: Optional[str] = None
+
+
+class RegistrarLanceLoteItem(BaseModel):
+    cota_id: UUID
+    assembleia_data: date
+    tipo: LanceTipo
+    percentual: Optional[Decimal] = None
+    valor: Optional[Decimal] = None
+    base_calculo: LanceBaseCalculo = "saldo_devedor"
+    pagamento: Optional[dict[str, Any]] = None
+    resultado: Optional[str] = None
+    observacoes_competencia: Optional[str] = None
+    cota_lance_fixo_opcao_id: Optional[UUID] = None
+
+
+class CompetenciaLotePayload(BaseModel):
+    competencia: date
+    controles: list[ControleMensalLoteItem] = Field(default_factory=list, max_length=5000)
+    lances: list[RegistrarLanceLoteItem] = Field(default_factory=list, max_length=5000)
+
+    @model_validator(mode="after")
+    def validate_non_empty_lote(self) -> "CompetenciaLotePayload":
+        if not self.controles and not self.lances:
+            raise ValueError("Informe ao menos um controle ou lance")
+        return self
+
+
+class CompetenciaLoteErroOut(BaseModel):
+    tipo: Literal["controle", "lance"]
+    indice: int
+    cota_id: Optional[str] = None
+    erro: str
+
+
+class CompetenciaLoteOut(BaseModel):
+    competencia: date
+    lances_registrados: int
+    controles_gravados: int
+    erros: list[CompetenciaLoteErroOut] = []
+
+
+class LanceEstatisticaGrupoOut(BaseModel):
+    administradora_id: UUID
+    grupo_codigo: str
+    produto: Optional[str] = None
+    competencia_inicio: date
+    competencia_fim: date
+    assembleias: int
+    lances_decididos: int
+    lances_vencedores: int
+    lance_p50: Optional[Decimal] = None
+    lance_p80: Optional[Decimal] = None
+    tendencia_pp_mes: Optional[Decimal] = None
+    taxa_contemplacao: Optional[Decimal] = None
+    atualizado_em: Optional[datetime] = None
+
+
+class LanceEstatisticasReconstruirOut(BaseModel):
+    grupos: int
+    competencias: int
+
+
 class AtualizarResultadoLancePayload(BaseModel):
     resultado: Literal["pendente", "contemplado", "nao_contemplado", "cancelado", "desconsiderado"]
 
@@ -197,6 +263,9 @@ class LanceCartaListItem(BaseModel):
     competencia: date
     status_mes: StatusMes
     tem_pendencia_configuracao: bool
+    lance_p50: Optional[Decimal] = None
+    lance_p80: Optional[Decimal] = None
+    taxa_contemplacao_grupo: Optional[Decimal] = None
     opcoes_lance_fixo: list[CotaLanceFixoOpcaoOut] = []
     debug_fixo: Optional[str] = None
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Any, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
@@ -176,3 +177,50 @@ class MetaOAuthFinalizeIn(BaseModel):
             cleaned = value.strip()
             return cleaned or None
         return value
+
+
+class MetaBackfillIn(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    since: Optional[datetime] = None
+    max_pages: int = Field(default=20, ge=1, le=500)
+    page_size: int = Field(default=100, ge=1, le=500)
+    restart: bool = False
+
+
+class MetaBackfillFormOut(BaseModel):
+    form_id: str
+    pages: int = 0
+    fetched: int = 0
+    skipped: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: int = 0
+    resumed_from: Optional[str] = None
+    completed: bool = False
+
+
+class MetaBackfillOut(BaseModel):
+    ok: bool = True
+    integration_id: str
+    page_id: str
+    completed: bool
+    forms: list[MetaBackfillFormOut] = Field(default_factory=list)
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+
+class MetaBackfillJobOut(BaseModel):
+    id: str
+    integration_id: str
+    # pendente | executando | concluido | falhou
+    status: str
+    em_execucao: bool = False
+    parametros: dict[str, Any] = Field(default_factory=dict)
+    resultado: Optional[MetaBackfillOut] = None
+    erro: Optional[str] = None
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    created_at: Optional[datetime] = None
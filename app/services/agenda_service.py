@@ -64,7 +64,7 @@ def feriados_nacionais(ano: int) -> dict[date, str]:
     return fer
 
 
-def _feriados_set(*, supa: Client, org_id: str, anos: set[int]) -> set[date]:
+def feriados_set(*, supa: Client, org_id: str, anos: set[int]) -> set[date]:
     """Dias bloqueados por feriado: nacionais (calculados) + custom da org."""
     dias: set[date] = set()
     for ano in anos:
@@ -202,7 +202,7 @@ def listar_slots(
     slots: list[dict[str, Any]] = []
     dia = agora().replace(hour=0, minute=0, second=0, microsecond=0)
     limite_dia = (agora() + timedelta(days=horizonte)).date()
-    feriados = _feriados_set(supa=supa, org_id=org_id, anos={agora().year, limite_dia.year})
+    feriados = feriados_set(supa=supa, org_id=org_id, anos={agora().year, limite_dia.year})
 
     for _ in range(horizonte + 1):
         if dia.date() in feriados:
@@ -242,7 +242,7 @@ def slot_disponivel(
     cal_id = calendario.get("id")
 
     # feriado bloqueia o dia inteiro
-    if inicio.date() in _feriados_set(supa=supa, org_id=org_id, anos={inicio.year}):
+    if inicio.date() in feriados_set(supa=supa, org_id=org_id, anos={inicio.year}):
         return False
 
     # dentro de alguma regra do dia?
@@ -0,0 +1,341 @@
+"""Calendário de assembleias materializado por org.
+
+A data de assembleia de uma cota sai do `assembleia_dia` da própria cota ou da
+regra da administradora (`administradora_regras_lance`, por produto ou
+genérica), ajustada para dia útil. O ajuste considera fim de semana e feriados:
+os nacionais (`agenda_service.feriados_nacionais`) e os da org
+(`agenda_feriados`).
+
+Para as regras das administradoras, as datas de um horizonte móvel
+(`ASSEMBLEIA_CALENDARIO_MESES_ANTES`/`_DEPOIS` em torno do mês atual) ficam
+gravadas em `assembleia_calendario` (migration 016) junto com a versão de
+`assembleia_calendario_versoes`, que os triggers incrementam quando uma regra
+ou um feriado da org muda. A listagem, o detalhe e o controle mensal leem o
+`CalendarioAssembleia` em memória (consulta O(1) por administradora/produto/
+competência). O materializado é lido primeiro; regras e feriados só são
+carregados quando alguém precisa deles, e as datas só são recalculadas quando a
+versão muda ou o horizonte anda. Sem a migration, o calendário é montado em
+memória a cada chamada.
+"""
+from __future__ import annotations
+
+import logging
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.core.cache import MISS, VersionedCache
+from app.core.config import settings
+from app.services.agenda_service import feriados_set
+
+logger = logging.getLogger(__name__)
+
+CALENDARIO_TABLE = "assembleia_calendario"
+VERSOES_TABLE = "assembleia_calendario_versoes"
+WRITE_CHUNK = 500
+PAGE_SIZE = 1000
+
+_Chave = Tuple[str, Optional[str], str]  # (administradora_id, produto, competencia)
+_Regras = Dict[Tuple[str, Optional[str]], Dict[str, Any]]
+
+
+def normalize_competencia(dt: date) -> date:
+    return date(dt.year, dt.month, 1)
+
+
+def _add_months(dt: date, months: int) -> date:
+    index = dt.year * 12 + (dt.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ajustar_dia_util(dt: date, tipo_ajuste: str, feriados: Iterable[date] = ()) -> date:
+    """Leva `dt` para o dia útil anterior/seguinte, pulando fim de semana e feriados."""
+    feriados = feriados if isinstance(feriados, (set, frozenset)) else set(feriados)
+    if tipo_ajuste == "dia_util_anterior":
+        passo = timedelta(days=-1)
+    elif tipo_ajuste == "proximo_dia_util":
+        passo = timedelta(days=1)
+    else:
+        return dt
+    while dt.weekday() >= 5 or dt in feriados:
+        dt += passo
+    return dt
+
+
+def build_assembleia_date(
+    *,
+    competencia: date,
+    dia_base: int,
+    ajustar_fim_semana: bool,
+    tipo_ajuste: str,
+    feriados: Iterable[date] = (),
+) -> date:
+    last_day = monthrange(competencia.year, competencia.month)[1]
+    safe_day = min(dia_base, last_day)
+    dt = date(competencia.year, competencia.month, safe_day)
+    if ajustar_fim_semana:
+        dt = ajustar_dia_util(dt, tipo_ajuste, feriados)
+    return dt
+
+
+# ---------------------------------------------------------------------------
+# Calendário em memória
+# ---------------------------------------------------------------------------
+
+
+class CalendarioAssembleia:
+    """Datas materializadas das regras + feriados da org, para consulta O(1).
+
+    Regras e feriados podem vir prontos ou ser carregados no primeiro uso
+    (`carregar_regras` / `carregar_feriados`, com o client de `usar_client`).
+    """
+
+    def __init__(
+        self,
+        *,
+        regras: Optional[_Regras] = None,
+        feriados: Optional[Set[date]] = None,
+        datas: Optional[Dict[_Chave, date]] = None,
+        versao: Optional[int] = None,
+        mes_referencia: Optional[date] = None,
+        carregar_regras: Optional[Callable[[Client], _Regras]] = None,
+        carregar_feriados: Optional[Callable[[Client], Set[date]]] = None,
+    ) -> None:
+        self._regras = regras
+        self._feriados = frozenset(feriados) if feriados is not None else None
+        self._carregar_regras = carregar_regras
+        self._carregar_feriados = carregar_feriados
+        self._supa: Optional[Client] = None
+        self.datas: Dict[_Chave, date] = datas or {}
+        self.versao = versao
+        self.mes_referencia = mes_referencia
+
+    def usar_client(self, supa: Client) -> "CalendarioAssembleia":
+        """Client da requisição atual para as cargas sob demanda (o calendário fica em cache)."""
+        self._supa = supa
+        return self
+
+    # Duas threads podem carregar ao mesmo tempo; o resultado é o mesmo.
+    @property
+    def regras(self) -> _Regras:
+        if self._regras is None:
+            self._regras = self._carregar_regras(self._supa) if self._carregar_regras else {}
+        return self._regras
+
+    @property
+    def feriados(self) -> frozenset:
+        if self._feriados is None:
+            self._feriados = frozenset(self._carregar_feriados(self._supa) if self._carregar_feriados else ())
+        return self._feriados
+
+    def regra(self, administradora_id: Optional[str], produto: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Regra da administradora: a do produto, senão a genérica."""
+        if not administradora_id:
+            return None
+        if produto and (administradora_id, produto) in self.regras:
+            return self.regras[(administradora_id, produto)]
+        return self.regras.get((administradora_id, None))
+
+    def data(self, competencia: date, *, dia_base: int, ajustar_fim_semana: bool, tipo_ajuste: str) -> date:
+        return build_assembleia_date(
+            competencia=competencia,
+            dia_base=dia_base,
+            ajustar_fim_semana=ajustar_fim_semana,
+            tipo_ajuste=tipo_ajuste,
+            feriados=self.feriados,
+        )
+
+    def data_regra(self, regra: Dict[str, Any], competencia: date) -> date:
+        chave = (regra["administradora_id"], regra.get("produto"), competencia.isoformat())
+        materializada = self.datas.get(chave)
+        if materializada is not None:
+            return materializada
+        # fora do horizonte materializado
+        return self.data(
+            competencia,
+            dia_base=int(regra["dia_base_assembleia"]),
+            ajustar_fim_semana=bool(regra.get("ajustar_fim_semana", True)),
+            tipo_ajuste=regra.get("tipo_ajuste") or "proximo_dia_util",
+        )
+
+
+def _horizonte(mes_referencia: date) -> list[date]:
+    antes = max(settings.ASSEMBLEIA_CALENDARIO_MESES_ANTES, 0)
+    depois = max(settings.ASSEMBLEIA_CALENDARIO_MESES_DEPOIS, 0)
+    return [_add_months(mes_referencia, offset) for offset in range(-antes, depois + 1)]
+
+
+def _carregar_regras(supa: Client, org_id: str) -> _Regras:
+    resp = (
+        supa.table("administradora_regras_lance")
+        .select("*")
+        .eq("org_id", org_id)
+        .order("created_at")
+        .execute()
+    )
+    regras: _Regras = {}
+    for row in getattr(resp, "data", None) or []:
+        if row.get("administradora_id") and row.get("dia_base_assembleia") is not None:
+            regras.setdefault((row["administradora_id"], row.get("produto")), row)
+    return regras
+
+
+def montar_calendario(
+    supa: Client,
+    org_id: str,
+    *,
+    mes_referencia: date,
+    versao: Optional[int] = None,
+) -> CalendarioAssembleia:
+    """Calcula as datas de todas as regras da org no horizonte."""
+    meses = _horizonte(mes_referencia)
+    calendario = CalendarioAssembleia(
+        regras=_carregar_regras(supa, org_id),
+        versao=versao,
+        mes_referencia=mes_referencia,
+        carregar_feriados=_feriados_loader(org_id, mes_referencia),
+    ).usar_client(supa)
+    for regra in calendario.regras.values():
+        for mes in meses:
+            calendario.datas[(regra["administradora_id"], regra.get("produto"), mes.isoformat())] = calendario.data(
+                mes,
+                dia_base=int(regra["dia_base_assembleia"]),
+                ajustar_fim_semana=bool(regra.get("ajustar_fim_semana", True)),
+                tipo_ajuste=regra.get("tipo_ajuste") or "proximo_dia_util",
+            )
+    return calendario
+
+
+def _feriados_loader(org_id: str, mes_referencia: date) -> Callable[[Client], Set[date]]:
+    anos = {mes.year for mes in _horizonte(mes_referencia)}
+    return lambda supa: feriados_set(supa=supa, org_id=org_id, anos=anos)
+
+
+# ---------------------------------------------------------------------------
+# Materialização
+# ---------------------------------------------------------------------------
+
+# org_id -> calendário, válido para a (versão, mês de referência) com que foi
+# montado. Sem cópia: o calendário não é alterado depois de montado.
+_cache = VersionedCache(copiar=False)
+
+
+def _is_missing_calendario(exc: APIError) -> bool:
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return CALENDARIO_TABLE in message
+
+
+def _fetch_versao(supa: Client, org_id: str) -> int:
+    resp = supa.table(VERSOES_TABLE).select("versao").eq("org_id", org_id).limit(1).execute()
+    rows = getattr(resp, "data", None) or []
+    # org sem regra nem feriado próprio nunca teve bump
+    return int(rows[0].get("versao") or 0) if rows else 0
+
+
+def _fetch_materializado(supa: Client, org_id: str, versao: int) -> list[Dict[str, Any]]:
+    rows: list[Dict[str, Any]] = []
+    start = 0
+    while True:
+        resp = (
+            supa.table(CALENDARIO_TABLE)
+            .select("administradora_id, produto, competencia, assembleia_prevista")
+            .eq("org_id", org_id)
+            .eq("versao", versao)
+            .order("competencia")
+            .range(start, start + PAGE_SIZE - 1)
+            .execute()
+        )
+        page = getattr(resp, "data", None) or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _gravar(supa: Client, org_id: str, calendario: CalendarioAssembleia) -> None:
+    rows = [
+        {
+            "org_id": org_id,
+            "administradora_id": administradora_id,
+            "produto": produto or "",
+            "competencia": competencia,
+            "assembleia_prevista": data.isoformat(),
+            "versao": calendario.versao,
+        }
+        for (administradora_id, produto, competencia), data in calendario.datas.items()
+    ]
+    # mês a mês: se a gravação parar no meio, faltam meses de todas as regras e
+    # `_cobre_horizonte` recusa o materializado incompleto
+    rows.sort(key=lambda row: (row["competencia"], row["administradora_id"], row["produto"]))
+    for start in range(0, len(rows), WRITE_CHUNK):
+        supa.table(CALENDARIO_TABLE).upsert(
+            rows[start:start + WRITE_CHUNK],
+            on_conflict="org_id,administradora_id,produto,competencia",
+        ).execute()
+    supa.table(CALENDARIO_TABLE).delete().eq("org_id", org_id).neq("versao", calendario.versao).execute()
+
+
+def _cobre_horizonte(calendario: CalendarioAssembleia) -> bool:
+    """Cada regra do materializado tem data em todos os meses do horizonte.
+
+    Sem nenhuma linha não dá para saber se a org não tem regra ou se a versão
+    ainda não foi gravada; nesse caso recalcula.
+    """
+    pares = {(administradora_id, produto) for administradora_id, produto, _ in calendario.datas}
+    esperadas = {
+        (administradora_id, produto, mes.isoformat())
+        for (administradora_id, produto) in pares
+        for mes in _horizonte(calendario.mes_referencia)
+    }
+    return bool(pares) and esperadas <= calendario.datas.keys()
+
+
+def carregar_calendario(supa: Client, org_id: str, *, hoje: Optional[date] = None) -> CalendarioAssembleia:
+    """Calendário da org: do cache do processo, do materializado ou recalculado."""
+    mes_referencia = normalize_competencia(hoje or date.today())
+    try:
+        versao = _fetch_versao(supa, org_id)
+    except APIError as exc:
+        if VERSOES_TABLE not in str(getattr(exc, "message", None) or exc).lower():
+            raise
+        logger.warning("assembleia_calendario_ausente", extra={"org_id": org_id})
+        return montar_calendario(supa, org_id, mes_referencia=mes_referencia)
+
+    cached = _cache.get(org_id, versao=(versao, mes_referencia))
+    if cached is not MISS:
+        return cached.usar_client(supa)
+
+    # o materializado guarda só as datas; regras e feriados ficam para quando
+    # alguma cota precisar
+    calendario: Optional[CalendarioAssembleia] = None
+    try:
+        rows = _fetch_materializado(supa, org_id, versao)
+        persistido = CalendarioAssembleia(
+            datas={
+                (row["administradora_id"], row.get("produto") or None, str(row["competencia"])[:10]): date.fromisoformat(
+                    str(row["assembleia_prevista"])[:10]
+                )
+                for row in rows
+            },
+            versao=versao,
+            mes_referencia=mes_referencia,
+            carregar_regras=lambda client: _carregar_regras(client, org_id),
+            carregar_feriados=_feriados_loader(org_id, mes_referencia),
+        ).usar_client(supa)
+        if _cobre_horizonte(persistido):
+            calendario = persistido
+        else:
+            calendario = montar_calendario(supa, org_id, mes_referencia=mes_referencia, versao=versao)
+            _gravar(supa, org_id, calendario)
+    except APIError as exc:
+        if not _is_missing_calendario(exc):
+            raise
+        logger.warning("assembleia_calendario_ausente", extra={"org_id": org_id})
+    if calendario is None:
+        calendario = montar_calendario(supa, org_id, mes_referencia=mes_referencia, versao=versao)
+
+    _cache.put(org_id, calendario, versao=(versao, mes_referencia))
+    return calendario
@@ -0,0 +1,280 @@
+"""Busca textual de clientes, cotas e contratos da org.
+
+Uma única RPC (`busca_carteira`, migration 017) procura o termo, sem acento e
+sem diferenciar maiúsculas, no nome do lead (trigrama + tsvector em português),
+no número da cota, no código do grupo e no número do contrato, usando índices
+GIN. Ela devolve pares `(lead_id, cota_id)` ordenados por relevância, limitados
+a `BUSCA_LIMITE`. A listagem das cartas usa os `cota_id`; a carteira e o kanban
+usam os `lead_id`. Assim o filtro das telas é sempre uma lista limitada de ids,
+e não uma lista que cresce com o número de leads encontrados.
+
+Filtros de cota da tela (status, administradora, produto, autorização) vão
+para a RPC (`filtros_cota`, migration 024) e valem antes do limite; senão as
+cotas que passam no filtro podiam ficar fora das primeiras encontradas. O mesmo
+vale para os filtros de lead (`filtros_lead`, migration 027): etapas do kanban
+e "só leads da carteira". Com filtro de lead o limite conta leads distintos.
+
+Sem a migration, a busca cai para `ilike` nas mesmas colunas (sensível a
+acento e sem índice), com o mesmo limite.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.core.config import settings
+from app.core.supabase_lote import fetch_in
+
+logger = logging.getLogger(__name__)
+
+BUSCA_RPC = "busca_carteira"
+TERMO_MIN = 2
+TERMO_MAX = 100
+
+
+def normalizar_termo(q: Optional[str]) -> Optional[str]:
+    """Termo pronto para a busca, ou None quando curto demais para filtrar."""
+    termo = " ".join((q or "").split())[:TERMO_MAX]
+    return termo if len(termo) >= TERMO_MIN else None
+
+
+# filtro de cota -> parâmetro da RPC
+_FILTROS_COTA = {
+    "status": "p_status",
+    "administradora_id": "p_administradora_id",
+    "produto": "p_produto",
+    "somente_autorizadas": "p_somente_autorizadas",
+}
+
+
+# filtro de lead -> parâmetro da RPC
+_FILTROS_LEAD = {
+    "etapas": "p_etapas",
+    "somente_carteira": "p_somente_carteira",
+}
+
+
+def _filtros_ativos(filtros: Optional[Dict[str, Any]], campos: Dict[str, str]) -> Dict[str, Any]:
+    return {campo: valor for campo, valor in (filtros or {}).items() if campo in campos and valor}
+
+
+def _escapar_like(termo: str) -> str:
+    """Termo literal num padrão LIKE: `%` e `_` do usuário não viram curinga."""
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filtrar_cotas(query: Any, filtros: Dict[str, Any]) -> Any:
+    for campo, valor in filtros.items():
+        query = query.eq("autorizacao_gestao", True) if campo == "somente_autorizadas" else query.eq(campo, valor)
+    return query
+
+
+def _resultado(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"lead_id": row.get("lead_id"), "cota_id": row.get("cota_id"), "rank": float(row.get("rank") or 0)}
+        for row in rows
+    ]
+
+
+def _leads_por_nome(
+    supa: Client,
+    *,
+    org_id: str,
+    padrao: str,
+    limite: int,
+    filtros_lead: Dict[str, Any],
+) -> List[str]:
+    """Até `limite` leads cujo nome casa, já dentro dos filtros de lead."""
+
+    def consulta() -> Any:
+        query = supa.table("leads").select("id").eq("org_id", org_id).ilike("nome", padrao)
+        if filtros_lead.get("etapas"):
+            query = query.in_("etapa", list(filtros_lead["etapas"]))
+        return query
+
+    if not filtros_lead.get("somente_carteira"):
+        return [row["id"] for row in getattr(consulta().limit(limite).execute(), "data", None) or []]
+
+    # a carteira não filtra na mesma consulta: lê em páginas até juntar `limite` leads
+    encontrados: List[str] = []
+    inicio = 0
+    while len(encontrados) < limite:
+        pagina = getattr(consulta().order("id").range(inicio, inicio + limite - 1).execute(), "data", None) or []
+        ids = [str(row["id"]) for row in pagina]
+        na_carteira = {
+            str(row["lead_id"]) for row in fetch_in(supa, "carteira_clientes", org_id, "lead_id", ids, columns="id, lead_id")
+        }
+        encontrados.extend(lead_id for lead_id in ids if lead_id in na_carteira)
+        if len(pagina) < limite:
+            break
+        inicio += limite
+    return encontrados[:limite]
+
+
+def _buscar_sem_indice(
+    supa: Client,
+    *,
+    org_id: str,
+    termo: str,
+    limite: int,
+    filtros: Optional[Dict[str, Any]] = None,
+    filtros_lead: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    # caracteres que quebram o filtro `or` do postgrest
+    seguro = termo.replace(",", " ").replace("(", " ").replace(")", " ")
+    padrao = f"%{_escapar_like(seguro)}%"
+    filtros_lead = filtros_lead or {}
+    rows: List[Dict[str, Any]] = []
+
+    lead_ids = _leads_por_nome(supa, org_id=org_id, padrao=padrao, limite=limite, filtros_lead=filtros_lead)
+    if not filtros:
+        rows.extend({"lead_id": lead_id, "cota_id": None, "rank": 0.5} for lead_id in lead_ids)
+    if lead_ids:
+        cotas_dos_leads = _filtrar_cotas(
+            supa.table("cotas").select("id, lead_id").eq("org_id", org_id).in_("lead_id", lead_ids), filtros or {}
+        ).execute()
+        rows.extend(
+            {"lead_id": row.get("lead_id"), "cota_id": row["id"], "rank": 0.5}
+            for row in getattr(cotas_dos_leads, "data", None) or []
+        )
+
+    cotas = (
+        _filtrar_cotas(
+            supa.table("cotas")
+            .select("id, lead_id")
+            .eq("org_id", org_id)
+            .or_(f"numero_cota.ilike.{padrao},grupo_codigo.ilike.{padrao}"),
+            filtros or {},
+        )
+        .limit(limite)
+        .execute()
+    )
+    rows.extend(
+        {"lead_id": row.get("lead_id"), "cota_id": row["id"], "rank": 1.0}
+        for row in getattr(cotas, "data", None) or []
+    )
+
+    contratos = (
+        supa.table("contratos")
+        .select("cota_id, cotas ( lead_id )")
+        .eq("org_id", org_id)
+        .ilike("numero", padrao)
+        .limit(limite)
+        .execute()
+    )
+    por_contrato = [
+        {"lead_id": (row.get("cotas") or {}).get("lead_id"), "cota_id": row.get("cota_id"), "rank": 1.0}
+        for row in getattr(contratos, "data", None) or []
+        if row.get("cota_id")
+    ]
+    if filtros and por_contrato:
+        validas = _filtrar_cotas(
+            supa.table("cotas")
+            .select("id")
+            .eq("org_id", org_id)
+            .in_("id", sorted({row["cota_id"] for row in por_contrato})),
+            filtros,
+        ).execute()
+        ids_validos = {row["id"] for row in getattr(validas, "data", None) or []}
+        por_contrato = [row for row in por_contrato if row["cota_id"] in ids_validos]
+    rows.extend(por_contrato)
+
+    rows.sort(key=lambda row: -row["rank"])
+    if not filtros_lead:
+        return rows[:limite]
+    return _limitar_por_lead(_filtrar_leads(supa, org_id=org_id, rows=rows, filtros_lead=filtros_lead), limite)
+
+
+def _filtrar_leads(
+    supa: Client,
+    *,
+    org_id: str,
+    rows: List[Dict[str, Any]],
+    filtros_lead: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    validos = {str(row["lead_id"]) for row in rows if row.get("lead_id")}
+    if filtros_lead.get("etapas") and validos:
+        etapas = set(filtros_lead["etapas"])
+        validos = {
+            str(row["id"])
+            for row in fetch_in(supa, "leads", org_id, "id", validos, columns="id, etapa")
+            if row.get("etapa") in etapas
+        }
+    if filtros_lead.get("somente_carteira") and validos:
+        validos = {
+            str(row["lead_id"])
+            for row in fetch_in(supa, "carteira_clientes", org_id, "lead_id", validos, columns="id, lead_id")
+        }
+    return [row for row in rows if row.get("lead_id") and str(row["lead_id"]) in validos]
+
+
+def _limitar_por_lead(rows: List[Dict[str, Any]], limite: int) -> List[Dict[str, Any]]:
+    """Todos os pares dos `limite` leads mais relevantes (`rows` já ordenado)."""
+    top = lead_ids(rows)[:limite]
+    return [row for row in rows if str(row["lead_id"]) in set(top)]
+
+
+def buscar(
+    supa: Client,
+    *,
+    org_id: str,
+    q: Optional[str],
+    limite: Optional[int] = None,
+    filtros_cota: Optional[Dict[str, Any]] = None,
+    filtros_lead: Optional[Dict[str, Any]] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """Pares `{lead_id, cota_id, rank}` do mais ao menos relevante.
+
+    None quando não há termo de busca (a tela não deve filtrar); lista vazia
+    quando há termo mas nada casou. Com `filtros_cota` (`status`,
+    `administradora_id`, `produto`, `somente_autorizadas`) só voltam cotas que
+    passam neles; com `filtros_lead` (`etapas`, `somente_carteira`) só leads que
+    passam neles, e o limite passa a contar leads distintos.
+    """
+    termo = normalizar_termo(q)
+    if termo is None:
+        return None
+    limite = max(int(limite or settings.BUSCA_LIMITE), 1)
+    filtros = _filtros_ativos(filtros_cota, _FILTROS_COTA)
+    por_lead = _filtros_ativos(filtros_lead, _FILTROS_LEAD)
+    if "etapas" in por_lead:
+        por_lead["etapas"] = list(por_lead["etapas"])
+    params: Dict[str, Any] = {"p_org_id": org_id, "p_q": termo, "p_limite": limite}
+    params.update({_FILTROS_COTA[campo]: valor for campo, valor in filtros.items()})
+    params.update({_FILTROS_LEAD[campo]: valor for campo, valor in por_lead.items()})
+    try:
+        resp = supa.rpc(BUSCA_RPC, params).execute()
+    except APIError as exc:
+        if BUSCA_RPC not in str(getattr(exc, "message", None) or exc):
+            raise
+        logger.warning("busca_sem_indice", extra={"org_id": org_id})
+        return _buscar_sem_indice(
+            supa, org_id=org_id, termo=termo, limite=limite, filtros=filtros, filtros_lead=por_lead
+        )
+    return _resultado(getattr(resp, "data", None) or [])
+
+
+def _ids(resultados: List[Dict[str, Any]], campo: str) -> List[str]:
+    vistos: Dict[str, None] = {}
+    for row in resultados:
+        if row.get(campo):
+            vistos.setdefault(str(row[campo]), None)
+    return list(vistos)
+
+
+def cota_ids(resultados: List[Dict[str, Any]]) -> List[str]:
+    """Cotas encontradas, na ordem de relevância."""
+    return _ids(resultados, "cota_id")
+
+
+def lead_ids(resultados: List[Dict[str, Any]]) -> List[str]:
+    """Leads encontrados, na ordem de relevância."""
+    return _ids(resultados, "lead_id")
+
+
+def ordenar_por_relevancia(rows: List[Dict[str, Any]], ids: List[str], campo: str) -> List[Dict[str, Any]]:
+    posicao = {item_id: i for i, item_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: posicao.get(str(row.get(campo)), len(posicao)))
@@ -0,0 +1,391 @@
+"""Importação de carteira em segundo plano (arquivo grande, retomável).
+
+`/carteira/import/confirm` recebe a planilha inteira como texto no JSON e grava
+tudo dentro da requisição; planilhas grandes estouram o timeout do proxy e
+deixam a carteira pela metade. Aqui a importação vira um job:
+
+1. o arquivo chega por multipart e é lido linha a linha; a cada
+   `LINHAS_POR_BLOCO` linhas um bloco é gravado em `carteira_import_job_blocos`
+   (o arquivo nunca fica inteiro em memória);
+2. uma thread por job (`app/core/jobs.py`, depois de reivindicar o job no
+   banco) confirma os blocos em ordem com `confirm_import` (lookups carregados
+   uma vez por bloco e inserts em lote) e grava o resultado de cada bloco como
+   checkpoint, junto com os contadores do job. Cada bloco também é reivindicado
+   (`pendente` -> `executando`) antes de ser confirmado;
+3. blocos `pendente` (job interrompido) ou `erro` podem ser retomados; os que
+   ficaram `executando` num job abandonado voltam para `pendente`. Rodar de
+   novo um bloco que chegou a gravar parte das linhas é seguro: a confirmação
+   reaproveita clientes, administradoras, grupos, cotas, contratos, lances e
+   contemplações que já existem;
+4. as linhas recusadas ficam no bloco (`erros_detalhe`) e saem no relatório de
+   erros do job.
+
+As regras de duplicidade dentro da planilha valem por bloco: uma cota repetida
+em outro bloco é tratada como cota já existente (aviso), não como erro.
+"""
+from __future__ import annotations
+
+import io
+import logging
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import Client
+
+from app.core.jobs import JobRunner, now_iso
+from app.core.supabase_lote import safe_rows
+from app.schemas.carteira_import import ImportProduto
+from app.security.auth import CurrentProfile
+from app.services.carteira_import_service import confirm_import
+from app.services.comissao_service import get_org_record_or_404
+
+logger = logging.getLogger(__name__)
+
+JOBS_TABLE = "carteira_import_jobs"
+BLOCOS_TABLE = "carteira_import_job_blocos"
+
+# Linhas da planilha gravadas e confirmadas por bloco (checkpoint do job).
+LINHAS_POR_BLOCO = 500
+# Blocos lidos por página ao montar o relatório de erros.
+RELATORIO_PAGE_SIZE = 50
+# O arquivo é lido como UTF-8 (com ou sem BOM); bytes inválidos viram "�".
+ARQUIVO_ENCODING = "utf-8-sig"
+
+_BLOCO_COLUMNS = "id, ordem, primeira_linha, total_linhas, status, importadas, com_erro, ignoradas"
+
+_jobs = JobRunner(JOBS_TABLE, nome="carteira-import", em_execucao_msg="Importação já está em execução")
+
+
+# ---------------------------------------------------------------------------
+# Persistência do job
+# ---------------------------------------------------------------------------
+
+
+def get_job_or_404(supa: Client, org_id: str, job_id: str) -> Dict[str, Any]:
+    return get_org_record_or_404(supa, JOBS_TABLE, org_id, job_id)
+
+
+def _fetch_blocos(supa: Client, job_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    query = supa.table(BLOCOS_TABLE).select(_BLOCO_COLUMNS).eq("job_id", job_id)
+    if status:
+        query = query.eq("status", status)
+    return safe_rows(query.order("ordem").execute())
+
+
+def _contadores(blocos: List[Dict[str, Any]]) -> Dict[str, int]:
+    ok = [bloco for bloco in blocos if bloco.get("status") == "ok"]
+    return {
+        "processadas": sum(int(bloco.get("total_linhas") or 0) for bloco in ok),
+        "importadas": sum(int(bloco.get("importadas") or 0) for bloco in ok),
+        "com_erro": sum(int(bloco.get("com_erro") or 0) for bloco in ok),
+        "ignoradas": sum(int(bloco.get("ignoradas") or 0) for bloco in ok),
+        "blocos_processados": len(ok),
+        "blocos_com_erro": sum(1 for bloco in blocos if bloco.get("status") == "erro"),
+    }
+
+
+def _perfil(job: Dict[str, Any]) -> CurrentProfile:
+    # a permissão foi checada ao criar o job; o perfil só identifica org e autor
+    return CurrentProfile(
+        user_id=str(job.get("created_by") or ""),
+        org_id=str(job["org_id"]),
+        role=str(job.get("created_by_role") or ""),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Recebimento do arquivo
+# ---------------------------------------------------------------------------
+
+
+def _linhas_do_arquivo(arquivo: BinaryIO) -> Iterator[Tuple[int, str]]:
+    """(número da linha no arquivo, conteúdo sem quebra de linha)."""
+    texto = io.TextIOWrapper(arquivo, encoding=ARQUIVO_ENCODING, errors="replace", newline="")
+    try:
+        for numero, linha in enumerate(texto, start=1):
+            yield numero, linha.rstrip("\r\n")
+    finally:
+        # devolve o arquivo ao dono (o UploadFile) sem fechá-lo
+        texto.detach()
+
+
+def _receber_blocos(
+    supa: Client,
+    *,
+    job: Dict[str, Any],
+    linhas: Iterator[Tuple[int, str]],
+) -> Tuple[int, int]:
+    """Grava as linhas após o cabeçalho em blocos; devolve (linhas, blocos)."""
+    total_linhas = 0
+    ordem = 0
+    bloco: List[str] = []
+    primeira_linha = 0
+
+    def gravar() -> None:
+        supa.table(BLOCOS_TABLE).insert(
+            {
+                "job_id": job["id"],
+                "org_id": job["org_id"],
+                "ordem": ordem,
+                "primeira_linha": primeira_linha,
+                "total_linhas": len(bloco),
+                "linhas": "\n".join(bloco),
+                "status": "pendente",
+            }
+        ).execute()
+
+    for numero, linha in linhas:
+        if not bloco:
+            primeira_linha = numero
+        bloco.append(linha)
+        total_linhas += 1
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            ordem += 1
+            gravar()
+            bloco = []
+    if bloco:
+        ordem += 1
+        gravar()
+    return total_linhas, ordem
+
+
+def criar_job(
+    supa: Client,
+    *,
+    profile: CurrentProfile,
+    arquivo: BinaryIO,
+    nome_arquivo: Optional[str],
+    produto_padrao: ImportProduto,
+) -> Dict[str, Any]:
+    """Recebe o arquivo em blocos e dispara a importação em segundo plano."""
+    linhas = _linhas_do_arquivo(arquivo)
+    cabecalho = next(((numero, linha) for numero, linha in linhas if linha.strip()), None)
+    if cabecalho is None:
+        raise HTTPException(400, "Nenhuma linha com dados foi encontrada.")
+
+    now = now_iso()
+    resp = supa.table(JOBS_TABLE).insert(
+        {
+            "org_id": profile.org_id,
+            "status": "recebendo",
+            "arquivo_nome": nome_arquivo,
+            "produto_padrao": produto_padrao,
+            "cabecalho": cabecalho[1],
+            "total_linhas": 0,
+            "blocos_total": 0,
+            "processadas": 0,
+            "importadas": 0,
+            "com_erro": 0,
+            "ignoradas": 0,
+            "blocos_processados": 0,
+            "blocos_com_erro": 0,
+            "created_by": profile.user_id,
+            "created_by_role": profile.role,
+            "created_at": now,
+            "updated_at": now,
+        }
+    ).execute()
+    rows = safe_rows(resp)
+    if not rows:
+        raise HTTPException(500, "Erro ao criar job de importação da carteira")
+    job = rows[0]
+
+    try:
+        total_linhas, blocos_total = _receber_blocos(supa, job=job, linhas=linhas)
+    except Exception as exc:
+        logger.exception("carteira_import_upload_error", extra={"job_id": job["id"]})
+        _jobs.update(supa, job["id"], {"status": "falhou", "erro": f"Falha ao receber o arquivo: {exc}"})
+        raise HTTPException(500, "Falha ao receber o arquivo da importação") from exc
+
+    patch: Dict[str, Any] = {
+        "status": "pendente",
+        "total_linhas": total_linhas,
+        "blocos_total": blocos_total,
+        "recebido_em": now_iso(),
+    }
+    if not blocos_total:
+        patch.update(status="concluido", concluido_em=patch["recebido_em"])
+    _jobs.update(supa, job["id"], patch)
+    job = {**job, **patch}
+    if blocos_total:
+        _jobs.disparar(supa, job["id"], executar_job)
+    return job
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+
+def _reivindicar_bloco(supa: Client, bloco_id: str) -> Optional[Dict[str, Any]]:
+    """`pendente` -> `executando`; devolve o bloco (com as linhas) só para quem fez a troca."""
+    resp = (
+        supa.table(BLOCOS_TABLE)
+        .update({"status": "executando"})
+        .eq("id", bloco_id)
+        .eq("status", "pendente")
+        .execute()
+    )
+    return next(iter(safe_rows(resp)), None)
+
+
+def _processar_bloco(
+    supa: Client,
+    *,
+    job: Dict[str, Any],
+    perfil: CurrentProfile,
+    bloco: Dict[str, Any],
+) -> None:
+    linhas = bloco.get("linhas") or ""
+    try:
+        resultado = confirm_import(
+            sb=supa,
+            profile=perfil,
+            raw_text=f"{job['cabecalho']}\n{linhas}",
+            produto_padrao=job.get("produto_padrao") or "imobiliario",
+            primeira_linha=int(bloco["primeira_linha"]),
+        )
+    except HTTPException as exc:
+        erro: Optional[str] = str(exc.detail)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("carteira_import_bloco_error", extra={"job_id": job["id"], "ordem": bloco.get("ordem")})
+        erro = str(exc) or exc.__class__.__name__
+    else:
+        erro = None
+
+    if erro is not None:
+        supa.table(BLOCOS_TABLE).update(
+            {"status": "erro", "erro": erro, "processado_em": now_iso()}
+        ).eq("id", bloco["id"]).execute()
+        return
+
+    supa.table(BLOCOS_TABLE).update(
+        {
+            "status": "ok",
+            "erro": None,
+            "importadas": resultado.imported_rows,
+            "com_erro": resultado.failed_rows,
+            # linha em branco no fim do bloco nem chega ao parser: conta como ignorada
+            "ignoradas": int(bloco.get("total_linhas") or 0) - resultado.imported_rows - resultado.failed_rows,
+            "erros_detalhe": [
+                {"linha": row.row_number, "cliente_nome": row.cliente_nome, "erros": row.errors}
+                for row in resultado.rows
+                if row.status == "erro"
+            ],
+            "processado_em": now_iso(),
+        }
+    ).eq("id", bloco["id"]).execute()
+
+
+def executar_job(supa: Client, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Confirma os blocos `pendente` do job já reivindicado, com checkpoint a cada bloco."""
+    job_id = job["id"]
+    perfil = _perfil(job)
+
+    try:
+        for pendente in _fetch_blocos(supa, job_id, status="pendente"):
+            bloco = _reivindicar_bloco(supa, pendente["id"])
+            if bloco is None:
+                continue
+            _processar_bloco(supa, job=job, perfil=perfil, bloco=bloco)
+            _jobs.update(supa, job_id, _contadores(_fetch_blocos(supa, job_id)))
+        contadores = _contadores(_fetch_blocos(supa, job_id))
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("carteira_import_job_error", extra={"job_id": job_id})
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc)})
+        return {"id": job_id, "status": "falhou"}
+
+    status = "concluido_com_erros" if contadores["com_erro"] or contadores["blocos_com_erro"] else "concluido"
+    _jobs.update(supa, job_id, {**contadores, "status": status, "concluido_em": now_iso()})
+    return {"id": job_id, "status": status, **contadores}
+
+
+def aguardar(job_id: str, timeout: Optional[float] = None) -> None:
+    """Espera o job terminar (útil em testes e scripts)."""
+    _jobs.aguardar(job_id, timeout)
+
+
+def retomar_importacao(
+    supa: Client,
+    *,
+    org_id: str,
+    job_id: str,
+    incluir_erros: bool = False,
+) -> Dict[str, Any]:
+    """Reexecuta os blocos `pendente` (e, se pedido, os com `erro`) do job."""
+    job = get_job_or_404(supa, org_id, job_id)
+    _jobs.checar_parado(job)
+    if not job.get("recebido_em"):
+        raise HTTPException(409, "O arquivo não foi recebido por completo; envie-o novamente")
+
+    # bloco `executando` de um job parado ficou no meio: volta para a fila
+    reabrir = ["executando", "erro"] if incluir_erros else ["executando"]
+    supa.table(BLOCOS_TABLE).update({"status": "pendente", "erro": None}).eq("job_id", job_id).in_(
+        "status", reabrir
+    ).execute()
+
+    blocos = _fetch_blocos(supa, job_id)
+    contadores = _contadores(blocos)
+    if not any(bloco.get("status") == "pendente" for bloco in blocos):
+        return {**job, **contadores}
+
+    job = _jobs.reabrir(supa, job, contadores)
+    _jobs.disparar(supa, job_id, executar_job)
+    return job
+
+
+def status_importacao(supa: Client, *, org_id: str, job_id: str) -> Dict[str, Any]:
+    job = get_job_or_404(supa, org_id, job_id)
+    total = int(job.get("total_linhas") or 0)
+    processadas = int(job.get("processadas") or 0)
+    return {
+        "ok": True,
+        "item": job,
+        "em_execucao": _jobs.em_execucao(job),
+        "percentual": round(processadas * 100 / total, 2) if total else 100.0,
+    }
+
+
+def iter_erros(supa: Client, *, org_id: str, job_id: str) -> Iterator[Dict[str, Any]]:
+    """Linhas do relatório de erros: linhas recusadas e blocos que falharam.
+
+    O job é validado antes do primeiro item, para a rota responder 404 antes
+    de começar o download.
+    """
+    get_job_or_404(supa, org_id, job_id)
+
+    def linhas() -> Iterator[Dict[str, Any]]:
+        ultima_ordem = 0
+        while True:
+            resp = (
+                supa.table(BLOCOS_TABLE)
+                .select("ordem, primeira_linha, total_linhas, status, erro, erros_detalhe")
+                .eq("job_id", job_id)
+                .or_("status.eq.erro,com_erro.gt.0")
+                .gt("ordem", ultima_ordem)
+                .order("ordem")
+                .limit(RELATORIO_PAGE_SIZE)
+                .execute()
+            )
+            blocos = safe_rows(resp)
+            for bloco in blocos:
+                if bloco.get("status") == "erro":
+                    primeira = int(bloco.get("primeira_linha") or 0)
+                    ultima = primeira + int(bloco.get("total_linhas") or 0) - 1
+                    yield {
+                        "linha": f"{primeira}-{ultima}",
+                        "cliente_nome": None,
+                        "erro": f"Bloco não processado: {bloco.get('erro') or ''}".strip(),
+                    }
+                    continue
+                for detalhe in bloco.get("erros_detalhe") or []:
+                    yield {
+                        "linha": str(detalhe.get("linha")),
+                        "cliente_nome": detalhe.get("cliente_nome"),
+                        "erro": "; ".join(detalhe.get("erros") or []),
+                    }
+            if len(blocos) < RELATORIO_PAGE_SIZE:
+                return
+            ultima_ordem = int(blocos[-1]["ordem"])
+
+    return linhas()
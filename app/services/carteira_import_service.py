@@ -7,12 +7,12 @@ import unicodedata
 from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Any, Iterable, Literal, Optional
+from typing import Any, Callable, Iterable, Literal
 
 from fastapi import HTTPException, status
 from supabase import Client
 
-from app.routers.carteira import ensure_carteira_cliente
+from app.core.supabase_lote import LOTE_CHUNK, chunks, fetch_in, gravar_em_blocos, select_paginado
 from app.schemas.carteira_import import (
     CarteiraImportConfirmResponse,
     CarteiraImportPlannedEntities,
@@ -65,6 +65,7 @@ HEADER_ALIASES = {
 PERCENT_REGEX = re.compile(r"(\d+(?:[.,]\d+)?)\s*%")
 MONEY_REGEX = re.compile(r"r\$\s*([\d\.\,]+)", re.IGNORECASE)
 SEPARATOR_ONLY_REGEX = re.compile(r"^[\-\_=|/\\\.\*]+$")
+# Linhas por página ao carregar leads e administradoras da org no preview.
 
 
 @dataclass
@@ -200,7 +201,8 @@ def _detect_delimiter(header_line: str) -> str:
 
 
 def _parse_delimited_line(line: str, delimiter: str) -> list[str]:
-    return next(csv.reader(io.StringIO(line), delimiter=delimiter))
+    # linha em branco não gera registro no csv.reader; vira linha vazia (ignorada)
+    return next(csv.reader(io.StringIO(line), delimiter=delimiter), [])
 
 
 def _split_delimited_rows(raw_text: str) -> tuple[list[str], list[list[str]]]:
@@ -277,11 +279,21 @@ def _is_separator_like_row(mapped: dict[str, str]) -> bool:
     return all(SEPARATOR_ONLY_REGEX.fullmatch(value) for value in values)
 
 
-def parse_import_rows(raw_text: str, *, produto_padrao: ImportProduto) -> list[ParsedImportRow]:
+def parse_import_rows(
+    raw_text: str,
+    *,
+    produto_padrao: ImportProduto,
+    primeira_linha: int = 2,
+) -> list[ParsedImportRow]:
+    """Linhas da planilha já normalizadas.
+
+    `primeira_linha` é o número (na planilha original) da primeira linha após o
+    cabeçalho; os jobs de importação usam para manter a numeração entre blocos.
+    """
     headers, row_values = _split_delimited_rows(raw_text)
     parsed_rows: list[ParsedImportRow] = []
 
-    for index, values in enumerate(row_values, start=2):
+    for index, values in enumerate(row_values, start=primeira_linha):
         mapped = _map_row(headers, values)
         if not any(_normalize_text(value) for value in mapped.values()):
             parsed_rows.append(
@@ -350,117 +362,94 @@ def parse_import_rows(raw_text: str, *, produto_padrao: ImportProduto) -> list[P
     return parsed_rows
 
 
-def _find_single_by_normalized_name(
-    rows: Iterable[dict[str, Any]],
-    *,
-    field_name: str,
-    expected: str,
-) -> dict[str, Any] | None:
-    expected_normalized = _normalize_lookup(expected)
-    for row in rows:
-        if _normalize_lookup(str(row.get(field_name) or "")) == expected_normalized:
-            return row
-    return None
+@dataclass
+class ImportLookups:
+    """Cadastros da org que a planilha pode reaproveitar, indexados como a importação compara.
 
+    Carregados uma vez por preview/confirm, em vez de consultas por linha.
+    """
 
-def _query_lead_by_name(sb: Client, *, org_id: str, nome: str) -> dict[str, Any] | None:
-    token = nome.split(" ")[0] if nome else ""
-    if not token:
-        return None
-    response = (
-        sb.table("leads")
-        .select("id, org_id, nome")
-        .eq("org_id", org_id)
-        .ilike("nome", f"%{token}%")
-        .limit(50)
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    return _find_single_by_normalized_name(rows, field_name="nome", expected=nome)
+    leads: dict[str, dict[str, Any]] = field(default_factory=dict)
+    administradoras: dict[str, dict[str, Any]] = field(default_factory=dict)
+    grupos: dict[str, dict[str, Any]] = field(default_factory=dict)
+    cotas: dict[str, dict[str, Any]] = field(default_factory=dict)
+    contratos: dict[str, dict[str, Any]] = field(default_factory=dict)
+    contemplacoes: dict[str, dict[str, Any]] = field(default_factory=dict)
 
+    def lead(self, nome: str | None) -> dict[str, Any] | None:
+        return self.leads.get(_normalize_lookup(nome))
 
-def _query_administradora_by_name(sb: Client, *, org_id: str, nome: str) -> dict[str, Any] | None:
-    token = nome.split(" ")[0] if nome else ""
-    if not token:
-        return None
-    response = (
-        sb.table("administradoras")
-        .select("id, org_id, nome")
-        .or_(f"org_id.eq.{org_id},org_id.is.null")
-        .ilike("nome", f"%{token}%")
-        .limit(50)
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    return _find_single_by_normalized_name(rows, field_name="nome", expected=nome)
+    def administradora(self, nome: str | None) -> dict[str, Any] | None:
+        return self.administradoras.get(_normalize_lookup(nome))
 
+    def grupo(self, administradora_id: str, codigo: str) -> dict[str, Any] | None:
+        return self.grupos.get(f"{administradora_id}::{codigo}")
 
-def _query_grupo(
-    sb: Client,
-    *,
-    org_id: str,
-    administradora_id: str,
-    codigo: str,
-) -> dict[str, Any] | None:
-    response = (
-        sb.table("grupos")
-        .select("id, org_id, administradora_id, codigo, produto, assembleia_dia")
-        .eq("org_id", org_id)
-        .eq("administradora_id", administradora_id)
-        .eq("codigo", codigo)
-        .limit(1)
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    return rows[0] if rows else None
+    def cota(self, administradora_id: str, grupo_codigo: str, numero_cota: str) -> dict[str, Any] | None:
+        return self.cotas.get(f"{administradora_id}::{grupo_codigo}::{numero_cota}")
 
+    def contrato(self, numero: str) -> dict[str, Any] | None:
+        return self.contratos.get(numero)
 
-def _query_cota(
-    sb: Client,
-    *,
-    org_id: str,
-    administradora_id: str,
-    grupo_codigo: str,
-    numero_cota: str,
-) -> dict[str, Any] | None:
-    response = (
-        sb.table("cotas")
-        .select("id, org_id, lead_id, administradora_id, grupo_codigo, numero_cota, status")
-        .eq("org_id", org_id)
-        .eq("administradora_id", administradora_id)
-        .eq("grupo_codigo", grupo_codigo)
-        .eq("numero_cota", numero_cota)
-        .limit(1)
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    return rows[0] if rows else None
-
-
-def _query_contract_by_number(sb: Client, *, org_id: str, numero: str) -> dict[str, Any] | None:
-    response = (
-        sb.table("contratos")
-        .select("id, org_id, cota_id, numero, status")
-        .eq("org_id", org_id)
-        .eq("numero", numero)
-        .limit(1)
-        .execute()
+    def contemplacao(self, cota_id: str) -> dict[str, Any] | None:
+        return self.contemplacoes.get(cota_id)
+
+
+def _index_by_name(rows: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    index: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        key = _normalize_lookup(str(row.get("nome") or ""))
+        if key:
+            index.setdefault(key, row)
+    return index
+
+
+def _prefetch_lookups(sb: Client, *, org_id: str, parsed_rows: list[ParsedImportRow]) -> ImportLookups:
+    lookups = ImportLookups()
+    lookups.leads = _index_by_name(
+        select_paginado(lambda: sb.table("leads").select("id, org_id, nome").eq("org_id", org_id))
     )
-    rows = getattr(response, "data", None) or []
-    return rows[0] if rows else None
-
-
-def _query_contemplacao(sb: Client, *, org_id: str, cota_id: str) -> dict[str, Any] | None:
-    response = (
-        sb.table("contemplacoes")
-        .select("id, cota_id, data")
-        .eq("org_id", org_id)
-        .eq("cota_id", cota_id)
-        .limit(1)
-        .execute()
+    administradoras = select_paginado(
+        lambda: sb.table("administradoras").select("id, org_id, nome").or_(f"org_id.eq.{org_id},org_id.is.null")
     )
-    rows = getattr(response, "data", None) or []
-    return rows[0] if rows else None
+    # com o mesmo nome na org e no catálogo global, vale a da org
+    lookups.administradoras = _index_by_name(sorted(administradoras, key=lambda row: not row.get("org_id")))
+
+    administradora_ids = {
+        str(adm["id"])
+        for adm in (lookups.administradora(parsed.administradora_nome) for parsed in parsed_rows)
+        if adm
+    }
+    if not administradora_ids:
+        grupos: list[dict[str, Any]] = []
+        cotas: list[dict[str, Any]] = []
+    else:
+        grupos = fetch_in(
+            sb, "grupos", org_id, "administradora_id", administradora_ids,
+            columns="id, org_id, administradora_id, codigo, produto, assembleia_dia",
+        )
+        cotas = fetch_in(
+            sb, "cotas", org_id, "grupo_codigo", [parsed.grupo_codigo for parsed in parsed_rows],
+            columns="id, org_id, lead_id, administradora_id, grupo_codigo, numero_cota, status",
+        )
+    for grupo in grupos:
+        lookups.grupos.setdefault(f"{grupo.get('administradora_id')}::{grupo.get('codigo')}", grupo)
+    for cota in cotas:
+        if str(cota.get("administradora_id")) in administradora_ids:
+            key = f"{cota.get('administradora_id')}::{cota.get('grupo_codigo')}::{cota.get('numero_cota')}"
+            lookups.cotas.setdefault(key, cota)
+
+    for contrato in fetch_in(
+        sb, "contratos", org_id, "numero", [parsed.numero_contrato for parsed in parsed_rows],
+        columns="id, org_id, cota_id, numero, status",
+    ):
+        lookups.contratos.setdefault(str(contrato.get("numero")), contrato)
+    for contemplacao in fetch_in(
+        sb, "contemplacoes", org_id, "cota_id", [cota["id"] for cota in lookups.cotas.values()],
+        columns="id, cota_id, data",
+    ):
+        lookups.contemplacoes.setdefault(str(contemplacao.get("cota_id")), contemplacao)
+    return lookups
 
 
 def _requires_lance(parsed: ParsedImportRow) -> bool:
@@ -483,7 +472,7 @@ def _can_create_contract(parsed: ParsedImportRow) -> bool:
     )
 
 
-def _build_preview_context(sb: Client, profile: CurrentProfile, parsed: ParsedImportRow) -> PreviewContext:
+def _build_preview_context(lookups: ImportLookups, parsed: ParsedImportRow) -> PreviewContext:
     if not any(
         [
             parsed.cliente_nome,
@@ -512,16 +501,12 @@ def _build_preview_context(sb: Client, profile: CurrentProfile, parsed: ParsedIm
         ctx.status = "erro"
         return ctx
 
-    existing_lead = _query_lead_by_name(sb, org_id=profile.org_id, nome=parsed.cliente_nome or "")
+    existing_lead = lookups.lead(parsed.cliente_nome)
     ctx.existing_lead = existing_lead
     ctx.planned.cliente_encontrado = existing_lead is not None
     ctx.planned.cliente_criar = existing_lead is None
 
-    existing_adm = _query_administradora_by_name(
-        sb,
-        org_id=profile.org_id,
-        nome=parsed.administradora_nome or "",
-    )
+    existing_adm = lookups.administradora(parsed.administradora_nome)
     ctx.existing_administradora = existing_adm
     ctx.planned.administradora_criar = existing_adm is None
     if parsed.grupo_codigo:
@@ -530,22 +515,11 @@ def _build_preview_context(sb: Client, profile: CurrentProfile, parsed: ParsedIm
         ctx.planned.cota_criar = True
 
     if existing_adm and parsed.grupo_codigo:
-        existing_grupo = _query_grupo(
-            sb,
-            org_id=profile.org_id,
-            administradora_id=str(existing_adm["id"]),
-            codigo=parsed.grupo_codigo,
-        )
+        existing_grupo = lookups.grupo(str(existing_adm["id"]), parsed.grupo_codigo)
         ctx.existing_grupo = existing_grupo
         ctx.planned.grupo_criar = existing_grupo is None
 
-        existing_cota = _query_cota(
-            sb,
-            org_id=profile.org_id,
-            administradora_id=str(existing_adm["id"]),
-            grupo_codigo=parsed.grupo_codigo,
-            numero_cota=parsed.numero_cota or "",
-        )
+        existing_cota = lookups.cota(str(existing_adm["id"]), parsed.grupo_codigo, parsed.numero_cota or "")
         ctx.existing_cota = existing_cota
         ctx.planned.cota_criar = existing_cota is None
         if existing_cota:
@@ -556,14 +530,10 @@ def _build_preview_context(sb: Client, profile: CurrentProfile, parsed: ParsedIm
             else:
                 ctx.warnings.append("A cota já existe e não será duplicada.")
 
-            ctx.existing_contemplacao = _query_contemplacao(
-                sb,
-                org_id=profile.org_id,
-                cota_id=str(existing_cota["id"]),
-            )
+            ctx.existing_contemplacao = lookups.contemplacao(str(existing_cota["id"]))
 
     if parsed.numero_contrato:
-        existing_contract = _query_contract_by_number(sb, org_id=profile.org_id, numero=parsed.numero_contrato)
+        existing_contract = lookups.contrato(parsed.numero_contrato)
         ctx.existing_contrato = existing_contract
         if existing_contract:
             ctx.warnings.append("Já existe contrato com este número na organização.")
@@ -707,101 +677,17 @@ def _build_preview_summary(contexts: list[PreviewContext]) -> CarteiraImportPrev
     return summary
 
 
-def _resolve_lead_for_confirm(
-    sb: Client,
-    profile: CurrentProfile,
-    parsed: ParsedImportRow,
-    cache: dict[str, dict[str, Any]],
-    existing_lead: dict[str, Any] | None,
-) -> dict[str, Any]:
-    if existing_lead:
-        return existing_lead
-
-    key = _normalize_lookup(parsed.cliente_nome)
-    if key in cache:
-        return cache[key]
-
-    found = _query_lead_by_name(sb, org_id=profile.org_id, nome=parsed.cliente_nome or "")
-    if found:
-        cache[key] = found
-        return found
-
-    created = _create_lead(sb, profile, parsed)
-    cache[key] = created
-    return created
-
-
-def _resolve_administradora_for_confirm(
-    sb: Client,
-    profile: CurrentProfile,
-    parsed: ParsedImportRow,
-    cache: dict[str, dict[str, Any]],
-    existing_administradora: dict[str, Any] | None,
-) -> dict[str, Any]:
-    if existing_administradora:
-        return existing_administradora
-
-    key = _normalize_lookup(parsed.administradora_nome)
-    if key in cache:
-        return cache[key]
-
-    found = _query_administradora_by_name(sb, org_id=profile.org_id, nome=parsed.administradora_nome or "")
-    if found:
-        cache[key] = found
-        return found
-
-    created = _create_administradora(sb, profile, parsed.administradora_nome or "")
-    cache[key] = created
-    return created
-
-
-def _resolve_grupo_for_confirm(
-    sb: Client,
-    profile: CurrentProfile,
-    parsed: ParsedImportRow,
-    administradora_id: str,
-    cache: dict[str, dict[str, Any]],
-    existing_grupo: dict[str, Any] | None,
-) -> dict[str, Any]:
-    if existing_grupo:
-        return existing_grupo
-
-    key = f"{administradora_id}::{parsed.grupo_codigo}"
-    if key in cache:
-        return cache[key]
-
-    found = _query_grupo(
-        sb,
-        org_id=profile.org_id,
-        administradora_id=administradora_id,
-        codigo=parsed.grupo_codigo or "",
-    )
-    if found:
-        cache[key] = found
-        return found
-
-    created = _create_grupo(
-        sb,
-        profile,
-        administradora_id=administradora_id,
-        codigo=parsed.grupo_codigo or "",
-        produto=parsed.produto,
-        assembleia_dia=None,
-        observacoes=_build_cota_observacoes(parsed),
-    )
-    cache[key] = created
-    return created
-
-
 def build_import_preview(
     *,
     sb: Client,
     profile: CurrentProfile,
     raw_text: str,
     produto_padrao: ImportProduto,
+    primeira_linha: int = 2,
 ) -> tuple[list[PreviewContext], CarteiraImportPreviewResponse]:
-    parsed_rows = parse_import_rows(raw_text, produto_padrao=produto_padrao)
-    contexts = [_build_preview_context(sb, profile, parsed) for parsed in parsed_rows]
+    parsed_rows = parse_import_rows(raw_text, produto_padrao=produto_padrao, primeira_linha=primeira_linha)
+    lookups = _prefetch_lookups(sb, org_id=profile.org_id, parsed_rows=parsed_rows)
+    contexts = [_build_preview_context(lookups, parsed) for parsed in parsed_rows]
     _apply_in_batch_duplicate_rules(contexts)
     rows = [
         CarteiraImportRowPreview(
@@ -825,8 +711,8 @@ def build_import_preview(
     return contexts, CarteiraImportPreviewResponse(rows=rows, summary=summary)
 
 
-def _create_lead(sb: Client, profile: CurrentProfile, parsed: ParsedImportRow) -> dict[str, Any]:
-    payload = apply_lead_address_rules(
+def _lead_payload(profile: CurrentProfile, parsed: ParsedImportRow) -> dict[str, Any]:
+    return apply_lead_address_rules(
         {
             "org_id": profile.org_id,
             "nome": parsed.cliente_nome,
@@ -836,54 +722,27 @@ def _create_lead(sb: Client, profile: CurrentProfile, parsed: ParsedImportRow) -
             "etapa": "pos_venda",
         }
     )
-    response = sb.table("leads").insert(payload, returning="representation").execute()
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar lead da carteira na importação.")
-    return rows[0]
-
-
-def _create_administradora(sb: Client, profile: CurrentProfile, nome: str) -> dict[str, Any]:
-    response = (
-        sb.table("administradoras")
-        .insert({"org_id": profile.org_id, "nome": nome}, returning="representation")
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar administradora na importação.")
-    return rows[0]
 
 
-def _create_grupo(
-    sb: Client,
-    profile: CurrentProfile,
-    *,
-    administradora_id: str,
-    codigo: str,
-    produto: ImportProduto,
-    assembleia_dia: Optional[int],
-    observacoes: Optional[str],
-) -> dict[str, Any]:
-    response = (
-        sb.table("grupos")
-        .insert(
-            {
-                "org_id": profile.org_id,
-                "administradora_id": administradora_id,
-                "codigo": codigo,
-                "produto": produto,
-                "assembleia_dia": assembleia_dia,
-                "observacoes": observacoes,
-            },
-            returning="representation",
-        )
-        .execute()
-    )
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar grupo na importação.")
-    return rows[0]
+def _carteira_payload(profile: CurrentProfile, lead_id: str) -> dict[str, Any]:
+    return {
+        "org_id": profile.org_id,
+        "lead_id": lead_id,
+        "status": "ativo",
+        "origem_entrada": "manual",
+        "observacoes": "Cliente importado por colagem de planilha",
+    }
+
+
+def _grupo_payload(profile: CurrentProfile, *, administradora_id: str, parsed: ParsedImportRow) -> dict[str, Any]:
+    return {
+        "org_id": profile.org_id,
+        "administradora_id": administradora_id,
+        "codigo": parsed.grupo_codigo,
+        "produto": parsed.produto,
+        "assembleia_dia": None,
+        "observacoes": _build_cota_observacoes(parsed),
+    }
 
 
 def _build_cota_observacoes(parsed: ParsedImportRow) -> str | None:
@@ -897,15 +756,14 @@ def _build_cota_observacoes(parsed: ParsedImportRow) -> str | None:
     return " | ".join(notes)
 
 
-def _create_cota(
-    sb: Client,
+def _cota_payload(
     profile: CurrentProfile,
     *,
     lead_id: str,
     administradora_id: str,
     parsed: ParsedImportRow,
 ) -> dict[str, Any]:
-    payload = normalize_cota_financial_payload(
+    return normalize_cota_financial_payload(
         {
             "org_id": profile.org_id,
             "lead_id": lead_id,
@@ -928,21 +786,10 @@ def _create_cota(
             "observacoes": _build_cota_observacoes(parsed),
         }
     )
-    response = sb.table("cotas").insert(payload, returning="representation").execute()
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar cota na importação.")
-    return rows[0]
 
 
-def _create_contract(
-    sb: Client,
-    profile: CurrentProfile,
-    *,
-    cota_id: str,
-    parsed: ParsedImportRow,
-) -> dict[str, Any]:
-    payload = {
+def _contract_payload(profile: CurrentProfile, *, cota_id: str, parsed: ParsedImportRow) -> dict[str, Any]:
+    return {
         "org_id": profile.org_id,
         "deal_id": None,
         "cota_id": cota_id,
@@ -950,21 +797,10 @@ def _create_contract(
         "data_assinatura": parsed.data_assinatura,
         "status": "contemplado" if parsed.contemplada else "alocado",
     }
-    response = sb.table("contratos").insert(payload, returning="representation").execute()
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar contrato na importação.")
-    return rows[0]
 
 
-def _create_lance(
-    sb: Client,
-    profile: CurrentProfile,
-    *,
-    cota_id: str,
-    parsed: ParsedImportRow,
-) -> dict[str, Any]:
-    payload = {
+def _lance_payload(profile: CurrentProfile, *, cota_id: str, parsed: ParsedImportRow) -> dict[str, Any]:
+    return {
         "org_id": profile.org_id,
         "cota_id": cota_id,
         "tipo": parsed.lance_tipo,
@@ -977,32 +813,70 @@ def _create_lance(
         "resultado": "pendente",
         "created_by": profile.user_id,
     }
-    response = sb.table("lances").insert(payload, returning="representation").execute()
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar lance na importação.")
-    return rows[0]
 
 
-def _create_contemplacao(
-    sb: Client,
-    profile: CurrentProfile,
-    *,
-    cota_id: str,
-    parsed: ParsedImportRow,
-) -> dict[str, Any]:
-    payload = {
+def _contemplacao_payload(profile: CurrentProfile, *, cota_id: str, parsed: ParsedImportRow) -> dict[str, Any]:
+    return {
         "org_id": profile.org_id,
         "cota_id": cota_id,
         "motivo": parsed.contemplacao_motivo,
         "lance_percentual": float(parsed.percentual_lance) if parsed.percentual_lance is not None else None,
         "data": parsed.data_ultimo_lance,
     }
-    response = sb.table("contemplacoes").insert(payload, returning="representation").execute()
-    rows = getattr(response, "data", None) or []
-    if not rows:
-        raise HTTPException(500, "Falha ao criar contemplação na importação.")
-    return rows[0]
+
+
+def _error_message(exc: Exception) -> str:
+    return str(exc.detail) if isinstance(exc, HTTPException) else str(exc)
+
+
+def _insert_step(
+    sb: Client,
+    contexts: list[PreviewContext],
+    failures: dict[int, str],
+    *,
+    table: str,
+    error_message: str,
+    key_of: Callable[[PreviewContext], str | None],
+    existing_of: Callable[[PreviewContext, str], dict[str, Any] | None],
+    payload_of: Callable[[PreviewContext], dict[str, Any]],
+) -> dict[str, dict[str, Any]]:
+    """Uma tabela da confirmação, em ordem de dependência.
+
+    Reaproveita o que já existe, cria o restante num insert em lote (uma linha
+    por chave, mesmo que várias linhas da planilha a usem) e marca em
+    `failures` as linhas da planilha cuja entidade não pôde ser criada. Linhas
+    já marcadas e linhas com chave None (etapa não se aplica) são puladas.
+    """
+    resolved: dict[str, dict[str, Any]] = {}
+    pending: dict[str, dict[str, Any]] = {}
+    active = [ctx for ctx in contexts if ctx.parsed.row_number not in failures]
+    for ctx in active:
+        key = key_of(ctx)
+        if key is None or key in resolved or key in pending:
+            continue
+        existing = existing_of(ctx, key)
+        if existing:
+            resolved[key] = existing
+        else:
+            pending[key] = payload_of(ctx)
+
+    errors: list[tuple[str, str]] = []
+    created = gravar_em_blocos(
+        lambda payloads: getattr(
+            sb.table(table).insert(payloads, returning="representation").execute(), "data", None
+        ) or [],
+        list(pending.items()),
+        errors,
+        lambda key, exc: (key, _error_message(exc)),
+    )
+    resolved.update(created)
+    error_by_key = dict(errors)
+
+    for ctx in active:
+        key = key_of(ctx)
+        if key is not None and key not in resolved:
+            failures[ctx.parsed.row_number] = error_by_key.get(key, error_message)
+    return resolved
 
 
 def confirm_import(
@@ -1011,21 +885,162 @@ def confirm_import(
     profile: CurrentProfile,
     raw_text: str,
     produto_padrao: ImportProduto,
+    primeira_linha: int = 2,
 ) -> CarteiraImportConfirmResponse:
+    """Grava as linhas válidas do preview com inserts em lote por tabela.
+
+    Ordem: leads, carteira, administradoras, grupos, cotas, contratos, lances e
+    contemplações. Cada etapa faz um insert por bloco de linhas; um bloco que
+    falha é regravado linha a linha, e só as linhas da planilha afetadas (e as
+    que dependem delas) voltam como erro.
+    """
     contexts, preview = build_import_preview(
         sb=sb,
         profile=profile,
         raw_text=raw_text,
         produto_padrao=produto_padrao,
+        primeira_linha=primeira_linha,
+    )
+    org_id = profile.org_id
+    valid = [ctx for ctx in contexts if ctx.status not in {"erro", "ignorada"}]
+    failures: dict[int, str] = {}
+
+    def lead_key(ctx: PreviewContext) -> str:
+        return _normalize_lookup(ctx.parsed.cliente_nome)
+
+    def administradora_key(ctx: PreviewContext) -> str:
+        return _normalize_lookup(ctx.parsed.administradora_nome)
+
+    leads = _insert_step(
+        sb, valid, failures,
+        table="leads",
+        error_message="Falha ao criar lead da carteira na importação.",
+        key_of=lead_key,
+        existing_of=lambda ctx, _key: ctx.existing_lead,
+        payload_of=lambda ctx: _lead_payload(profile, ctx.parsed),
+    )
+
+    def lead_id(ctx: PreviewContext) -> str:
+        return str(leads[lead_key(ctx)]["id"])
+
+    carteiras = {
+        str(row.get("lead_id")): row
+        for row in fetch_in(
+            sb, "carteira_clientes", org_id, "lead_id", [str(lead["id"]) for lead in leads.values()],
+            columns="id, org_id, lead_id, status, origem_entrada",
+        )
+    }
+    _insert_step(
+        sb, valid, failures,
+        table="carteira_clientes",
+        error_message="Erro ao inserir cliente na carteira",
+        key_of=lead_id,
+        existing_of=lambda _ctx, key: carteiras.get(key),
+        payload_of=lambda ctx: _carteira_payload(profile, lead_id(ctx)),
+    )
+
+    administradoras = _insert_step(
+        sb, valid, failures,
+        table="administradoras",
+        error_message="Falha ao criar administradora na importação.",
+        key_of=administradora_key,
+        existing_of=lambda ctx, _key: ctx.existing_administradora,
+        payload_of=lambda ctx: {"org_id": org_id, "nome": ctx.parsed.administradora_nome},
+    )
+
+    def administradora_id(ctx: PreviewContext) -> str:
+        return str(administradoras[administradora_key(ctx)]["id"])
+
+    grupos = _insert_step(
+        sb, valid, failures,
+        table="grupos",
+        error_message="Falha ao criar grupo na importação.",
+        key_of=lambda ctx: f"{administradora_id(ctx)}::{ctx.parsed.grupo_codigo}",
+        existing_of=lambda ctx, _key: ctx.existing_grupo,
+        payload_of=lambda ctx: _grupo_payload(profile, administradora_id=administradora_id(ctx), parsed=ctx.parsed),
+    )
+
+    def row_key(ctx: PreviewContext) -> str:
+        return str(ctx.parsed.row_number)
+
+    cotas = _insert_step(
+        sb, valid, failures,
+        table="cotas",
+        error_message="Falha ao criar cota na importação.",
+        key_of=row_key,
+        existing_of=lambda ctx, _key: ctx.existing_cota,
+        payload_of=lambda ctx: _cota_payload(
+            profile, lead_id=lead_id(ctx), administradora_id=administradora_id(ctx), parsed=ctx.parsed
+        ),
+    )
+
+    def cota_id(ctx: PreviewContext) -> str:
+        return str(cotas[row_key(ctx)]["id"])
+
+    contratos = _insert_step(
+        sb, valid, failures,
+        table="contratos",
+        error_message="Falha ao criar contrato na importação.",
+        key_of=lambda ctx: row_key(ctx) if ctx.planned.contrato_criar else None,
+        existing_of=lambda _ctx, _key: None,
+        payload_of=lambda ctx: _contract_payload(profile, cota_id=cota_id(ctx), parsed=ctx.parsed),
+    )
+
+    def lance_key(ctx: PreviewContext) -> str | None:
+        if not ctx.planned.lance_criar:
+            return None
+        return f"{cota_id(ctx)}::{ctx.parsed.data_ultimo_lance}"
+
+    # só cotas que já existiam podem ter o lance desta data
+    existing_lances = {
+        f"{row.get('cota_id')}::{row.get('assembleia_data')}": row
+        for row in fetch_in(
+            sb, "lances", org_id, "cota_id",
+            [
+                str(ctx.existing_cota["id"])
+                for ctx in valid
+                if ctx.existing_cota and ctx.planned.lance_criar and ctx.parsed.row_number not in failures
+            ],
+            columns="id, cota_id, assembleia_data",
+        )
+    }
+    lances = _insert_step(
+        sb, valid, failures,
+        table="lances",
+        error_message="Falha ao criar lance na importação.",
+        key_of=lance_key,
+        existing_of=lambda _ctx, key: existing_lances.get(key),
+        payload_of=lambda ctx: _lance_payload(profile, cota_id=cota_id(ctx), parsed=ctx.parsed),
+    )
+
+    contemplacoes = _insert_step(
+        sb, valid, failures,
+        table="contemplacoes",
+        error_message="Falha ao criar contemplação na importação.",
+        key_of=lambda ctx: row_key(ctx) if ctx.planned.contemplacao_criar else None,
+        existing_of=lambda _ctx, _key: None,
+        payload_of=lambda ctx: _contemplacao_payload(profile, cota_id=cota_id(ctx), parsed=ctx.parsed),
     )
 
+    # cotas novas já nascem contempladas; as existentes mudam de status aqui
+    contempladas = [
+        ctx
+        for ctx in valid
+        if ctx.existing_cota and row_key(ctx) in contemplacoes and ctx.parsed.row_number not in failures
+    ]
+    for bloco in chunks(contempladas, LOTE_CHUNK):
+        try:
+            sb.table("cotas").update({"status": "contemplada"}).eq("org_id", org_id).in_(
+                "id", [cota_id(ctx) for ctx in bloco]
+            ).execute()
+        except Exception as exc:  # noqa: BLE001
+            for ctx in bloco:
+                failures[ctx.parsed.row_number] = _error_message(exc)
+
     results: list[CarteiraImportRowResult] = []
     imported_rows = 0
     failed_rows = 0
     ignored_rows = 0
-    lead_cache: dict[str, dict[str, Any]] = {}
-    administradora_cache: dict[str, dict[str, Any]] = {}
-    grupo_cache: dict[str, dict[str, Any]] = {}
 
     for ctx in contexts:
         if ctx.status == "ignorada":
@@ -1040,131 +1055,39 @@ def confirm_import(
             )
             continue
 
-        if ctx.status == "erro":
+        failure = failures.get(ctx.parsed.row_number)
+        if ctx.status == "erro" or failure is not None:
             failed_rows += 1
             results.append(
                 CarteiraImportRowResult(
                     row_number=ctx.parsed.row_number,
                     status="erro",
                     cliente_nome=ctx.parsed.cliente_nome,
-                    errors=ctx.errors,
+                    errors=ctx.errors if failure is None else [failure],
                     warnings=ctx.warnings,
                 )
             )
             continue
 
-        try:
-            lead = _resolve_lead_for_confirm(
-                sb,
-                profile,
-                ctx.parsed,
-                lead_cache,
-                ctx.existing_lead,
-            )
-            ensure_carteira_cliente(
-                supa=sb,
-                org_id=profile.org_id,
-                lead_id=str(lead["id"]),
-                origem_entrada="manual",
-                observacoes="Cliente importado por colagem de planilha",
-            )
-
-            administradora = _resolve_administradora_for_confirm(
-                sb,
-                profile,
-                ctx.parsed,
-                administradora_cache,
-                ctx.existing_administradora,
-            )
-            grupo = _resolve_grupo_for_confirm(
-                sb,
-                profile,
-                administradora_id=str(administradora["id"]),
-                parsed=ctx.parsed,
-                cache=grupo_cache,
-                existing_grupo=ctx.existing_grupo,
-            )
-            cota = ctx.existing_cota or _create_cota(
-                sb,
-                profile,
-                lead_id=str(lead["id"]),
-                administradora_id=str(administradora["id"]),
-                parsed=ctx.parsed,
-            )
-
-            contrato = ctx.existing_contrato
-            if ctx.planned.contrato_criar:
-                contrato = _create_contract(sb, profile, cota_id=str(cota["id"]), parsed=ctx.parsed)
-
-            lance = None
-            if ctx.planned.lance_criar:
-                existing_lance_resp = (
-                    sb.table("lances")
-                    .select("id")
-                    .eq("org_id", profile.org_id)
-                    .eq("cota_id", str(cota["id"]))
-                    .eq("assembleia_data", ctx.parsed.data_ultimo_lance)
-                    .limit(1)
-                    .execute()
-                )
-                existing_lances = getattr(existing_lance_resp, "data", None) or []
-                lance = existing_lances[0] if existing_lances else _create_lance(
-                    sb,
-                    profile,
-                    cota_id=str(cota["id"]),
-                    parsed=ctx.parsed,
-                )
-
-            contemplacao = ctx.existing_contemplacao
-            if ctx.planned.contemplacao_criar:
-                contemplacao = _create_contemplacao(
-                    sb,
-                    profile,
-                    cota_id=str(cota["id"]),
-                    parsed=ctx.parsed,
-                )
-                sb.table("cotas").update({"status": "contemplada"}).eq("org_id", profile.org_id).eq(
-                    "id", str(cota["id"])
-                ).execute()
-
-            imported_rows += 1
-            results.append(
-                CarteiraImportRowResult(
-                    row_number=ctx.parsed.row_number,
-                    status="aviso" if ctx.warnings else "pronta",
-                    cliente_nome=ctx.parsed.cliente_nome,
-                    lead_id=str(lead["id"]),
-                    administradora_id=str(administradora["id"]),
-                    grupo_id=str(grupo["id"]),
-                    cota_id=str(cota["id"]),
-                    contrato_id=str(contrato["id"]) if contrato else None,
-                    lance_id=str(lance["id"]) if lance else None,
-                    contemplacao_id=str(contemplacao["id"]) if contemplacao else None,
-                    warnings=ctx.warnings,
-                )
-            )
-        except HTTPException as exc:
-            failed_rows += 1
-            results.append(
-                CarteiraImportRowResult(
-                    row_number=ctx.parsed.row_number,
-                    status="erro",
-                    cliente_nome=ctx.parsed.cliente_nome,
-                    errors=[str(exc.detail)],
-                    warnings=ctx.warnings,
-                )
-            )
-        except Exception as exc:
-            failed_rows += 1
-            results.append(
-                CarteiraImportRowResult(
-                    row_number=ctx.parsed.row_number,
-                    status="erro",
-                    cliente_nome=ctx.parsed.cliente_nome,
-                    errors=[str(exc)],
-                    warnings=ctx.warnings,
-                )
+        contrato = contratos.get(row_key(ctx)) or ctx.existing_contrato
+        lance = lances.get(lance_key(ctx) or "")
+        contemplacao = contemplacoes.get(row_key(ctx)) or ctx.existing_contemplacao
+        imported_rows += 1
+        results.append(
+            CarteiraImportRowResult(
+                row_number=ctx.parsed.row_number,
+                status="aviso" if ctx.warnings else "pronta",
+                cliente_nome=ctx.parsed.cliente_nome,
+                lead_id=lead_id(ctx),
+                administradora_id=administradora_id(ctx),
+                grupo_id=str(grupos[f"{administradora_id(ctx)}::{ctx.parsed.grupo_codigo}"]["id"]),
+                cota_id=cota_id(ctx),
+                contrato_id=str(contrato["id"]) if contrato else None,
+                lance_id=str(lance["id"]) if lance else None,
+                contemplacao_id=str(contemplacao["id"]) if contemplacao else None,
+                warnings=ctx.warnings,
             )
+        )
 
     return CarteiraImportConfirmResponse(
         imported_rows=imported_rows,
@@ -0,0 +1,227 @@
+"""Listagem da carteira de clientes (`GET /carteira`).
+
+Sem `limit`/`cursor` a lista vem inteira, como sempre veio. Com eles, a
+página vem por keyset em (entered_at desc, id desc). O enriquecimento de
+cada item (cota mais recente do lead, contrato mais recente da cota e
+administradora) é feito com uma consulta por tabela para a página inteira.
+A escolha do "mais recente" é feita em memória sobre linhas já ordenadas por
+`created_at desc`. O formato de cada item é o mesmo da listagem antiga.
+
+Com busca (`q`), a lista é o resultado limitado e ordenado por relevância da
+`busca_service`; o cursor passa a ser a posição nesse resultado.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import Client
+
+from app.core.supabase_lote import fetch_in
+from app.services import busca_service
+
+CARTEIRA_PAGE_SIZE = 50
+CARTEIRA_PAGE_MAX = 200
+
+CARTEIRA_SELECT = """
+    id,
+    org_id,
+    lead_id,
+    status,
+    origem_entrada,
+    entered_at,
+    observacoes,
+    leads!inner (
+        id,
+        nome,
+        telefone,
+        email,
+        etapa,
+        cep,
+        logradouro,
+        numero,
+        complemento,
+        bairro,
+        cidade,
+        estado,
+        latitude,
+        longitude,
+        address_updated_at
+    )
+"""
+COTA_COLUMNS = """
+    id,
+    lead_id,
+    administradora_id,
+    numero_cota,
+    grupo_codigo,
+    valor_carta,
+    valor_parcela,
+    prazo,
+    autorizacao_gestao,
+    produto
+"""
+CONTRATO_COLUMNS = """
+    id,
+    cota_id,
+    numero,
+    status,
+    data_assinatura,
+    data_pagamento,
+    data_alocacao,
+    data_contemplacao
+"""
+
+
+def encode_carteira_cursor(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_carteira_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if "o" in data:
+            return {"o": max(int(data["o"]), 0)}
+        return {"e": str(data["e"]), "id": str(data["id"])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def _mais_recente_por(rows: List[Dict[str, Any]], campo: str) -> Dict[str, Dict[str, Any]]:
+    # linhas já vêm em created_at desc: a primeira de cada chave é a mais recente
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        if row.get(campo):
+            out.setdefault(str(row[campo]), row)
+    return out
+
+
+def enriquecer_carteira(supa: Client, org_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cota, contrato e administradora de cada item, uma consulta por tabela."""
+    cotas = _mais_recente_por(
+        fetch_in(
+            supa, "cotas", org_id, "lead_id", [row["lead_id"] for row in rows],
+            columns=COTA_COLUMNS, order="created_at", desc=True,
+        ),
+        "lead_id",
+    )
+    contratos = _mais_recente_por(
+        fetch_in(
+            supa, "contratos", org_id, "cota_id", [cota["id"] for cota in cotas.values()],
+            columns=CONTRATO_COLUMNS, order="created_at", desc=True,
+        ),
+        "cota_id",
+    )
+    administradoras = {
+        str(row["id"]): row
+        for row in fetch_in(
+            supa, "administradoras", org_id, "id",
+            [cota.get("administradora_id") for cota in cotas.values()],
+            columns="id, nome",
+        )
+    }
+
+    result: List[Dict[str, Any]] = []
+    for row in rows:
+        cota = cotas.get(str(row["lead_id"]))
+        contrato = contratos.get(str(cota["id"])) if cota else None
+        administradora = (
+            administradoras.get(str(cota["administradora_id"]))
+            if cota and cota.get("administradora_id")
+            else None
+        )
+        result.append({
+            "carteira_id": row["id"],
+            "lead_id": row["lead_id"],
+            "status_carteira": row["status"],
+            "origem_entrada": row["origem_entrada"],
+            "entered_at": row["entered_at"],
+            "observacoes": row.get("observacoes"),
+            "lead": row.get("leads"),
+            "cota": cota,
+            "contrato": contrato,
+            "administradora": administradora,
+        })
+    return result
+
+
+def _pagina_keyset(
+    supa: Client,
+    org_id: str,
+    posicao: Optional[Dict[str, Any]],
+    limit: int,
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Linhas depois de `posicao` em (entered_at desc, id desc) e a posição seguinte."""
+    query = supa.table("carteira_clientes").select(CARTEIRA_SELECT).eq("org_id", org_id)
+    if posicao:
+        query = query.or_(
+            f"entered_at.lt.{posicao['e']},"
+            f"and(entered_at.eq.{posicao['e']},id.lt.{posicao['id']})"
+        )
+    resp = query.order("entered_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    rows = getattr(resp, "data", None) or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, {"e": rows[-1]["entered_at"], "id": rows[-1]["id"]}
+
+
+def _total_carteira(supa: Client, org_id: str) -> int:
+    resp = supa.table("carteira_clientes").select("id", count="exact").eq("org_id", org_id).limit(1).execute()
+    return int(getattr(resp, "count", None) or 0)
+
+
+def listar_carteira(
+    supa: Client,
+    org_id: str,
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+    """Carteira: (itens, cursor da próxima página ou None, total do filtro).
+
+    A paginação é opcional: sem `limit` nem `cursor` volta a lista inteira
+    (lida em páginas de CARTEIRA_PAGE_MAX). `total` é o total do filtro em
+    todas as páginas.
+    """
+    paginado = limit is not None or cursor is not None
+    limit = max(1, min(int(limit or CARTEIRA_PAGE_SIZE), CARTEIRA_PAGE_MAX))
+    posicao = decode_carteira_cursor(cursor) if cursor else None
+
+    # busca por nome do cliente, cota, grupo ou contrato (ids por relevância)
+    encontrados = busca_service.buscar(supa, org_id=org_id, q=q, filtros_lead={"somente_carteira": True})
+    if encontrados is not None:
+        if posicao is not None and "o" not in posicao:
+            raise HTTPException(400, "Cursor inválido")
+        lead_ids = busca_service.lead_ids(encontrados)
+        rows: List[Dict[str, Any]] = []
+        if lead_ids:
+            resp = supa.table("carteira_clientes").select(CARTEIRA_SELECT).eq("org_id", org_id).in_("lead_id", lead_ids).execute()
+            rows = busca_service.ordenar_por_relevancia(getattr(resp, "data", None) or [], lead_ids, "lead_id")
+        if not paginado:
+            return enriquecer_carteira(supa, org_id, rows), None, len(rows)
+        inicio = posicao["o"] if posicao else 0
+        pagina = rows[inicio:inicio + limit]
+        proximo = encode_carteira_cursor({"o": inicio + limit}) if inicio + limit < len(rows) else None
+        return enriquecer_carteira(supa, org_id, pagina), proximo, len(rows)
+
+    if posicao is not None and "o" in posicao:
+        raise HTTPException(400, "Cursor inválido")
+    if not paginado:
+        rows = []
+        while True:
+            pagina, posicao = _pagina_keyset(supa, org_id, posicao, CARTEIRA_PAGE_MAX)
+            rows.extend(pagina)
+            if posicao is None:
+                return enriquecer_carteira(supa, org_id, rows), None, len(rows)
+
+    rows, seguinte = _pagina_keyset(supa, org_id, posicao, limit)
+    proximo = encode_carteira_cursor(seguinte) if seguinte else None
+    # o total é sempre o da carteira inteira, não o restante depois do cursor
+    total = len(rows) if posicao is None and seguinte is None else _total_carteira(supa, org_id)
+    return enriquecer_carteira(supa, org_id, rows), proximo, total
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import json
+import logging
 from calendar import monthrange
 from datetime import date, datetime
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional, Tuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
 
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from supabase import Client
 
+from app.core.cache import MISS, VersionedCache
+from app.core.config import settings
 from app.services.comissao_service import (
     fetch_config_by_cota,
     fetch_cota_context,
@@ -20,8 +26,12 @@ from app.services.contract_partner_sync_service import (
     sync_contrato_parceiros_for_contract,
 )
 
+logger = logging.getLogger(__name__)
+
 MONEY_Q = Decimal("0.01")
 PCT_Q = Decimal("0.0001")
+# Sentinela: contemplação ainda não consultada (None é um resultado válido).
+_NAO_CARREGADA: Any = object()
 
 
 def _dec(value: Any, default: str = "0") -> Decimal:
@@ -351,6 +361,7 @@ def _resolve_regra_competencia_prevista(
     config: Dict[str, Any],
     regra: Dict[str, Any],
     pulos: Optional[List[date]] = None,
+    contemplacao: Any = _NAO_CARREGADA,
 ) -> Optional[date]:
     tipo = regra.get("tipo_evento")
     offset = int(regra.get("offset_meses") or 0)
@@ -365,7 +376,8 @@ def _resolve_regra_competencia_prevista(
     elif tipo in ("proxima_cobranca", "manual"):
         result = add_months_month_start(base_competencia, offset) if base_competencia else None
     elif tipo == "contemplacao":
-        contemplacao = _resolve_contemplacao_competencia(supa, org_id, contrato, cota["id"])
+        if contemplacao is _NAO_CARREGADA:
+            contemplacao = _resolve_contemplacao_competencia(supa, org_id, contrato, cota["id"])
         result = add_months_month_start(contemplacao, offset) if contemplacao else None
 
     if result is None:
@@ -484,6 +496,33 @@ def _find_existing_lancamentos_for_competencia_regra(
     return _safe_rows(query.execute())
 
 
+def _block_patch(
+    lanc: Dict[str, Any],
+    *,
+    target_status: str,
+    observacao: str,
+) -> Optional[Dict[str, Any]]:
+    """Alterações para bloquear/cancelar o lançamento; None quando já foi pago."""
+    if lanc.get("status") == "pago":
+        return None
+    if lanc.get("beneficiario_tipo") == "parceiro" and lanc.get("repasse_status") == "pago":
+        return None
+
+    update_payload: Dict[str, Any] = {
+        "status": target_status,
+        "observacoes": observacao,
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+    if lanc.get("beneficiario_tipo") == "parceiro":
+        update_payload["repasse_status"] = _repasse_status_for_target(target_status)
+        if target_status != "disponivel":
+            update_payload["repasse_previsto_em"] = None
+    if target_status != "disponivel":
+        update_payload["liberado_por_evento_em"] = None
+        update_payload["competencia_real"] = None
+    return update_payload
+
+
 def _cancel_or_block_existing_lancamentos(
     supa: Client,
     *,
@@ -494,26 +533,11 @@ def _cancel_or_block_existing_lancamentos(
 ) -> List[Dict[str, Any]]:
     updated_items: List[Dict[str, Any]] = []
     for lanc in lancamentos:
-        if lanc.get("status") == "pago":
-            updated_items.append(lanc)
-            continue
-        if lanc.get("beneficiario_tipo") == "parceiro" and lanc.get("repasse_status") == "pago":
+        update_payload = _block_patch(lanc, target_status=target_status, observacao=observacao)
+        if update_payload is None:
             updated_items.append(lanc)
             continue
 
-        update_payload: Dict[str, Any] = {
-            "status": target_status,
-            "observacoes": observacao,
-            "updated_at": datetime.utcnow().isoformat(),
-        }
-        if lanc.get("beneficiario_tipo") == "parceiro":
-            update_payload["repasse_status"] = _repasse_status_for_target(target_status)
-            if target_status != "disponivel":
-                update_payload["repasse_previsto_em"] = None
-        if target_status != "disponivel":
-            update_payload["liberado_por_evento_em"] = None
-            update_payload["competencia_real"] = None
-
         resp = (
             supa.table("comissao_lancamentos")
             .update(update_payload)
@@ -626,6 +650,154 @@ def _build_parceiro_lancamento(
     }
 
 
+def calcular_valores_parcela(
+    *,
+    cota: Dict[str, Any],
+    config: Dict[str, Any],
+    regra: Dict[str, Any],
+    parceiros: List[Dict[str, Any]],
+) -> Tuple[Decimal, Decimal, Decimal, List[Tuple[Dict[str, Any], Decimal, Decimal, Decimal, Decimal]]]:
+    """Valores da parcela `regra`: (valor_base, bruto_total, bruto_empresa,
+    [(parceiro, bruto, imposto_pct, imposto, liquido)]). Sem I/O."""
+    valor_base = _dec(cota.get("valor_carta"))
+    if valor_base <= 0:
+        raise HTTPException(400, "valor_carta da cota precisa ser maior que zero")
+
+    total_pct = _dec(config.get("percentual_total"))
+    if total_pct <= 0:
+        raise HTTPException(400, "percentual_total da comissão precisa ser maior que zero")
+
+    regra_pct = _dec(regra.get("percentual_comissao"))
+    valor_bruto_total = _money(valor_base * (regra_pct / Decimal("100")))
+
+    parceiro_rows: List[Tuple[Dict[str, Any], Decimal, Decimal, Decimal, Decimal]] = []
+    total_parceiros_bruto = Decimal("0")
+
+    for parceiro in parceiros:
+        parceiro_pct_total = _dec(parceiro.get("percentual_parceiro"))
+        if parceiro_pct_total <= 0:
+            continue
+        ratio = parceiro_pct_total / total_pct
+        parceiro_pct_regra = _pct(regra_pct * ratio)
+        valor_bruto = _money(valor_base * (parceiro_pct_regra / Decimal("100")))
+        imposto_pct = _dec(parceiro.get("imposto_retido_pct"))
+        valor_imposto = _money(valor_bruto * (imposto_pct / Decimal("100")))
+        valor_liquido = _money(valor_bruto - valor_imposto)
+        total_parceiros_bruto += valor_bruto
+        parceiro_rows.append((parceiro, valor_bruto, imposto_pct, valor_imposto, valor_liquido))
+
+    valor_empresa_bruto = _money(valor_bruto_total - total_parceiros_bruto)
+    return valor_base, valor_bruto_total, valor_empresa_bruto, parceiro_rows
+
+
+def _build_competencia_lancamentos(
+    *,
+    org_id: str,
+    comp: Dict[str, Any],
+    cota: Dict[str, Any],
+    config: Dict[str, Any],
+    regra: Dict[str, Any],
+    parceiros: List[Dict[str, Any]],
+    competencia_prevista: Optional[date],
+    target_status: str,
+) -> List[Dict[str, Any]]:
+    """Payloads (empresa + parceiros) da parcela `regra` na competência `comp`."""
+    valor_base, valor_bruto_total, valor_empresa_bruto, parceiro_rows = calcular_valores_parcela(
+        cota=cota, config=config, regra=regra, parceiros=parceiros
+    )
+    if not competencia_prevista:
+        raise HTTPException(400, "Não foi possível determinar a competência da parcela de comissão")
+
+    payloads: List[Dict[str, Any]] = [
+        _build_empresa_lancamento(
+            org_id=org_id,
+            comp=comp,
+            config=config,
+            regra=regra,
+            competencia_prevista=competencia_prevista,
+            valor_base=valor_base,
+            valor_bruto_total=valor_bruto_total,
+            valor_empresa_bruto=valor_empresa_bruto,
+            status=target_status,
+        )
+    ]
+    for parceiro, valor_bruto, imposto_pct, valor_imposto, valor_liquido in parceiro_rows:
+        payloads.append(
+            _build_parceiro_lancamento(
+                org_id=org_id,
+                comp=comp,
+                config=config,
+                regra=regra,
+                parceiro=parceiro,
+                competencia_prevista=competencia_prevista,
+                valor_base=valor_base,
+                valor_bruto=valor_bruto,
+                imposto_pct=imposto_pct,
+                valor_imposto=valor_imposto,
+                valor_liquido=valor_liquido,
+                status=target_status,
+            )
+        )
+    return payloads
+
+
+def _paid_lancamento_conflict(
+    current: Dict[str, Any],
+    payload: Dict[str, Any],
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(preservar?, auditoria) para lançamento já pago ou com repasse pago.
+
+    A auditoria (`action`/`diff`) só vem quando o recálculo diverge do que foi pago.
+    """
+    if current.get("status") == "pago":
+        if not _payload_diverges(current, payload):
+            return True, None
+        return True, {
+            "action": "paid_lancamento_conflict_preserved",
+            "diff": {
+                "current": {
+                    "id": current.get("id"),
+                    "status": current.get("status"),
+                    "competencia_id": current.get("competencia_id"),
+                    "regra_id": current.get("regra_id"),
+                    "valor_bruto": current.get("valor_bruto"),
+                    "valor_liquido": current.get("valor_liquido"),
+                },
+                "attempted": {
+                    "status": payload.get("status"),
+                    "competencia_id": payload.get("competencia_id"),
+                    "regra_id": payload.get("regra_id"),
+                    "valor_bruto": payload.get("valor_bruto"),
+                    "valor_liquido": payload.get("valor_liquido"),
+                },
+                "reason": "Paid launch preserved without destructive overwrite.",
+            },
+        }
+    if current.get("beneficiario_tipo") == "parceiro" and current.get("repasse_status") == "pago":
+        if not _payload_diverges(current, payload):
+            return True, None
+        return True, {
+            "action": "paid_repasse_conflict_preserved",
+            "diff": {
+                "current": {
+                    "id": current.get("id"),
+                    "status": current.get("status"),
+                    "repasse_status": current.get("repasse_status"),
+                    "competencia_id": current.get("competencia_id"),
+                    "regra_id": current.get("regra_id"),
+                },
+                "attempted": {
+                    "status": payload.get("status"),
+                    "repasse_status": payload.get("repasse_status"),
+                    "competencia_id": payload.get("competencia_id"),
+                    "regra_id": payload.get("regra_id"),
+                },
+                "reason": "Paid partner transfer preserved without destructive overwrite.",
+            },
+        }
+    return False, None
+
+
 def _upsert_lancamento(
     supa: Client,
     *,
@@ -656,60 +828,16 @@ def _upsert_lancamento(
 
     if existing:
         current = existing[0]
-        if current.get("status") == "pago":
-            if _payload_diverges(current, payload):
-                insert_audit_log(
-                    supa,
-                    org_id=org_id,
-                    actor_id=None,
-                    entity="comissao_lancamentos",
-                    entity_id=current["id"],
-                    action="paid_lancamento_conflict_preserved",
-                    diff={
-                        "current": {
-                            "id": current.get("id"),
-                            "status": current.get("status"),
-                            "competencia_id": current.get("competencia_id"),
-                            "regra_id": current.get("regra_id"),
-                            "valor_bruto": current.get("valor_bruto"),
-                            "valor_liquido": current.get("valor_liquido"),
-                        },
-                        "attempted": {
-                            "status": payload.get("status"),
-                            "competencia_id": payload.get("competencia_id"),
-                            "regra_id": payload.get("regra_id"),
-                            "valor_bruto": payload.get("valor_bruto"),
-                            "valor_liquido": payload.get("valor_liquido"),
-                        },
-                        "reason": "Paid launch preserved without destructive overwrite.",
-                    },
-                )
-            return current
-        if current.get("beneficiario_tipo") == "parceiro" and current.get("repasse_status") == "pago":
-            if _payload_diverges(current, payload):
+        preserved, audit = _paid_lancamento_conflict(current, payload)
+        if preserved:
+            if audit:
                 insert_audit_log(
                     supa,
                     org_id=org_id,
                     actor_id=None,
                     entity="comissao_lancamentos",
                     entity_id=current["id"],
-                    action="paid_repasse_conflict_preserved",
-                    diff={
-                        "current": {
-                            "id": current.get("id"),
-                            "status": current.get("status"),
-                            "repasse_status": current.get("repasse_status"),
-                            "competencia_id": current.get("competencia_id"),
-                            "regra_id": current.get("regra_id"),
-                        },
-                        "attempted": {
-                            "status": payload.get("status"),
-                            "repasse_status": payload.get("repasse_status"),
-                            "competencia_id": payload.get("competencia_id"),
-                            "regra_id": payload.get("regra_id"),
-                        },
-                        "reason": "Paid partner transfer preserved without destructive overwrite.",
-                    },
+                    **audit,
                 )
             return current
 
@@ -970,35 +1098,6 @@ def processar_comissao_competencia(
         observacao="Lançamento descontinuado após remapeamento da competência para outra parcela.",
     )
 
-    valor_base = _dec(cota.get("valor_carta"))
-    if valor_base <= 0:
-        raise HTTPException(400, "valor_carta da cota precisa ser maior que zero")
-
-    total_pct = _dec(config.get("percentual_total"))
-    if total_pct <= 0:
-        raise HTTPException(400, "percentual_total da comissão precisa ser maior que zero")
-
-    regra_pct = _dec(regra.get("percentual_comissao"))
-    valor_bruto_total = _money(valor_base * (regra_pct / Decimal("100")))
-    parceiros = fetch_active_cota_partners(supa, org_id, comp["cota_id"])
-
-    parceiro_rows: List[Tuple[Dict[str, Any], Decimal, Decimal, Decimal, Decimal]] = []
-    total_parceiros_bruto = Decimal("0")
-
-    for parceiro in parceiros:
-        parceiro_pct_total = _dec(parceiro.get("percentual_parceiro"))
-        if parceiro_pct_total <= 0:
-            continue
-        ratio = parceiro_pct_total / total_pct
-        parceiro_pct_regra = _pct(regra_pct * ratio)
-        valor_bruto = _money(valor_base * (parceiro_pct_regra / Decimal("100")))
-        imposto_pct = _dec(parceiro.get("imposto_retido_pct"))
-        valor_imposto = _money(valor_bruto * (imposto_pct / Decimal("100")))
-        valor_liquido = _money(valor_bruto - valor_imposto)
-        total_parceiros_bruto += valor_bruto
-        parceiro_rows.append((parceiro, valor_bruto, imposto_pct, valor_imposto, valor_liquido))
-
-    valor_empresa_bruto = _money(valor_bruto_total - total_parceiros_bruto)
     competencia_prevista = _resolve_regra_competencia_prevista(
         supa=supa,
         org_id=org_id,
@@ -1007,39 +1106,19 @@ def processar_comissao_competencia(
         config=config,
         regra=regra,
     )
-    if not competencia_prevista:
-        raise HTTPException(400, "Não foi possível determinar a competência da parcela de comissão")
-
-    items: List[Dict[str, Any]] = []
-    empresa_payload = _build_empresa_lancamento(
+    payloads = _build_competencia_lancamentos(
         org_id=org_id,
         comp=comp,
+        cota=cota,
         config=config,
         regra=regra,
+        parceiros=fetch_active_cota_partners(supa, org_id, comp["cota_id"]),
         competencia_prevista=competencia_prevista,
-        valor_base=valor_base,
-        valor_bruto_total=valor_bruto_total,
-        valor_empresa_bruto=valor_empresa_bruto,
-        status=target_status,
+        target_status=target_status,
     )
-    items.append(_upsert_lancamento(supa, org_id=org_id, payload=empresa_payload))
-
-    for parceiro, valor_bruto, imposto_pct, valor_imposto, valor_liquido in parceiro_rows:
-        parceiro_payload = _build_parceiro_lancamento(
-            org_id=org_id,
-            comp=comp,
-            config=config,
-            regra=regra,
-            parceiro=parceiro,
-            competencia_prevista=competencia_prevista,
-            valor_base=valor_base,
-            valor_bruto=valor_bruto,
-            imposto_pct=imposto_pct,
-            valor_imposto=valor_imposto,
-            valor_liquido=valor_liquido,
-            status=target_status,
-        )
-        items.append(_upsert_lancamento(supa, org_id=org_id, payload=parceiro_payload))
+    items: List[Dict[str, Any]] = [
+        _upsert_lancamento(supa, org_id=org_id, payload=payload) for payload in payloads
+    ]
 
     if target_status != "disponivel":
         items = _cancel_or_block_existing_lancamentos(
@@ -1107,47 +1186,353 @@ def processar_pagamento_para_comissao(
     }
 
 
-def _cancel_stale_launches_for_contract(
-    supa: Client,
+# --------------------------------------------------------------------------- #
+# Reprocessamento do contrato inteiro em memória
+# --------------------------------------------------------------------------- #
+# Mesmas regras de `processar_comissao_competencia`, mas com o contexto do
+# contrato (cota, config, regras, parceiros, pulos, contemplação, competências e
+# lançamentos) carregado uma vez. As competências são aplicadas em ordem sobre os
+# lançamentos em memória e, no fim, só o que mudou é gravado em lote.
+LANCAMENTO_WRITE_CHUNK = 500
+# Campos que mudam a cada recálculo sem mudar o lançamento.
+_VOLATILE_LANCAMENTO_FIELDS = frozenset({"updated_at", "created_at"})
+
+
+class _LancamentosContrato:
+    """Lançamentos do contrato em memória, indexados como a constraint
+    unq_comissao_lancamento_regra_benef (ordem, beneficiario_tipo, parceiro_id)."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows: Dict[str, Dict[str, Any]] = {row["id"]: dict(row) for row in rows}
+        self.originais: Dict[str, Dict[str, Any]] = {row["id"]: dict(row) for row in rows}
+        self.novos: List[str] = []
+        self.auditorias: List[Dict[str, Any]] = []
+        self._by_key: Dict[Tuple[int, str, Optional[str]], str] = {}
+        for row in rows:
+            self._by_key.setdefault(self._key(row), row["id"])
+
+    @staticmethod
+    def _key(row: Dict[str, Any]) -> Tuple[int, str, Optional[str]]:
+        return (int(row.get("ordem") or 0), str(row.get("beneficiario_tipo")), row.get("parceiro_id") or None)
+
+    def da_competencia(self, competencia_id: str) -> List[Dict[str, Any]]:
+        return [
+            dict(row)
+            for row in self.rows.values()
+            if row.get("competencia_id") == competencia_id and row.get("origem_tipo") == "pagamento_parcela"
+        ]
+
+    def por_chave(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        row_id = self._by_key.get(self._key(payload))
+        return dict(self.rows[row_id]) if row_id else None
+
+    def atualizar(self, row_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
+        self.rows[row_id].update(patch)
+        return dict(self.rows[row_id])
+
+    def inserir(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        row = {**payload, "id": str(uuid4())}
+        self.rows[row["id"]] = row
+        self.novos.append(row["id"])
+        self._by_key.setdefault(self._key(row), row["id"])
+        return dict(row)
+
+
+def _bloquear_em_memoria(
+    store: _LancamentosContrato,
+    lancamentos: List[Dict[str, Any]],
     *,
-    org_id: str,
-    contrato_id: str,
+    target_status: str,
+    observacao: str,
+) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    for lanc in lancamentos:
+        patch = _block_patch(lanc, target_status=target_status, observacao=observacao)
+        items.append(lanc if patch is None else store.atualizar(lanc["id"], patch))
+    return items
+
+
+def _upsert_em_memoria(store: _LancamentosContrato, payload: Dict[str, Any]) -> Dict[str, Any]:
+    payload["updated_at"] = datetime.utcnow().isoformat()
+    current = store.por_chave(payload)
+    if current:
+        preserved, audit = _paid_lancamento_conflict(current, payload)
+        if preserved:
+            if audit:
+                store.auditorias.append({"entity_id": current["id"], **audit})
+            return current
+        return store.atualizar(current["id"], payload)
+    payload["created_at"] = datetime.utcnow().isoformat()
+    return store.inserir(payload)
+
+
+def _match_regra(
+    regras: List[Dict[str, Any]],
+    previstas: Dict[str, Optional[date]],
+    competencia: date,
+) -> Optional[Dict[str, Any]]:
+    # Igual a `_find_matching_regra_for_competencia`: havendo sobreposição, vale a menor ordem.
+    for regra in sorted(regras, key=lambda row: int(row.get("ordem") or 0)):
+        if previstas.get(regra["id"]) == competencia:
+            return regra
+    return None
+
+
+def _reprocessar_competencia_em_memoria(
+    ctx: Dict[str, Any],
+    store: _LancamentosContrato,
+    comp: Dict[str, Any],
+) -> Dict[str, Any]:
+    config = ctx["config"]
+    existing_for_comp = store.da_competencia(comp["id"])
+
+    if not config or not config.get("ativo", True) or not ctx["regras"]:
+        sem_config = not config or not config.get("ativo", True)
+        _bloquear_em_memoria(
+            store,
+            existing_for_comp,
+            target_status="previsto",
+            observacao=(
+                "Competência sem configuração ativa de comissão."
+                if sem_config
+                else "Competência sem regras de comissão configuradas."
+            ),
+        )
+        return {
+            "processed": False,
+            "total_itens": 0,
+            "reason": "Cota sem configuração ativa de comissão" if sem_config else "Sem regras de comissão",
+        }
+
+    competencia_ref = parse_date(comp.get("competencia"))
+    if not competencia_ref:
+        raise HTTPException(400, "Competência inválida")
+
+    regra = _match_regra(ctx["regras"], ctx["previstas"], competencia_ref)
+    if not regra:
+        blocked = _bloquear_em_memoria(
+            store,
+            existing_for_comp,
+            target_status="previsto",
+            observacao="Nenhuma parcela da comissão corresponde a esta competência.",
+        )
+        return {
+            "processed": False,
+            "total_itens": len(blocked),
+            "reason": "Nenhuma regra corresponde à competência",
+        }
+
+    target_status = _determine_target_status(comp=comp, regra=regra, config=config)
+    blocked_items = _bloquear_em_memoria(
+        store,
+        [row for row in existing_for_comp if row.get("regra_id") != regra["id"]],
+        target_status="cancelado",
+        observacao="Lançamento descontinuado após remapeamento da competência para outra parcela.",
+    )
+    payloads = _build_competencia_lancamentos(
+        org_id=ctx["org_id"],
+        comp=comp,
+        cota=ctx["cota"],
+        config=config,
+        regra=regra,
+        parceiros=ctx["parceiros"],
+        competencia_prevista=ctx["previstas"].get(regra["id"]),
+        target_status=target_status,
+    )
+    items = [_upsert_em_memoria(store, payload) for payload in payloads]
+
+    if target_status != "disponivel":
+        items = _bloquear_em_memoria(
+            store,
+            items,
+            target_status=target_status,
+            observacao=(
+                "Competência paga sem assembleia: comissão mantida bloqueada."
+                if comp.get("status") == "paga_sem_assembleia"
+                else "Competência ainda não elegível para liberar comissão."
+            ),
+        )
+
+    return {
+        "processed": True,
+        "total_itens": len(blocked_items) + len(items),
+        "reason": None,
+    }
+
+
+def _cancelar_sem_competencia_em_memoria(
+    store: _LancamentosContrato,
     active_competencia_ids: List[str],
 ) -> int:
-    resp = (
-        supa.table("comissao_lancamentos")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("contrato_id", contrato_id)
-        .eq("origem_tipo", "pagamento_parcela")
-        .execute()
-    )
-    rows = _safe_rows(resp)
-    updated = 0
     active_ids = set(active_competencia_ids)
-    for row in rows:
-        if row.get("competencia_id") in active_ids:
+    cancelled = 0
+    for row in list(store.rows.values()):
+        if row.get("origem_tipo") != "pagamento_parcela" or row.get("competencia_id") in active_ids:
             continue
         if row.get("status") == "pago":
             continue
         if row.get("beneficiario_tipo") == "parceiro" and row.get("repasse_status") == "pago":
             continue
-        (
-            supa.table("comissao_lancamentos")
-            .update(
-                {
-                    "status": "cancelado",
-                    "repasse_status": "cancelado" if row.get("beneficiario_tipo") == "parceiro" else row.get("repasse_status"),
-                    "observacoes": "Lançamento cancelado em reprocessamento por não existir mais competência ativa correspondente.",
-                    "updated_at": datetime.utcnow().isoformat(),
-                }
+        store.atualizar(
+            row["id"],
+            {
+                "status": "cancelado",
+                "repasse_status": "cancelado" if row.get("beneficiario_tipo") == "parceiro" else row.get("repasse_status"),
+                "observacoes": "Lançamento cancelado em reprocessamento por não existir mais competência ativa correspondente.",
+                "updated_at": datetime.utcnow().isoformat(),
+            },
+        )
+        cancelled += 1
+    return cancelled
+
+
+def _same_value(current: Any, new: Any) -> bool:
+    if current == new:
+        return True
+    if current is None or new is None or isinstance(current, bool) or isinstance(new, bool):
+        return False
+    try:
+        # numeric volta do PostgREST como número; o payload usa string quantizada.
+        return Decimal(str(current)) == Decimal(str(new))
+    except (InvalidOperation, ValueError):
+        return str(current) == str(new)
+
+
+def _lancamento_patch(original: Dict[str, Any], row: Dict[str, Any]) -> Dict[str, Any]:
+    if original.get("liberado_por_evento_em") and row.get("liberado_por_evento_em"):
+        # Continua liberado: preserva o instante da primeira liberação.
+        row["liberado_por_evento_em"] = original["liberado_por_evento_em"]
+    return {
+        field: value
+        for field, value in row.items()
+        if field not in _VOLATILE_LANCAMENTO_FIELDS and not _same_value(original.get(field), value)
+    }
+
+
+def _blocos_por_colunas(rows: List[Dict[str, Any]]) -> Iterable[List[Dict[str, Any]]]:
+    """Blocos de escrita com o mesmo conjunto de colunas.
+
+    O insert em lote do PostgREST usa a união das chaves do bloco e grava NULL
+    onde a linha não tem a coluna, sem passar pelo default do banco.
+    """
+    por_colunas: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        por_colunas.setdefault(tuple(sorted(row)), []).append(row)
+    for grupo in por_colunas.values():
+        for start in range(0, len(grupo), LANCAMENTO_WRITE_CHUNK):
+            yield grupo[start:start + LANCAMENTO_WRITE_CHUNK]
+
+
+def _gravar_lancamentos_em_lote(
+    supa: Client,
+    *,
+    org_id: str,
+    store: _LancamentosContrato,
+) -> Dict[str, int]:
+    """Grava só a diferença: inserts em lote, updates agrupados pela mesma
+    alteração (ex.: cancelamentos) e os demais num upsert por `id`."""
+    now_iso = datetime.utcnow().isoformat()
+
+    novos = [store.rows[row_id] for row_id in store.novos]
+    for bloco in _blocos_por_colunas(novos):
+        supa.table("comissao_lancamentos").insert(bloco).execute()
+
+    grupos: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+    for row_id, original in store.originais.items():
+        patch = _lancamento_patch(original, store.rows[row_id])
+        if not patch:
+            continue
+        chave = json.dumps(patch, sort_keys=True, default=str)
+        grupos.setdefault(chave, (patch, []))[1].append(row_id)
+
+    individuais: List[Dict[str, Any]] = []
+    atualizados = 0
+    for patch, ids in grupos.values():
+        atualizados += len(ids)
+        if len(ids) == 1:
+            individuais.append({**store.rows[ids[0]], "updated_at": now_iso})
+            continue
+        for start in range(0, len(ids), LANCAMENTO_WRITE_CHUNK):
+            (
+                supa.table("comissao_lancamentos")
+                .update({**patch, "updated_at": now_iso})
+                .eq("org_id", org_id)
+                .in_("id", ids[start:start + LANCAMENTO_WRITE_CHUNK])
+                .execute()
             )
-            .eq("org_id", org_id)
-            .eq("id", row["id"])
-            .execute()
+    for bloco in _blocos_por_colunas(individuais):
+        supa.table("comissao_lancamentos").upsert(bloco, on_conflict="id").execute()
+
+    for audit in store.auditorias:
+        insert_audit_log(
+            supa,
+            org_id=org_id,
+            actor_id=None,
+            entity="comissao_lancamentos",
+            **audit,
         )
-        updated += 1
-    return updated
+
+    return {"inseridos": len(novos), "atualizados": atualizados}
+
+
+def _load_reprocessamento_context(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato: Dict[str, Any],
+) -> Dict[str, Any]:
+    cota_id = contrato.get("cota_id")
+    if not cota_id:
+        raise HTTPException(400, "Contrato sem cota_id")
+
+    cota = fetch_cota_context(supa, org_id, cota_id)
+    config = fetch_config_by_cota(supa, org_id, cota_id)
+    ctx: Dict[str, Any] = {
+        "org_id": org_id,
+        "contrato": contrato,
+        "cota": cota,
+        "config": config,
+        "regras": [],
+        "parceiros": [],
+        "previstas": {},
+    }
+    if not config or not config.get("ativo", True):
+        return ctx
+
+    ctx["regras"] = fetch_regras(supa, org_id, config["id"])
+    if not ctx["regras"]:
+        return ctx
+
+    ctx["parceiros"] = fetch_active_cota_partners(supa, org_id, cota_id)
+    pulos = _fetch_pulos_competencia(supa, org_id, contrato["id"])
+    contemplacao: Any = _NAO_CARREGADA
+    if any(regra.get("tipo_evento") == "contemplacao" for regra in ctx["regras"]):
+        contemplacao = _resolve_contemplacao_competencia(supa, org_id, contrato, cota_id)
+    ctx["previstas"] = {
+        regra["id"]: _resolve_regra_competencia_prevista(
+            supa=supa,
+            org_id=org_id,
+            contrato=contrato,
+            cota=cota,
+            config=config,
+            regra=regra,
+            pulos=pulos,
+            contemplacao=contemplacao,
+        )
+        for regra in ctx["regras"]
+    }
+    return ctx
+
+
+def fetch_lancamentos_contrato(supa: Client, org_id: str, contrato_id: str) -> List[Dict[str, Any]]:
+    resp = (
+        supa.table("comissao_lancamentos")
+        .select("*")
+        .eq("org_id", org_id)
+        .eq("contrato_id", contrato_id)
+        .execute()
+    )
+    return _safe_rows(resp)
 
 
 def reprocessar_comissoes_contrato(
@@ -1166,31 +1551,20 @@ def reprocessar_comissoes_contrato(
         actor_id=actor_id,
     )
 
+    ctx = _load_reprocessamento_context(supa, org_id=org_id, contrato=contrato)
     competencias = fetch_competencias_contrato(supa, org_id, contrato_id)
-    processadas = []
+    store = _LancamentosContrato(fetch_lancamentos_contrato(supa, org_id, contrato_id))
 
+    processadas = []
     for comp in competencias:
-        result = processar_comissao_competencia(
-            supa,
-            org_id=org_id,
-            competencia_id=comp["id"],
-            actor_id=actor_id,
-        )
-        processadas.append(
-            {
-                "competencia_id": comp["id"],
-                "processed": result.get("processed", False),
-                "total_itens": result.get("total_itens", 0),
-                "reason": result.get("reason"),
-            }
-        )
+        result = _reprocessar_competencia_em_memoria(ctx, store, comp)
+        processadas.append({"competencia_id": comp["id"], **result})
 
-    stale_cancelled = _cancel_stale_launches_for_contract(
-        supa,
-        org_id=org_id,
-        contrato_id=contrato_id,
-        active_competencia_ids=[row["id"] for row in competencias],
+    stale_cancelled = _cancelar_sem_competencia_em_memoria(
+        store,
+        [row["id"] for row in competencias],
     )
+    gravados = _gravar_lancamentos_em_lote(supa, org_id=org_id, store=store)
 
     insert_audit_log(
         supa,
@@ -1202,6 +1576,8 @@ def reprocessar_comissoes_contrato(
         diff={
             "competencias_processadas": len(processadas),
             "lancamentos_cancelados_sem_competencia": stale_cancelled,
+            "lancamentos_inseridos": gravados["inseridos"],
+            "lancamentos_atualizados": gravados["atualizados"],
         },
     )
 
@@ -1213,15 +1589,51 @@ def reprocessar_comissoes_contrato(
     }
 
 
-def listar_competencias_contrato(
-    supa: Client,
-    *,
-    org_id: str,
-    contrato_id: str,
-) -> Dict[str, Any]:
-    contrato = fetch_contrato_context(supa, org_id, contrato_id)
+# --------------------------------------------------------------------------- #
+# Snapshot financeiro do contrato
+# --------------------------------------------------------------------------- #
+# A tela financeira do contrato usa competências, resumo e timeline. As três
+# visões saem do mesmo snapshot (contrato, pagamentos, competências e
+# lançamentos carregados uma vez) e o snapshot fica em cache por contrato
+# enquanto `contrato_financeiro_versoes.versao` (incrementada por trigger a
+# cada escrita nessas tabelas, migration 013) não muda.
+CONTRATO_VERSOES_TABLE = "contrato_financeiro_versoes"
 
-    resp = (
+# (org_id, contrato_id) -> snapshot, válido para a `versao` com que foi carregado
+_snapshot_cache = VersionedCache()
+
+
+def _fetch_contrato_versao(supa: Client, org_id: str, contrato_id: str) -> Optional[int]:
+    """Versão atual do contrato; None quando não dá para cachear com segurança."""
+    try:
+        resp = (
+            supa.table(CONTRATO_VERSOES_TABLE)
+            .select("versao")
+            .eq("org_id", org_id)
+            .eq("contrato_id", contrato_id)
+            .limit(1)
+            .execute()
+        )
+    except APIError as exc:
+        if CONTRATO_VERSOES_TABLE not in str(getattr(exc, "message", None) or exc).lower():
+            raise
+        logger.warning("contrato_financeiro_versoes_ausente", extra={"org_id": org_id})
+        return None
+    rows = _safe_rows(resp)
+    return int(rows[0]["versao"]) if rows else None
+
+
+def _load_contrato_snapshot(supa: Client, org_id: str, contrato_id: str) -> Dict[str, Any]:
+    contrato = fetch_contrato_context(supa, org_id, contrato_id)
+    pagamentos = _safe_rows(
+        supa.table("pagamentos")
+        .select("*")
+        .eq("org_id", org_id)
+        .eq("contrato_id", contrato_id)
+        .order("competencia")
+        .execute()
+    )
+    competencias = _safe_rows(
         supa.table("cota_pagamento_competencias")
         .select("*")
         .eq("org_id", org_id)
@@ -1229,34 +1641,63 @@ def listar_competencias_contrato(
         .order("competencia")
         .execute()
     )
-    competencias = _safe_rows(resp)
+    lancamentos = _safe_rows(
+        supa.table("comissao_lancamentos")
+        .select("*")
+        .eq("org_id", org_id)
+        .eq("contrato_id", contrato_id)
+        .order("competencia_real")
+        .order("ordem")
+        .execute()
+    )
+    return {
+        "contrato": contrato,
+        "pagamentos": pagamentos,
+        "competencias": competencias,
+        "lancamentos": lancamentos,
+    }
+
+
+def contrato_snapshot(supa: Client, *, org_id: str, contrato_id: str) -> Dict[str, Any]:
+    """Dados da tela financeira do contrato, do cache quando a versão bate."""
+    key = (org_id, contrato_id)
+    # Versão lida ANTES da carga: uma escrita durante a carga gera versão maior,
+    # e a próxima leitura recarrega.
+    versao = _fetch_contrato_versao(supa, org_id, contrato_id)
+    cacheavel = versao is not None and settings.CONTRATO_SNAPSHOT_CACHE_MAX > 0
+    if cacheavel:
+        hit = _snapshot_cache.get(key, versao=versao)
+        if hit is not MISS:
+            return hit
 
+    snapshot = _load_contrato_snapshot(supa, org_id, contrato_id)
+    if cacheavel:
+        _snapshot_cache.put(key, snapshot, versao=versao, max_items=settings.CONTRATO_SNAPSHOT_CACHE_MAX)
+    return snapshot
+
+
+def _competencias_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    competencias = snapshot["competencias"]
     return {
         "ok": True,
-        "contrato": contrato,
+        "contrato": snapshot["contrato"],
         "items": competencias,
         "total": len(competencias),
     }
 
 
-def resumo_financeiro_contrato(
+def listar_competencias_contrato(
     supa: Client,
     *,
     org_id: str,
     contrato_id: str,
 ) -> Dict[str, Any]:
-    contrato = fetch_contrato_context(supa, org_id, contrato_id)
+    return _competencias_view(contrato_snapshot(supa, org_id=org_id, contrato_id=contrato_id))
 
-    resp = (
-        supa.table("comissao_lancamentos")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("contrato_id", contrato_id)
-        .order("competencia_real")
-        .order("ordem")
-        .execute()
-    )
-    rows = _safe_rows(resp)
+
+def _resumo_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    contrato = snapshot["contrato"]
+    rows = snapshot["lancamentos"]
 
     total_bruto = Decimal("0")
     total_imposto = Decimal("0")
@@ -1321,44 +1762,20 @@ def resumo_financeiro_contrato(
     }
 
 
-def timeline_contrato(
+def resumo_financeiro_contrato(
     supa: Client,
     *,
     org_id: str,
     contrato_id: str,
 ) -> Dict[str, Any]:
-    contrato = fetch_contrato_context(supa, org_id, contrato_id)
+    return _resumo_view(contrato_snapshot(supa, org_id=org_id, contrato_id=contrato_id))
 
-    pagamentos_resp = (
-        supa.table("pagamentos")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("contrato_id", contrato_id)
-        .order("competencia")
-        .execute()
-    )
-    pagamentos = _safe_rows(pagamentos_resp)
 
-    competencias_resp = (
-        supa.table("cota_pagamento_competencias")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("contrato_id", contrato_id)
-        .order("competencia")
-        .execute()
-    )
-    competencias = _safe_rows(competencias_resp)
-
-    lancamentos_resp = (
-        supa.table("comissao_lancamentos")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("contrato_id", contrato_id)
-        .order("competencia_real")
-        .order("ordem")
-        .execute()
-    )
-    lancamentos = _safe_rows(lancamentos_resp)
+def _timeline_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    contrato = snapshot["contrato"]
+    pagamentos = snapshot["pagamentos"]
+    competencias = snapshot["competencias"]
+    lancamentos = snapshot["lancamentos"]
 
     eventos = []
 
@@ -1407,3 +1824,32 @@ def timeline_contrato(
         "items": eventos,
         "total": len(eventos),
     }
+
+
+def timeline_contrato(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_id: str,
+) -> Dict[str, Any]:
+    return _timeline_view(contrato_snapshot(supa, org_id=org_id, contrato_id=contrato_id))
+
+
+def financeiro_contrato(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_id: str,
+) -> Dict[str, Any]:
+    """As três visões da tela financeira numa resposta, do mesmo snapshot."""
+    snapshot = contrato_snapshot(supa, org_id=org_id, contrato_id=contrato_id)
+    competencias = _competencias_view(snapshot)
+    resumo = _resumo_view(snapshot)
+    timeline = _timeline_view(snapshot)
+    return {
+        "ok": True,
+        "contrato": snapshot["contrato"],
+        "competencias": {"items": competencias["items"], "total": competencias["total"]},
+        "resumo": {key: resumo[key] for key in ("totais", "quantidades", "items")},
+        "timeline": {"items": timeline["items"], "total": timeline["total"]},
+    }
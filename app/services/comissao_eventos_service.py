@@ -0,0 +1,387 @@
+"""Outbox de comissão dos pagamentos.
+
+Criar/editar um pagamento não processa mais a comissão na requisição:
+`salvar_pagamento_com_evento` grava o pagamento e enfileira um evento em
+`comissao_eventos` na mesma transação (RPC), e o worker (`processar_eventos`,
+chamado pelo agendador embutido) roda `processar_pagamento_para_comissao`
+depois, com retentativa e backoff.
+
+Salvamentos repetidos do mesmo pagamento enquanto o evento está `pendente`
+viram um só evento (`versao` conta quantos foram coalescidos) — cada pagamento
+tem uma única competência, então processar uma vez com o estado mais recente
+basta. O front acompanha o resultado por `status_processamento_pagamento`.
+
+Sem a migration 012 o fluxo volta ao processamento síncrono antigo.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.services import comissao_competencia_service
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_TABLE = "comissao_eventos"
+SALVAR_RPC = "salvar_pagamento_com_evento"
+ENFILEIRAR_RPC = "comissao_evento_enfileirar"
+
+# backoff por tentativa (minutos): 1, 5, 15, 60, 180
+_RETRY_BACKOFF_MIN = [1, 5, 15, 60, 180]
+# Evento em `processando` há mais que isso é considerado abandonado (worker caiu).
+PROCESSANDO_TIMEOUT_MIN = 15
+
+_EVENTO_STATUS_FIELDS = (
+    "id",
+    "status",
+    "versao",
+    "tentativas",
+    "max_tentativas",
+    "disponivel_em",
+    "erro",
+    "resultado",
+    "processado_em",
+    "updated_at",
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _safe_rows(resp: Any) -> List[Dict[str, Any]]:
+    return getattr(resp, "data", None) or []
+
+
+def _is_missing_outbox(exc: APIError) -> bool:
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return EVENTOS_TABLE in message or SALVAR_RPC in message or ENFILEIRAR_RPC in message
+
+
+def evento_status(evento: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not evento:
+        return {"status": "sem_evento"}
+    return {key: evento.get(key) for key in _EVENTO_STATUS_FIELDS if key in evento}
+
+
+# --------------------------------------------------------------------------- #
+# Escrita: pagamento + evento
+# --------------------------------------------------------------------------- #
+
+
+def _salvar_pagamento_legado(
+    supa: Client,
+    *,
+    org_id: str,
+    pagamento_id: Optional[str],
+    dados: Dict[str, Any],
+    actor_id: Optional[str],
+) -> Dict[str, Any]:
+    if pagamento_id is None:
+        pagamento = next(iter(_safe_rows(supa.table("pagamentos").insert(dados).execute())), None)
+        if not pagamento:
+            raise HTTPException(500, "Erro ao criar pagamento")
+    else:
+        updated = (
+            supa.table("pagamentos")
+            .update(dados)
+            .eq("org_id", org_id)
+            .eq("id", pagamento_id)
+            .execute()
+        )
+        pagamento = next(iter(_safe_rows(updated)), None)
+        if not pagamento:
+            raise HTTPException(500, "Erro ao atualizar pagamento")
+
+    processamento = comissao_competencia_service.processar_pagamento_para_comissao(
+        supa,
+        org_id=org_id,
+        pagamento_id=pagamento["id"],
+        actor_id=actor_id,
+    )
+    return {
+        "pagamento": pagamento,
+        "processamento": {"status": "concluido", "sincrono": True, "resultado": _resumo_resultado(processamento)},
+    }
+
+
+def salvar_pagamento_com_evento(
+    supa: Client,
+    *,
+    org_id: str,
+    pagamento_id: Optional[str],
+    dados: Dict[str, Any],
+    actor_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Insere (`pagamento_id=None`) ou atualiza o pagamento e enfileira o evento
+    de comissão na mesma transação. Retorna `{pagamento, processamento}`."""
+    params = {
+        "p_org_id": org_id,
+        "p_pagamento_id": pagamento_id,
+        "p_dados": dados,
+        "p_actor_id": actor_id,
+    }
+    try:
+        resp = supa.rpc(SALVAR_RPC, params).execute()
+    except APIError as exc:
+        if not _is_missing_outbox(exc):
+            raise
+        logger.warning("comissao_outbox_ausente", extra={"org_id": org_id})
+        return _salvar_pagamento_legado(
+            supa, org_id=org_id, pagamento_id=pagamento_id, dados=dados, actor_id=actor_id
+        )
+
+    data = getattr(resp, "data", None) or {}
+    pagamento = data.get("pagamento")
+    if not pagamento:
+        raise HTTPException(500, "Erro ao salvar pagamento")
+    return {"pagamento": pagamento, "processamento": evento_status(data.get("evento"))}
+
+
+def enfileirar_evento(
+    supa: Client,
+    *,
+    org_id: str,
+    pagamento_id: str,
+    actor_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Enfileira (ou coalesce no pendente) o evento de um pagamento já gravado."""
+    resp = supa.rpc(
+        ENFILEIRAR_RPC,
+        {"p_org_id": org_id, "p_pagamento_id": pagamento_id, "p_actor_id": actor_id},
+    ).execute()
+    data = getattr(resp, "data", None)
+    if isinstance(data, list):
+        data = data[0] if data else None
+    return evento_status(data)
+
+
+def enfileirar_eventos_novos(
+    supa: Client,
+    *,
+    org_id: str,
+    pagamento_ids: List[str],
+    actor_id: Optional[str] = None,
+    chunk_size: int = 500,
+) -> int:
+    """Enfileira em lote os eventos de pagamentos recém-inseridos.
+
+    Pagamento novo não tem evento `pendente` para coalescer, então basta um
+    insert por bloco em vez de um RPC por pagamento. Sem a migration 012 processa
+    cada pagamento na hora, como `_salvar_pagamento_legado`.
+    """
+    rows = [{"org_id": org_id, "pagamento_id": pagamento_id, "actor_id": actor_id} for pagamento_id in pagamento_ids]
+    try:
+        for start in range(0, len(rows), chunk_size):
+            supa.table(EVENTOS_TABLE).insert(rows[start:start + chunk_size]).execute()
+    except APIError as exc:
+        if not _is_missing_outbox(exc):
+            raise
+        logger.warning("comissao_outbox_ausente", extra={"org_id": org_id})
+        enfileirados = start
+        for pagamento_id in pagamento_ids[enfileirados:]:
+            comissao_competencia_service.processar_pagamento_para_comissao(
+                supa,
+                org_id=org_id,
+                pagamento_id=pagamento_id,
+                actor_id=actor_id,
+            )
+        return enfileirados
+    return len(rows)
+
+
+# --------------------------------------------------------------------------- #
+# Worker
+# --------------------------------------------------------------------------- #
+
+
+def _resumo_resultado(result: Dict[str, Any]) -> Dict[str, Any]:
+    comp = result.get("competencia") or {}
+    processamento = result.get("processamento") or {}
+    return {
+        "competencia_id": comp.get("id"),
+        "competencia": comp.get("competencia"),
+        "competencia_status": comp.get("status"),
+        "processed": bool(processamento.get("processed")),
+        "reason": processamento.get("reason"),
+        "total_itens": processamento.get("total_itens", 0),
+    }
+
+
+def _fetch_prontos(supa: Client, *, limit: int) -> List[Dict[str, Any]]:
+    now = _now()
+    pendentes = _safe_rows(
+        supa.table(EVENTOS_TABLE)
+        .select("*")
+        .eq("status", "pendente")
+        .lte("disponivel_em", now.isoformat())
+        .order("disponivel_em")
+        .limit(limit)
+        .execute()
+    )
+    if len(pendentes) >= limit:
+        return pendentes
+    abandonados = _safe_rows(
+        supa.table(EVENTOS_TABLE)
+        .select("*")
+        .eq("status", "processando")
+        .lt("updated_at", (now - timedelta(minutes=PROCESSANDO_TIMEOUT_MIN)).isoformat())
+        .order("updated_at")
+        .limit(limit - len(pendentes))
+        .execute()
+    )
+    return pendentes + abandonados
+
+
+def _reivindicar(supa: Client, evento: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Marca o evento como `processando` só se ele ainda está como foi lido.
+
+    O update é condicional em `status`, `versao` (salvamento coalescido depois
+    da leitura) e `tentativas` (outro worker reivindicou antes, inclusive um
+    evento abandonado): só um worker recebe a linha de volta.
+    """
+    tentativas = int(evento.get("tentativas") or 0)
+    resp = (
+        supa.table(EVENTOS_TABLE)
+        .update(
+            {
+                "status": "processando",
+                "tentativas": tentativas + 1,
+                "updated_at": _now().isoformat(),
+            }
+        )
+        .eq("id", evento["id"])
+        .eq("status", evento["status"])
+        .eq("versao", int(evento.get("versao") or 1))
+        .eq("tentativas", tentativas)
+        .execute()
+    )
+    return next(iter(_safe_rows(resp)), None)
+
+
+def _marcar(supa: Client, evento_id: str, patch: Dict[str, Any]) -> None:
+    patch = {**patch, "updated_at": _now().isoformat()}
+    supa.table(EVENTOS_TABLE).update(patch).eq("id", evento_id).execute()
+
+
+def _agendar_retentativa(supa: Client, evento: Dict[str, Any], erro: str) -> str:
+    tentativas = int(evento.get("tentativas") or 0)
+    if tentativas >= int(evento.get("max_tentativas") or len(_RETRY_BACKOFF_MIN)):
+        _marcar(supa, evento["id"], {"status": "falhou", "erro": erro})
+        return "falhou"
+
+    # Um salvamento novo durante o processamento já abriu outro evento pendente,
+    # que vai reprocessar a competência com o estado mais recente.
+    newer = _safe_rows(
+        supa.table(EVENTOS_TABLE)
+        .select("id")
+        .eq("pagamento_id", evento["pagamento_id"])
+        .eq("status", "pendente")
+        .limit(1)
+        .execute()
+    )
+    if newer:
+        _marcar(supa, evento["id"], {"status": "substituido", "erro": erro})
+        return "substituido"
+
+    delay = _RETRY_BACKOFF_MIN[min(max(tentativas, 1), len(_RETRY_BACKOFF_MIN)) - 1]
+    _marcar(
+        supa,
+        evento["id"],
+        {
+            "status": "pendente",
+            "erro": erro,
+            "disponivel_em": (_now() + timedelta(minutes=delay)).isoformat(),
+        },
+    )
+    return "reagendado"
+
+
+def processar_evento(supa: Client, evento: Dict[str, Any]) -> str:
+    try:
+        result = comissao_competencia_service.processar_pagamento_para_comissao(
+            supa,
+            org_id=evento["org_id"],
+            pagamento_id=evento["pagamento_id"],
+            actor_id=evento.get("actor_id"),
+        )
+    except HTTPException as exc:
+        if exc.status_code < 500:
+            # Erro de dado (pagamento/competência inválidos): repetir não resolve.
+            _marcar(supa, evento["id"], {"status": "falhou", "erro": str(exc.detail)})
+            return "falhou"
+        return _agendar_retentativa(supa, evento, str(exc.detail))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(
+            "comissao_evento_erro",
+            extra={"evento_id": evento["id"], "pagamento_id": evento["pagamento_id"], "error": str(exc)},
+        )
+        return _agendar_retentativa(supa, evento, str(exc))
+
+    _marcar(
+        supa,
+        evento["id"],
+        {
+            "status": "concluido",
+            "erro": None,
+            "resultado": _resumo_resultado(result),
+            "processado_em": _now().isoformat(),
+        },
+    )
+    return "concluido"
+
+
+def processar_eventos(supa: Client, *, limit: int = 25) -> Dict[str, Any]:
+    """Drena até `limit` eventos prontos. Seguro para rodar em paralelo."""
+    try:
+        prontos = _fetch_prontos(supa, limit=limit)
+    except APIError as exc:
+        if not _is_missing_outbox(exc):
+            raise
+        return {"processed": 0, "skipped": "outbox_ausente"}
+
+    stats: Dict[str, int] = {}
+    processed = 0
+    for evento in prontos:
+        claimed = _reivindicar(supa, evento)
+        if not claimed:
+            continue
+        outcome = processar_evento(supa, claimed)
+        stats[outcome] = stats.get(outcome, 0) + 1
+        processed += 1
+    return {"processed": processed, **stats}
+
+
+# --------------------------------------------------------------------------- #
+# Consulta
+# --------------------------------------------------------------------------- #
+
+
+def status_processamento_pagamento(supa: Client, *, org_id: str, pagamento_id: str) -> Dict[str, Any]:
+    resp = (
+        supa.table(EVENTOS_TABLE)
+        .select("*")
+        .eq("org_id", org_id)
+        .eq("pagamento_id", pagamento_id)
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    evento = next(iter(_safe_rows(resp)), None)
+    if not evento:
+        pagamento = (
+            supa.table("pagamentos")
+            .select("id")
+            .eq("org_id", org_id)
+            .eq("id", pagamento_id)
+            .maybe_single()
+            .execute()
+        )
+        if not getattr(pagamento, "data", None):
+            raise HTTPException(404, "Pagamento não encontrado")
+    return {"pagamento_id": pagamento_id, "processamento": evento_status(evento)}
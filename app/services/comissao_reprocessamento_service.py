@@ -0,0 +1,414 @@
+"""Reprocessamento de comissões em massa (org inteira ou recorte).
+
+Quando uma regra de comissão muda (config da cota, parceiro, modelo aplicado),
+vários contratos precisam passar de novo por `reprocessar_comissoes_contrato`.
+Este módulo transforma isso num job:
+
+1. resolve os contratos afetados pelo filtro (contratos, cotas, parceiros,
+   modelo ou a org toda) e grava um item por contrato;
+2. um coordenador (`app/core/jobs.py`, depois de reivindicar o job no banco)
+   distribui os itens num pool limitado de workers
+   (`COMISSAO_REPROCESSAMENTO_WORKERS`), compartilhado entre os jobs;
+3. o progresso e o erro de cada contrato ficam em
+   `comissao_reprocessamento_job_itens`, e os contadores no job;
+4. itens `pendente` (job interrompido ou abandonado) ou `erro` podem ser
+   retomados depois.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import CancelledError, as_completed
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import Client
+
+from app.core.config import settings
+from app.core.jobs import JobRunner, WorkerPool, now_iso
+from app.core.supabase_lote import chunks, safe_rows
+from app.services import comissao_competencia_service
+from app.services.comissao_service import get_org_record_or_404
+
+logger = logging.getLogger(__name__)
+
+JOBS_TABLE = "comissao_reprocessamento_jobs"
+ITENS_TABLE = "comissao_reprocessamento_job_itens"
+
+# A cada quantos contratos concluídos o progresso é persistido.
+PROGRESS_FLUSH_EVERY = 20
+# Tolerância ao comparar a proporção de uma regra com a do modelo (pontos %).
+PROPORCAO_TOLERANCIA = Decimal("0.01")
+
+_pool = WorkerPool("comissao-reprocessamento", lambda: settings.COMISSAO_REPROCESSAMENTO_WORKERS)
+_jobs = JobRunner(JOBS_TABLE, nome="comissao-reprocessamento", em_execucao_msg="Reprocessamento já está em execução")
+
+
+def shutdown(wait: bool = False) -> None:
+    """Encerra o pool; itens ainda na fila ficam `pendente` para retomada."""
+    _pool.shutdown(wait=wait)
+
+
+def _dec(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value if value is not None else "0"))
+    except (InvalidOperation, ValueError):
+        return Decimal("0")
+
+
+# ---------------------------------------------------------------------------
+# Resolução dos contratos afetados
+# ---------------------------------------------------------------------------
+
+
+def _contratos_por_cotas(supa: Client, org_id: str, cota_ids: Iterable[str]) -> List[str]:
+    ids = sorted({str(cota_id) for cota_id in cota_ids if cota_id})
+    contratos: List[str] = []
+    for chunk in chunks(ids):
+        resp = (
+            supa.table("contratos")
+            .select("id, cota_id")
+            .eq("org_id", org_id)
+            .in_("cota_id", chunk)
+            .execute()
+        )
+        contratos.extend(row["id"] for row in safe_rows(resp))
+    return contratos
+
+
+def _contratos_da_org(supa: Client, org_id: str, contrato_ids: Iterable[str]) -> List[str]:
+    """Os contratos pedidos, se todos forem da org; senão 404 (não vaza ids de outra org)."""
+    ids = list(dict.fromkeys(str(contrato_id) for contrato_id in contrato_ids if contrato_id))
+    encontrados: set = set()
+    for chunk in chunks(ids):
+        resp = supa.table("contratos").select("id").eq("org_id", org_id).in_("id", chunk).execute()
+        encontrados.update(str(row["id"]) for row in safe_rows(resp))
+    if len(encontrados) != len(ids):
+        raise HTTPException(404, "Contrato não encontrado")
+    return ids
+
+
+def _cotas_por_parceiros(supa: Client, org_id: str, parceiro_ids: List[str]) -> List[str]:
+    cotas: List[str] = []
+    for chunk in chunks(sorted(set(parceiro_ids))):
+        resp = (
+            supa.table("cota_comissao_parceiros")
+            .select("cota_id")
+            .eq("org_id", org_id)
+            .in_("parceiro_id", chunk)
+            .execute()
+        )
+        cotas.extend(row["cota_id"] for row in safe_rows(resp) if row.get("cota_id"))
+    return cotas
+
+
+def _configs_da_org(supa: Client, org_id: str) -> List[Dict[str, Any]]:
+    resp = (
+        supa.table("cota_comissao_config")
+        .select("id, cota_id, percentual_total, ativo")
+        .eq("org_id", org_id)
+        .execute()
+    )
+    return safe_rows(resp)
+
+
+def _regras_por_config(supa: Client, org_id: str, config_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for chunk in chunks(config_ids):
+        resp = (
+            supa.table("cota_comissao_regras")
+            .select("cota_comissao_config_id, ordem, tipo_evento, offset_meses, percentual_comissao")
+            .eq("org_id", org_id)
+            .in_("cota_comissao_config_id", chunk)
+            .execute()
+        )
+        for row in safe_rows(resp):
+            out.setdefault(row["cota_comissao_config_id"], []).append(row)
+    return out
+
+
+def config_segue_modelo(
+    config: Dict[str, Any],
+    regras: List[Dict[str, Any]],
+    modelo: Dict[str, Any],
+) -> bool:
+    """A config da cota tem a mesma estrutura do modelo?
+
+    Não há vínculo gravado entre `comissao_modelos` e `cota_comissao_config`
+    (o modelo só preenche o formulário). A config "segue" o modelo quando tem
+    as mesmas parcelas (ordem, evento, offset) e a mesma proporção de cada
+    parcela sobre o `percentual_total` — que pode ter sido editado na venda.
+    """
+    modelo_regras = modelo.get("regras") or []
+    total = _dec(config.get("percentual_total"))
+    if total <= 0 or len(regras) != len(modelo_regras):
+        return False
+
+    por_ordem = {int(regra.get("ordem") or 0): regra for regra in regras}
+    for parcela in modelo_regras:
+        regra = por_ordem.get(int(parcela.get("ordem") or 0))
+        if not regra:
+            return False
+        if regra.get("tipo_evento") != parcela.get("tipo_evento"):
+            return False
+        if int(regra.get("offset_meses") or 0) != int(parcela.get("offset_meses") or 0):
+            return False
+        proporcao = _dec(regra.get("percentual_comissao")) / total * 100
+        if abs(proporcao - _dec(parcela.get("proporcao"))) > PROPORCAO_TOLERANCIA:
+            return False
+    return True
+
+
+def _cotas_por_modelo(supa: Client, org_id: str, modelo_id: str) -> List[str]:
+    modelo = get_org_record_or_404(supa, "comissao_modelos", org_id, modelo_id)
+    configs = _configs_da_org(supa, org_id)
+    regras = _regras_por_config(supa, org_id, [config["id"] for config in configs])
+    return [
+        config["cota_id"]
+        for config in configs
+        if config_segue_modelo(config, regras.get(config["id"], []), modelo)
+    ]
+
+
+def resolver_contratos_afetados(supa: Client, org_id: str, filtro: Dict[str, Any]) -> List[str]:
+    """IDs (sem repetição, em ordem estável) dos contratos a reprocessar."""
+    escopo = filtro.get("escopo")
+    if escopo == "contratos":
+        contratos = _contratos_da_org(supa, org_id, filtro.get("contrato_ids") or [])
+    elif escopo == "cotas":
+        contratos = _contratos_por_cotas(supa, org_id, filtro.get("cota_ids") or [])
+    elif escopo == "parceiros":
+        cotas = _cotas_por_parceiros(supa, org_id, list(filtro.get("parceiro_ids") or []))
+        contratos = _contratos_por_cotas(supa, org_id, cotas)
+    elif escopo == "modelo":
+        contratos = _contratos_por_cotas(supa, org_id, _cotas_por_modelo(supa, org_id, filtro["modelo_id"]))
+    elif escopo == "todos":
+        contratos = _contratos_por_cotas(supa, org_id, [config["cota_id"] for config in _configs_da_org(supa, org_id)])
+    else:
+        raise HTTPException(400, "Escopo de reprocessamento inválido")
+    return list(dict.fromkeys(str(contrato_id) for contrato_id in contratos))
+
+
+# ---------------------------------------------------------------------------
+# Persistência do job
+# ---------------------------------------------------------------------------
+
+
+def get_job_or_404(supa: Client, org_id: str, job_id: str) -> Dict[str, Any]:
+    return get_org_record_or_404(supa, JOBS_TABLE, org_id, job_id)
+
+
+def _fetch_itens(supa: Client, job_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    query = supa.table(ITENS_TABLE).select("id, contrato_id, status, erro").eq("job_id", job_id)
+    if status:
+        query = query.eq("status", status)
+    return safe_rows(query.order("contrato_id").execute())
+
+
+def _contadores(itens: List[Dict[str, Any]]) -> Tuple[int, int]:
+    processados = sum(1 for item in itens if item.get("status") in ("ok", "erro"))
+    erros = sum(1 for item in itens if item.get("status") == "erro")
+    return processados, erros
+
+
+def _flush_itens(
+    supa: Client,
+    *,
+    ok_ids: List[str],
+    falhas: List[Tuple[str, str]],
+) -> None:
+    now = now_iso()
+    for chunk in chunks(ok_ids):
+        supa.table(ITENS_TABLE).update({"status": "ok", "erro": None, "processado_em": now}).in_("id", chunk).execute()
+    for item_id, erro in falhas:
+        supa.table(ITENS_TABLE).update({"status": "erro", "erro": erro, "processado_em": now}).eq("id", item_id).execute()
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+
+def _processar_contrato(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_id: str,
+    actor_id: Optional[str],
+) -> Optional[str]:
+    """Reprocessa um contrato; retorna a mensagem de erro ou None."""
+    try:
+        comissao_competencia_service.reprocessar_comissoes_contrato(
+            supa,
+            org_id=org_id,
+            contrato_id=contrato_id,
+            actor_id=actor_id,
+        )
+    except HTTPException as exc:
+        return str(exc.detail)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("comissao_reprocessamento_item_error", extra={"contrato_id": contrato_id})
+        return str(exc) or exc.__class__.__name__
+    return None
+
+
+def executar_job(supa: Client, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Processa os itens `pendente` do job já reivindicado no pool e grava o progresso."""
+    job_id = job["id"]
+    org_id = job["org_id"]
+    actor_id = job.get("created_by")
+
+    itens = _fetch_itens(supa, job_id)
+    processados, erros = _contadores(itens)
+    pendentes = [item for item in itens if item.get("status") == "pendente"]
+    _jobs.update(supa, job_id, {"processados": processados, "erros": erros})
+
+    ok_ids: List[str] = []
+    falhas: List[Tuple[str, str]] = []
+    interrompido = False
+    try:
+        executor = _pool.executor()
+        futures = {
+            executor.submit(
+                _processar_contrato,
+                supa,
+                org_id=org_id,
+                contrato_id=item["contrato_id"],
+                actor_id=actor_id,
+            ): item
+            for item in pendentes
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                erro = future.result()
+            except CancelledError:
+                interrompido = True
+                continue
+            processados += 1
+            if erro is None:
+                ok_ids.append(item["id"])
+            else:
+                erros += 1
+                falhas.append((item["id"], erro))
+            if len(ok_ids) + len(falhas) >= PROGRESS_FLUSH_EVERY:
+                _flush_itens(supa, ok_ids=ok_ids, falhas=falhas)
+                _jobs.update(supa, job_id, {"processados": processados, "erros": erros})
+                ok_ids, falhas = [], []
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("comissao_reprocessamento_job_error", extra={"job_id": job_id})
+        _flush_itens(supa, ok_ids=ok_ids, falhas=falhas)
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc), "processados": processados, "erros": erros})
+        return {"id": job_id, "status": "falhou", "processados": processados, "erros": erros}
+
+    _flush_itens(supa, ok_ids=ok_ids, falhas=falhas)
+    if interrompido:
+        status = "interrompido"
+    else:
+        status = "concluido_com_erros" if erros else "concluido"
+    patch: Dict[str, Any] = {"status": status, "processados": processados, "erros": erros}
+    if not interrompido:
+        patch["concluido_em"] = now_iso()
+    _jobs.update(supa, job_id, patch)
+    return {"id": job_id, "status": status, "processados": processados, "erros": erros}
+
+
+def aguardar(job_id: str, timeout: Optional[float] = None) -> None:
+    """Espera o coordenador do job terminar (útil em testes e scripts)."""
+    _jobs.aguardar(job_id, timeout)
+
+
+def iniciar_reprocessamento(
+    supa: Client,
+    *,
+    org_id: str,
+    filtro: Dict[str, Any],
+    actor_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    contrato_ids = resolver_contratos_afetados(supa, org_id, filtro)
+    now = now_iso()
+    resp = supa.table(JOBS_TABLE).insert(
+        {
+            "org_id": org_id,
+            "status": "pendente",
+            "filtro": filtro,
+            "total": len(contrato_ids),
+            "processados": 0,
+            "erros": 0,
+            "created_by": actor_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+    ).execute()
+    rows = safe_rows(resp)
+    if not rows:
+        raise HTTPException(500, "Erro ao criar job de reprocessamento")
+    job = rows[0]
+
+    itens = [
+        {"job_id": job["id"], "org_id": org_id, "contrato_id": contrato_id, "status": "pendente"}
+        for contrato_id in contrato_ids
+    ]
+    for chunk in chunks(itens, 500):
+        supa.table(ITENS_TABLE).insert(chunk).execute()
+
+    if contrato_ids:
+        _jobs.disparar(supa, job["id"], executar_job)
+    else:
+        _jobs.update(supa, job["id"], {"status": "concluido", "concluido_em": now})
+        job = {**job, "status": "concluido", "concluido_em": now}
+    return job
+
+
+def retomar_reprocessamento(
+    supa: Client,
+    *,
+    org_id: str,
+    job_id: str,
+    incluir_erros: bool = False,
+) -> Dict[str, Any]:
+    """Reexecuta os itens `pendente` (e, se pedido, os com `erro`) do job."""
+    job = get_job_or_404(supa, org_id, job_id)
+    _jobs.checar_parado(job)
+
+    if incluir_erros:
+        supa.table(ITENS_TABLE).update({"status": "pendente", "erro": None}).eq("job_id", job_id).eq(
+            "status", "erro"
+        ).execute()
+
+    itens = _fetch_itens(supa, job_id)
+    processados, erros = _contadores(itens)
+    if not any(item.get("status") == "pendente" for item in itens):
+        return {**job, "processados": processados, "erros": erros}
+
+    job = _jobs.reabrir(supa, job, {"processados": processados, "erros": erros})
+    _jobs.disparar(supa, job_id, executar_job)
+    return job
+
+
+def status_reprocessamento(
+    supa: Client,
+    *,
+    org_id: str,
+    job_id: str,
+    erros_limit: int = 50,
+) -> Dict[str, Any]:
+    job = get_job_or_404(supa, org_id, job_id)
+    resp = (
+        supa.table(ITENS_TABLE)
+        .select("contrato_id, erro, processado_em")
+        .eq("job_id", job_id)
+        .eq("status", "erro")
+        .order("processado_em", desc=True)
+        .limit(erros_limit)
+        .execute()
+    )
+    total = int(job.get("total") or 0)
+    processados = int(job.get("processados") or 0)
+    return {
+        "ok": True,
+        "item": job,
+        "em_execucao": _jobs.em_execucao(job),
+        "percentual": round(processados * 100 / total, 2) if total else 100.0,
+        "erros": safe_rows(resp),
+    }
@@ -1,19 +1,27 @@
 from __future__ import annotations
 
+import base64
+import json
+import logging
 from calendar import monthrange
 from dataclasses import dataclass
 from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from supabase import Client
 
+from app.core.supabase_lote import select_paginado
 from app.schemas.comissoes import CotaComissaoConfigUpsertIn
 from app.services.contract_partner_sync_service import (
     remove_synced_partner_links_for_cota,
     sync_contrato_parceiros_for_cota,
 )
+from app.services.export_service import ExportColumn
+
+logger = logging.getLogger(__name__)
 
 MONEY_Q = Decimal("0.01")
 PCT_Q = Decimal("0.0001")
@@ -516,17 +524,17 @@ def build_launches_payload(
     return launches
 
 
-def fetch_lancamentos(supa: Client, org_id: str, **filters: Any) -> List[Dict[str, Any]]:
-    query = (
-        supa.table("comissao_lancamentos")
-        .select(
-            "*, parceiros_corretores(id, nome),"
-            " contratos(numero),"
-            " cotas(numero_cota, grupo_codigo, leads(nome))"
-        )
-        .eq("org_id", org_id)
-    )
+LANCAMENTOS_SELECT = (
+    "*, parceiros_corretores(id, nome),"
+    " contratos(numero),"
+    " cotas(numero_cota, grupo_codigo, leads(nome))"
+)
+# Página padrão/máxima da listagem paginada do ledger.
+LANCAMENTOS_PAGE_SIZE = 200
+LANCAMENTOS_PAGE_MAX = 1000
+
 
+def _apply_lancamento_filters(query: Any, filters: Dict[str, Any]) -> Any:
     for key, value in filters.items():
         if value is None:
             continue
@@ -536,9 +544,11 @@ def fetch_lancamentos(supa: Client, org_id: str, **filters: Any) -> List[Dict[st
             query = query.lte("competencia_prevista", value.isoformat())
         else:
             query = query.eq(key, value)
+    return query
 
-    resp = query.order("competencia_prevista").order("ordem").execute()
-    rows = getattr(resp, "data", None) or []
+
+def _enrich_lancamentos(supa: Client, org_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Achata os embeds e anexa às linhas da empresa os repasses dos parceiros."""
     for row in rows:
         contrato = row.pop("contratos", None) or {}
         cota = row.pop("cotas", None) or {}
@@ -561,6 +571,7 @@ def fetch_lancamentos(supa: Client, org_id: str, **filters: Any) -> List[Dict[st
             .eq("org_id", org_id)
             .eq("beneficiario_tipo", "parceiro")
             .in_("cota_id", cota_ids)
+            .in_("ordem", sorted({key[1] for key in empresa_keys}))
             .execute()
         )
         parc_map: Dict[Any, List[Dict[str, Any]]] = {}
@@ -580,9 +591,105 @@ def fetch_lancamentos(supa: Client, org_id: str, **filters: Any) -> List[Dict[st
     return rows
 
 
-def summarize_lancamentos(lancamentos: List[Dict[str, Any]]) -> Dict[str, Any]:
-    summary = {
-        "total_lancamentos": len(lancamentos),
+def fetch_lancamentos(supa: Client, org_id: str, **filters: Any) -> List[Dict[str, Any]]:
+    query = supa.table("comissao_lancamentos").select(LANCAMENTOS_SELECT).eq("org_id", org_id)
+    query = _apply_lancamento_filters(query, filters)
+    resp = query.order("competencia_prevista").order("ordem").execute()
+    return _enrich_lancamentos(supa, org_id, getattr(resp, "data", None) or [])
+
+
+def encode_lancamentos_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps({"c": row.get("competencia_prevista"), "id": row["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_lancamentos_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        competencia, row_id = data.get("c"), str(data["id"])
+        if competencia is not None:
+            competencia = date.fromisoformat(str(competencia)[:10]).isoformat()
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(400, "Cursor inválido")
+    return competencia, row_id
+
+
+def fetch_lancamentos_page(
+    supa: Client,
+    org_id: str,
+    *,
+    limit: int = LANCAMENTOS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    **filters: Any,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Página do ledger por keyset em (competencia_prevista, id).
+
+    Sem competência fica no fim (NULLS LAST do asc). Retorna as linhas e o
+    cursor da próxima página (None na última).
+    """
+    limit = max(1, min(int(limit), LANCAMENTOS_PAGE_MAX))
+    query = supa.table("comissao_lancamentos").select(LANCAMENTOS_SELECT).eq("org_id", org_id)
+    query = _apply_lancamento_filters(query, filters)
+    if cursor:
+        competencia, last_id = decode_lancamentos_cursor(cursor)
+        if competencia is None:
+            query = query.is_("competencia_prevista", "null").gt("id", last_id)
+        else:
+            query = query.or_(
+                f"competencia_prevista.gt.{competencia},"
+                f"and(competencia_prevista.eq.{competencia},id.gt.{last_id}),"
+                "competencia_prevista.is.null"
+            )
+    resp = query.order("competencia_prevista").order("id").limit(limit + 1).execute()
+    rows = getattr(resp, "data", None) or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_lancamentos_cursor(rows[-1]) if has_more and rows else None
+    return _enrich_lancamentos(supa, org_id, rows), next_cursor
+
+
+def iter_lancamentos(
+    supa: Client,
+    org_id: str,
+    *,
+    page_size: int = LANCAMENTOS_PAGE_MAX,
+    **filters: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Percorre o ledger filtrado página a página (usado nas exportações)."""
+    cursor: Optional[str] = None
+    while True:
+        rows, cursor = fetch_lancamentos_page(supa, org_id, limit=page_size, cursor=cursor, **filters)
+        yield from rows
+        if cursor is None:
+            return
+
+
+LANCAMENTOS_EXPORT_COLUMNS = [
+    ExportColumn("Competencia prevista", "competencia_prevista"),
+    ExportColumn("Competencia real", "competencia_real"),
+    ExportColumn("Contrato", "contrato_numero"),
+    ExportColumn("Grupo", "grupo_codigo"),
+    ExportColumn("Cota", "numero_cota"),
+    ExportColumn("Cliente", "cliente_nome"),
+    ExportColumn("Beneficiario", "beneficiario_tipo"),
+    ExportColumn("Parceiro", lambda row: (row.get("parceiros_corretores") or {}).get("nome")),
+    ExportColumn("Parcela", "ordem", "numero"),
+    ExportColumn("Evento", "tipo_evento"),
+    ExportColumn("Status", "status"),
+    ExportColumn("Repasse", "repasse_status"),
+    ExportColumn("Percentual", "percentual_base", "numero"),
+    ExportColumn("Valor bruto", "valor_bruto", "dinheiro"),
+    ExportColumn("Imposto", "valor_imposto", "dinheiro"),
+    ExportColumn("Valor liquido", "valor_liquido", "dinheiro"),
+    ExportColumn("Repasse pago em", "repasse_pago_em"),
+    ExportColumn("ID", "id"),
+]
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {
+        "total_lancamentos": 0,
         "total_bruto_empresa": Decimal("0"),
         "total_bruto_parceiros": Decimal("0"),
         "total_liquido_parceiros": Decimal("0"),
@@ -591,22 +698,31 @@ def summarize_lancamentos(lancamentos: List[Dict[str, Any]]) -> Dict[str, Any]:
         "repasses_pagos": 0,
     }
 
-    for item in lancamentos:
-        bruto = _dec(item.get("valor_bruto"))
-        liquido = _dec(item.get("valor_liquido"))
-        imposto = _dec(item.get("valor_imposto"))
 
-        if item["beneficiario_tipo"] == "empresa":
-            summary["total_bruto_empresa"] += bruto
-        else:
-            summary["total_bruto_parceiros"] += bruto
-            summary["total_liquido_parceiros"] += liquido
-            summary["total_impostos_parceiros"] += imposto
-            if item.get("repasse_status") == "pendente":
-                summary["repasses_pendentes"] += 1
-            elif item.get("repasse_status") == "pago":
-                summary["repasses_pagos"] += 1
+def _add_to_summary(
+    summary: Dict[str, Any],
+    *,
+    beneficiario_tipo: Optional[str],
+    repasse_status: Optional[str],
+    quantidade: int,
+    bruto: Decimal,
+    liquido: Decimal,
+    imposto: Decimal,
+) -> None:
+    summary["total_lancamentos"] += quantidade
+    if beneficiario_tipo == "empresa":
+        summary["total_bruto_empresa"] += bruto
+    else:
+        summary["total_bruto_parceiros"] += bruto
+        summary["total_liquido_parceiros"] += liquido
+        summary["total_impostos_parceiros"] += imposto
+        if repasse_status == "pendente":
+            summary["repasses_pendentes"] += quantidade
+        elif repasse_status == "pago":
+            summary["repasses_pagos"] += quantidade
+
 
+def _format_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
     return {
         **summary,
         "total_bruto_empresa": str(_money(summary["total_bruto_empresa"])),
@@ -616,6 +732,21 @@ def summarize_lancamentos(lancamentos: List[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
+def summarize_lancamentos(lancamentos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = _empty_summary()
+    for item in lancamentos:
+        _add_to_summary(
+            summary,
+            beneficiario_tipo=item["beneficiario_tipo"],
+            repasse_status=item.get("repasse_status"),
+            quantidade=1,
+            bruto=_dec(item.get("valor_bruto")),
+            liquido=_dec(item.get("valor_liquido")),
+            imposto=_dec(item.get("valor_imposto")),
+        )
+    return _format_summary(summary)
+
+
 def _ranking_pdate(value: Any) -> Optional[date]:
     if not value:
         return None
@@ -625,78 +756,57 @@ def _ranking_pdate(value: Any) -> Optional[date]:
         return None
 
 
-def parceiros_ranking(
-    supa: Client,
-    org_id: str,
-    competencia_de: Optional[date] = None,
-    competencia_ate: Optional[date] = None,
-) -> List[Dict[str, Any]]:
-    """Agrega métricas gerenciais por parceiro.
-
-    - vendas: cartas/cotas com `data_adesao` dentro do período
-    - volume_cartas: soma de `valor_carta` dessas vendas
-    - taxa_cancelamento: % de cotas canceladas sobre o total de cotas do parceiro (carteira, vitalício)
-    - repasse_pago / repasse_pendente: somas de `valor_liquido` por status, no período
-    """
-    resp = (
-        supa.table("comissao_lancamentos")
-        .select(
-            "parceiro_id, cota_id, repasse_status, valor_liquido, competencia_prevista,"
-            " parceiros_corretores(nome),"
-            " cotas(status, valor_carta, data_adesao)"
-        )
-        .eq("org_id", org_id)
-        .eq("beneficiario_tipo", "parceiro")
-        .execute()
+def _ranking_acc(parceiros: Dict[str, Dict[str, Any]], pid: str, parceiro: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return parceiros.setdefault(
+        pid,
+        {
+            "parceiro_id": pid,
+            "nome": (parceiro or {}).get("nome") or "Parceiro",
+            "cotas": {},  # cota_id -> {status, valor_carta, data_adesao}
+            "repasse_pago": Decimal("0"),
+            "repasse_pendente": Decimal("0"),
+        },
     )
-    rows = getattr(resp, "data", None) or []
 
-    def _in_period(d: Optional[date]) -> bool:
-        if d is None:
-            return False
-        if competencia_de and d < competencia_de:
-            return False
-        if competencia_ate and d > competencia_ate:
-            return False
-        return True
 
-    parceiros: Dict[str, Dict[str, Any]] = {}
-    for row in rows:
-        pid = row.get("parceiro_id")
-        if not pid:
-            continue
-        acc = parceiros.setdefault(
-            pid,
-            {
-                "parceiro_id": pid,
-                "nome": (row.get("parceiros_corretores") or {}).get("nome") or "Parceiro",
-                "cotas": {},  # cota_id -> {status, valor_carta, data_adesao}
-                "repasse_pago": Decimal("0"),
-                "repasse_pendente": Decimal("0"),
-            },
-        )
-        cota = row.get("cotas") or {}
-        cota_id = row.get("cota_id")
-        if cota_id and cota_id not in acc["cotas"]:
-            acc["cotas"][cota_id] = {
-                "status": (cota.get("status") or "").lower(),
-                "valor_carta": _dec(cota.get("valor_carta")),
-                "data_adesao": _ranking_pdate(cota.get("data_adesao")),
-            }
-        comp = _ranking_pdate(row.get("competencia_prevista"))
-        if _in_period(comp):
-            val = _dec(row.get("valor_liquido"))
-            if row.get("repasse_status") == "pago":
-                acc["repasse_pago"] += val
-            elif row.get("repasse_status") == "pendente":
-                acc["repasse_pendente"] += val
+def _ranking_add_cota(acc: Dict[str, Any], cota_id: Optional[str], cota: Optional[Dict[str, Any]]) -> None:
+    cota = cota or {}
+    if cota_id and cota_id not in acc["cotas"]:
+        acc["cotas"][cota_id] = {
+            "status": (cota.get("status") or "").lower(),
+            "valor_carta": _dec(cota.get("valor_carta")),
+            "data_adesao": _ranking_pdate(cota.get("data_adesao")),
+        }
+
+
+def _ranking_add_repasse(acc: Dict[str, Any], repasse_status: Optional[str], valor: Decimal) -> None:
+    if repasse_status == "pago":
+        acc["repasse_pago"] += valor
+    elif repasse_status == "pendente":
+        acc["repasse_pendente"] += valor
+
+
+def _ranking_in_period(d: Optional[date], competencia_de: Optional[date], competencia_ate: Optional[date]) -> bool:
+    if d is None:
+        return False
+    if competencia_de and d < competencia_de:
+        return False
+    if competencia_ate and d > competencia_ate:
+        return False
+    return True
+
 
+def _ranking_result(
+    parceiros: Dict[str, Dict[str, Any]],
+    competencia_de: Optional[date],
+    competencia_ate: Optional[date],
+) -> List[Dict[str, Any]]:
     result: List[Dict[str, Any]] = []
     for acc in parceiros.values():
         cotas = acc["cotas"]
         total_cotas = len(cotas)
         canceladas = sum(1 for c in cotas.values() if c["status"] == "cancelada")
-        vendas = [c for c in cotas.values() if _in_period(c["data_adesao"])]
+        vendas = [c for c in cotas.values() if _ranking_in_period(c["data_adesao"], competencia_de, competencia_ate)]
         volume = sum((c["valor_carta"] for c in vendas), Decimal("0"))
         taxa = (Decimal(canceladas) / Decimal(total_cotas) * 100) if total_cotas else Decimal("0")
         result.append(
@@ -717,6 +827,253 @@ def parceiros_ranking(
     return result
 
 
+def _parceiros_ranking_ledger(
+    supa: Client,
+    org_id: str,
+    competencia_de: Optional[date] = None,
+    competencia_ate: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Ranking agregando o ledger inteiro (sem os agregados da migration 010)."""
+    resp = (
+        supa.table("comissao_lancamentos")
+        .select(
+            "parceiro_id, cota_id, repasse_status, valor_liquido, competencia_prevista,"
+            " parceiros_corretores(nome),"
+            " cotas(status, valor_carta, data_adesao)"
+        )
+        .eq("org_id", org_id)
+        .eq("beneficiario_tipo", "parceiro")
+        .execute()
+    )
+    rows = getattr(resp, "data", None) or []
+
+    parceiros: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        pid = row.get("parceiro_id")
+        if not pid:
+            continue
+        acc = _ranking_acc(parceiros, pid, row.get("parceiros_corretores"))
+        _ranking_add_cota(acc, row.get("cota_id"), row.get("cotas"))
+        comp = _ranking_pdate(row.get("competencia_prevista"))
+        if _ranking_in_period(comp, competencia_de, competencia_ate):
+            _ranking_add_repasse(acc, row.get("repasse_status"), _dec(row.get("valor_liquido")))
+
+    return _ranking_result(parceiros, competencia_de, competencia_ate)
+
+
+# ---------------------------------------------------------------------------
+# Agregados mantidos por trigger (migration 010)
+# ---------------------------------------------------------------------------
+#
+# `comissao_resumo_mensal` soma os lançamentos por org/beneficiário/parceiro/
+# competência/status e `comissao_parceiro_cotas` guarda as cotas de cada
+# parceiro. Os dois são atualizados pelo trigger de `comissao_lancamentos`, então
+# ranking e resumos leem dezenas de linhas em vez do ledger inteiro. Enquanto a
+# migration não foi aplicada, cai na agregação em Python (mesmos números).
+
+RESUMO_MENSAL_TABLE = "comissao_resumo_mensal"
+PARCEIRO_COTAS_TABLE = "comissao_parceiro_cotas"
+# Filtros da listagem que o agregado responde; com outros, soma os lançamentos.
+RESUMO_FILTROS = frozenset({"parceiro_id", "status", "repasse_status", "competencia_de", "competencia_ate"})
+# GROUP BY no banco para os demais filtros (migration 011).
+LANCAMENTOS_TOTAIS_RPC = "comissao_lancamentos_totais"
+
+
+def _is_missing_resumo_table(exc: APIError) -> bool:
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return RESUMO_MENSAL_TABLE in message or PARCEIRO_COTAS_TABLE in message
+
+
+def _iso(value: Any) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def _fetch_resumo_mensal(supa: Client, org_id: str, filters: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    def consulta() -> Any:
+        query = (
+            supa.table(RESUMO_MENSAL_TABLE)
+            .select(
+                "beneficiario_tipo, parceiro_id, competencia, status, repasse_status,"
+                " quantidade, valor_bruto, valor_imposto, valor_liquido"
+            )
+            .eq("org_id", org_id)
+        )
+        for key, value in filters.items():
+            if key == "competencia_de":
+                query = query.gte("competencia", _iso(value))
+            elif key == "competencia_ate":
+                query = query.lte("competencia", _iso(value))
+            elif key == "repasse_status_in":
+                query = query.in_("repasse_status", list(value))
+            else:
+                query = query.eq(key, value)
+        return query
+
+    # fatias x meses x status passam do max-rows em orgs grandes: lê em páginas
+    try:
+        return select_paginado(consulta)
+    except APIError as exc:
+        if not _is_missing_resumo_table(exc):
+            raise
+        logger.warning("comissao_resumo_ausente", extra={"org_id": org_id})
+        return None
+
+
+def _fetch_grupos_rpc(supa: Client, org_id: str, filters: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Mesmos grupos do agregado, via GROUP BY no banco (qualquer filtro)."""
+    params: Dict[str, Any] = {"p_org_id": org_id}
+    for key, value in filters.items():
+        params[f"p_{key}"] = _iso(value) if isinstance(value, date) else value
+    try:
+        resp = supa.rpc(LANCAMENTOS_TOTAIS_RPC, params).execute()
+    except APIError as exc:
+        message = str(getattr(exc, "message", None) or exc).lower()
+        if LANCAMENTOS_TOTAIS_RPC not in message:
+            raise
+        logger.warning("comissao_totais_rpc_ausente", extra={"org_id": org_id})
+        return None
+    return getattr(resp, "data", None) or []
+
+
+def _grupos_de_lancamentos(lancamentos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "beneficiario_tipo": item["beneficiario_tipo"],
+            "status": item.get("status"),
+            "repasse_status": item.get("repasse_status"),
+            "quantidade": 1,
+            "valor_bruto": item.get("valor_bruto"),
+            "valor_imposto": item.get("valor_imposto"),
+            "valor_liquido": item.get("valor_liquido"),
+        }
+        for item in lancamentos
+    ]
+
+
+def _grupos_lancamentos(
+    supa: Client,
+    org_id: str,
+    filtros: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Linhas agregadas (beneficiário, status, repasse) sobre o filtro inteiro.
+
+    Ordem de preferência: `comissao_resumo_mensal` (filtros cobertos), a RPC
+    `comissao_lancamentos_totais` e, sem as migrations, os próprios lançamentos.
+    """
+    if set(filtros) <= RESUMO_FILTROS:
+        rows = _fetch_resumo_mensal(supa, org_id, filtros)
+        if rows is not None:
+            return rows
+    rows = _fetch_grupos_rpc(supa, org_id, filtros)
+    if rows is not None:
+        return rows
+    return _grupos_de_lancamentos(fetch_lancamentos(supa, org_id, **filtros))
+
+
+def _summary_from_grupos(grupos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = _empty_summary()
+    for row in grupos:
+        _add_to_summary(
+            summary,
+            beneficiario_tipo=row.get("beneficiario_tipo"),
+            repasse_status=row.get("repasse_status"),
+            quantidade=int(row.get("quantidade") or 0),
+            bruto=_dec(row.get("valor_bruto")),
+            liquido=_dec(row.get("valor_liquido")),
+            imposto=_dec(row.get("valor_imposto")),
+        )
+    return _format_summary(summary)
+
+
+def _breakdown_from_grupos(grupos: List[Dict[str, Any]], field: str) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in grupos:
+        acc = out.setdefault(
+            row.get(field) or "sem_status",
+            {"quantidade": 0, "valor_bruto": Decimal("0"), "valor_liquido": Decimal("0")},
+        )
+        acc["quantidade"] += int(row.get("quantidade") or 0)
+        acc["valor_bruto"] += _dec(row.get("valor_bruto"))
+        acc["valor_liquido"] += _dec(row.get("valor_liquido"))
+    return {
+        key: {**acc, "valor_bruto": str(_money(acc["valor_bruto"])), "valor_liquido": str(_money(acc["valor_liquido"]))}
+        for key, acc in sorted(out.items())
+    }
+
+
+def totais_lancamentos(supa: Client, org_id: str, **filters: Any) -> Dict[str, Any]:
+    """Resumo e quebra por status/repasse do filtro inteiro (não só da página)."""
+    filtros = {key: value for key, value in filters.items() if value is not None}
+    grupos = _grupos_lancamentos(supa, org_id, filtros)
+    return {
+        "resumo": _summary_from_grupos(grupos),
+        "por_status": _breakdown_from_grupos(grupos, "status"),
+        "por_repasse_status": _breakdown_from_grupos(grupos, "repasse_status"),
+    }
+
+
+def _parceiros_ranking_resumo(
+    supa: Client,
+    org_id: str,
+    competencia_de: Optional[date],
+    competencia_ate: Optional[date],
+) -> Optional[List[Dict[str, Any]]]:
+    try:
+        parceiro_cotas = select_paginado(
+            lambda: supa.table(PARCEIRO_COTAS_TABLE)
+            .select("parceiro_id, cota_id, parceiros_corretores(nome), cotas(status, valor_carta, data_adesao)")
+            .eq("org_id", org_id),
+            order="parceiro_id",
+        )
+    except APIError as exc:
+        if not _is_missing_resumo_table(exc):
+            raise
+        logger.warning("comissao_resumo_ausente", extra={"org_id": org_id})
+        return None
+
+    filters: Dict[str, Any] = {"beneficiario_tipo": "parceiro", "repasse_status_in": ("pago", "pendente")}
+    if competencia_de:
+        filters["competencia_de"] = competencia_de
+    if competencia_ate:
+        filters["competencia_ate"] = competencia_ate
+    mensal = _fetch_resumo_mensal(supa, org_id, filters)
+    if mensal is None:
+        return None
+
+    parceiros: Dict[str, Dict[str, Any]] = {}
+    for row in parceiro_cotas:
+        acc = _ranking_acc(parceiros, row["parceiro_id"], row.get("parceiros_corretores"))
+        _ranking_add_cota(acc, row.get("cota_id"), row.get("cotas"))
+
+    for row in mensal:
+        acc = parceiros.get(row.get("parceiro_id"))
+        comp = _ranking_pdate(row.get("competencia"))
+        if acc is None or not _ranking_in_period(comp, competencia_de, competencia_ate):
+            continue
+        _ranking_add_repasse(acc, row.get("repasse_status"), _dec(row.get("valor_liquido")))
+
+    return _ranking_result(parceiros, competencia_de, competencia_ate)
+
+
+def parceiros_ranking(
+    supa: Client,
+    org_id: str,
+    competencia_de: Optional[date] = None,
+    competencia_ate: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Agrega métricas gerenciais por parceiro.
+
+    - vendas: cartas/cotas com `data_adesao` dentro do período
+    - volume_cartas: soma de `valor_carta` dessas vendas
+    - taxa_cancelamento: % de cotas canceladas sobre o total de cotas do parceiro (carteira, vitalício)
+    - repasse_pago / repasse_pendente: somas de `valor_liquido` por status, no período
+    """
+    ranking = _parceiros_ranking_resumo(supa, org_id, competencia_de, competencia_ate)
+    if ranking is not None:
+        return ranking
+    return _parceiros_ranking_ledger(supa, org_id, competencia_de, competencia_ate)
+
+
 def _reconcile_regras_for_config(
     supa: Client,
     *,
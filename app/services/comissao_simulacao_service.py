@@ -0,0 +1,427 @@
+"""Simulação ("e se") de mudanças de regra de comissão na carteira.
+
+Antes de trocar um modelo de comissão ou o percentual de um parceiro, a gestão
+quer ver o impacto no caixa mês a mês. Aqui a carteira do recorte é carregada
+em poucas consultas em lote (configs, regras, cotas, parceiros, contratos,
+pulos e contemplações) e cada cota é projetada duas vezes em memória — com a
+regra atual e com a proposta — usando as mesmas funções do motor de
+competências:
+
+- `_resolve_regra_competencia_prevista`: competência de cada parcela (base da
+  config, furo, ciclo perdido, pulos e contemplação);
+- `_match_regra`: havendo parcelas no mesmo mês, vale a de menor ordem (as
+  demais nunca são geradas pelo motor);
+- `calcular_valores_parcela`: bruto/imposto/líquido de empresa e parceiros
+  com os mesmos arredondamentos.
+
+Nada é gravado.
+"""
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import Client
+
+from app.core.supabase_lote import fetch_in, select_paginado
+from app.schemas.comissoes import ComissaoSimulacaoIn
+from app.services.comissao_competencia_service import (
+    _match_regra,
+    _resolve_regra_competencia_prevista,
+    calcular_valores_parcela,
+    month_start,
+    parse_date,
+)
+from app.services.comissao_reprocessamento_service import config_segue_modelo
+from app.services.comissao_service import _dec, _money, _pct, get_org_record_or_404
+
+# Quantos alertas de cota devolver (o total vem em `resumo`).
+MAX_ALERTAS = 50
+
+_Chave = Tuple[str, Optional[str]]
+_Valores = List[Decimal]
+
+
+# ---------------------------------------------------------------------------
+# Carga da carteira
+# ---------------------------------------------------------------------------
+
+
+def _carregar_carteira(
+    supa: Client,
+    org_id: str,
+    payload: ComissaoSimulacaoIn,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Contexto de cada cota do recorte, sem consultas por cota."""
+    if payload.cota_ids:
+        configs = fetch_in(
+            supa, "cota_comissao_config", org_id, "cota_id", payload.cota_ids, filtros={"ativo": True}
+        )
+    else:
+        configs = select_paginado(
+            lambda: supa.table("cota_comissao_config").select("*").eq("org_id", org_id).eq("ativo", True)
+        )
+
+    regras_por_config: Dict[str, List[Dict[str, Any]]] = {}
+    for regra in fetch_in(
+        supa, "cota_comissao_regras", org_id, "cota_comissao_config_id", [c["id"] for c in configs], order="ordem"
+    ):
+        regras_por_config.setdefault(regra["cota_comissao_config_id"], []).append(regra)
+
+    if payload.modelo_id:
+        modelo = get_org_record_or_404(supa, "comissao_modelos", org_id, payload.modelo_id)
+        configs = [
+            config for config in configs if config_segue_modelo(config, regras_por_config.get(config["id"], []), modelo)
+        ]
+
+    cota_ids = [config["cota_id"] for config in configs]
+    cotas = {
+        row["id"]: row
+        for row in fetch_in(
+            supa,
+            "cotas",
+            org_id,
+            "id",
+            cota_ids,
+            columns="id, numero_cota, grupo_codigo, status, valor_carta, data_adesao, assembleia_dia, furo_meses",
+        )
+    }
+
+    contratos: Dict[str, Dict[str, Any]] = {}
+    for row in fetch_in(
+        supa, "contratos", org_id, "cota_id", cota_ids, columns="id, cota_id, data_contemplacao", order="created_at"
+    ):
+        contratos.setdefault(row["cota_id"], row)
+
+    pulos: Dict[str, List[date]] = {}
+    for row in fetch_in(
+        supa,
+        "cota_pagamento_pulos",
+        org_id,
+        "contrato_id",
+        [contrato["id"] for contrato in contratos.values()],
+        columns="contrato_id, competencia",
+        order="competencia",
+    ):
+        d = parse_date(row.get("competencia"))
+        if d:
+            pulos.setdefault(row["contrato_id"], []).append(d)
+
+    contemplacoes: Dict[str, date] = {}
+    for row in fetch_in(
+        supa, "contemplacoes", org_id, "cota_id", cota_ids, columns="cota_id, data", order="data", desc=True
+    ):
+        d = parse_date(row.get("data"))
+        if d and row["cota_id"] not in contemplacoes:
+            contemplacoes[row["cota_id"]] = month_start(d)
+
+    parceiros: Dict[str, List[Dict[str, Any]]] = {}
+    for row in fetch_in(
+        supa, "cota_comissao_parceiros", org_id, "cota_id", cota_ids, order="created_at"
+    ):
+        # mesmo filtro de `fetch_active_cota_partners`
+        if row.get("ativo", True) and row.get("parceiro_id"):
+            parceiros.setdefault(row["cota_id"], []).append(row)
+
+    resumo = {"cotas_sem_contrato": 0, "cotas_inativas": 0}
+    carteira: List[Dict[str, Any]] = []
+    for config in configs:
+        cota = cotas.get(config["cota_id"])
+        if not cota or cota.get("status") == "cancelada":
+            resumo["cotas_inativas"] += 1
+            continue
+        contrato = contratos.get(cota["id"])
+        if not contrato:
+            # sem contrato não há pagamento, então o motor não gera comissão
+            resumo["cotas_sem_contrato"] += 1
+            continue
+        contemplacao = parse_date(contrato.get("data_contemplacao"))
+        carteira.append(
+            {
+                "org_id": org_id,
+                "cota": cota,
+                "config": config,
+                "regras": regras_por_config.get(config["id"], []),
+                "parceiros": parceiros.get(cota["id"], []),
+                "contrato": contrato,
+                "pulos": pulos.get(contrato["id"], []),
+                "contemplacao": month_start(contemplacao) if contemplacao else contemplacoes.get(cota["id"]),
+            }
+        )
+    return carteira, resumo
+
+
+# ---------------------------------------------------------------------------
+# Proposta
+# ---------------------------------------------------------------------------
+
+
+def _regras_propostas(
+    config: Dict[str, Any],
+    regras: List[Dict[str, Any]],
+    payload: ComissaoSimulacaoIn,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    total_atual = _dec(config.get("percentual_total"))
+    total = payload.percentual_total if payload.percentual_total is not None else total_atual
+    config_proposta = {**config, "percentual_total": str(total)}
+
+    if payload.regras:
+        return config_proposta, [
+            {
+                "id": f"simulada-{regra.ordem}",
+                "ordem": regra.ordem,
+                "tipo_evento": regra.tipo_evento,
+                "offset_meses": regra.offset_meses,
+                "percentual_comissao": str(_pct(total * regra.proporcao / Decimal("100"))),
+            }
+            for regra in payload.regras
+        ]
+    if total != total_atual and total_atual > 0:
+        return config_proposta, [
+            {**regra, "percentual_comissao": str(_pct(_dec(regra.get("percentual_comissao")) * total / total_atual))}
+            for regra in regras
+        ]
+    return config_proposta, regras
+
+
+def _parceiros_propostos(
+    parceiros: List[Dict[str, Any]],
+    overrides: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    if not overrides:
+        return parceiros
+    out: List[Dict[str, Any]] = []
+    for parceiro in parceiros:
+        override = overrides.get(parceiro["parceiro_id"])
+        if override is None:
+            out.append(parceiro)
+            continue
+        if override.percentual_parceiro <= 0:
+            continue
+        row = {**parceiro, "percentual_parceiro": str(override.percentual_parceiro)}
+        if override.imposto_retido_pct is not None:
+            row["imposto_retido_pct"] = str(override.imposto_retido_pct)
+        out.append(row)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Projeção
+# ---------------------------------------------------------------------------
+
+
+def _previstas(
+    supa: Client,
+    ctx: Dict[str, Any],
+    config: Dict[str, Any],
+    regras: List[Dict[str, Any]],
+) -> Dict[str, Optional[date]]:
+    # pulos e contemplação vêm carregados no ctx: nenhuma consulta aqui
+    return {
+        regra["id"]: _resolve_regra_competencia_prevista(
+            supa=supa,
+            org_id=ctx["org_id"],
+            contrato=ctx["contrato"],
+            cota=ctx["cota"],
+            config=config,
+            regra=regra,
+            pulos=ctx["pulos"],
+            contemplacao=ctx["contemplacao"],
+        )
+        for regra in regras
+    }
+
+
+def projetar_cota(
+    supa: Client,
+    ctx: Dict[str, Any],
+    *,
+    config: Dict[str, Any],
+    regras: List[Dict[str, Any]],
+    parceiros: List[Dict[str, Any]],
+    previstas: Optional[Dict[str, Optional[date]]] = None,
+) -> Dict[Tuple[_Chave, Optional[date]], _Valores]:
+    """{((beneficiario_tipo, parceiro_id), competencia): [bruto, imposto, liquido]}.
+    Competência `None` = parcela sem previsão (ex.: contemplação ainda não ocorreu)."""
+    if previstas is None:
+        previstas = _previstas(supa, ctx, config, regras)
+
+    realizadas: List[Tuple[Optional[date], Dict[str, Any]]] = []
+    for competencia in sorted({d for d in previstas.values() if d}):
+        regra = _match_regra(regras, previstas, competencia)
+        if regra:
+            realizadas.append((competencia, regra))
+    realizadas.extend((None, regra) for regra in regras if previstas.get(regra["id"]) is None)
+
+    out: Dict[Tuple[_Chave, Optional[date]], _Valores] = {}
+
+    def _add(chave: _Chave, competencia: Optional[date], bruto: Decimal, imposto: Decimal, liquido: Decimal) -> None:
+        acc = out.setdefault((chave, competencia), [Decimal("0"), Decimal("0"), Decimal("0")])
+        acc[0] += bruto
+        acc[1] += imposto
+        acc[2] += liquido
+
+    for competencia, regra in realizadas:
+        _, _, empresa_bruto, parceiro_rows = calcular_valores_parcela(
+            cota=ctx["cota"], config=config, regra=regra, parceiros=parceiros
+        )
+        _add(("empresa", None), competencia, empresa_bruto, Decimal("0"), empresa_bruto)
+        for parceiro, bruto, _imposto_pct, imposto, liquido in parceiro_rows:
+            _add(("parceiro", parceiro["parceiro_id"]), competencia, bruto, imposto, liquido)
+    return out
+
+
+def _valores_out(valores: Optional[_Valores]) -> Dict[str, str]:
+    bruto, imposto, liquido = valores or (Decimal("0"), Decimal("0"), Decimal("0"))
+    return {
+        "valor_bruto": str(_money(bruto)),
+        "valor_imposto": str(_money(imposto)),
+        "valor_liquido": str(_money(liquido)),
+    }
+
+
+def _comparacao(atual: Optional[_Valores], proposto: Optional[_Valores]) -> Dict[str, Any]:
+    zero = [Decimal("0"), Decimal("0"), Decimal("0")]
+    a, p = atual or zero, proposto or zero
+    return {
+        "atual": _valores_out(a),
+        "proposto": _valores_out(p),
+        "diferenca": _valores_out([p[i] - a[i] for i in range(3)]),
+    }
+
+
+def _somar(target: Dict[Any, _Valores], key: Any, valores: _Valores) -> None:
+    acc = target.setdefault(key, [Decimal("0"), Decimal("0"), Decimal("0")])
+    for i in range(3):
+        acc[i] += valores[i]
+
+
+def _no_periodo(competencia: Optional[date], de: Optional[date], ate: Optional[date]) -> bool:
+    if competencia is None:
+        return de is None and ate is None
+    if de and competencia < month_start(de):
+        return False
+    if ate and competencia > month_start(ate):
+        return False
+    return True
+
+
+def simular_comissoes(supa: Client, org_id: str, payload: ComissaoSimulacaoIn) -> Dict[str, Any]:
+    carteira, resumo = _carregar_carteira(supa, org_id, payload)
+    overrides = {item.parceiro_id: item for item in payload.parceiros}
+
+    atual: Dict[Tuple[_Chave, Optional[date]], _Valores] = {}
+    proposto: Dict[Tuple[_Chave, Optional[date]], _Valores] = {}
+    alertas: List[Dict[str, Any]] = []
+    resumo.update({"cotas_avaliadas": 0, "cotas_alteradas": 0, "cotas_com_erro": 0, "cotas_com_alerta": 0})
+
+    for ctx in carteira:
+        config, regras = ctx["config"], ctx["regras"]
+        if not regras:
+            continue
+        config_p, regras_p = _regras_propostas(config, regras, payload)
+        parceiros_p = _parceiros_propostos(ctx["parceiros"], overrides)
+        try:
+            previstas = _previstas(supa, ctx, config, regras)
+            cota_atual = projetar_cota(
+                supa, ctx, config=config, regras=regras, parceiros=ctx["parceiros"], previstas=previstas
+            )
+            cota_proposta = projetar_cota(
+                supa,
+                ctx,
+                config=config_p,
+                regras=regras_p,
+                parceiros=parceiros_p,
+                # só a estrutura das parcelas muda a competência
+                previstas=None if payload.regras else previstas,
+            )
+        except HTTPException as exc:
+            resumo["cotas_com_erro"] += 1
+            if len(alertas) < MAX_ALERTAS:
+                alertas.append({"cota_id": ctx["cota"]["id"], "erro": str(exc.detail)})
+            continue
+
+        resumo["cotas_avaliadas"] += 1
+        if cota_atual != cota_proposta:
+            resumo["cotas_alteradas"] += 1
+        soma_parceiros = sum((_dec(p.get("percentual_parceiro")) for p in parceiros_p), Decimal("0"))
+        if soma_parceiros > _dec(config_p.get("percentual_total")):
+            resumo["cotas_com_alerta"] += 1
+            if len(alertas) < MAX_ALERTAS:
+                alertas.append(
+                    {
+                        "cota_id": ctx["cota"]["id"],
+                        "erro": "A soma dos percentuais dos parceiros supera a comissão total",
+                    }
+                )
+        for key, valores in cota_atual.items():
+            _somar(atual, key, valores)
+        for key, valores in cota_proposta.items():
+            _somar(proposto, key, valores)
+
+    return _montar_resultado(supa, org_id, payload, atual, proposto, resumo, alertas)
+
+
+def _montar_resultado(
+    supa: Client,
+    org_id: str,
+    payload: ComissaoSimulacaoIn,
+    atual: Dict[Tuple[_Chave, Optional[date]], _Valores],
+    proposto: Dict[Tuple[_Chave, Optional[date]], _Valores],
+    resumo: Dict[str, int],
+    alertas: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    de, ate = payload.competencia_de, payload.competencia_ate
+    chaves = sorted(
+        {key for key in (*atual, *proposto) if _no_periodo(key[1], de, ate)},
+        key=lambda key: (key[0][0], str(key[0][1]), key[1] or date.max),
+    )
+
+    parceiro_ids = {chave[1] for chave, _ in chaves if chave[1]}
+    nomes = {
+        row["id"]: row.get("nome")
+        for row in fetch_in(supa, "parceiros_corretores", org_id, "id", parceiro_ids, columns="id, nome")
+    }
+
+    beneficiarios: Dict[_Chave, Dict[str, Any]] = {}
+    total_atual: Dict[Any, _Valores] = {}
+    total_proposto: Dict[Any, _Valores] = {}
+    for chave, competencia in chaves:
+        a, p = atual.get((chave, competencia)), proposto.get((chave, competencia))
+        item = beneficiarios.setdefault(
+            chave,
+            {
+                "beneficiario_tipo": chave[0],
+                "parceiro_id": chave[1],
+                "nome": nomes.get(chave[1]) if chave[1] else None,
+                "meses": [],
+                "sem_previsao": None,
+            },
+        )
+        if competencia is None:
+            item["sem_previsao"] = _comparacao(a, p)
+        else:
+            item["meses"].append({"competencia": competencia.isoformat(), **_comparacao(a, p)})
+        # totais por beneficiário (chave) e por mês (competência)
+        for totais, valores in ((total_atual, a), (total_proposto, p)):
+            if valores:
+                _somar(totais, chave, valores)
+                if competencia is not None:
+                    _somar(totais, competencia, valores)
+
+    for chave, item in beneficiarios.items():
+        item["total"] = _comparacao(total_atual.get(chave), total_proposto.get(chave))
+
+    meses = sorted({competencia for _, competencia in chaves if competencia is not None})
+    return {
+        "ok": True,
+        "resumo": resumo,
+        "beneficiarios": list(beneficiarios.values()),
+        "meses": [
+            {"competencia": competencia.isoformat(), **_comparacao(total_atual.get(competencia), total_proposto.get(competencia))}
+            for competencia in meses
+        ],
+        "alertas": alertas,
+    }
@@ -0,0 +1,746 @@
+"""Conciliação de extrato/retorno bancário com os pagamentos previstos.
+
+Em vez de baixar parcela por parcela em `create_pagamento`/`update_pagamento`,
+o financeiro envia o arquivo do banco e recebe as baixas propostas:
+
+1. `indexar_parcelas_abertas` carrega, em páginas, os pagamentos mensais em
+   aberto (`previsto`/`inadimplente`) e monta um índice em memória
+   número do contrato -> valor (centavos) -> parcelas por vencimento;
+2. o arquivo é lido em streaming (OFX, CNAB 240 ou CNAB 400 de retorno) — só a
+   transação corrente fica em memória, nunca o arquivo inteiro;
+3. cada crédito é casado no índice pelo número do contrato (documento/memo),
+   valor e vencimento. Uma parcela só é proposta uma vez por arquivo.
+
+`iniciar_confirmacao` grava as baixas num job (`conciliacao_jobs`, migration
+025) que roda em segundo plano (`app/core/jobs.py`). O job agrupa os
+pagamentos em aberto por contrato e, bloco a bloco de contratos, grava as
+baixas com um update por (data, valor pago) e processa a comissão uma vez por
+contrato: atualiza as competências dos pagamentos baixados e roda
+`reprocessar_comissoes_contrato`. O último contrato do bloco fica no job
+(`ultimo_contrato_id`); a retomada continua dali e refaz a comissão dos
+contratos seguintes, inclusive dos pagamentos que o bloco interrompido já baixou.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import re
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import Client
+
+from app.core.jobs import JobRunner, now_iso
+from app.core.supabase_lote import chunks, fetch_in, safe_rows
+from app.services import comissao_competencia_service
+from app.services.comissao_service import get_org_record_or_404
+
+logger = logging.getLogger(__name__)
+
+FormatoExtrato = Literal["ofx", "cnab240", "cnab400"]
+
+# Página da carga das parcelas em aberto (keyset por id).
+INDICE_PAGE_SIZE = 1000
+# Bloco lido por vez do OFX (que pode vir todo numa linha só).
+OFX_READ_SIZE = 64 * 1024
+# Distância máxima (dias) entre vencimento da parcela e a data de referência da
+# transação quando o vencimento não bate exatamente.
+JANELA_DIAS = 45
+# Quantas transações não conciliadas devolver na prévia (o total vem em `totais`).
+MAX_PENDENCIAS = 500
+
+STATUS_ABERTOS = ("previsto", "inadimplente")
+# Códigos de movimento de retorno que significam liquidação do título.
+_CNAB240_LIQUIDACAO = {"06", "17"}
+_CNAB400_LIQUIDACAO = {"06", "15", "17"}
+
+# "CTR-200", "12.345/6" e afins contam como um token só
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+(?:[-./][A-Za-z0-9]+)*")
+_OFX_TAG_RE = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _safe_rows(resp: Any) -> List[Dict[str, Any]]:
+    return getattr(resp, "data", None) or []
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def normalizar_numero(value: Any) -> str:
+    """Número de contrato comparável: só letras/dígitos, maiúsculo, sem zeros à
+    esquerda (o CNAB completa o campo com zeros)."""
+    text = re.sub(r"[^A-Za-z0-9]", "", str(value or "")).upper()
+    return text.lstrip("0") or ("0" if text else "")
+
+
+def _centavos(value: Decimal) -> int:
+    return int((value * 100).to_integral_value())
+
+
+# ---------------------------------------------------------------------------
+# Leitura em streaming
+# ---------------------------------------------------------------------------
+
+
+def _cnab_valor(raw: str) -> Optional[Decimal]:
+    raw = raw.strip()
+    if not raw.isdigit():
+        return None
+    return Decimal(int(raw)) / 100
+
+
+def _cnab_data(raw: str) -> Optional[date]:
+    raw = raw.strip()
+    if not raw.isdigit() or int(raw) == 0:
+        return None
+    try:
+        if len(raw) == 8:
+            return datetime.strptime(raw, "%d%m%Y").date()
+        if len(raw) == 6:
+            return datetime.strptime(raw, "%d%m%y").date()
+    except ValueError:
+        return None
+    return None
+
+
+def _iter_cnab240(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Retorno CNAB 240 (Febraban): segmento T (título) seguido do U (valores)."""
+    titulo: Optional[Dict[str, Any]] = None
+    for numero, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if len(line) < 240 or line[7] != "3":
+            continue
+        segmento = line[13]
+        if segmento == "T":
+            titulo = {
+                "linha": numero,
+                "liquidacao": line[15:17] in _CNAB240_LIQUIDACAO,
+                "referencia": line[37:57].strip(),
+                "documento": line[58:73].strip(),
+                "vencimento": _cnab_data(line[73:81]),
+                "valor": _cnab_valor(line[81:96]),
+            }
+        elif segmento == "U" and titulo is not None:
+            atual, titulo = titulo, None
+            if not atual.pop("liquidacao"):
+                yield {**atual, "ignorada": True}
+                continue
+            yield {
+                **atual,
+                "valor_pago": _cnab_valor(line[77:92]),
+                "data_pagamento": _cnab_data(line[145:153]) or _cnab_data(line[137:145]),
+            }
+
+
+def _iter_cnab400(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Retorno CNAB 400: registro de detalhe tipo 1."""
+    for numero, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if len(line) < 400 or line[0] != "1":
+            continue
+        transacao = {
+            "linha": numero,
+            "referencia": line[70:82].strip(),
+            "documento": line[116:126].strip(),
+            "vencimento": _cnab_data(line[146:152]),
+            "valor": _cnab_valor(line[152:165]),
+        }
+        if line[108:110] not in _CNAB400_LIQUIDACAO:
+            yield {**transacao, "ignorada": True}
+            continue
+        yield {
+            **transacao,
+            "valor_pago": _cnab_valor(line[253:266]),
+            "data_pagamento": _cnab_data(line[295:301]) or _cnab_data(line[110:116]),
+        }
+
+
+def _iter_ofx_tags(chunks: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(TAG, valor) do OFX (SGML ou XML) lido em blocos; `/TAG` para fechamento."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        # só processa até o último "<": a tag seguinte pode estar incompleta
+        corte = buffer.rfind("<")
+        if corte <= 0:
+            continue
+        for match in _OFX_TAG_RE.finditer(buffer, 0, corte):
+            yield match.group(1) + match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[corte:]
+    for match in _OFX_TAG_RE.finditer(buffer):
+        yield match.group(1) + match.group(2).upper(), match.group(3).strip()
+
+
+def _ofx_data(raw: str) -> Optional[date]:
+    digits = raw[:8]
+    if len(digits) < 8 or not digits.isdigit():
+        return None
+    try:
+        return datetime.strptime(digits, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _ofx_valor(raw: str) -> Optional[Decimal]:
+    try:
+        return Decimal(raw.replace(",", "."))
+    except (InvalidOperation, AttributeError):
+        return None
+
+
+def _ofx_transacao(numero: int, campos: Dict[str, str]) -> Dict[str, Any]:
+    valor = _ofx_valor(campos.get("TRNAMT", ""))
+    transacao = {
+        "linha": numero,
+        "referencia": campos.get("FITID") or campos.get("REFNUM") or "",
+        "documento": " ".join(
+            campos[tag] for tag in ("CHECKNUM", "REFNUM", "NAME", "MEMO") if campos.get(tag)
+        ),
+        "vencimento": None,
+        "valor": valor,
+        "valor_pago": valor,
+        "data_pagamento": _ofx_data(campos.get("DTPOSTED", "")),
+    }
+    # débitos não quitam parcela
+    if valor is None or valor <= 0:
+        transacao["ignorada"] = True
+    return transacao
+
+
+def _iter_ofx(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    campos: Optional[Dict[str, str]] = None
+    numero = 0
+    for tag, value in _iter_ofx_tags(chunks):
+        if tag == "STMTTRN":
+            if campos is not None:  # SGML sem fechamento
+                yield _ofx_transacao(numero, campos)
+            numero += 1
+            campos = {}
+        elif tag == "/STMTTRN" or (tag == "/BANKTRANLIST" and campos is not None):
+            if campos is not None:
+                yield _ofx_transacao(numero, campos)
+            campos = None
+        elif campos is not None and not tag.startswith("/"):
+            campos[tag] = value
+    if campos is not None:
+        yield _ofx_transacao(numero, campos)
+
+
+def _detectar_formato(primeira_linha: str) -> FormatoExtrato:
+    texto = primeira_linha.lstrip("\ufeff").strip()
+    if texto.upper().startswith(("OFXHEADER", "<?XML", "<OFX")):
+        return "ofx"
+    tamanho = len(primeira_linha.rstrip("\r\n"))
+    if tamanho == 240:
+        return "cnab240"
+    if tamanho == 400:
+        return "cnab400"
+    raise HTTPException(400, "Formato de arquivo não reconhecido (esperado OFX, CNAB 240 ou CNAB 400)")
+
+
+def iter_transacoes(stream: BinaryIO) -> Tuple[FormatoExtrato, Iterator[Dict[str, Any]]]:
+    """Formato do arquivo e um iterador das transações, lendo o stream aos poucos."""
+    text = io.TextIOWrapper(stream, encoding="latin-1", newline="")
+    primeira = ""
+    while not primeira.strip():
+        primeira = text.readline()
+        if not primeira:
+            raise HTTPException(400, "Arquivo vazio")
+    formato = _detectar_formato(primeira)
+    if formato == "ofx":
+        return formato, _iter_ofx(chain([primeira], iter(lambda: text.read(OFX_READ_SIZE), "")))
+    if formato == "cnab240":
+        return formato, _iter_cnab240(chain([primeira], text))
+    return formato, _iter_cnab400(chain([primeira], text))
+
+
+# ---------------------------------------------------------------------------
+# Índice das parcelas em aberto
+# ---------------------------------------------------------------------------
+
+
+class IndiceParcelas:
+    """numero normalizado -> centavos -> parcelas abertas ordenadas por vencimento."""
+
+    def __init__(self) -> None:
+        self._por_numero: Dict[str, Dict[int, List[Dict[str, Any]]]] = {}
+        self.usados: set[str] = set()
+        self.total = 0
+
+    def adicionar(self, numero: str, parcela: Dict[str, Any]) -> None:
+        por_valor = self._por_numero.setdefault(numero, {})
+        por_valor.setdefault(parcela["centavos"], []).append(parcela)
+        self.total += 1
+
+    def contratos(self, transacao: Dict[str, Any]) -> List[str]:
+        """Números de contrato do índice citados no documento/memo da transação."""
+        documento = transacao.get("documento") or ""
+        candidatos = [normalizar_numero(documento)]
+        candidatos.extend(normalizar_numero(token) for token in _TOKEN_RE.findall(documento))
+        return list(dict.fromkeys(c for c in candidatos if c and c in self._por_numero))
+
+    def parcelas(self, numero: str, centavos: int) -> List[Dict[str, Any]]:
+        return [p for p in self._por_numero.get(numero, {}).get(centavos, []) if p["id"] not in self.usados]
+
+    def ordenar(self) -> None:
+        for por_valor in self._por_numero.values():
+            for parcelas in por_valor.values():
+                parcelas.sort(key=lambda p: (p["vencimento"] or date.max, p["id"]))
+
+
+def indexar_parcelas_abertas(supa: Client, org_id: str) -> IndiceParcelas:
+    numeros: Dict[str, Tuple[str, str]] = {}
+    last_id: Optional[str] = None
+    while True:
+        query = supa.table("contratos").select("id, numero").eq("org_id", org_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = _safe_rows(query.order("id").limit(INDICE_PAGE_SIZE).execute())
+        for row in page:
+            numero = normalizar_numero(row.get("numero"))
+            if numero:
+                numeros[row["id"]] = (numero, row.get("numero"))
+        if len(page) < INDICE_PAGE_SIZE:
+            break
+        last_id = page[-1]["id"]
+
+    indice = IndiceParcelas()
+    last_id = None
+    while True:
+        query = (
+            supa.table("pagamentos")
+            .select("id, contrato_id, competencia, vencimento, valor, status")
+            .eq("org_id", org_id)
+            .eq("tipo", "parcela_mensal")
+            .in_("status", list(STATUS_ABERTOS))
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = _safe_rows(query.order("id").limit(INDICE_PAGE_SIZE).execute())
+        for row in page:
+            contrato = numeros.get(row.get("contrato_id"))
+            if not contrato:
+                continue
+            try:
+                valor = Decimal(str(row.get("valor")))
+            except InvalidOperation:
+                continue
+            indice.adicionar(
+                contrato[0],
+                {
+                    "id": row["id"],
+                    "contrato_id": row["contrato_id"],
+                    "contrato_numero": contrato[1],
+                    "competencia": row.get("competencia"),
+                    "vencimento": comissao_competencia_service.parse_date(row.get("vencimento")),
+                    "valor": str(valor),
+                    "centavos": _centavos(valor),
+                },
+            )
+        if len(page) < INDICE_PAGE_SIZE:
+            break
+        last_id = page[-1]["id"]
+
+    indice.ordenar()
+    return indice
+
+
+# ---------------------------------------------------------------------------
+# Casamento
+# ---------------------------------------------------------------------------
+
+
+def conciliar_transacao(indice: IndiceParcelas, transacao: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado `{situacao, parcela?, confianca?}` de uma transação de crédito."""
+    numeros = indice.contratos(transacao)
+    if not numeros:
+        return {"situacao": "sem_contrato"}
+    valor = transacao.get("valor")
+    if valor is None:
+        return {"situacao": "sem_parcela"}
+
+    centavos = _centavos(valor)
+    candidatas = [p for numero in numeros for p in indice.parcelas(numero, centavos)]
+    if not candidatas and transacao.get("valor_pago") not in (None, valor):
+        # título pago com juros/desconto: tenta pelo valor efetivamente pago
+        candidatas = [p for numero in numeros for p in indice.parcelas(numero, _centavos(transacao["valor_pago"]))]
+    if not candidatas:
+        return {"situacao": "sem_parcela"}
+
+    vencimento = transacao.get("vencimento")
+    exatas = [p for p in candidatas if vencimento and p["vencimento"] == vencimento]
+    if len(exatas) == 1:
+        return {"situacao": "conciliada", "parcela": exatas[0], "confianca": "exata"}
+    if len(exatas) > 1:
+        return {"situacao": "ambigua"}
+
+    referencia = vencimento or transacao.get("data_pagamento")
+    if referencia is None:
+        if len(candidatas) > 1:
+            return {"situacao": "ambigua"}
+        return {"situacao": "conciliada", "parcela": candidatas[0], "confianca": "provavel"}
+    proximas = sorted(
+        (abs((p["vencimento"] - referencia).days), p["id"], p)
+        for p in candidatas
+        if p["vencimento"] and abs((p["vencimento"] - referencia).days) <= JANELA_DIAS
+    )
+    if not proximas:
+        return {"situacao": "sem_parcela"}
+    if len(proximas) > 1 and proximas[0][0] == proximas[1][0]:
+        return {"situacao": "ambigua"}
+    return {"situacao": "conciliada", "parcela": proximas[0][2], "confianca": "provavel"}
+
+
+def _iso(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _money_str(value: Optional[Decimal]) -> Optional[str]:
+    return str(value.quantize(Decimal("0.01"))) if value is not None else None
+
+
+def previa_conciliacao(supa: Client, *, org_id: str, stream: BinaryIO) -> Dict[str, Any]:
+    """Lê o arquivo em streaming e propõe uma baixa por crédito conciliado."""
+    indice = indexar_parcelas_abertas(supa, org_id)
+    formato, transacoes = iter_transacoes(stream)
+
+    totais = {
+        "transacoes": 0,
+        "ignoradas": 0,
+        "conciliadas": 0,
+        "exatas": 0,
+        "provaveis": 0,
+        "ambiguas": 0,
+        "sem_contrato": 0,
+        "sem_parcela": 0,
+        "parcelas_abertas": indice.total,
+    }
+    propostas: List[Dict[str, Any]] = []
+    pendencias: List[Dict[str, Any]] = []
+    for transacao in transacoes:
+        totais["transacoes"] += 1
+        if transacao.get("ignorada"):
+            totais["ignoradas"] += 1
+            continue
+        resultado = conciliar_transacao(indice, transacao)
+        situacao = resultado["situacao"]
+        base = {
+            "linha": transacao["linha"],
+            "referencia": transacao.get("referencia"),
+            "documento": transacao.get("documento"),
+            "valor": _money_str(transacao.get("valor")),
+            "valor_pago": _money_str(transacao.get("valor_pago")),
+            "data_pagamento": _iso(transacao.get("data_pagamento")),
+        }
+        if situacao != "conciliada":
+            totais["ambiguas" if situacao == "ambigua" else situacao] += 1
+            if len(pendencias) < MAX_PENDENCIAS:
+                pendencias.append({**base, "situacao": situacao})
+            continue
+
+        parcela = resultado["parcela"]
+        indice.usados.add(parcela["id"])
+        totais["conciliadas"] += 1
+        totais["exatas" if resultado["confianca"] == "exata" else "provaveis"] += 1
+        propostas.append(
+            {
+                **base,
+                "confianca": resultado["confianca"],
+                "pagamento_id": parcela["id"],
+                "contrato_id": parcela["contrato_id"],
+                "contrato_numero": parcela["contrato_numero"],
+                "competencia": parcela["competencia"],
+                "vencimento": _iso(parcela["vencimento"]),
+                "valor_parcela": parcela["valor"],
+            }
+        )
+
+    return {"ok": True, "formato": formato, "totais": totais, "propostas": propostas, "pendencias": pendencias}
+
+
+# ---------------------------------------------------------------------------
+# Confirmação
+# ---------------------------------------------------------------------------
+
+
+JOBS_TABLE = "conciliacao_jobs"
+
+# Pagamentos (de contratos inteiros) baixados por bloco; o progresso é salvo a cada bloco.
+BAIXAS_POR_BLOCO = 500
+# Quantos erros por contrato guardar no job (o total fica em `erros`).
+MAX_ERROS_DETALHE = 200
+
+_jobs = JobRunner(JOBS_TABLE, nome="conciliacao", em_execucao_msg="Confirmação da conciliação já está em execução")
+
+Progresso = Callable[[Dict[str, Any]], None]
+
+
+def _processar_comissao_contrato(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_id: str,
+    pagamento_ids: List[str],
+    actor_id: Optional[str],
+) -> Optional[str]:
+    """Atualiza as competências dos pagamentos baixados e reprocessa o contrato
+    uma vez. Retorna a mensagem de erro ou None."""
+    try:
+        for pagamento_id in pagamento_ids:
+            comissao_competencia_service.upsert_competencia_from_pagamento(
+                supa, org_id=org_id, pagamento_id=pagamento_id, actor_id=actor_id
+            )
+        comissao_competencia_service.reprocessar_comissoes_contrato(
+            supa, org_id=org_id, contrato_id=contrato_id, actor_id=actor_id
+        )
+    except HTTPException as exc:
+        return str(exc.detail)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("conciliacao_comissao_error", extra={"contrato_id": contrato_id})
+        return str(exc) or exc.__class__.__name__
+    return None
+
+
+def normalizar_baixas(itens: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[str]]]:
+    """`{pagamento_id: {pago_em, valor_pago}}` (a última baixa de cada pagamento vale)."""
+    baixas: Dict[str, Dict[str, Optional[str]]] = {}
+    for item in itens:
+        pago_em = item["pago_em"]
+        valor_pago = item.get("valor_pago")
+        baixas[str(item["pagamento_id"])] = {
+            "pago_em": pago_em.isoformat() if isinstance(pago_em, date) else str(pago_em),
+            "valor_pago": _money_str(Decimal(str(valor_pago))) if valor_pago not in (None, "") else None,
+        }
+    return baixas
+
+
+def _blocos_por_contrato(pagamentos: List[Dict[str, Any]], tamanho: int) -> List[List[Tuple[str, List[Dict[str, Any]]]]]:
+    """Contratos em ordem de id, em blocos de ~`tamanho` pagamentos (um contrato nunca é dividido)."""
+    por_contrato: Dict[str, List[Dict[str, Any]]] = {}
+    for row in sorted(pagamentos, key=lambda row: (str(row.get("contrato_id") or ""), str(row["id"]))):
+        por_contrato.setdefault(str(row.get("contrato_id") or ""), []).append(row)
+    blocos: List[List[Tuple[str, List[Dict[str, Any]]]]] = []
+    atual: List[Tuple[str, List[Dict[str, Any]]]] = []
+    quantidade = 0
+    for contrato_id, rows in por_contrato.items():
+        if atual and quantidade + len(rows) > tamanho:
+            blocos.append(atual)
+            atual, quantidade = [], 0
+        atual.append((contrato_id, rows))
+        quantidade += len(rows)
+    if atual:
+        blocos.append(atual)
+    return blocos
+
+
+def _baixar(
+    supa: Client,
+    *,
+    org_id: str,
+    pagamentos: List[Dict[str, Any]],
+    baixas: Dict[str, Dict[str, Optional[str]]],
+) -> List[Dict[str, Any]]:
+    """Um update por (data, valor pago), só nos que ainda estão em aberto."""
+    grupos: Dict[Tuple[str, Optional[str]], List[str]] = {}
+    for row in pagamentos:
+        baixa = baixas[str(row["id"])]
+        grupos.setdefault((baixa["pago_em"], baixa["valor_pago"]), []).append(str(row["id"]))
+    now = _now_iso()
+    baixados: List[Dict[str, Any]] = []
+    for (pago_em, valor_pago), ids in sorted(grupos.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        patch: Dict[str, Any] = {"status": "pago", "pago_em": pago_em, "updated_at": now}
+        if valor_pago is not None:
+            patch["valor"] = valor_pago
+        for chunk in chunks(sorted(ids)):
+            resp = (
+                supa.table("pagamentos")
+                .update(patch)
+                .eq("org_id", org_id)
+                .in_("id", chunk)
+                .in_("status", list(STATUS_ABERTOS))
+                .execute()
+            )
+            baixados.extend(safe_rows(resp))
+    return baixados
+
+
+def confirmar_baixas(
+    supa: Client,
+    *,
+    org_id: str,
+    baixas: Dict[str, Dict[str, Optional[str]]],
+    actor_id: Optional[str],
+    progresso: Optional[Progresso] = None,
+    contadores: Optional[Dict[str, Any]] = None,
+    retomada: bool = False,
+) -> Dict[str, Any]:
+    """Baixa os pagamentos em aberto, bloco a bloco de contratos.
+
+    `contadores` continua uma execução anterior (com `ultimo_contrato_id`); na
+    retomada, os pagamentos já `pago` dos contratos seguintes também têm a
+    comissão processada, porque o bloco interrompido pode ter baixado sem
+    chegar à comissão.
+    """
+    contadores = {
+        "total": len(baixas),
+        "processados": 0,
+        "baixados": 0,
+        "ignorados": 0,
+        "contratos_processados": 0,
+        "erros": 0,
+        "erros_detalhe": [],
+        **(contadores or {}),
+    }
+    ultimo = contadores.get("ultimo_contrato_id")
+    pagamentos = fetch_in(supa, "pagamentos", org_id, "id", baixas, columns="id, contrato_id, status")
+    abertos: List[Dict[str, Any]] = []
+    ja_pagos: List[Dict[str, Any]] = []
+    for row in pagamentos:
+        if ultimo is not None and str(row.get("contrato_id") or "") <= ultimo:
+            continue
+        status = (row.get("status") or "").lower()
+        if status in STATUS_ABERTOS:
+            abertos.append(row)
+        elif retomada and status == "pago":
+            ja_pagos.append(row)
+    if ultimo is None:
+        contadores["ignorados"] = len(baixas) - len(abertos)
+        contadores["processados"] = contadores["ignorados"]
+        if progresso:
+            progresso(contadores)
+
+    ja_pagos_ids = {str(row["id"]) for row in ja_pagos}
+    for bloco in _blocos_por_contrato(abertos + ja_pagos, BAIXAS_POR_BLOCO):
+        baixados = _baixar(
+            supa,
+            org_id=org_id,
+            pagamentos=[row for _, rows in bloco for row in rows if str(row["id"]) not in ja_pagos_ids],
+            baixas=baixas,
+        )
+        baixados_ids = {str(row["id"]) for row in baixados}
+        for contrato_id, rows in bloco:
+            pagamento_ids = [str(row["id"]) for row in rows if str(row["id"]) in baixados_ids | ja_pagos_ids]
+            if not contrato_id or not pagamento_ids:
+                continue
+            erro = _processar_comissao_contrato(
+                supa, org_id=org_id, contrato_id=contrato_id, pagamento_ids=pagamento_ids, actor_id=actor_id
+            )
+            if erro:
+                contadores["erros"] += 1
+                if len(contadores["erros_detalhe"]) < MAX_ERROS_DETALHE:
+                    contadores["erros_detalhe"].append({"contrato_id": contrato_id, "erro": erro})
+            else:
+                contadores["contratos_processados"] += 1
+
+        contadores["baixados"] += len(baixados)
+        contadores["processados"] += sum(1 for _, rows in bloco for row in rows if str(row["id"]) not in ja_pagos_ids)
+        contadores["ultimo_contrato_id"] = bloco[-1][0]
+        if progresso:
+            progresso(contadores)
+    contadores["processados"] = contadores["total"]
+    return contadores
+
+
+def get_job_or_404(supa: Client, org_id: str, job_id: str) -> Dict[str, Any]:
+    return get_org_record_or_404(supa, JOBS_TABLE, org_id, job_id)
+
+
+def executar_job(supa: Client, job: Dict[str, Any], *, retomada: bool = False) -> Dict[str, Any]:
+    """Executa o job já reivindicado a partir do último bloco gravado."""
+    job_id = job["id"]
+    anteriores: Dict[str, Any] = {}
+    if job.get("ultimo_contrato_id") is not None:
+        anteriores = {
+            key: job.get(key) or 0
+            for key in ("processados", "baixados", "ignorados", "contratos_processados", "erros")
+        }
+        anteriores.update(
+            ultimo_contrato_id=job["ultimo_contrato_id"],
+            erros_detalhe=list(job.get("erros_detalhe") or []),
+        )
+    try:
+        contadores = confirmar_baixas(
+            supa,
+            org_id=job["org_id"],
+            baixas=job.get("baixas") or {},
+            actor_id=job.get("created_by"),
+            progresso=lambda contadores: _jobs.update(supa, job_id, dict(contadores)),
+            contadores=anteriores,
+            retomada=retomada,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("conciliacao_job_error", extra={"job_id": job_id})
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc)})
+        return {"id": job_id, "status": "falhou"}
+
+    status = "concluido_com_erros" if contadores["erros"] else "concluido"
+    _jobs.update(supa, job_id, {**contadores, "status": status, "concluido_em": now_iso()})
+    return {"id": job_id, "status": status, **contadores}
+
+
+def aguardar(job_id: str, timeout: Optional[float] = None) -> None:
+    """Espera o job terminar (útil em testes e scripts)."""
+    _jobs.aguardar(job_id, timeout)
+
+
+def iniciar_confirmacao(
+    supa: Client,
+    *,
+    org_id: str,
+    itens: List[Dict[str, Any]],
+    actor_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Grava as baixas confirmadas (`{pagamento_id, pago_em, valor_pago}`) num job
+    e dispara o processamento em segundo plano."""
+    baixas = normalizar_baixas(itens)
+    if not baixas:
+        raise HTTPException(400, "Nenhuma baixa informada")
+    now = now_iso()
+    resp = supa.table(JOBS_TABLE).insert(
+        {
+            "org_id": org_id,
+            "status": "pendente",
+            "baixas": baixas,
+            "total": len(baixas),
+            "processados": 0,
+            "baixados": 0,
+            "ignorados": 0,
+            "contratos_processados": 0,
+            "erros": 0,
+            "created_by": actor_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+    ).execute()
+    rows = safe_rows(resp)
+    if not rows:
+        raise HTTPException(500, "Erro ao criar job de conciliação")
+    job = rows[0]
+    _jobs.disparar(supa, job["id"], executar_job)
+    return job
+
+
+def retomar_confirmacao(supa: Client, *, org_id: str, job_id: str) -> Dict[str, Any]:
+    """Continua um job que falhou ou foi interrompido, do último bloco gravado."""
+    job = get_job_or_404(supa, org_id, job_id)
+    if job.get("status") in ("concluido", "concluido_com_erros"):
+        return job
+    job = _jobs.reabrir(supa, job)
+    _jobs.disparar(supa, job["id"], lambda supa, reivindicado: executar_job(supa, reivindicado, retomada=True))
+    return job
+
+
+def status_confirmacao(supa: Client, *, org_id: str, job_id: str) -> Dict[str, Any]:
+    job = get_job_or_404(supa, org_id, job_id)
+    total = int(job.get("total") or 0)
+    processados = int(job.get("processados") or 0)
+    return {
+        "ok": True,
+        "item": {key: value for key, value in job.items() if key != "baixas"},
+        "em_execucao": _jobs.em_execucao(job),
+        "percentual": round(processados * 100 / total, 2) if total else 100.0,
+    }
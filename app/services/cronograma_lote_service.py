@@ -0,0 +1,498 @@
+"""Geração do cronograma de pagamentos em lote (carteira inteira ou recorte).
+
+`gerar_cronograma_pagamentos_contrato` atende um contrato por chamada e grava
+uma linha por vez — depois de importar uma carteira, isso vira centenas de
+requisições. Aqui o job:
+
+1. resolve os contratos (informados, das cotas informadas ou todos da org);
+2. a cada bloco de contratos carrega contratos, cotas, configs, regras, pulos,
+   contemplações e pagamentos já existentes em poucas consultas `in.(...)`;
+3. calcula em memória a competência de cada regra com
+   `_resolve_regra_competencia_prevista` (mesma regra do motor, com pulos);
+4. grava as parcelas novas com insert em bloco e enfileira os eventos de
+   comissão no outbox (`enfileirar_eventos_novos`);
+5. persiste o progresso no job a cada bloco, com o último contrato gravado
+   (`ultimo_contrato_id`): um job que falhou ou foi interrompido continua dali.
+   As parcelas levam o id do job no payload; na retomada, as do bloco
+   interrompido que ficaram sem evento de comissão (queda entre o insert e o
+   enfileiramento) são enfileiradas antes de seguir.
+
+O job só roda depois de reivindicado no banco (`app/core/jobs.py`), então dois
+processos não geram as mesmas parcelas.
+
+É um gerador de *onboarding*: só cria o que falta. Regra que já tem parcela
+no cronograma, competência já ocupada por outro pagamento mensal ou pulada
+fica como está — mover/cancelar parcelas continua sendo papel da geração por
+contrato.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.core.jobs import JobRunner, now_iso
+from app.core.supabase_lote import LOTE_CHUNK, chunks, fetch_in, safe_rows
+from app.services import comissao_eventos_service
+from app.services.comissao_competencia_service import (
+    _resolve_regra_competencia_prevista,
+    month_start,
+    parse_date,
+)
+from app.services.comissao_service import get_org_record_or_404
+from app.services.pagamentos_service import cronograma_payload
+
+logger = logging.getLogger(__name__)
+
+JOBS_TABLE = "cronograma_lote_jobs"
+
+# Contratos carregados, calculados e gravados por vez (progresso é salvo a cada bloco).
+CONTRATOS_POR_BLOCO = 200
+# Página da listagem de contratos da org (keyset por id).
+CONTRATOS_PAGE_SIZE = 1000
+# Quantos erros por contrato guardar no job (o total fica em `erros`).
+MAX_ERROS_DETALHE = 200
+
+_jobs = JobRunner(JOBS_TABLE, nome="cronograma-lote", em_execucao_msg="Geração de cronogramas já está em execução")
+
+Progresso = Callable[[Dict[str, Any]], None]
+
+# Chave do payload das parcelas com o job que as criou.
+JOB_PAYLOAD_KEY = "cronograma_lote_job_id"
+
+
+# ---------------------------------------------------------------------------
+# Seleção dos contratos
+# ---------------------------------------------------------------------------
+
+
+def _contratos_da_org(supa: Client, org_id: str) -> List[str]:
+    ids: List[str] = []
+    last_id: Optional[str] = None
+    while True:
+        query = supa.table("contratos").select("id").eq("org_id", org_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = safe_rows(query.order("id").limit(CONTRATOS_PAGE_SIZE).execute())
+        ids.extend(row["id"] for row in page)
+        if len(page) < CONTRATOS_PAGE_SIZE:
+            return ids
+        last_id = page[-1]["id"]
+
+
+def resolver_contratos(
+    supa: Client,
+    org_id: str,
+    *,
+    contrato_ids: Optional[List[str]] = None,
+    cota_ids: Optional[List[str]] = None,
+) -> List[str]:
+    if contrato_ids:
+        ids = [row["id"] for row in fetch_in(supa, "contratos", org_id, "id", contrato_ids, columns="id")]
+    elif cota_ids:
+        ids = [row["id"] for row in fetch_in(supa, "contratos", org_id, "cota_id", cota_ids, columns="id")]
+    else:
+        ids = _contratos_da_org(supa, org_id)
+    return sorted(dict.fromkeys(str(contrato_id) for contrato_id in ids))
+
+
+# ---------------------------------------------------------------------------
+# Cálculo em memória
+# ---------------------------------------------------------------------------
+
+
+def _carregar_bloco(supa: Client, org_id: str, contrato_ids: List[str]) -> List[Dict[str, Any]]:
+    """Contexto de cada contrato do bloco, sem consultas por contrato."""
+    contratos = fetch_in(
+        supa,
+        "contratos",
+        org_id,
+        "id",
+        contrato_ids,
+        columns="id, org_id, cota_id, numero, status, data_contemplacao",
+    )
+    cota_ids = [contrato["cota_id"] for contrato in contratos if contrato.get("cota_id")]
+    cotas = {
+        row["id"]: row
+        for row in fetch_in(
+            supa,
+            "cotas",
+            org_id,
+            "id",
+            cota_ids,
+            columns="id, org_id, numero_cota, grupo_codigo, valor_carta, data_adesao, assembleia_dia, furo_meses, status",
+        )
+    }
+    configs: Dict[str, Dict[str, Any]] = {}
+    for row in fetch_in(supa, "cota_comissao_config", org_id, "cota_id", cota_ids):
+        configs.setdefault(row["cota_id"], row)
+
+    regras: Dict[str, List[Dict[str, Any]]] = {}
+    for row in fetch_in(
+        supa,
+        "cota_comissao_regras",
+        org_id,
+        "cota_comissao_config_id",
+        [config["id"] for config in configs.values()],
+        order="ordem",
+    ):
+        regras.setdefault(row["cota_comissao_config_id"], []).append(row)
+
+    pulos: Dict[str, List[date]] = {}
+    for row in fetch_in(
+        supa,
+        "cota_pagamento_pulos",
+        org_id,
+        "contrato_id",
+        contrato_ids,
+        columns="contrato_id, competencia",
+        order="competencia",
+    ):
+        d = parse_date(row.get("competencia"))
+        if d:
+            pulos.setdefault(row["contrato_id"], []).append(d)
+
+    contemplacoes: Dict[str, date] = {}
+    for row in fetch_in(
+        supa, "contemplacoes", org_id, "cota_id", cota_ids, columns="cota_id, data", order="data", desc=True
+    ):
+        d = parse_date(row.get("data"))
+        if d and row["cota_id"] not in contemplacoes:
+            contemplacoes[row["cota_id"]] = month_start(d)
+
+    pagamentos: Dict[str, List[Dict[str, Any]]] = {}
+    for row in fetch_in(
+        supa,
+        "pagamentos",
+        org_id,
+        "contrato_id",
+        contrato_ids,
+        columns="id, contrato_id, tipo, competencia, status, payload",
+    ):
+        if row.get("tipo") == "parcela_mensal":
+            pagamentos.setdefault(row["contrato_id"], []).append(row)
+
+    contexto: List[Dict[str, Any]] = []
+    for contrato in contratos:
+        cota = cotas.get(contrato.get("cota_id"))
+        config = configs.get(contrato.get("cota_id"))
+        contemplacao = parse_date(contrato.get("data_contemplacao"))
+        contexto.append(
+            {
+                "contrato": contrato,
+                "cota": cota,
+                "config": config,
+                "regras": regras.get(config["id"], []) if config else [],
+                "pulos": pulos.get(contrato["id"], []),
+                "contemplacao": month_start(contemplacao) if contemplacao else contemplacoes.get(contrato.get("cota_id")),
+                "pagamentos": pagamentos.get(contrato["id"], []),
+            }
+        )
+    return contexto
+
+
+def planejar_contrato(
+    supa: Client,
+    *,
+    org_id: str,
+    actor_id: str,
+    ctx: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Parcelas que faltam no cronograma de um contrato já carregado.
+
+    Levanta HTTPException com a mesma mensagem da geração por contrato quando
+    falta cota/config/regras ou valor da carta.
+    """
+    contrato, cota, config = ctx["contrato"], ctx["cota"], ctx["config"]
+    if not cota:
+        raise HTTPException(400, "Contrato sem cota vinculada")
+    if not config or not config.get("ativo", True):
+        raise HTTPException(400, "A cota não possui configuração ativa de comissão")
+    if not ctx["regras"]:
+        raise HTTPException(400, "A comissão da cota não possui regras configuradas")
+    valor_carta = Decimal(str(cota.get("valor_carta") or 0))
+    if valor_carta <= 0:
+        raise HTTPException(400, "valor_carta precisa ser maior que zero para gerar o cronograma")
+
+    regras_com_parcela = set()
+    ocupadas = set()
+    for row in ctx["pagamentos"]:
+        payload = row.get("payload") or {}
+        if payload.get("source_module") == "financeiro_cronograma_comissao" and payload.get("regra_id"):
+            regras_com_parcela.add(str(payload["regra_id"]))
+        if (row.get("status") or "").lower() != "cancelado" and row.get("competencia"):
+            ocupadas.add(str(row["competencia"])[:10])
+    puladas = {pulo.isoformat() for pulo in ctx["pulos"]}
+
+    novos: List[Dict[str, Any]] = []
+    ignoradas = 0
+    for regra in sorted(ctx["regras"], key=lambda row: int(row.get("ordem") or 0)):
+        if str(regra["id"]) in regras_com_parcela:
+            ignoradas += 1
+            continue
+        competencia = _resolve_regra_competencia_prevista(
+            supa=supa,
+            org_id=org_id,
+            contrato=contrato,
+            cota=cota,
+            config=config,
+            regra=regra,
+            pulos=ctx["pulos"],
+            contemplacao=ctx["contemplacao"],
+        )
+        if not competencia:
+            continue
+        key = competencia.isoformat()
+        if key in ocupadas or key in puladas:
+            ignoradas += 1
+            continue
+        ocupadas.add(key)
+        percentual = Decimal(str(regra.get("percentual_comissao") or 0))
+        novos.append(
+            cronograma_payload(
+                org_id=org_id,
+                actor_id=actor_id,
+                contrato=contrato,
+                cota=cota,
+                regra=regra,
+                competencia=competencia,
+                valor=valor_carta * (percentual / Decimal("100")),
+            )
+        )
+    return {"pagamentos": novos, "ignoradas": ignoradas}
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+
+def gerar_cronogramas(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_ids: List[str],
+    actor_id: str,
+    progresso: Optional[Progresso] = None,
+    contadores: Optional[Dict[str, Any]] = None,
+    job_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Gera as parcelas que faltam para os contratos, bloco a bloco.
+
+    `progresso` recebe os contadores acumulados ao fim de cada bloco, com o
+    último contrato do bloco em `ultimo_contrato_id` (checkpoint da retomada).
+    `contadores` continua a contagem de uma execução anterior. `job_id` vai no
+    payload das parcelas criadas (`reenfileirar_sem_evento` acha as do job).
+    """
+    contadores = {
+        "total": len(contrato_ids),
+        "processados": 0,
+        "pagamentos_criados": 0,
+        "competencias_ignoradas": 0,
+        "erros": 0,
+        "erros_detalhe": [],
+        **(contadores or {}),
+    }
+    for bloco in chunks(contrato_ids, CONTRATOS_POR_BLOCO):
+        novos: List[Dict[str, Any]] = []
+        for ctx in _carregar_bloco(supa, org_id, bloco):
+            try:
+                plano = planejar_contrato(supa, org_id=org_id, actor_id=actor_id, ctx=ctx)
+            except HTTPException as exc:
+                contadores["erros"] += 1
+                if len(contadores["erros_detalhe"]) < MAX_ERROS_DETALHE:
+                    contadores["erros_detalhe"].append({"contrato_id": ctx["contrato"]["id"], "erro": str(exc.detail)})
+                continue
+            novos.extend(plano["pagamentos"])
+            contadores["competencias_ignoradas"] += plano["ignoradas"]
+        if job_id:
+            for row in novos:
+                row["payload"] = {**(row.get("payload") or {}), JOB_PAYLOAD_KEY: job_id}
+
+        criados: List[str] = []
+        for chunk in chunks(novos, LOTE_CHUNK):
+            criados.extend(row["id"] for row in safe_rows(supa.table("pagamentos").insert(chunk).execute()))
+        if criados:
+            comissao_eventos_service.enfileirar_eventos_novos(
+                supa, org_id=org_id, pagamento_ids=criados, actor_id=actor_id
+            )
+
+        contadores["pagamentos_criados"] += len(criados)
+        contadores["processados"] += len(bloco)
+        contadores["ultimo_contrato_id"] = bloco[-1]
+        if progresso:
+            progresso(contadores)
+    return contadores
+
+
+def reenfileirar_sem_evento(
+    supa: Client,
+    *,
+    org_id: str,
+    job_id: str,
+    contrato_ids: List[str],
+    actor_id: Optional[str],
+) -> int:
+    """Enfileira os eventos das parcelas do job nesses contratos que ficaram sem evento.
+
+    O insert das parcelas e o enfileiramento não são uma transação: se o
+    processo cai entre os dois, a retomada não recria as parcelas (já existem)
+    e a comissão delas nunca seria processada.
+    """
+    if not contrato_ids:
+        return 0
+    do_job = [
+        str(row["id"])
+        for row in fetch_in(supa, "pagamentos", org_id, "contrato_id", contrato_ids, columns="id, payload")
+        if (row.get("payload") or {}).get(JOB_PAYLOAD_KEY) == job_id
+    ]
+    if not do_job:
+        return 0
+    try:
+        com_evento = {
+            str(row["pagamento_id"])
+            for row in fetch_in(
+                supa, comissao_eventos_service.EVENTOS_TABLE, org_id, "pagamento_id", do_job, columns="id, pagamento_id"
+            )
+        }
+    except APIError as exc:
+        if not comissao_eventos_service._is_missing_outbox(exc):
+            raise
+        # sem outbox a comissão foi (ou não) processada na hora; reprocessar é idempotente
+        com_evento = set()
+    faltando = [pagamento_id for pagamento_id in do_job if pagamento_id not in com_evento]
+    if faltando:
+        logger.warning("cronograma_lote_reenfileirados", extra={"job_id": job_id, "quantidade": len(faltando)})
+        comissao_eventos_service.enfileirar_eventos_novos(
+            supa, org_id=org_id, pagamento_ids=faltando, actor_id=actor_id
+        )
+    return len(faltando)
+
+
+def get_job_or_404(supa: Client, org_id: str, job_id: str) -> Dict[str, Any]:
+    return get_org_record_or_404(supa, JOBS_TABLE, org_id, job_id)
+
+
+def executar_job(supa: Client, job: Dict[str, Any], contrato_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Executa o job já reivindicado a partir do último bloco gravado.
+
+    Sem `contrato_ids` (retomada), os contratos saem de novo do filtro do job;
+    os que vão até `ultimo_contrato_id` já foram processados e ficam de fora.
+    """
+    job_id = job["id"]
+    retomada = contrato_ids is None
+    try:
+        if contrato_ids is None:
+            filtro = job.get("filtro") or {}
+            contrato_ids = resolver_contratos(
+                supa, job["org_id"], contrato_ids=filtro.get("contrato_ids"), cota_ids=filtro.get("cota_ids")
+            )
+        ultimo = job.get("ultimo_contrato_id")
+        restantes = [contrato_id for contrato_id in contrato_ids if ultimo is None or contrato_id > str(ultimo)]
+        processados = int(job.get("processados") or 0) if ultimo is not None else 0
+        anteriores: Dict[str, Any] = {"total": processados + len(restantes)}
+        if ultimo is not None:
+            anteriores.update(
+                processados=processados,
+                pagamentos_criados=int(job.get("pagamentos_criados") or 0),
+                competencias_ignoradas=int(job.get("competencias_ignoradas") or 0),
+                erros=int(job.get("erros") or 0),
+                erros_detalhe=list(job.get("erros_detalhe") or []),
+            )
+        if retomada:
+            # o bloco interrompido é o primeiro depois do checkpoint
+            reenfileirados = reenfileirar_sem_evento(
+                supa,
+                org_id=job["org_id"],
+                job_id=job_id,
+                contrato_ids=restantes[:CONTRATOS_POR_BLOCO],
+                actor_id=job.get("created_by"),
+            )
+            anteriores["pagamentos_criados"] = anteriores.get("pagamentos_criados", 0) + reenfileirados
+        contadores = gerar_cronogramas(
+            supa,
+            org_id=job["org_id"],
+            contrato_ids=restantes,
+            actor_id=job.get("created_by"),
+            progresso=lambda contadores: _jobs.update(supa, job_id, dict(contadores)),
+            contadores=anteriores,
+            job_id=job_id,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("cronograma_lote_job_error", extra={"job_id": job_id})
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc)})
+        return {"id": job_id, "status": "falhou"}
+
+    status = "concluido_com_erros" if contadores["erros"] else "concluido"
+    _jobs.update(supa, job_id, {"status": status, "total": contadores["total"], "concluido_em": now_iso()})
+    return {"id": job_id, "status": status, **contadores}
+
+
+def aguardar(job_id: str, timeout: Optional[float] = None) -> None:
+    """Espera o job terminar (útil em testes e scripts)."""
+    _jobs.aguardar(job_id, timeout)
+
+
+def iniciar_geracao(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_ids: Optional[List[str]] = None,
+    cota_ids: Optional[List[str]] = None,
+    actor_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    ids = resolver_contratos(supa, org_id, contrato_ids=contrato_ids, cota_ids=cota_ids)
+    now = now_iso()
+    resp = supa.table(JOBS_TABLE).insert(
+        {
+            "org_id": org_id,
+            "status": "pendente",
+            "filtro": {"contrato_ids": contrato_ids or [], "cota_ids": cota_ids or []},
+            "total": len(ids),
+            "processados": 0,
+            "pagamentos_criados": 0,
+            "competencias_ignoradas": 0,
+            "erros": 0,
+            "created_by": actor_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+    ).execute()
+    rows = safe_rows(resp)
+    if not rows:
+        raise HTTPException(500, "Erro ao criar job de geração de cronogramas")
+    job = rows[0]
+
+    if not ids:
+        _jobs.update(supa, job["id"], {"status": "concluido", "concluido_em": now})
+        return {**job, "status": "concluido", "concluido_em": now}
+
+    _jobs.disparar(supa, job["id"], lambda supa, reivindicado: executar_job(supa, reivindicado, ids))
+    return job
+
+
+def retomar_geracao(supa: Client, *, org_id: str, job_id: str) -> Dict[str, Any]:
+    """Continua um job que falhou ou foi interrompido, do último bloco gravado."""
+    job = get_job_or_404(supa, org_id, job_id)
+    if job.get("status") in ("concluido", "concluido_com_erros"):
+        return job
+    job = _jobs.reabrir(supa, job)
+    _jobs.disparar(supa, job["id"], executar_job)
+    return job
+
+
+def status_geracao(supa: Client, *, org_id: str, job_id: str) -> Dict[str, Any]:
+    job = get_job_or_404(supa, org_id, job_id)
+    total = int(job.get("total") or 0)
+    processados = int(job.get("processados") or 0)
+    return {
+        "ok": True,
+        "item": job,
+        "em_execucao": _jobs.em_execucao(job),
+        "percentual": round(processados * 100 / total, 2) if total else 100.0,
+    }
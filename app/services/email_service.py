@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 import os
-import requests
+
+from app.core import http_client
 
 
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
@@ -43,7 +44,7 @@ def send_system_email(
     if html_body:
         payload["html"] = html_body
 
-    resp = requests.post(
+    resp = http_client.post(
         "https://api.resend.com/emails",
         json=payload,
         headers={
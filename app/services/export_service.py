@@ -0,0 +1,275 @@
+"""Exportação em streaming (CSV e XLSX) para as telas financeiras.
+
+As rotas de exportação passam um iterador de linhas (que pagina a consulta por
+baixo) e uma lista de colunas; aqui as linhas viram bytes à medida que chegam,
+sem montar o arquivo inteiro em memória.
+
+- CSV: UTF-8 com BOM e `;` (abre direto no Excel pt-BR).
+- XLSX: planilha única escrita como zip em streaming (sem dependência extra);
+  valores monetários vão como número, com o mesmo arredondamento de
+  `summarize_lancamentos` (2 casas, ROUND_HALF_UP).
+
+Texto que começa com `=`, `+`, `-`, `@`, tab ou CR sai prefixado com `'`, para
+a planilha não interpretar nome de parceiro/observação como fórmula.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+import unicodedata
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+ExportFormato = Literal["csv", "xlsx"]
+
+MONEY_Q = Decimal("0.01")
+# Quantas linhas acumular antes de devolver um pedaço ao cliente.
+FLUSH_EVERY = 200
+
+# Caracteres que fazem Excel/LibreOffice tratar a célula como fórmula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    titulo: str
+    campo: str | Callable[[Dict[str, Any]], Any]
+    tipo: Literal["texto", "dinheiro", "numero"] = "texto"
+
+    def valor(self, row: Dict[str, Any]) -> Any:
+        if callable(self.campo):
+            return self.campo(row)
+        return row.get(self.campo)
+
+
+def format_money(value: Any) -> str:
+    if value is None or value == "":
+        return ""
+    try:
+        return str(Decimal(str(value)).quantize(MONEY_Q, rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        return str(value)
+
+
+def _texto(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "sim" if value else "nao"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _is_number(text: str) -> bool:
+    try:
+        Decimal(text)
+    except InvalidOperation:
+        return False
+    return True
+
+
+def _sem_formula(text: str) -> str:
+    if text.startswith(FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+def _cell_text(column: ExportColumn, row: Dict[str, Any]) -> str:
+    value = column.valor(row)
+    text = format_money(value) if column.tipo == "dinheiro" else _texto(value)
+    if column.tipo != "texto" and _is_number(text):
+        return text
+    return _sem_formula(text)
+
+
+# ---------------------------------------------------------------------------
+# CSV
+# ---------------------------------------------------------------------------
+
+
+def iter_csv(columns: List[ExportColumn], rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\r\n")
+    writer.writerow([column.titulo for column in columns])
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_cell_text(column, row) for column in columns])
+        pending += 1
+        if pending >= FLUSH_EVERY:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# XLSX
+# ---------------------------------------------------------------------------
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "</Types>"
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    "</Relationships>"
+)
+# Estilo 1 = número com 2 casas (formato embutido 4: "#,##0.00").
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    "</cellXfs>"
+    "</styleSheet>"
+)
+
+
+def _workbook_xml(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    )
+
+
+def _xlsx_cell(column: ExportColumn, row: Dict[str, Any]) -> str:
+    text = _cell_text(column, row)
+    if text == "":
+        return "<c/>"
+    if column.tipo in ("dinheiro", "numero") and _is_number(text):
+        style = ' s="1"' if column.tipo == "dinheiro" else ""
+        return f"<c{style}><v>{text}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_header(columns: List[ExportColumn]) -> str:
+    cells = "".join(f'<c t="inlineStr"><is><t>{escape(column.titulo)}</t></is></c>' for column in columns)
+    return f"<row>{cells}</row>"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino não-seekable do zip: guarda os bytes até o próximo `drain()`."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_xlsx(
+    columns: List[ExportColumn],
+    rows: Iterable[Dict[str, Any]],
+    *,
+    sheet_name: str = "Dados",
+) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _workbook_xml(sheet_name))
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/styles.xml", _STYLES)
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_header(columns).encode("utf-8"))
+            pending = 0
+            for row in rows:
+                sheet.write(("<row>" + "".join(_xlsx_cell(column, row) for column in columns) + "</row>").encode("utf-8"))
+                pending += 1
+                if pending >= FLUSH_EVERY:
+                    data = sink.drain()
+                    if data:
+                        yield data
+                    pending = 0
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def _safe_filename(name: str) -> str:
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", ascii_name).strip("-") or "export"
+
+
+def export_response(
+    formato: ExportFormato,
+    *,
+    filename: str,
+    columns: List[ExportColumn],
+    rows: Iterable[Dict[str, Any]],
+    sheet_name: Optional[str] = None,
+) -> StreamingResponse:
+    if formato == "xlsx":
+        body = iter_xlsx(columns, rows, sheet_name=sheet_name or filename)
+        media_type = XLSX_MEDIA_TYPE
+    else:
+        body = iter_csv(columns, rows)
+        media_type = CSV_MEDIA_TYPE
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{_safe_filename(filename)}.{formato}"'},
+    )
@@ -9,6 +9,7 @@ from supabase import Client
 from app.schemas.kanban import KanbanSnapshot, LeadCard, Stage, KanbanMetrics
 
 from app.schemas.kanban import Interest
+from app.services import busca_service
 from app.services.lead_address_service import LEAD_ADDRESS_SELECT
 from app.services.kanban_interest_insights import build_interest_insight
 from app.services.meta_leads_service import extract_meta_ads_summary
@@ -46,6 +47,7 @@ def build_kanban_snapshot(
     show_active: bool = False,
     show_lost: bool = False,
     show_cold: bool = False,
+    q: Optional[str] = None,
 ) -> KanbanSnapshot:
     """
     Monta o snapshot de Kanban a partir da tabela leads,
@@ -64,7 +66,7 @@ def build_kanban_snapshot(
         stages.append("perdido")
 
     # 2) Busca os leads da organização nessas etapas
-    resp = (
+    query = (
         supa.table("leads")
         .select(
             "id, nome, etapa, telefone, email, origem, owner_id, created_at, first_contact_at, "
@@ -73,12 +75,20 @@ def build_kanban_snapshot(
         )
         .eq("org_id", org_id)
         .in_("etapa", stages)
-        .execute()
     )
-    rows: List[Dict[str, Any]] = resp.data or []
 
     columns = _empty_columns()
 
+    # busca textual: só os leads encontrados (já nas etapas visíveis), na ordem de relevância
+    encontrados = busca_service.buscar(supa, org_id=org_id, q=q, filtros_lead={"etapas": stages})
+    if encontrados is None:
+        rows: List[Dict[str, Any]] = query.execute().data or []
+    else:
+        ids = busca_service.lead_ids(encontrados)
+        if not ids:
+            return KanbanSnapshot(columns=columns)
+        rows = busca_service.ordenar_por_relevancia(query.in_("id", ids).execute().data or [], ids, "id")
+
     if not rows:
         return KanbanSnapshot(columns=columns)
 
@@ -0,0 +1,502 @@
+"""Estatísticas de lances vencedores por administradora/grupo.
+
+O histórico de lances e contemplações só aparece por cota. Aqui ele é agregado
+por (administradora, grupo, competência) e resumido por grupo, para a
+listagem das cartas e o simulador da IA mostrarem "lance necessário para
+p50/p80" sem varrer o histórico a cada requisição.
+
+Definições:
+
+- lance vencedor: contemplação com `motivo = 'lance'` (percentual da
+  contemplação) ou lance com `resultado = 'contemplado'`, um por cota e
+  competência (a contemplação prevalece);
+- lance decidido: lance com resultado `contemplado` ou `nao_contemplado`;
+- corte da competência: menor percentual vencedor da assembleia, ou seja, o
+  que bastou para ser contemplado naquele mês;
+- `lance_p50`/`lance_p80`: percentis (interpolação linear, como o
+  `percentile_cont` do Postgres) dos cortes dos últimos
+  `LANCE_ESTATISTICAS_JANELA_MESES` meses, contados a partir da última
+  competência com histórico do grupo. Um lance de `lance_p80` teria sido
+  suficiente em ~80% dessas assembleias;
+- `tendencia_pp_mes`: inclinação (mínimos quadrados) do corte, em pontos
+  percentuais por mês;
+- `taxa_contemplacao`: vencedores / lances decididos na janela.
+
+Os resultados ficam em `lance_estatisticas_mensais` e
+`lance_estatisticas_grupos` (migration 018). `atualizar_grupos` recalcula só os
+grupos afetados depois de uma assembleia (resultado de lance, contemplação);
+`reconstruir_estatisticas` refaz a org inteira.
+
+O recálculo não roda na requisição do lance: `atualizar_apos_assembleia` só
+marca os grupos em `lance_estatisticas_pendencias` (migration 022) e
+`processar_pendencias`, chamado pelo agendador embutido, recalcula os grupos
+marcados.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.core.config import settings
+from app.core.supabase_lote import LOTE_CHUNK, chunks, fetch_in, safe_rows, select_paginado
+
+logger = logging.getLogger(__name__)
+
+MENSAIS_TABLE = "lance_estatisticas_mensais"
+GRUPOS_TABLE = "lance_estatisticas_grupos"
+PENDENCIAS_TABLE = "lance_estatisticas_pendencias"
+RESULTADOS_DECIDIDOS = ("contemplado", "nao_contemplado")
+
+_Grupo = Tuple[str, str]  # (administradora_id, grupo_codigo)
+
+
+# ---------------------------------------------------------------------------
+# Cálculo
+# ---------------------------------------------------------------------------
+
+
+def percentil(valores_ordenados: List[float], p: float) -> Optional[float]:
+    """Percentil com interpolação linear (`percentile_cont`); p em [0, 1]."""
+    if not valores_ordenados:
+        return None
+    posicao = (len(valores_ordenados) - 1) * p
+    base = int(posicao)
+    fracao = posicao - base
+    if base + 1 >= len(valores_ordenados):
+        return valores_ordenados[-1]
+    return valores_ordenados[base] + (valores_ordenados[base + 1] - valores_ordenados[base]) * fracao
+
+
+def tendencia(pontos: List[Tuple[int, float]]) -> Optional[float]:
+    """Inclinação da reta de mínimos quadrados; None com menos de 2 meses."""
+    if len(pontos) < 2:
+        return None
+    n = len(pontos)
+    media_x = sum(x for x, _ in pontos) / n
+    media_y = sum(y for _, y in pontos) / n
+    var_x = sum((x - media_x) ** 2 for x, _ in pontos)
+    if not var_x:
+        return None
+    return sum((x - media_x) * (y - media_y) for x, y in pontos) / var_x
+
+
+def _pct(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return str(Decimal(str(value)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP))
+
+
+def _competencia(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        parsed = date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+    return date(parsed.year, parsed.month, 1)
+
+
+def _mes_index(competencia: date) -> int:
+    return competencia.year * 12 + competencia.month - 1
+
+
+def calcular_estatisticas(
+    *,
+    cotas: Dict[str, Dict[str, Any]],
+    lances: Iterable[Dict[str, Any]],
+    contemplacoes: Iterable[Dict[str, Any]],
+    janela_meses: Optional[int] = None,
+) -> Tuple[Dict[Tuple[str, str, date], Dict[str, Any]], Dict[_Grupo, Dict[str, Any]]]:
+    """Linhas mensais e resumo por grupo a partir do histórico já carregado."""
+    janela = max(int(janela_meses or settings.LANCE_ESTATISTICAS_JANELA_MESES), 1)
+
+    decididos: Dict[Tuple[str, str, date], int] = {}
+    vencedores: Dict[Tuple[str, date], Tuple[_Grupo, Optional[float]]] = {}
+
+    def _grupo_da_cota(cota_id: Any) -> Optional[_Grupo]:
+        cota = cotas.get(str(cota_id))
+        if not cota or not cota.get("administradora_id") or not cota.get("grupo_codigo"):
+            return None
+        return (str(cota["administradora_id"]), str(cota["grupo_codigo"]))
+
+    for lance in lances:
+        grupo = _grupo_da_cota(lance.get("cota_id"))
+        competencia = _competencia(lance.get("assembleia_data"))
+        if grupo is None or competencia is None or lance.get("resultado") not in RESULTADOS_DECIDIDOS:
+            continue
+        chave = (*grupo, competencia)
+        decididos[chave] = decididos.get(chave, 0) + 1
+        if lance["resultado"] == "contemplado":
+            percentual = lance.get("percentual")
+            vencedores.setdefault(
+                (str(lance["cota_id"]), competencia),
+                (grupo, float(percentual) if percentual is not None else None),
+            )
+
+    for contemplacao in contemplacoes:
+        grupo = _grupo_da_cota(contemplacao.get("cota_id"))
+        competencia = _competencia(contemplacao.get("data"))
+        if grupo is None or competencia is None or contemplacao.get("motivo") != "lance":
+            continue
+        percentual = contemplacao.get("lance_percentual")
+        anterior = vencedores.get((str(contemplacao["cota_id"]), competencia))
+        if percentual is None and anterior is not None:
+            continue
+        vencedores[(str(contemplacao["cota_id"]), competencia)] = (
+            grupo,
+            float(percentual) if percentual is not None else None,
+        )
+
+    percentuais: Dict[Tuple[str, str, date], List[float]] = {}
+    quantidade_vencedores: Dict[Tuple[str, str, date], int] = {}
+    for (_, competencia), (grupo, percentual) in vencedores.items():
+        chave = (*grupo, competencia)
+        quantidade_vencedores[chave] = quantidade_vencedores.get(chave, 0) + 1
+        if percentual is not None:
+            percentuais.setdefault(chave, []).append(percentual)
+
+    mensais: Dict[Tuple[str, str, date], Dict[str, Any]] = {}
+    for chave in set(decididos) | set(quantidade_vencedores):
+        valores = sorted(percentuais.get(chave, []))
+        # contemplação registrada sem o lance decidido também conta como oferta
+        ofertados = max(decididos.get(chave, 0), quantidade_vencedores.get(chave, 0))
+        mensais[chave] = {
+            "lances_decididos": ofertados,
+            "lances_vencedores": quantidade_vencedores.get(chave, 0),
+            "corte": valores[0] if valores else None,
+            "maximo": valores[-1] if valores else None,
+            "mediana": percentil(valores, 0.5),
+        }
+
+    por_grupo: Dict[_Grupo, List[Tuple[date, Dict[str, Any]]]] = {}
+    for (administradora_id, grupo_codigo, competencia), linha in mensais.items():
+        por_grupo.setdefault((administradora_id, grupo_codigo), []).append((competencia, linha))
+
+    grupos: Dict[_Grupo, Dict[str, Any]] = {}
+    for grupo, linhas in por_grupo.items():
+        linhas.sort(key=lambda item: item[0])
+        ultima = linhas[-1][0]
+        inicio = _mes_index(ultima) - janela + 1
+        na_janela = [(competencia, linha) for competencia, linha in linhas if _mes_index(competencia) >= inicio]
+        cortes = [(_mes_index(competencia), linha["corte"]) for competencia, linha in na_janela if linha["corte"] is not None]
+        cortes_ordenados = sorted(corte for _, corte in cortes)
+        decididos_janela = sum(linha["lances_decididos"] for _, linha in na_janela)
+        vencedores_janela = sum(linha["lances_vencedores"] for _, linha in na_janela)
+        grupos[grupo] = {
+            "competencia_inicio": na_janela[0][0],
+            "competencia_fim": ultima,
+            "assembleias": len(cortes),
+            "lances_decididos": decididos_janela,
+            "lances_vencedores": vencedores_janela,
+            "lance_p50": percentil(cortes_ordenados, 0.5),
+            "lance_p80": percentil(cortes_ordenados, 0.8),
+            "tendencia_pp_mes": tendencia(cortes),
+            "taxa_contemplacao": (vencedores_janela / decididos_janela) if decididos_janela else None,
+        }
+    return mensais, grupos
+
+
+# ---------------------------------------------------------------------------
+# Carga e gravação
+# ---------------------------------------------------------------------------
+
+_COTA_COLUMNS = "id, administradora_id, grupo_codigo, produto"
+
+
+def _carregar_historico(
+    supa: Client,
+    org_id: str,
+    cotas: Dict[str, Dict[str, Any]],
+    *,
+    org_inteira: bool,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    lance_columns = "id, cota_id, percentual, resultado, assembleia_data"
+    contemplacao_columns = "id, cota_id, motivo, lance_percentual, data"
+    if org_inteira:
+        lances = select_paginado(
+            lambda: supa.table("lances")
+            .select(lance_columns)
+            .eq("org_id", org_id)
+            .in_("resultado", list(RESULTADOS_DECIDIDOS))
+        )
+        contemplacoes = select_paginado(
+            lambda: supa.table("contemplacoes").select(contemplacao_columns).eq("org_id", org_id).eq("motivo", "lance")
+        )
+        return lances, contemplacoes
+    lances = [
+        row
+        for row in fetch_in(supa, "lances", org_id, "cota_id", cotas, columns=lance_columns)
+        if row.get("resultado") in RESULTADOS_DECIDIDOS
+    ]
+    contemplacoes = fetch_in(
+        supa, "contemplacoes", org_id, "cota_id", cotas, columns=contemplacao_columns, filtros={"motivo": "lance"}
+    )
+    return lances, contemplacoes
+
+
+def _produto_predominante(cotas: Dict[str, Dict[str, Any]]) -> Dict[_Grupo, Optional[str]]:
+    contagem: Dict[_Grupo, Dict[str, int]] = {}
+    for cota in cotas.values():
+        if cota.get("administradora_id") and cota.get("grupo_codigo") and cota.get("produto"):
+            chave = (str(cota["administradora_id"]), str(cota["grupo_codigo"]))
+            produtos = contagem.setdefault(chave, {})
+            produtos[cota["produto"]] = produtos.get(cota["produto"], 0) + 1
+    return {chave: max(sorted(produtos), key=produtos.get) for chave, produtos in contagem.items()}
+
+
+def _gravar(
+    supa: Client,
+    org_id: str,
+    grupos_afetados: Iterable[_Grupo],
+    mensais: Dict[Tuple[str, str, date], Dict[str, Any]],
+    grupos: Dict[_Grupo, Dict[str, Any]],
+    produtos: Dict[_Grupo, Optional[str]],
+) -> None:
+    agora = datetime.now(timezone.utc).isoformat()
+    linhas_mensais = [
+        {
+            "org_id": org_id,
+            "administradora_id": administradora_id,
+            "grupo_codigo": grupo_codigo,
+            "competencia": competencia.isoformat(),
+            "lances_decididos": linha["lances_decididos"],
+            "lances_vencedores": linha["lances_vencedores"],
+            "corte_percentual": _pct(linha["corte"]),
+            "mediana_percentual": _pct(linha["mediana"]),
+            "maximo_percentual": _pct(linha["maximo"]),
+            "atualizado_em": agora,
+        }
+        for (administradora_id, grupo_codigo, competencia), linha in sorted(mensais.items())
+    ]
+    linhas_grupos = [
+        {
+            "org_id": org_id,
+            "administradora_id": administradora_id,
+            "grupo_codigo": grupo_codigo,
+            "produto": produtos.get((administradora_id, grupo_codigo)),
+            "competencia_inicio": resumo["competencia_inicio"].isoformat(),
+            "competencia_fim": resumo["competencia_fim"].isoformat(),
+            "assembleias": resumo["assembleias"],
+            "lances_decididos": resumo["lances_decididos"],
+            "lances_vencedores": resumo["lances_vencedores"],
+            "lance_p50": _pct(resumo["lance_p50"]),
+            "lance_p80": _pct(resumo["lance_p80"]),
+            "tendencia_pp_mes": _pct(resumo["tendencia_pp_mes"]),
+            "taxa_contemplacao": _pct(resumo["taxa_contemplacao"]),
+            "atualizado_em": agora,
+        }
+        for (administradora_id, grupo_codigo), resumo in sorted(grupos.items())
+    ]
+
+    for table, linhas, conflito in (
+        (MENSAIS_TABLE, linhas_mensais, "org_id,administradora_id,grupo_codigo,competencia"),
+        (GRUPOS_TABLE, linhas_grupos, "org_id,administradora_id,grupo_codigo"),
+    ):
+        for bloco in chunks(linhas, LOTE_CHUNK):
+            supa.table(table).upsert(bloco, on_conflict=conflito).execute()
+
+    # o que não foi regravado agora saiu do histórico (lance desconsiderado, cota movida)
+    for administradora_id, grupo_codigo in sorted(set(grupos_afetados)):
+        for table in (MENSAIS_TABLE, GRUPOS_TABLE):
+            (
+                supa.table(table)
+                .delete()
+                .eq("org_id", org_id)
+                .eq("administradora_id", administradora_id)
+                .eq("grupo_codigo", grupo_codigo)
+                .lt("atualizado_em", agora)
+                .execute()
+            )
+
+
+def atualizar_grupos(supa: Client, *, org_id: str, grupos: Iterable[_Grupo]) -> Dict[str, int]:
+    """Recalcula só os grupos informados (depois de uma assembleia)."""
+    afetados = sorted({(str(adm), str(grupo)) for adm, grupo in grupos if adm and grupo})
+    cotas: Dict[str, Dict[str, Any]] = {}
+    for administradora_id in sorted({adm for adm, _ in afetados}):
+        codigos = [grupo for adm, grupo in afetados if adm == administradora_id]
+        for row in fetch_in(supa, "cotas", org_id, "grupo_codigo", codigos, columns=_COTA_COLUMNS):
+            if str(row.get("administradora_id")) == administradora_id:
+                cotas[str(row["id"])] = row
+    lances, contemplacoes = _carregar_historico(supa, org_id, cotas, org_inteira=False)
+    mensais, resumos = calcular_estatisticas(cotas=cotas, lances=lances, contemplacoes=contemplacoes)
+    _gravar(supa, org_id, afetados, mensais, resumos, _produto_predominante(cotas))
+    return {"grupos": len(resumos), "competencias": len(mensais)}
+
+
+def reconstruir_estatisticas(supa: Client, *, org_id: str) -> Dict[str, int]:
+    """Refaz as estatísticas de todos os grupos da org."""
+    cotas = {
+        str(row["id"]): row
+        for row in select_paginado(lambda: supa.table("cotas").select(_COTA_COLUMNS).eq("org_id", org_id))
+    }
+    lances, contemplacoes = _carregar_historico(supa, org_id, cotas, org_inteira=True)
+    mensais, resumos = calcular_estatisticas(cotas=cotas, lances=lances, contemplacoes=contemplacoes)
+    existentes = {
+        (str(row["administradora_id"]), str(row["grupo_codigo"]))
+        for row in select_paginado(
+            lambda: supa.table(GRUPOS_TABLE).select("administradora_id, grupo_codigo").eq("org_id", org_id)
+        )
+    }
+    _gravar(supa, org_id, existentes | set(resumos), mensais, resumos, _produto_predominante(cotas))
+    return {"grupos": len(resumos), "competencias": len(mensais)}
+
+
+def _is_missing_table(exc: APIError) -> bool:
+    message = str(getattr(exc, "message", None) or exc)
+    return MENSAIS_TABLE in message or GRUPOS_TABLE in message
+
+
+def _sem_pendencias(exc: APIError) -> bool:
+    return PENDENCIAS_TABLE in str(getattr(exc, "message", None) or exc)
+
+
+def marcar_grupos(supa: Client, *, org_id: str, grupos: Iterable[_Grupo]) -> None:
+    """Marca os grupos para recálculo; marcar de novo só renova `marcado_em`."""
+    agora = datetime.now(timezone.utc).isoformat()
+    linhas = [
+        {"org_id": org_id, "administradora_id": adm, "grupo_codigo": grupo, "marcado_em": agora}
+        for adm, grupo in sorted({(str(adm), str(grupo)) for adm, grupo in grupos if adm and grupo})
+    ]
+    if linhas:
+        supa.table(PENDENCIAS_TABLE).upsert(linhas, on_conflict="org_id,administradora_id,grupo_codigo").execute()
+
+
+def atualizar_apos_assembleia(supa: Client, *, org_id: str, cota_ids: Iterable[str]) -> None:
+    """Gancho dos fluxos de lance/contemplação: marca os grupos das cotas.
+
+    O recálculo fica para `processar_pendencias`; sem a migration 022, ele
+    roda aqui mesmo. Falha aqui não desfaz a operação que já foi gravada; só
+    fica no log.
+    """
+    ids = sorted({str(cota_id) for cota_id in cota_ids if cota_id})
+    if not ids:
+        return
+    try:
+        cotas = fetch_in(supa, "cotas", org_id, "id", ids, columns=_COTA_COLUMNS)
+        grupos = [(cota.get("administradora_id"), cota.get("grupo_codigo")) for cota in cotas]
+        try:
+            marcar_grupos(supa, org_id=org_id, grupos=grupos)
+        except APIError as exc:
+            if not _sem_pendencias(exc):
+                raise
+            atualizar_grupos(supa, org_id=org_id, grupos=grupos)
+    except APIError as exc:
+        if not _is_missing_table(exc):
+            logger.exception("lance_estatisticas_falhou", extra={"org_id": org_id})
+            return
+        logger.warning("lance_estatisticas_ausente", extra={"org_id": org_id})
+    except Exception:  # noqa: BLE001
+        logger.exception("lance_estatisticas_falhou", extra={"org_id": org_id})
+
+
+def processar_pendencias(supa: Client, *, limit: int = 50) -> Dict[str, int]:
+    """Recalcula os grupos marcados mais antigos (worker do agendador embutido).
+
+    A marcação só é apagada se `marcado_em` não mudou durante o recálculo; um
+    grupo marcado de novo nesse meio tempo fica para a próxima rodada.
+    """
+    pendencias = safe_rows(
+        supa.table(PENDENCIAS_TABLE).select("*").order("marcado_em").limit(limit).execute()
+    )
+    por_org: Dict[str, List[Dict[str, Any]]] = {}
+    for pendencia in pendencias:
+        por_org.setdefault(str(pendencia["org_id"]), []).append(pendencia)
+
+    result = {"processed": 0, "falhas": 0}
+    for org_id, itens in por_org.items():
+        try:
+            atualizar_grupos(
+                supa,
+                org_id=org_id,
+                grupos=[(item["administradora_id"], item["grupo_codigo"]) for item in itens],
+            )
+        except Exception:  # noqa: BLE001
+            logger.exception("lance_estatisticas_pendencias_falhou", extra={"org_id": org_id})
+            result["falhas"] += len(itens)
+            continue
+        for item in itens:
+            supa.table(PENDENCIAS_TABLE).delete().eq("id", item["id"]).eq("marcado_em", item["marcado_em"]).execute()
+        result["processed"] += len(itens)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+
+def estatisticas_grupos(
+    supa: Client,
+    *,
+    org_id: str,
+    grupos: Iterable[_Grupo],
+) -> Dict[_Grupo, Dict[str, Any]]:
+    """Resumo pré-calculado dos grupos pedidos, numa consulta (sem migration: vazio)."""
+    pedidos = {(str(adm), str(grupo)) for adm, grupo in grupos if adm and grupo}
+    if not pedidos:
+        return {}
+    try:
+        rows = fetch_in(
+            supa, GRUPOS_TABLE, org_id, "grupo_codigo", {grupo for _, grupo in pedidos}
+        )
+    except APIError as exc:
+        if not _is_missing_table(exc):
+            raise
+        logger.warning("lance_estatisticas_ausente", extra={"org_id": org_id})
+        return {}
+    out: Dict[_Grupo, Dict[str, Any]] = {}
+    for row in rows:
+        chave = (str(row.get("administradora_id")), str(row.get("grupo_codigo")))
+        if chave in pedidos:
+            out[chave] = row
+    return out
+
+
+def listar_estatisticas(
+    supa: Client,
+    *,
+    org_id: str,
+    administradora_id: Optional[str] = None,
+    produto: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    query = supa.table(GRUPOS_TABLE).select("*").eq("org_id", org_id)
+    if administradora_id:
+        query = query.eq("administradora_id", administradora_id)
+    if produto:
+        query = query.eq("produto", produto)
+    try:
+        return getattr(query.order("grupo_codigo").execute(), "data", None) or []
+    except APIError as exc:
+        if not _is_missing_table(exc):
+            raise
+        logger.warning("lance_estatisticas_ausente", extra={"org_id": org_id})
+        return []
+
+
+def referencia_produto(supa: Client, *, org_id: str, produtos: List[str]) -> Optional[Dict[str, Any]]:
+    """Referência de lance para um produto: mediana dos p50/p80 dos grupos dele.
+
+    Percentis não se somam entre grupos; a mediana dos grupos é só uma
+    referência para quem ainda não tem grupo (simulação).
+    """
+    try:
+        rows = fetch_in(supa, GRUPOS_TABLE, org_id, "produto", produtos)
+    except APIError as exc:
+        if not _is_missing_table(exc):
+            raise
+        return None
+    p50 = sorted(float(row["lance_p50"]) for row in rows if row.get("lance_p50") is not None)
+    p80 = sorted(float(row["lance_p80"]) for row in rows if row.get("lance_p80") is not None)
+    if not p50:
+        return None
+    return {
+        "grupos_com_historico": len(p50),
+        "lance_p50": round(percentil(p50, 0.5), 2),
+        "lance_p80": round(percentil(p80, 0.5), 2) if p80 else None,
+    }
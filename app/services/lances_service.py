@@ -1,14 +1,20 @@
 from __future__ import annotations
 
-from calendar import monthrange
-from datetime import date, timedelta
+from datetime import date
 from typing import Any, Optional
 
 from fastapi import HTTPException
 from supabase import Client
 from decimal import Decimal
 from math import isclose
+from app.core.supabase_lote import chunks, fetch_in, gravar_em_blocos
 from app.schemas.lances import AtualizarCartaPayload
+from app.services.assembleia_calendario_service import (
+    CalendarioAssembleia,
+    carregar_calendario,
+    normalize_competencia,
+)
+from app.services import busca_service, lance_estatisticas_service
 from app.services.cota_finance_service import normalize_cota_financial_payload
 
 from app.security.auth import CurrentProfile
@@ -102,43 +108,6 @@ def to_jsonable(value):
     return value
 
 
-def normalize_competencia(dt: date) -> date:
-    return date(dt.year, dt.month, 1)
-
-
-def adjust_weekend(dt: date, tipo_ajuste: str) -> date:
-    weekday = dt.weekday()  # seg=0, dom=6
-    if weekday < 5:
-        return dt
-
-    if tipo_ajuste == "dia_util_anterior":
-        if weekday == 5:  # sabado
-            return dt - timedelta(days=1)
-        return dt - timedelta(days=2)
-
-    if tipo_ajuste == "proximo_dia_util":
-        if weekday == 5:
-            return dt + timedelta(days=2)
-        return dt + timedelta(days=1)
-
-    return dt
-
-
-def build_assembleia_date(
-    *,
-    competencia: date,
-    dia_base: int,
-    ajustar_fim_semana: bool,
-    tipo_ajuste: str,
-) -> date:
-    last_day = monthrange(competencia.year, competencia.month)[1]
-    safe_day = min(dia_base, last_day)
-    dt = date(competencia.year, competencia.month, safe_day)
-    if ajustar_fim_semana:
-        dt = adjust_weekend(dt, tipo_ajuste)
-    return dt
-
-
 def get_cota_or_404(*, sb: Client, org_id: str, cota_id: str) -> dict[str, Any]:
     resp = (
         sb.table("cotas")
@@ -235,43 +204,28 @@ def get_controle_mensal(
     return rows[0] if rows else None
 
 
-def get_regra_assembleia(
+def prefetch_controles_mensais(
     *,
     sb: Client,
     org_id: str,
-    administradora_id: str | None,
-    produto: str | None,
-) -> Optional[dict[str, Any]]:
-    if not administradora_id:
-        return None
-
-    # 1) regra específica por produto
-    if produto:
-        resp_prod = (
-            sb.table("administradora_regras_lance")
-            .select("*")
-            .eq("org_id", org_id)
-            .eq("administradora_id", administradora_id)
-            .eq("produto", produto)
-            .limit(1)
-            .execute()
-        )
-        rows_prod = getattr(resp_prod, "data", None) or []
-        if rows_prod:
-            return rows_prod[0]
-
-    # 2) regra genérica
-    resp_generic = (
-        sb.table("administradora_regras_lance")
-        .select("*")
-        .eq("org_id", org_id)
-        .eq("administradora_id", administradora_id)
-        .is_("produto", None)
-        .limit(1)
-        .execute()
+    cota_ids: list[str],
+    competencia: date,
+) -> dict[str, dict[str, Any]]:
+    """`get_controle_mensal` de várias cotas (em blocos de cota_id), por cota_id."""
+    if not cota_ids:
+        return {}
+    rows = fetch_in(
+        sb,
+        "cota_lance_competencias",
+        org_id,
+        "cota_id",
+        cota_ids,
+        filtros={"competencia": competencia.isoformat()},
     )
-    rows_generic = getattr(resp_generic, "data", None) or []
-    return rows_generic[0] if rows_generic else None
+    controles: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        controles.setdefault(row["cota_id"], row)
+    return controles
 
 
 def resolve_assembleia(
@@ -280,12 +234,19 @@ def resolve_assembleia(
     org_id: str,
     cota: dict[str, Any],
     competencia: date,
+    calendario: CalendarioAssembleia | None = None,
 ) -> dict[str, Any]:
+    """Data de assembleia da cota no calendário da org (fim de semana e feriados).
+
+    Quem resolve várias cotas passa o mesmo `calendario` (de `carregar_calendario`).
+    """
     competencia = normalize_competencia(competencia)
+    if calendario is None:
+        calendario = carregar_calendario(sb, org_id)
 
     if cota.get("assembleia_dia"):
-        assembleia_prevista = build_assembleia_date(
-            competencia=competencia,
+        assembleia_prevista = calendario.data(
+            competencia,
             dia_base=int(cota["assembleia_dia"]),
             ajustar_fim_semana=True,
             tipo_ajuste="proximo_dia_util",
@@ -299,19 +260,9 @@ def resolve_assembleia(
             "assembleia_prevista": assembleia_prevista,
         }
 
-    regra = get_regra_assembleia(
-        sb=sb,
-        org_id=org_id,
-        administradora_id=cota.get("administradora_id"),
-        produto=cota.get("produto"),
-    )
+    regra = calendario.regra(cota.get("administradora_id"), cota.get("produto"))
     if regra:
-        assembleia_prevista = build_assembleia_date(
-            competencia=competencia,
-            dia_base=int(regra["dia_base_assembleia"]),
-            ajustar_fim_semana=bool(regra.get("ajustar_fim_semana", True)),
-            tipo_ajuste=regra.get("tipo_ajuste") or "proximo_dia_util",
-        )
+        assembleia_prevista = calendario.data_regra(regra, competencia)
         return {
             "origem": "regra_operadora",
             "produto": regra.get("produto"),
@@ -423,6 +374,27 @@ def ensure_cota_ativa(cota: dict[str, Any]) -> None:
         raise HTTPException(400, "Apenas cotas ativas podem receber operação de lance")
 
 
+def _controle_payload(
+    *,
+    org_id: str,
+    cota_id: str,
+    competencia: date,
+    status_mes: str,
+    observacoes: str | None,
+    assembleia_prevista: date | None,
+    lance_id: str | None,
+) -> dict[str, Any]:
+    return {
+        "org_id": org_id,
+        "cota_id": cota_id,
+        "competencia": competencia.isoformat(),
+        "assembleia_prevista": assembleia_prevista.isoformat() if assembleia_prevista else None,
+        "status_mes": status_mes,
+        "lance_id": lance_id,
+        "observacoes": observacoes,
+    }
+
+
 def upsert_controle_mensal(
     *,
     sb: Client,
@@ -442,15 +414,15 @@ def upsert_controle_mensal(
         competencia=competencia,
     )
 
-    payload = {
-        "org_id": profile.org_id,
-        "cota_id": cota_id,
-        "competencia": competencia.isoformat(),
-        "assembleia_prevista": assembleia_prevista.isoformat() if assembleia_prevista else None,
-        "status_mes": status_mes,
-        "lance_id": lance_id,
-        "observacoes": observacoes,
-    }
+    payload = _controle_payload(
+        org_id=profile.org_id,
+        cota_id=cota_id,
+        competencia=competencia,
+        status_mes=status_mes,
+        observacoes=observacoes,
+        assembleia_prevista=assembleia_prevista,
+        lance_id=lance_id,
+    )
 
     if existing:
         resp = (
@@ -743,52 +715,62 @@ def list_cartas_operacao(
     if somente_autorizadas:
         query = query.eq("autorizacao_gestao", True)
 
-    # busca pelo número da cota, grupo ou nome do cliente
-    if q:
-        q_safe = q.replace(",", "").replace("(", "").replace(")", "").strip()
-
-        or_filters = [f"numero_cota.ilike.%{q_safe}%", f"grupo_codigo.ilike.%{q_safe}%"]
-
-        leads_resp = (
-            sb.table("leads")
-            .select("id")
-            .eq("org_id", profile.org_id)
-            .ilike("nome", f"%{q_safe}%")
-            .execute()
-        )
-        lead_ids = [row["id"] for row in (getattr(leads_resp, "data", None) or [])]
-        if lead_ids:
-            or_filters.append(f"lead_id.in.({','.join(lead_ids)})")
-
-        query = query.or_(",".join(or_filters))
-
     start = (page - 1) * page_size
     end = start + page_size - 1
 
-    resp = query.order("created_at", desc=True).range(start, end).execute()
-    rows = getattr(resp, "data", None) or []
-    total = getattr(resp, "count", None) or len(rows)
+    # busca pelo número da cota, grupo, contrato ou nome do cliente
+    # os filtros da tela vão para a busca, antes do limite dela
+    encontrados = busca_service.buscar(
+        sb,
+        org_id=profile.org_id,
+        q=q,
+        filtros_cota={
+            "status": status_cota if status_cota != "all" else None,
+            "administradora_id": administradora_id,
+            "produto": produto,
+            "somente_autorizadas": somente_autorizadas,
+        },
+    )
+    if encontrados is None:
+        resp = query.order("created_at", desc=True).range(start, end).execute()
+        rows = getattr(resp, "data", None) or []
+        total = getattr(resp, "count", None) or len(rows)
+    else:
+        # a busca já é limitada (BUSCA_LIMITE): ordena por relevância e pagina aqui
+        ids = busca_service.cota_ids(encontrados)
+        rows = []
+        if ids:
+            rows = getattr(query.in_("id", ids).execute(), "data", None) or []
+        rows = busca_service.ordenar_por_relevancia(rows, ids, "id")
+        total = len(rows)
+        rows = rows[start:end + 1]
+
+    # Dependências da página inteira numa consulta por tabela (não por cota).
+    cota_ids = [cota["id"] for cota in rows]
+    controles = prefetch_controles_mensais(
+        sb=sb, org_id=profile.org_id, cota_ids=cota_ids, competencia=competencia
+    )
+    calendario = carregar_calendario(sb, profile.org_id)
+    opcoes_por_cota = prefetch_opcoes_lance_fixo(sb=sb, org_id=profile.org_id, cota_ids=cota_ids)
+    estatisticas = lance_estatisticas_service.estatisticas_grupos(
+        sb,
+        org_id=profile.org_id,
+        grupos=[(cota.get("administradora_id"), cota.get("grupo_codigo")) for cota in rows],
+    )
 
     items: list[dict[str, Any]] = []
     for cota in rows:
         cota_id = cota["id"]
-        controle = get_controle_mensal(
-            sb=sb,
-            org_id=profile.org_id,
-            cota_id=cota_id,
-            competencia=competencia,
-        )
+        controle = controles.get(cota_id)
         regra = resolve_assembleia(
             sb=sb,
             org_id=profile.org_id,
             cota=cota,
             competencia=competencia,
+            calendario=calendario,
         )
-        opcoes_lance_fixo = get_opcoes_lance_fixo(
-            sb=sb,
-            org_id=profile.org_id,
-            cota_id=cota_id,
-        )
+        opcoes_lance_fixo = opcoes_por_cota.get(cota_id, [])
+        estatistica = estatisticas.get((str(cota.get("administradora_id")), str(cota.get("grupo_codigo")))) or {}
 
         items.append({
             "cota_id": cota_id,
@@ -832,6 +814,9 @@ def list_cartas_operacao(
             "status_mes": (controle or {}).get("status_mes", "pendente"),
             "opcoes_lance_fixo": opcoes_lance_fixo,
             "tem_pendencia_configuracao": regra.get("assembleia_prevista") is None,
+            "lance_p50": estatistica.get("lance_p50"),
+            "lance_p80": estatistica.get("lance_p80"),
+            "taxa_contemplacao_grupo": estatistica.get("taxa_contemplacao"),
         })
 
     return {
@@ -938,6 +923,39 @@ def resolve_lance_fixo(
     return rows[0]
 
 
+def _lance_payload(
+    *,
+    profile: CurrentProfile,
+    cota: dict[str, Any],
+    tipo: str,
+    percentual: Any,
+    valor: Any,
+    assembleia_data: date,
+    base_calculo: str,
+    pagamento: dict[str, Any] | None,
+    resultado: str | None,
+    opcao_fixo: dict[str, Any] | None,
+) -> dict[str, Any]:
+    pagamento_normalizado = validate_pagamento_composicao(
+        cota=cota,
+        pagamento=pagamento,
+        valor_total_lance=valor,
+    )
+    return {
+        "org_id": profile.org_id,
+        "cota_id": cota["id"],
+        "tipo": tipo,
+        "percentual": to_jsonable(opcao_fixo["percentual"] if opcao_fixo else percentual),
+        "valor": to_jsonable(valor),
+        "origem": "executado",
+        "created_by": profile.user_id,
+        "assembleia_data": assembleia_data.isoformat(),
+        "base_calculo": base_calculo,
+        "pagamento": to_jsonable(pagamento_normalizado),
+        "resultado": resultado or "pendente",
+    }
+
+
 def registrar_lance(
     *,
     sb: Client,
@@ -957,7 +975,6 @@ def registrar_lance(
     cota = get_cota_or_404(sb=sb, org_id=profile.org_id, cota_id=cota_id)
     ensure_cota_ativa(cota)
     opcao_fixo = None
-    percentual_final = percentual
 
     if tipo == "fixo":
         opcao_fixo = resolve_lance_fixo(
@@ -966,27 +983,19 @@ def registrar_lance(
             cota_id=cota_id,
             cota_lance_fixo_opcao_id=cota_lance_fixo_opcao_id,
         )
-        percentual_final = opcao_fixo["percentual"]
-    pagamento_normalizado = validate_pagamento_composicao(
+    payload = _lance_payload(
+        profile=profile,
         cota=cota,
+        tipo=tipo,
+        percentual=percentual,
+        valor=valor,
+        assembleia_data=assembleia_data,
+        base_calculo=base_calculo,
         pagamento=pagamento,
-        valor_total_lance=valor,
+        resultado=resultado,
+        opcao_fixo=opcao_fixo,
     )
 
-    payload = {
-        "org_id": profile.org_id,
-        "cota_id": cota_id,
-        "tipo": tipo,
-        "percentual": to_jsonable(percentual_final),
-        "valor": to_jsonable(valor),
-        "origem": "executado",
-        "created_by": profile.user_id,
-        "assembleia_data": assembleia_data.isoformat(),
-        "base_calculo": base_calculo,
-        "pagamento": to_jsonable(pagamento_normalizado),
-        "resultado": resultado or "pendente",
-    }
-
     try:
         resp = sb.table("lances").insert(payload, returning="representation").execute()
     except Exception as e:
@@ -1016,9 +1025,210 @@ def registrar_lance(
         lance_id=lance["id"],
     )
 
+    if lance.get("resultado") in lance_estatisticas_service.RESULTADOS_DECIDIDOS:
+        lance_estatisticas_service.atualizar_apos_assembleia(sb, org_id=profile.org_id, cota_ids=[cota_id])
+
     return {"lance": lance, "controle_mes": controle}
 
 
+_COTA_LOTE_SELECT = "id, org_id, status, valor_carta, embutido_permitido, embutido_max_percent, fgts_permitido"
+
+
+def _erro_lote(tipo: str, indice: int, cota_id: str | None, exc: Exception) -> dict[str, Any]:
+    detalhe = exc.detail if isinstance(exc, HTTPException) else str(exc)
+    return {"tipo": tipo, "indice": indice, "cota_id": cota_id, "erro": detalhe}
+
+
+def registrar_competencia_lote(
+    *,
+    sb: Client,
+    profile: CurrentProfile,
+    competencia: date,
+    controles: list[dict[str, Any]],
+    lances: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """Controle mensal e lances de uma competência inteira de uma vez.
+
+    Mesmas validações de `upsert_controle_mensal` e `registrar_lance`, mas com o
+    estado das cotas, as opções de lance fixo e os controles já existentes
+    carregados numa consulta por tabela, e as gravações em blocos. Linhas
+    inválidas não interrompem o lote: voltam em `erros` com o índice de origem.
+    """
+    competencia = normalize_competencia(competencia)
+    org_id = profile.org_id
+    erros: list[dict[str, Any]] = []
+
+    cota_ids = sorted({str(item["cota_id"]) for item in [*controles, *lances] if item.get("cota_id")})
+    cotas: dict[str, dict[str, Any]] = {}
+    if cota_ids:
+        cotas = {row["id"]: row for row in fetch_in(sb, "cotas", org_id, "id", cota_ids, columns=_COTA_LOTE_SELECT)}
+    opcoes_por_cota = prefetch_opcoes_lance_fixo(sb=sb, org_id=org_id, cota_ids=cota_ids)
+    existentes = prefetch_controles_mensais(sb=sb, org_id=org_id, cota_ids=cota_ids, competencia=competencia)
+
+    def _cota_valida(cota_id: str) -> dict[str, Any]:
+        cota = cotas.get(cota_id)
+        if not cota:
+            raise HTTPException(404, "Cota não encontrada")
+        ensure_cota_ativa(cota)
+        return cota
+
+    # 1) lances: validação contra o estado pré-carregado
+    lances_validos: list[tuple[tuple[int, dict[str, Any]], dict[str, Any]]] = []
+    for indice, item in enumerate(lances):
+        cota_id = str(item.get("cota_id") or "")
+        try:
+            cota = _cota_valida(cota_id)
+            opcao_fixo = None
+            if item["tipo"] == "fixo":
+                opcao_id = item.get("cota_lance_fixo_opcao_id")
+                if not opcao_id:
+                    raise HTTPException(400, "Selecione uma opção de lance fixo")
+                opcao_fixo = next(
+                    (op for op in opcoes_por_cota.get(cota_id, []) if str(op["id"]) == str(opcao_id)),
+                    None,
+                )
+                if not opcao_fixo:
+                    raise HTTPException(400, "Opção de lance fixo inválida para esta cota")
+            payload = _lance_payload(
+                profile=profile,
+                cota=cota,
+                tipo=item["tipo"],
+                percentual=item.get("percentual"),
+                valor=item.get("valor"),
+                assembleia_data=item["assembleia_data"],
+                base_calculo=item.get("base_calculo") or "saldo_devedor",
+                pagamento=item.get("pagamento"),
+                resultado=item.get("resultado"),
+                opcao_fixo=opcao_fixo,
+            )
+        except HTTPException as exc:
+            erros.append(_erro_lote("lance", indice, cota_id or None, exc))
+            continue
+        lances_validos.append(((indice, item), payload))
+
+    # 2) controles sem lance: a cota que recebe lance no lote já fica como "feito"
+    cotas_com_lance = {str(item["cota_id"]) for (_, item), _ in lances_validos}
+    controles_validos: dict[str, tuple[tuple[str, int], dict[str, Any]]] = {}
+    for indice, item in enumerate(controles):
+        cota_id = str(item.get("cota_id") or "")
+        try:
+            _cota_valida(cota_id)
+            if cota_id in cotas_com_lance:
+                raise HTTPException(400, "Cota com lance registrado neste lote")
+            if cota_id in controles_validos:
+                raise HTTPException(400, "Cota repetida no lote")
+        except HTTPException as exc:
+            erros.append(_erro_lote("controle", indice, cota_id or None, exc))
+            continue
+        controles_validos[cota_id] = (
+            ("controle", indice),
+            _controle_payload(
+                org_id=org_id,
+                cota_id=cota_id,
+                competencia=competencia,
+                status_mes=item["status_mes"],
+                observacoes=item.get("observacoes"),
+                assembleia_prevista=None,
+                lance_id=None,
+            ),
+        )
+
+    # 3) gravação dos lances
+    def _inserir_lances(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        resp = sb.table("lances").insert(payloads, returning="representation").execute()
+        return getattr(resp, "data", None) or []
+
+    lances_gravados = gravar_em_blocos(
+        _inserir_lances,
+        lances_validos,
+        erros,
+        lambda origem, exc: _erro_lote(
+            "lance", origem[0], str(origem[1]["cota_id"]),
+            HTTPException(409, f"Não foi possível registrar o lance: {exc}"),
+        ),
+    )
+
+    # um update de data_ultimo_lance por data de assembleia, não por cota
+    por_data: dict[str, set[str]] = {}
+    for _, lance in lances_gravados:
+        por_data.setdefault(lance["assembleia_data"], set()).add(lance["cota_id"])
+    for assembleia_data, ids in sorted(por_data.items()):
+        for chunk in chunks(sorted(ids)):
+            (
+                sb.table("cotas")
+                .update({"data_ultimo_lance": assembleia_data})
+                .eq("org_id", org_id)
+                .in_("id", chunk)
+                .execute()
+            )
+
+    # 4) controles: os dos lances (último lance da cota vence) + os avulsos
+    for (indice, item), lance in lances_gravados:
+        cota_id = str(item["cota_id"])
+        controles_validos[cota_id] = (
+            ("lance", indice),
+            _controle_payload(
+                org_id=org_id,
+                cota_id=cota_id,
+                competencia=competencia,
+                status_mes="feito",
+                observacoes=item.get("observacoes_competencia"),
+                assembleia_prevista=item["assembleia_data"],
+                lance_id=lance["id"],
+            ),
+        )
+
+    atualizar: list[tuple[Any, dict[str, Any]]] = []
+    inserir: list[tuple[Any, dict[str, Any]]] = []
+    for cota_id, (origem, payload) in controles_validos.items():
+        existente = existentes.get(cota_id)
+        if existente:
+            atualizar.append((origem, {"id": existente["id"], **payload}))
+        else:
+            inserir.append((origem, payload))
+
+    def _erro_controle(origem, exc: Exception) -> dict[str, Any]:
+        tipo, indice = origem
+        erro = _erro_lote(tipo, indice, None, exc)
+        if tipo == "lance":
+            erro["erro"] = f"Lance registrado, mas o controle do mês falhou: {erro['erro']}"
+        return erro
+
+    def _upsert_controles(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        resp = sb.table("cota_lance_competencias").upsert(payloads, on_conflict="id").execute()
+        return getattr(resp, "data", None) or []
+
+    def _inserir_controles(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        resp = sb.table("cota_lance_competencias").insert(payloads, returning="representation").execute()
+        return getattr(resp, "data", None) or []
+
+    gravados = gravar_em_blocos(_upsert_controles, atualizar, erros, _erro_controle)
+    gravados += gravar_em_blocos(_inserir_controles, inserir, erros, _erro_controle)
+
+    lance_estatisticas_service.atualizar_apos_assembleia(
+        sb,
+        org_id=org_id,
+        cota_ids=[
+            lance["cota_id"]
+            for _, lance in lances_gravados
+            if lance.get("resultado") in lance_estatisticas_service.RESULTADOS_DECIDIDOS
+        ],
+    )
+
+    for erro in erros:
+        if erro["cota_id"] is None:
+            fonte = controles if erro["tipo"] == "controle" else lances
+            erro["cota_id"] = str(fonte[erro["indice"]].get("cota_id") or "") or None
+    erros.sort(key=lambda erro: (erro["tipo"], erro["indice"]))
+
+    return {
+        "competencia": competencia.isoformat(),
+        "lances_registrados": len(lances_gravados),
+        "controles_gravados": len(gravados),
+        "erros": erros,
+    }
+
+
 def get_opcoes_lance_fixo(*, sb: Client, org_id: str, cota_id: str) -> list[dict[str, Any]]:
     resp = (
         sb.table("cota_lance_fixo_opcoes")
@@ -1033,6 +1243,25 @@ def get_opcoes_lance_fixo(*, sb: Client, org_id: str, cota_id: str) -> list[dict
     return getattr(resp, "data", None) or []
 
 
+def prefetch_opcoes_lance_fixo(
+    *,
+    sb: Client,
+    org_id: str,
+    cota_ids: list[str],
+) -> dict[str, list[dict[str, Any]]]:
+    """`get_opcoes_lance_fixo` de várias cotas (em blocos de cota_id), com a mesma ordenação."""
+    if not cota_ids:
+        return {}
+    rows = fetch_in(sb, "cota_lance_fixo_opcoes", org_id, "cota_id", cota_ids, filtros={"ativo": True})
+    opcoes: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        opcoes.setdefault(row["cota_id"], []).append(row)
+    for lista in opcoes.values():
+        # ordem crescente e, na mesma ordem, maior percentual primeiro
+        lista.sort(key=lambda row: (row.get("ordem") or 0, -Decimal(str(row.get("percentual") or 0))))
+    return opcoes
+
+
 def contemplar_cota(
     *,
     sb: Client,
@@ -1084,6 +1313,9 @@ def contemplar_cota(
         lance_id=None,
     )
 
+    if motivo == "lance":
+        lance_estatisticas_service.atualizar_apos_assembleia(sb, org_id=profile.org_id, cota_ids=[cota_id])
+
     return rows[0]
 
 
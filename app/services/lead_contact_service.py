@@ -0,0 +1,198 @@
+"""Chave de contato normalizada para deduplicação de leads.
+
+Todos os caminhos que criam lead (Meta Lead Ads, WhatsApp, importações) usam a
+mesma chave para achar o lead existente:
+
+- telefone: só dígitos em E.164 sem o `+` (DDI 55 para número nacional de 10/11
+  dígitos);
+- email: minúsculo e sem espaços.
+
+No banco as chaves são as colunas geradas `leads.phone_key`/`leads.email_key`
+(migration 008), indexadas por `(org_id, chave)`. A expressão SQL é o espelho de
+`phone_key()`/`email_key()` abaixo — mudar uma exige mudar a outra.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Iterable, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+LEAD_CONTACT_SELECT = "id, org_id, nome, telefone, email"
+# Limite de chaves por `in.(...)` para a URL do PostgREST não estourar.
+RESOLVE_CHUNK_SIZE = 150
+
+
+def phone_key(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    digits = re.sub(r"\D", "", str(value))
+    if not digits:
+        return None
+    if len(digits) in (10, 11):
+        return "55" + digits
+    return digits
+
+
+def email_key(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    cleaned = str(value).strip().lower()
+    return cleaned or None
+
+
+def contact_keys(*, telefone: Any = None, email: Any = None) -> tuple[Optional[str], Optional[str]]:
+    return phone_key(telefone), email_key(email)
+
+
+def _quote(value: str) -> str:
+    # Valores do filtro `or=(...)` com vírgula/parênteses precisam de aspas.
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _is_missing_key_column(exc: APIError) -> bool:
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return ("phone_key" in message or "email_key" in message) and "exist" in message
+
+
+def _select_columns(columns: str) -> str:
+    # telefone/email sempre vêm junto para indexar o resultado pelas chaves.
+    names = [part.strip() for part in columns.split(",") if part.strip()]
+    for required in ("id", "telefone", "email"):
+        if required not in names:
+            names.append(required)
+    return ", ".join(names)
+
+
+def _legacy_rows(
+    supa: Client,
+    *,
+    org_id: str,
+    phones: list[str],
+    emails: list[str],
+    columns: str,
+) -> list[dict[str, Any]]:
+    """Busca pelas colunas cruas enquanto a migration 008 não foi aplicada."""
+    rows: list[dict[str, Any]] = []
+    if phones:
+        candidates = sorted({cand for key in phones for cand in (key, key[2:] if key.startswith("55") else key)})
+        resp = supa.table("leads").select(columns).eq("org_id", org_id).in_("telefone", candidates).execute()
+        rows.extend(getattr(resp, "data", None) or [])
+    for email in emails:
+        resp = supa.table("leads").select(columns).eq("org_id", org_id).ilike("email", email).limit(1).execute()
+        rows.extend(getattr(resp, "data", None) or [])
+    return rows
+
+
+def _fetch_rows(
+    supa: Client,
+    *,
+    org_id: str,
+    phones: list[str],
+    emails: list[str],
+    columns: str,
+) -> list[dict[str, Any]]:
+    filters = []
+    if phones:
+        filters.append(f"phone_key.in.({','.join(phones)})")
+    if emails:
+        filters.append(f"email_key.in.({','.join(_quote(email) for email in emails)})")
+    if not filters:
+        return []
+    try:
+        resp = (
+            supa.table("leads")
+            .select(columns)
+            .eq("org_id", org_id)
+            .or_(",".join(filters))
+            .order("created_at")
+            .execute()
+        )
+    except APIError as exc:
+        if not _is_missing_key_column(exc):
+            raise
+        logger.warning("lead_contact_keys_ausentes", extra={"org_id": org_id})
+        return _legacy_rows(supa, org_id=org_id, phones=phones, emails=emails, columns=columns)
+    return getattr(resp, "data", None) or []
+
+
+def remember_lead(index: dict[str, dict[str, Any]], row: dict[str, Any]) -> None:
+    """Registra o lead no índice (chave -> lead); o primeiro lead da chave vence."""
+    pkey, ekey = contact_keys(telefone=row.get("telefone"), email=row.get("email"))
+    for key in (pkey, ekey):
+        if key:
+            index.setdefault(key, row)
+
+
+def match_lead(
+    index: dict[str, dict[str, Any]],
+    *,
+    telefone: Any = None,
+    email: Any = None,
+) -> Optional[dict[str, Any]]:
+    """Telefone tem precedência sobre email, como na deduplicação original da Meta."""
+    pkey, ekey = contact_keys(telefone=telefone, email=email)
+    if pkey and pkey in index:
+        return index[pkey]
+    if ekey and ekey in index:
+        return index[ekey]
+    return None
+
+
+def resolve_leads_by_contacts(
+    supa: Client,
+    *,
+    org_id: str,
+    contacts: Iterable[tuple[Any, Any]],
+    columns: str = LEAD_CONTACT_SELECT,
+) -> dict[str, dict[str, Any]]:
+    """Resolve vários contatos `(telefone, email)` de uma vez.
+
+    Retorna o índice chave -> lead (use `match_lead` para consultar). Uma query
+    por bloco de `RESOLVE_CHUNK_SIZE` chaves, em vez de duas por contato.
+    """
+    phones: set[str] = set()
+    emails: set[str] = set()
+    for telefone, email in contacts:
+        pkey, ekey = contact_keys(telefone=telefone, email=email)
+        if pkey:
+            phones.add(pkey)
+        if ekey:
+            emails.add(ekey)
+
+    select_columns = _select_columns(columns)
+    index: dict[str, dict[str, Any]] = {}
+    phone_list, email_list = sorted(phones), sorted(emails)
+    for start in range(0, max(len(phone_list), len(email_list)), RESOLVE_CHUNK_SIZE):
+        rows = _fetch_rows(
+            supa,
+            org_id=org_id,
+            phones=phone_list[start:start + RESOLVE_CHUNK_SIZE],
+            emails=email_list[start:start + RESOLVE_CHUNK_SIZE],
+            columns=select_columns,
+        )
+        for row in rows:
+            remember_lead(index, row)
+    return index
+
+
+def find_lead_by_contact(
+    supa: Client,
+    *,
+    org_id: str,
+    telefone: Any = None,
+    email: Any = None,
+    columns: str = LEAD_CONTACT_SELECT,
+) -> Optional[dict[str, Any]]:
+    """Lead existente da org com o mesmo telefone ou email (uma query)."""
+    index = resolve_leads_by_contacts(
+        supa,
+        org_id=org_id,
+        contacts=[(telefone, email)],
+        columns=columns,
+    )
+    return match_lead(index, telefone=telefone, email=email)
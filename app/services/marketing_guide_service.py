@@ -8,6 +8,7 @@ from supabase import Client
 from playwright.async_api import async_playwright
 
 from app.services.lead_address_service import apply_lead_address_rules
+from app.services.lead_contact_service import find_lead_by_contact
 
 
 def _safe_upsert_lead(
@@ -17,14 +18,8 @@ def _safe_upsert_lead(
     payload_full: Dict[str, Any],
     payload_min: Dict[str, Any],
 ) -> str:
-    existing = (
-        supa.table("leads")
-        .select("id, owner_id")
-        .eq("org_id", org_id)
-        .eq("telefone", telefone)
-        .limit(1)
-        .execute()
-    ).data or []
+    found = find_lead_by_contact(supa, org_id=org_id, telefone=telefone, columns="id, owner_id")
+    existing = [found] if found else []
 
     if existing:
         lead_id = existing[0]["id"]
@@ -0,0 +1,495 @@
+"""Backfill/reconciliação de leads da Meta Lead Ads.
+
+Se o webhook ficou fora do ar ou recusou eventos, os leads continuam disponíveis
+em `/{form_id}/leads` na Graph API. Este módulo pagina esses leads por cursor,
+pula os `leadgen_id` já registrados em `meta_webhook_events` e manda os novos
+pelo mesmo caminho do webhook (`_process_meta_lead_event` -> `upsert_lead_from_meta`
+-> `upsert_meta_diagnostic_from_meta`), uma página por vez.
+
+- Memória constante: só a página corrente fica em memória.
+- Retomável: o cursor `after` de cada formulário é salvo em
+  `meta_lead_integrations.settings.backfill` depois de cada página.
+- Em segundo plano: `iniciar_backfill` grava um job em `meta_backfill_jobs`
+  (migration 023) e a varredura roda numa thread (`app/core/jobs.py`); o
+  resultado fica no job. A cada página o job recebe o progresso (e um
+  `updated_at` novo), então uma varredura longa não passa por abandonada; o
+  índice único parcial da migration 026 garante um job ativo por integração.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from app.core.jobs import JobRunner, now_iso
+from app.core.supabase_lote import safe_rows
+from app.services.lead_contact_service import resolve_leads_by_contacts
+from app.services.meta_leads_service import (
+    LEAD_CONTACT_COLUMNS,
+    META_GRAPH_FIELDS,
+    _build_event_id,
+    _ensure_meta_integration_token,
+    _insert_webhook_event,
+    _integration_provider_filter,
+    _meta_graph_request,
+    _merge_integration_settings,
+    _parse_meta_field_data,
+    _process_meta_lead_event,
+    _safe_data,
+    _settings_dict,
+    _trim,
+    list_meta_page_forms,
+    normalize_email,
+    normalize_phone,
+    utcnow_iso,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_SETTINGS_KEY = "backfill"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+JOBS_TABLE = "meta_backfill_jobs"
+# Índice único parcial (migration 026): um job pendente/executando por integração.
+JOB_ATIVO_INDEX = "meta_backfill_jobs_integration_ativo_idx"
+
+_jobs = JobRunner(JOBS_TABLE, nome="meta-backfill", em_execucao_msg="Backfill desta integração já está em execução")
+
+Progresso = Callable[[dict[str, Any]], None]
+
+
+def _backfill_state(integration: dict[str, Any]) -> dict[str, Any]:
+    state = _settings_dict(integration).get(BACKFILL_SETTINGS_KEY)
+    return dict(state) if isinstance(state, dict) else {}
+
+
+def _save_form_checkpoint(
+    supa: Client,
+    *,
+    integration: dict[str, Any],
+    form_id: str,
+    checkpoint: dict[str, Any],
+) -> None:
+    state = _backfill_state(integration)
+    state[form_id] = {**checkpoint, "updated_at": utcnow_iso()}
+    _merge_integration_settings(
+        supa,
+        integration=integration,
+        updates={BACKFILL_SETTINGS_KEY: state},
+    )
+
+
+def _since_filter(since: Optional[datetime]) -> Optional[str]:
+    if since is None:
+        return None
+    return json.dumps(
+        [{"field": "time_created", "operator": "GREATER_THAN", "value": int(since.timestamp())}]
+    )
+
+
+def iter_form_lead_pages(
+    *,
+    access_token: str,
+    form_id: str,
+    after: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+) -> Iterator[tuple[list[dict[str, Any]], Optional[str]]]:
+    """Gera (leads da página, cursor da próxima página) até acabar."""
+    params: dict[str, Any] = {
+        "fields": META_GRAPH_FIELDS,
+        "limit": max(1, min(page_size, MAX_PAGE_SIZE)),
+    }
+    filtering = _since_filter(since)
+    if filtering:
+        params["filtering"] = filtering
+
+    cursor = after
+    while True:
+        page_params = {**params, **({"after": cursor} if cursor else {})}
+        payload = _meta_graph_request(
+            method="GET",
+            path=f"{form_id}/leads",
+            access_token=access_token,
+            params=page_params,
+        )
+        items = [item for item in payload.get("data") or [] if isinstance(item, dict) and item.get("id")]
+        paging = payload.get("paging") or {}
+        next_cursor = _trim((paging.get("cursors") or {}).get("after")) if paging.get("next") else None
+        yield items, next_cursor
+        if not next_cursor:
+            return
+        cursor = next_cursor
+
+
+def _known_leadgen_ids(
+    supa: Client,
+    *,
+    integration_id: str,
+    leadgen_ids: list[str],
+) -> set[str]:
+    if not leadgen_ids:
+        return set()
+    # Qualquer evento já registrado, em qualquer status: o reprocessamento de
+    # evento com erro é do webhook, não do backfill.
+    resp = (
+        supa.table("meta_webhook_events")
+        .select("leadgen_id")
+        .eq("integration_id", integration_id)
+        .in_("leadgen_id", leadgen_ids)
+        .execute()
+    )
+    return {str(row["leadgen_id"]) for row in _safe_data(resp) or [] if row.get("leadgen_id")}
+
+
+def _ingest_backfilled_lead(
+    supa: Client,
+    *,
+    integration: dict[str, Any],
+    form_id: str,
+    lead_data: dict[str, Any],
+    contact_index: Optional[dict[str, dict[str, Any]]] = None,
+) -> dict[str, Any]:
+    leadgen_id = str(lead_data["id"])
+    page_id = integration["page_id"]
+    payload = {
+        "page_id": page_id,
+        "form_id": form_id,
+        "leadgen_id": leadgen_id,
+        "created_time": lead_data.get("created_time"),
+        "source": "backfill",
+    }
+    event = _insert_webhook_event(
+        supa,
+        org_id=integration["org_id"],
+        integration_id=integration["id"],
+        payload=payload,
+        page_id=page_id,
+        form_id=form_id,
+        leadgen_id=leadgen_id,
+        event_id=_build_event_id(payload, page_id, form_id, leadgen_id),
+        status_value="received",
+    )
+    return _process_meta_lead_event(
+        supa,
+        prepared={
+            "payload": payload,
+            "page_id": page_id,
+            "form_id": form_id,
+            "leadgen_id": leadgen_id,
+            "integration": integration,
+            "event": event,
+        },
+        lead_data=lead_data,
+        contact_index=contact_index,
+    )
+
+
+def _page_contact_index(
+    supa: Client,
+    *,
+    org_id: str,
+    items: list[dict[str, Any]],
+) -> dict[str, dict[str, Any]]:
+    contacts = []
+    for lead_data in items:
+        parsed = _parse_meta_field_data(lead_data.get("field_data"))
+        contacts.append((normalize_phone(parsed.get("telefone")), normalize_email(parsed.get("email"))))
+    return resolve_leads_by_contacts(supa, org_id=org_id, contacts=contacts, columns=LEAD_CONTACT_COLUMNS)
+
+
+def backfill_form(
+    supa: Client,
+    *,
+    integration: dict[str, Any],
+    form_id: str,
+    access_token: str,
+    max_pages: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+    restart: bool = False,
+    progresso: Optional[Progresso] = None,
+) -> dict[str, Any]:
+    """Varre um formulário a partir do checkpoint (`partial`) ou do início.
+
+    `progresso` recebe os contadores do formulário depois de cada checkpoint.
+    """
+    checkpoint = {} if restart else dict(_backfill_state(integration).get(form_id) or {})
+    after = checkpoint.get("cursor") if checkpoint.get("status") == "partial" else None
+    stats = {
+        "form_id": form_id,
+        "pages": 0,
+        "fetched": 0,
+        "skipped": 0,
+        "created": 0,
+        "updated": 0,
+        "errors": 0,
+        "resumed_from": after,
+        "completed": False,
+    }
+    # Ao retomar, os contadores do checkpoint continuam acumulando.
+    totals = {
+        key: int(checkpoint.get(key) or 0) if after else 0
+        for key in ("fetched", "created", "updated", "skipped", "errors")
+    }
+
+    for items, next_cursor in iter_form_lead_pages(
+        access_token=access_token,
+        form_id=form_id,
+        after=after,
+        page_size=page_size,
+        since=since,
+    ):
+        stats["pages"] += 1
+        stats["fetched"] += len(items)
+        known = _known_leadgen_ids(
+            supa,
+            integration_id=integration["id"],
+            leadgen_ids=[str(item["id"]) for item in items],
+        )
+        new_items = [item for item in items if str(item["id"]) not in known]
+        stats["skipped"] += len(items) - len(new_items)
+        # Uma busca de contatos por página; os leads criados entram no índice.
+        contact_index = (
+            _page_contact_index(supa, org_id=integration["org_id"], items=new_items) if new_items else {}
+        )
+        for lead_data in new_items:
+            try:
+                result = _ingest_backfilled_lead(
+                    supa,
+                    integration=integration,
+                    form_id=form_id,
+                    lead_data=lead_data,
+                    contact_index=contact_index,
+                )
+                if result.get("action") in ("created", "updated"):
+                    stats[result["action"]] += 1
+            except HTTPException as exc:
+                stats["errors"] += 1
+                logger.warning(
+                    "meta_backfill_lead_failed",
+                    extra={
+                        "integration_id": integration["id"],
+                        "form_id": form_id,
+                        "leadgen_id": lead_data.get("id"),
+                        "detail": exc.detail,
+                    },
+                )
+
+        stats["completed"] = next_cursor is None
+        _save_form_checkpoint(
+            supa,
+            integration=integration,
+            form_id=form_id,
+            checkpoint={
+                "status": "completed" if stats["completed"] else "partial",
+                "cursor": next_cursor,
+                **{key: totals[key] + stats[key] for key in totals},
+            },
+        )
+        if progresso:
+            progresso(dict(stats))
+        if max_pages is not None and stats["pages"] >= max_pages:
+            break
+
+    if stats["pages"] == 0:
+        stats["completed"] = True
+    return stats
+
+
+def run_meta_backfill(
+    supa: Client,
+    *,
+    integration: dict[str, Any],
+    max_pages: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+    restart: bool = False,
+    progresso: Optional[Progresso] = None,
+) -> dict[str, Any]:
+    """Reconciliação de todos os formulários da integração (ou só do form configurado).
+
+    `max_pages` limita o trabalho por chamada; o restante continua de onde parou
+    na próxima execução. `progresso` é repassado a `backfill_form`.
+    """
+    access_token = _ensure_meta_integration_token(integration, require_page_token=True)
+    forms = list_meta_page_forms(integration=integration)
+    configured_form_id = _trim(integration.get("form_id"))
+    if configured_form_id:
+        forms = [form for form in forms if form["id"] == configured_form_id] or [{"id": configured_form_id}]
+
+    # Formulário já varrido até o fim só é refeito com `restart` ou com uma
+    # janela `since` (ex.: reconciliar a partir do início de uma queda do webhook).
+    state = _backfill_state(integration)
+    if not restart and since is None:
+        forms = [form for form in forms if (state.get(form["id"]) or {}).get("status") != "completed"]
+
+    results: list[dict[str, Any]] = []
+    remaining = max_pages
+    for form in forms:
+        if remaining is not None and remaining <= 0:
+            break
+        form_stats = backfill_form(
+            supa,
+            integration=integration,
+            form_id=form["id"],
+            access_token=access_token,
+            max_pages=remaining,
+            page_size=page_size,
+            since=since,
+            restart=restart,
+            progresso=progresso,
+        )
+        results.append(form_stats)
+        if remaining is not None:
+            remaining -= form_stats["pages"]
+
+    completed = len(results) == len(forms) and all(item["completed"] for item in results)
+    return {
+        "ok": True,
+        "integration_id": integration["id"],
+        "page_id": integration["page_id"],
+        "completed": completed,
+        "forms": results,
+        "created": sum(item["created"] for item in results),
+        "updated": sum(item["updated"] for item in results),
+        "skipped": sum(item["skipped"] for item in results),
+        "errors": sum(item["errors"] for item in results),
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Job em segundo plano
+# --------------------------------------------------------------------------- #
+
+
+def _fetch_integration(supa: Client, *, org_id: str, integration_id: str) -> Optional[dict[str, Any]]:
+    resp = (
+        _integration_provider_filter(
+            supa.table("meta_lead_integrations").select("*").eq("org_id", org_id).eq("id", integration_id)
+        )
+        .limit(1)
+        .execute()
+    )
+    return next(iter(safe_rows(resp)), None)
+
+
+def get_job_or_404(supa: Client, *, org_id: str, integration_id: str, job_id: str) -> dict[str, Any]:
+    resp = (
+        supa.table(JOBS_TABLE)
+        .select("*")
+        .eq("org_id", org_id)
+        .eq("integration_id", integration_id)
+        .eq("id", job_id)
+        .limit(1)
+        .execute()
+    )
+    job = next(iter(safe_rows(resp)), None)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill não encontrado.")
+    return job
+
+
+def executar_job(supa: Client, job: dict[str, Any]) -> dict[str, Any]:
+    """Roda o backfill do job já reivindicado, com a integração relida do banco
+    (os checkpoints podem ter mudado desde o POST)."""
+    job_id = job["id"]
+    parametros = job.get("parametros") or {}
+    try:
+        integration = _fetch_integration(supa, org_id=job["org_id"], integration_id=job["integration_id"])
+        if not integration:
+            raise HTTPException(status_code=404, detail="Integração Meta não encontrada.")
+        since = parametros.get("since")
+        result = run_meta_backfill(
+            supa,
+            integration=integration,
+            max_pages=parametros.get("max_pages"),
+            page_size=int(parametros.get("page_size") or DEFAULT_PAGE_SIZE),
+            since=datetime.fromisoformat(since) if since else None,
+            restart=bool(parametros.get("restart")),
+            # heartbeat: sem update por página, um backfill longo vira "abandonado"
+            progresso=lambda stats: _jobs.update(supa, job_id, {"resultado": {"em_andamento": stats}}),
+        )
+    except HTTPException as exc:
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc.detail)})
+        return {"id": job_id, "status": "falhou"}
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("meta_backfill_job_error", extra={"job_id": job_id})
+        _jobs.update(supa, job_id, {"status": "falhou", "erro": str(exc)})
+        return {"id": job_id, "status": "falhou"}
+
+    _jobs.update(supa, job_id, {"status": "concluido", "resultado": result, "concluido_em": now_iso()})
+    return {"id": job_id, "status": "concluido", "resultado": result}
+
+
+def aguardar(job_id: str, timeout: Optional[float] = None) -> None:
+    """Espera o job terminar (útil em testes e scripts)."""
+    _jobs.aguardar(job_id, timeout)
+
+
+def iniciar_backfill(
+    supa: Client,
+    *,
+    integration: dict[str, Any],
+    max_pages: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+    restart: bool = False,
+    actor_id: Optional[str] = None,
+) -> dict[str, Any]:
+    """Cria o job de backfill da integração e dispara a varredura em segundo plano.
+
+    Um backfill por integração: job ainda rodando é 409; job pendente que nunca
+    foi reivindicado ou `executando` abandonado é encerrado antes do novo. Dois
+    POSTs ao mesmo tempo esbarram no índice único parcial e o segundo é 409.
+    """
+    ativos = safe_rows(
+        supa.table(JOBS_TABLE)
+        .select("*")
+        .eq("integration_id", integration["id"])
+        .in_("status", ["pendente", "executando"])
+        .execute()
+    )
+    for job in ativos:
+        _jobs.checar_parado(job)
+        _jobs.update(supa, job["id"], {"status": "falhou", "erro": "Interrompido antes de concluir"})
+
+    now = now_iso()
+    try:
+        resp = supa.table(JOBS_TABLE).insert(
+            {
+                "org_id": integration["org_id"],
+                "integration_id": integration["id"],
+                "status": "pendente",
+                "parametros": {
+                    "max_pages": max_pages,
+                    "page_size": page_size,
+                    "since": since.isoformat() if since else None,
+                    "restart": restart,
+                },
+                "created_by": actor_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+        ).execute()
+    except APIError as exc:
+        # Corrida: outro POST criou o job ativo entre a consulta e o insert.
+        if getattr(exc, "code", None) == "23505" or JOB_ATIVO_INDEX in str(exc):
+            raise HTTPException(status_code=409, detail=_jobs.em_execucao_msg) from exc
+        raise
+    job = next(iter(safe_rows(resp)), None)
+    if not job:
+        raise HTTPException(status_code=500, detail="Erro ao criar o job de backfill.")
+    _jobs.disparar(supa, job["id"], executar_job)
+    return {**job, "em_execucao": True}
+
+
+def status_backfill(supa: Client, *, org_id: str, integration_id: str, job_id: str) -> dict[str, Any]:
+    job = get_job_or_404(supa, org_id=org_id, integration_id=integration_id, job_id=job_id)
+    return {**job, "em_execucao": _jobs.em_execucao(job)}
@@ -9,12 +9,20 @@ from typing import Any, Dict, Optional
 from urllib.parse import urlencode, urlparse
 from uuid import uuid4
 
-import requests
 from fastapi import HTTPException, status
 from supabase import Client
 
+from app.core import http_client
+from app.core.cache import MISS, VersionedCache
 from app.core.config import settings
 from app.schemas.meta import PROVIDER_VALUES
+from app.services.lead_contact_service import (
+    find_lead_by_contact,
+    match_lead,
+    phone_key,
+    remember_lead,
+    resolve_leads_by_contacts,
+)
 
 
 META_PROVIDER = "meta_lead_ads"
@@ -24,8 +32,14 @@ META_EVENT_TYPE = "meta_leadgen"
 META_GRAPH_FIELDS = (
     "id,created_time,field_data,ad_id,ad_name,adset_id,adset_name,campaign_id,campaign_name,form_id,platform"
 )
+# Limite de sub-requisições por chamada da Graph Batch API.
+META_GRAPH_BATCH_SIZE = 50
 logger = logging.getLogger(__name__)
 
+# Cache em processo: (tipo, page_id, form_id) -> linhas, por TTL. Guarda também
+# o resultado vazio, para rajadas de uma página sem integração não irem ao banco.
+_integration_cache = VersionedCache()
+
 
 def utcnow_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -598,6 +612,9 @@ def _merge_integration_settings(
         integration_id=integration["id"],
         updates={"settings": next_settings},
     )
+    # Depois da escrita: invalidar antes deixaria uma leitura concorrente
+    # recolocar a linha antiga no cache até o TTL.
+    invalidate_meta_integration_cache(integration.get("page_id"))
     integration["settings"] = next_settings
     return integration
 
@@ -741,7 +758,7 @@ def _ensure_owner_in_org(supa: Client, *, org_id: str, owner_id: Optional[str])
     return owner_id
 
 
-def resolve_meta_integration(
+def _query_meta_integration(
     supa: Client,
     *,
     page_id: str,
@@ -792,7 +809,7 @@ def resolve_meta_integration(
     return rows[0] if rows else None
 
 
-def list_meta_integrations_for_page(
+def _query_meta_integrations_for_page(
     supa: Client,
     *,
     page_id: str,
@@ -811,6 +828,49 @@ def list_meta_integrations_for_page(
     return _safe_data(resp) or []
 
 
+def invalidate_meta_integration_cache(page_id: Optional[str] = None) -> None:
+    """Descarta o cache da página (ou todo o cache quando `page_id` é None)."""
+    _integration_cache.discard(lambda key: page_id is None or key[1] == page_id)
+
+
+def _cached_integration_lookup(key: tuple[str, str, Optional[str]], loader) -> Any:
+    ttl = settings.META_INTEGRATION_CACHE_TTL_SEC
+    if ttl <= 0:
+        return loader()
+    # Cópia na leitura: o chamador altera a integração (ex.: `_merge_integration_settings`).
+    hit = _integration_cache.get(key)
+    if hit is not MISS:
+        return hit
+    # invalidação durante a leitura descarta a escrita (o valor lido pode ser o antigo)
+    geracao = _integration_cache.geracao()
+    value = loader()
+    _integration_cache.put(key, value, ttl=ttl, geracao=geracao)
+    return value
+
+
+def resolve_meta_integration(
+    supa: Client,
+    *,
+    page_id: str,
+    form_id: str | None,
+) -> Optional[dict[str, Any]]:
+    return _cached_integration_lookup(
+        ("resolve", page_id, form_id),
+        lambda: _query_meta_integration(supa, page_id=page_id, form_id=form_id),
+    )
+
+
+def list_meta_integrations_for_page(
+    supa: Client,
+    *,
+    page_id: str,
+) -> list[dict[str, Any]]:
+    return _cached_integration_lookup(
+        ("page", page_id, None),
+        lambda: _query_meta_integrations_for_page(supa, page_id=page_id),
+    )
+
+
 def resolve_meta_verify_token(
     supa: Client,
     *,
@@ -835,7 +895,7 @@ def _fetch_meta_lead_details(
     leadgen_id: str,
     access_token: str,
 ) -> dict[str, Any]:
-    response = requests.get(
+    response = http_client.get(
         f"{settings.META_GRAPH_API_BASE.rstrip('/')}/{leadgen_id}",
         params={
             "access_token": access_token,
@@ -846,12 +906,80 @@ def _fetch_meta_lead_details(
     if response.status_code >= 400:
         raise RuntimeError(f"Meta Graph falhou: {response.status_code} {response.text}")
 
-    data = response.json()
+    return _validate_meta_lead_details(response.json())
+
+
+def _validate_meta_lead_details(data: Any) -> dict[str, Any]:
     if not isinstance(data, dict) or not data.get("id"):
         raise RuntimeError("Meta Graph não retornou um lead válido.")
     return data
 
 
+def _fetch_meta_lead_details_batch(
+    *,
+    leadgen_ids: list[str],
+    access_token: str,
+) -> dict[str, dict[str, Any] | Exception]:
+    """Busca vários leads pela Graph Batch API (até 50 por chamada).
+
+    Devolve, por leadgen_id, o lead validado ou a exceção daquele item: uma
+    falha isolada não derruba os demais; uma falha da chamada inteira vale
+    para todos os itens do lote.
+    """
+    results: dict[str, dict[str, Any] | Exception] = {}
+    unique_ids = list(dict.fromkeys(leadgen_ids))
+    for start in range(0, len(unique_ids), META_GRAPH_BATCH_SIZE):
+        chunk = unique_ids[start:start + META_GRAPH_BATCH_SIZE]
+        try:
+            response = http_client.post(
+                f"{settings.META_GRAPH_API_BASE.rstrip('/')}/",
+                data={
+                    "access_token": access_token,
+                    "include_headers": "false",
+                    "batch": json.dumps(
+                        [
+                            {"method": "GET", "relative_url": f"{leadgen_id}?fields={META_GRAPH_FIELDS}"}
+                            for leadgen_id in chunk
+                        ]
+                    ),
+                },
+                timeout=30,
+                idempotent=True,
+                endpoint="meta.graph.batch",
+            )
+            if response.status_code >= 400:
+                raise RuntimeError(f"Meta Graph falhou: {response.status_code} {response.text}")
+            items = response.json()
+            if not isinstance(items, list) or len(items) != len(chunk):
+                raise RuntimeError("Meta Graph batch retornou payload inválido.")
+        except Exception as exc:
+            for leadgen_id in chunk:
+                results[leadgen_id] = exc
+            continue
+
+        for leadgen_id, item in zip(chunk, items):
+            results[leadgen_id] = _parse_meta_batch_item(item)
+    return results
+
+
+def _parse_meta_batch_item(item: Any) -> dict[str, Any] | Exception:
+    # Item nulo = a Meta não concluiu aquela sub-requisição a tempo.
+    if not isinstance(item, dict):
+        return RuntimeError("Meta Graph batch não retornou resultado para o lead.")
+    code = item.get("code")
+    body = item.get("body")
+    if not isinstance(code, int) or code >= 400:
+        return RuntimeError(f"Meta Graph falhou: {code} {body}")
+    try:
+        data = json.loads(body) if isinstance(body, str) else body
+    except ValueError:
+        return RuntimeError("Meta Graph não retornou um lead válido.")
+    try:
+        return _validate_meta_lead_details(data)
+    except RuntimeError as exc:
+        return exc
+
+
 def _meta_graph_request(
     *,
     method: str,
@@ -860,9 +988,9 @@ def _meta_graph_request(
     params: Optional[dict[str, Any]] = None,
     data: Optional[dict[str, Any]] = None,
 ) -> dict[str, Any]:
-    response = requests.request(
-        method=method.upper(),
-        url=f"{settings.META_GRAPH_API_BASE.rstrip('/')}/{path.lstrip('/')}",
+    response = http_client.request(
+        method.upper(),
+        f"{settings.META_GRAPH_API_BASE.rstrip('/')}/{path.lstrip('/')}",
         params={
             **(params or {}),
             "access_token": access_token,
@@ -977,7 +1105,7 @@ def exchange_meta_oauth_code(*, code: str) -> str:
             "code_present": bool(code),
         },
     )
-    response = requests.get(
+    response = http_client.get(
         f"{settings.META_GRAPH_API_BASE.rstrip('/')}/oauth/access_token",
         params={
             "client_id": settings.META_APP_ID.strip(),
@@ -1324,6 +1452,7 @@ def save_meta_oauth_draft(
                 )
             else:
                 supa.table("meta_lead_integrations").insert(payload).execute()
+            invalidate_meta_integration_cache(payload.get("page_id"))
         except Exception as exc:
             error_message = _stringify_exception(exc)
             logger.exception(
@@ -1404,6 +1533,7 @@ def save_meta_oauth_draft(
                 "ativo": False,
             },
         )
+        invalidate_meta_integration_cache(page_id)
 
     return persisted
 
@@ -1532,6 +1662,7 @@ def finalize_meta_oauth_integration(
         .eq("org_id", org_id)
         .execute()
     )
+    invalidate_meta_integration_cache(page_id)
     row = _fetch_meta_integration_row(
         supa,
         org_id=org_id,
@@ -1925,6 +2056,12 @@ def _parse_meta_field_data(field_data: list[dict[str, Any]] | None) -> dict[str,
     }
 
 
+LEAD_CONTACT_COLUMNS = (
+    "id, org_id, nome, telefone, email, origem, owner_id, etapa, "
+    "source_label, form_label, channel, utm_source, utm_medium, utm_campaign, utm_term, utm_content"
+)
+
+
 def _fetch_existing_lead_by_contact(
     supa: Client,
     *,
@@ -1932,39 +2069,13 @@ def _fetch_existing_lead_by_contact(
     telefone: Optional[str],
     email: Optional[str],
 ) -> Optional[dict[str, Any]]:
-    if telefone:
-        phone_resp = (
-            supa.table("leads")
-            .select(
-                "id, org_id, nome, telefone, email, origem, owner_id, etapa, "
-                "source_label, form_label, channel, utm_source, utm_medium, utm_campaign, utm_term, utm_content"
-            )
-            .eq("org_id", org_id)
-            .eq("telefone", telefone)
-            .limit(1)
-            .execute()
-        )
-        rows = _safe_data(phone_resp) or []
-        if rows:
-            return rows[0]
-
-    if email:
-        email_resp = (
-            supa.table("leads")
-            .select(
-                "id, org_id, nome, telefone, email, origem, owner_id, etapa, "
-                "source_label, form_label, channel, utm_source, utm_medium, utm_campaign, utm_term, utm_content"
-            )
-            .eq("org_id", org_id)
-            .ilike("email", email)
-            .limit(1)
-            .execute()
-        )
-        rows = _safe_data(email_resp) or []
-        if rows:
-            return rows[0]
-
-    return None
+    return find_lead_by_contact(
+        supa,
+        org_id=org_id,
+        telefone=telefone,
+        email=email,
+        columns=LEAD_CONTACT_COLUMNS,
+    )
 
 
 def upsert_lead_from_meta(
@@ -1973,7 +2084,13 @@ def upsert_lead_from_meta(
     integration: dict[str, Any],
     lead_payload: dict[str, Any],
     actor_id: Optional[str] = None,
+    contact_index: Optional[dict[str, dict[str, Any]]] = None,
 ) -> tuple[dict[str, Any], str]:
+    """Cria ou atualiza o lead pelo contato.
+
+    `contact_index` é o índice já resolvido em lote (`resolve_leads_by_contacts`)
+    numa rajada de eventos; o lead gravado entra nele para os eventos seguintes.
+    """
     org_id = integration["org_id"]
     telefone = normalize_phone(lead_payload.get("telefone"))
     email = normalize_email(lead_payload.get("email"))
@@ -1984,12 +2101,15 @@ def upsert_lead_from_meta(
             detail="Lead da Meta sem telefone ou email para deduplicação.",
         )
 
-    existing = _fetch_existing_lead_by_contact(
-        supa,
-        org_id=org_id,
-        telefone=telefone,
-        email=email,
-    )
+    if contact_index is not None:
+        existing = match_lead(contact_index, telefone=telefone, email=email)
+    else:
+        existing = _fetch_existing_lead_by_contact(
+            supa,
+            org_id=org_id,
+            telefone=telefone,
+            email=email,
+        )
 
     owner_id = integration.get("default_owner_id")
     base_payload: dict[str, Any] = {
@@ -2045,10 +2165,16 @@ def upsert_lead_from_meta(
             diff={
                 "provider": META_PROVIDER,
                 "integration_id": integration["id"],
-                "matched_by": "telefone" if telefone and existing.get("telefone") == telefone else "email",
+                "matched_by": (
+                    "telefone"
+                    if telefone and phone_key(existing.get("telefone")) == phone_key(telefone)
+                    else "email"
+                ),
                 "updated_fields": sorted(update_payload.keys()),
             },
         )
+        if contact_index is not None:
+            remember_lead(contact_index, row)
         return row, "updated"
 
     create_payload = {
@@ -2079,6 +2205,8 @@ def upsert_lead_from_meta(
             "source_label": integration.get("source_label"),
         },
     )
+    if contact_index is not None:
+        remember_lead(contact_index, row)
     return row, "created"
 
 
@@ -2163,11 +2291,16 @@ def upsert_meta_diagnostic_from_meta(
     return _first_row(resp) or insert_payload
 
 
-def ingest_meta_lead_event(
+def _prepare_meta_lead_event(
     supa: Client,
     *,
     payload: dict[str, Any],
-) -> dict[str, Any]:
+) -> tuple[Optional[dict[str, Any]], Optional[dict[str, Any]]]:
+    """Valida, resolve a integração, deduplica e registra o evento recebido.
+
+    Retorna `(prepared, None)` quando o lead precisa ser buscado na Graph, ou
+    `(None, result)` quando o evento já foi tratado (duplicado).
+    """
     page_id = _trim(payload.get("page_id"))
     form_id = _trim(payload.get("form_id"))
     leadgen_id = _trim(payload.get("leadgen_id"))
@@ -2236,7 +2369,7 @@ def ingest_meta_lead_event(
     )
     duplicate_by_leadgen_rows = _safe_data(duplicate_by_leadgen_resp) or []
     if duplicate_by_leadgen_rows:
-        return {
+        return None, {
             "ok": True,
             "event_id": duplicate_by_leadgen_rows[0]["id"],
             "lead_id": None,
@@ -2253,7 +2386,7 @@ def ingest_meta_lead_event(
     )
     duplicate_rows = _safe_data(duplicate_resp) or []
     if duplicate_rows:
-        return {
+        return None, {
             "ok": True,
             "event_id": duplicate_rows[0]["id"],
             "lead_id": None,
@@ -2280,16 +2413,49 @@ def ingest_meta_lead_event(
         },
     )
 
+    return {
+        "payload": payload,
+        "page_id": page_id,
+        "form_id": form_id,
+        "leadgen_id": leadgen_id,
+        "integration": integration,
+        "event": event,
+    }, None
+
+
+def _process_meta_lead_event(
+    supa: Client,
+    *,
+    prepared: dict[str, Any],
+    lead_data: Optional[dict[str, Any]] = None,
+    fetch_error: Optional[Exception] = None,
+    contact_index: Optional[dict[str, dict[str, Any]]] = None,
+) -> dict[str, Any]:
+    """Upsert do lead a partir do evento registrado.
+
+    `lead_data`/`fetch_error` vêm da busca em lote; sem eles o lead é buscado aqui.
+    `contact_index` é o índice de contatos da org resolvido em lote.
+    """
+    payload = prepared["payload"]
+    page_id = prepared["page_id"]
+    form_id = prepared["form_id"]
+    leadgen_id = prepared["leadgen_id"]
+    integration = prepared["integration"]
+    event = prepared["event"]
+
     lead_payload_audit: dict[str, Any] = {"webhook": payload}
     try:
-        access_token = _trim(integration.get("access_token_encrypted"))
-        if not access_token:
-            raise RuntimeError("Integração Meta sem access_token configurado.")
-
-        lead_data = _fetch_meta_lead_details(
-            leadgen_id=leadgen_id,
-            access_token=access_token,
-        )
+        if fetch_error is not None:
+            raise fetch_error
+        if lead_data is None:
+            access_token = _trim(integration.get("access_token_encrypted"))
+            if not access_token:
+                raise RuntimeError("Integração Meta sem access_token configurado.")
+
+            lead_data = _fetch_meta_lead_details(
+                leadgen_id=leadgen_id,
+                access_token=access_token,
+            )
         parsed = _parse_meta_field_data(lead_data.get("field_data"))
         if not parsed.get("nome"):
             raise RuntimeError("Lead da Meta sem nome válido.")
@@ -2335,6 +2501,7 @@ def ingest_meta_lead_event(
             integration=integration,
             lead_payload=meta_lead_payload,
             actor_id=integration.get("created_by") or integration.get("updated_by"),
+            contact_index=contact_index,
         )
         diagnostic_row = upsert_meta_diagnostic_from_meta(
             supa,
@@ -2444,6 +2611,106 @@ def ingest_meta_lead_event(
         )
 
 
+def ingest_meta_lead_event(
+    supa: Client,
+    *,
+    payload: dict[str, Any],
+) -> dict[str, Any]:
+    prepared, result = _prepare_meta_lead_event(supa, payload=payload)
+    if result is not None:
+        return result
+    return _process_meta_lead_event(supa, prepared=prepared)
+
+
+def ingest_meta_lead_events(
+    supa: Client,
+    *,
+    payloads: list[dict[str, Any]],
+) -> list[dict[str, Any] | HTTPException]:
+    """Processa uma rajada de eventos leadgen com as buscas agrupadas na Graph Batch API.
+
+    Retorna um resultado por payload, na mesma ordem: o dict de
+    `ingest_meta_lead_event` ou a HTTPException daquele evento.
+    """
+    outcomes: list[dict[str, Any] | HTTPException] = [{} for _ in payloads]
+    pending: list[tuple[int, dict[str, Any]]] = []
+    for index, payload in enumerate(payloads):
+        try:
+            prepared, result = _prepare_meta_lead_event(supa, payload=payload)
+        except HTTPException as exc:
+            outcomes[index] = exc
+            continue
+        if result is not None:
+            outcomes[index] = result
+            continue
+        pending.append((index, prepared))
+
+    if len(pending) == 1:
+        index, prepared = pending[0]
+        try:
+            outcomes[index] = _process_meta_lead_event(supa, prepared=prepared)
+        except HTTPException as exc:
+            outcomes[index] = exc
+        return outcomes
+
+    ids_by_token: dict[str, list[str]] = {}
+    for _, prepared in pending:
+        access_token = _trim(prepared["integration"].get("access_token_encrypted"))
+        if access_token:
+            ids_by_token.setdefault(access_token, []).append(prepared["leadgen_id"])
+
+    fetched: dict[tuple[str, str], dict[str, Any] | Exception] = {}
+    for access_token, leadgen_ids in ids_by_token.items():
+        batch = _fetch_meta_lead_details_batch(leadgen_ids=leadgen_ids, access_token=access_token)
+        for leadgen_id, item in batch.items():
+            fetched[(access_token, leadgen_id)] = item
+
+    items: list[dict[str, Any] | Exception] = []
+    contacts_by_org: dict[str, list[tuple[Any, Any]]] = {}
+    for _, prepared in pending:
+        access_token = _trim(prepared["integration"].get("access_token_encrypted"))
+        item: dict[str, Any] | Exception
+        if not access_token:
+            item = RuntimeError("Integração Meta sem access_token configurado.")
+        else:
+            item = fetched.get(
+                (access_token, prepared["leadgen_id"]),
+                RuntimeError("Meta Graph batch não retornou resultado para o lead."),
+            )
+        items.append(item)
+        if isinstance(item, dict):
+            parsed = _parse_meta_field_data(item.get("field_data"))
+            contacts_by_org.setdefault(prepared["integration"]["org_id"], []).append(
+                (normalize_phone(parsed.get("telefone")), normalize_email(parsed.get("email")))
+            )
+
+    # Deduplicação da rajada inteira: uma busca de contatos por org.
+    contact_indexes: dict[str, dict[str, dict[str, Any]]] = {}
+    for org_id, contacts in contacts_by_org.items():
+        try:
+            contact_indexes[org_id] = resolve_leads_by_contacts(
+                supa,
+                org_id=org_id,
+                contacts=contacts,
+                columns=LEAD_CONTACT_COLUMNS,
+            )
+        except Exception as exc:  # noqa: BLE001 - cai na busca por evento
+            logger.warning("meta_contact_resolve_failed", extra={"org_id": org_id, "error": str(exc)})
+
+    for (index, prepared), item in zip(pending, items):
+        try:
+            outcomes[index] = _process_meta_lead_event(
+                supa,
+                prepared=prepared,
+                lead_data=item if isinstance(item, dict) else None,
+                fetch_error=item if isinstance(item, Exception) else None,
+                contact_index=contact_indexes.get(prepared["integration"]["org_id"]),
+            )
+        except HTTPException as exc:
+            outcomes[index] = exc
+    return outcomes
+
+
 def delete_meta_integration(
     supa: Client,
     *,
@@ -2463,6 +2730,7 @@ def delete_meta_integration(
     supa.table("meta_lead_integrations").delete().eq("id", integration["id"]).eq(
         "org_id", integration["org_id"]
     ).execute()
+    invalidate_meta_integration_cache(integration["page_id"])
 
     return {
         "ok": True,
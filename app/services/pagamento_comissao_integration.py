@@ -1,7 +1,7 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 from supabase import Client
 
-from app.services.comissao_competencia_service import processar_pagamento_para_comissao
+from app.services.comissao_eventos_service import enfileirar_evento
 
 
 def on_pagamento_saved(
@@ -10,10 +10,10 @@ def on_pagamento_saved(
     org_id: str,
     pagamento_id: str,
     actor_id: Optional[str] = None,
-) -> None:
-    processar_pagamento_para_comissao(
+) -> Dict[str, Any]:
+    return enfileirar_evento(
         supa,
         org_id=org_id,
         pagamento_id=pagamento_id,
         actor_id=actor_id,
-    )
\ No newline at end of file
+    )
@@ -3,12 +3,13 @@ from __future__ import annotations
 from calendar import monthrange
 from datetime import date, datetime, timezone
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from fastapi import HTTPException
 from supabase import Client
 
 from app.schemas.financeiro import PagamentoUpsertIn
+from app.services import comissao_eventos_service
 from app.services.comissao_competencia_service import (
     _resolve_regra_competencia_prevista,
     processar_pagamento_para_comissao,
@@ -20,6 +21,7 @@ from app.services.comissao_service import (
     fetch_cota_context,
     fetch_regras,
 )
+from app.services.export_service import ExportColumn
 
 MONEY_Q = Decimal("0.01")
 
@@ -175,8 +177,7 @@ def _find_cronograma_rows_for_regra(
     return rows
 
 
-def _upsert_pagamento_cronograma(
-    supa: Client,
+def cronograma_payload(
     *,
     org_id: str,
     actor_id: str,
@@ -185,27 +186,10 @@ def _upsert_pagamento_cronograma(
     regra: Dict[str, Any],
     competencia: date,
     valor: Decimal,
-) -> Tuple[Dict[str, Any], str]:
+) -> Dict[str, Any]:
+    """Linha de `pagamentos` da parcela prevista de uma regra do cronograma."""
     vencimento = _resolve_pagamento_vencimento(competencia, cota)
-    # Identidade por REGRA: reutiliza a parcela existente da regra (movendo a competência)
-    # em vez de cancelar+criar. Duplicados da mesma regra são removidos (limpa poluição).
-    rows_regra = _find_cronograma_rows_for_regra(
-        supa, org_id=org_id, contrato_id=contrato["id"], regra_id=regra["id"]
-    )
-    existing = rows_regra[0] if rows_regra else None
-    for extra in rows_regra[1:]:
-        supa.table("pagamentos").delete().eq("org_id", org_id).eq("id", extra["id"]).execute()
-
-    source_payload = {
-        "source_module": "financeiro_cronograma_comissao",
-        "regra_id": regra["id"],
-        "ordem": int(regra.get("ordem") or 0),
-        "tipo_evento": regra.get("tipo_evento"),
-        "actor_id": actor_id,
-        "cronograma_confirmado_em": _now_iso(),
-    }
-
-    payload = {
+    return {
         "org_id": org_id,
         "contrato_id": contrato["id"],
         "tipo": "parcela_mensal",
@@ -216,9 +200,48 @@ def _upsert_pagamento_cronograma(
         "referencia": f"Comissão prevista #{int(regra.get('ordem') or 0)}",
         "origem": "manual",
         "observacoes": "Cronograma previsto da comissão confirmado operacionalmente.",
-        "payload": source_payload,
+        "payload": {
+            "source_module": "financeiro_cronograma_comissao",
+            "regra_id": regra["id"],
+            "ordem": int(regra.get("ordem") or 0),
+            "tipo_evento": regra.get("tipo_evento"),
+            "actor_id": actor_id,
+            "cronograma_confirmado_em": _now_iso(),
+        },
     }
 
+
+def _upsert_pagamento_cronograma(
+    supa: Client,
+    *,
+    org_id: str,
+    actor_id: str,
+    contrato: Dict[str, Any],
+    cota: Dict[str, Any],
+    regra: Dict[str, Any],
+    competencia: date,
+    valor: Decimal,
+) -> Tuple[Dict[str, Any], str]:
+    # Identidade por REGRA: reutiliza a parcela existente da regra (movendo a competência)
+    # em vez de cancelar+criar. Duplicados da mesma regra são removidos (limpa poluição).
+    rows_regra = _find_cronograma_rows_for_regra(
+        supa, org_id=org_id, contrato_id=contrato["id"], regra_id=regra["id"]
+    )
+    existing = rows_regra[0] if rows_regra else None
+    for extra in rows_regra[1:]:
+        supa.table("pagamentos").delete().eq("org_id", org_id).eq("id", extra["id"]).execute()
+
+    payload = cronograma_payload(
+        org_id=org_id,
+        actor_id=actor_id,
+        contrato=contrato,
+        cota=cota,
+        regra=regra,
+        competencia=competencia,
+        valor=valor,
+    )
+    source_payload = payload["payload"]
+
     if existing:
         existing_status = (existing.get("status") or "previsto").lower()
         update_payload = {
@@ -400,23 +423,20 @@ def create_pagamento(
 ) -> Dict[str, Any]:
     _get_contract_or_404(supa, org_id, body.contrato_id)
     payload = _normalize_pagamento_payload(body=body, org_id=org_id)
-    inserted = supa.table("pagamentos").insert(payload).execute()
-    pagamento = _safe_one(inserted)
-    if not pagamento:
-        raise HTTPException(500, "Erro ao criar pagamento")
-
-    processamento = processar_pagamento_para_comissao(
+    saved = comissao_eventos_service.salvar_pagamento_com_evento(
         supa,
         org_id=org_id,
-        pagamento_id=pagamento["id"],
+        pagamento_id=None,
+        dados=payload,
         actor_id=actor_id,
     )
+    pagamento = saved["pagamento"]
 
     enriched = _enrich_pagamento_rows(supa, org_id, [pagamento])
     return {
         "ok": True,
         "item": enriched[0] if enriched else pagamento,
-        "processamento": processamento,
+        "processamento": saved["processamento"],
     }
 
 
@@ -438,31 +458,34 @@ def update_pagamento(
         "updated_at_financeiro": _now_iso(),
     }
 
-    updated = (
-        supa.table("pagamentos")
-        .update(payload)
-        .eq("org_id", org_id)
-        .eq("id", pagamento_id)
-        .execute()
-    )
-    pagamento = _safe_one(updated)
-    if not pagamento:
-        raise HTTPException(500, "Erro ao atualizar pagamento")
-
-    processamento = processar_pagamento_para_comissao(
+    saved = comissao_eventos_service.salvar_pagamento_com_evento(
         supa,
         org_id=org_id,
         pagamento_id=pagamento_id,
+        dados=payload,
         actor_id=actor_id,
     )
+    pagamento = saved["pagamento"]
+
     enriched = _enrich_pagamento_rows(supa, org_id, [pagamento])
     return {
         "ok": True,
         "item": enriched[0] if enriched else pagamento,
-        "processamento": processamento,
+        "processamento": saved["processamento"],
     }
 
 
+def contrato_ids_da_cota(supa: Client, org_id: str, cota_id: str) -> List[str]:
+    resp = (
+        supa.table("contratos")
+        .select("id")
+        .eq("org_id", org_id)
+        .eq("cota_id", cota_id)
+        .execute()
+    )
+    return [row["id"] for row in _safe_rows(resp)]
+
+
 def list_pagamentos_by_contrato(
     supa: Client,
     *,
@@ -489,15 +512,7 @@ def list_pagamentos_by_cota(
     org_id: str,
     cota_id: str,
 ) -> Dict[str, Any]:
-    contratos_resp = (
-        supa.table("contratos")
-        .select("id")
-        .eq("org_id", org_id)
-        .eq("cota_id", cota_id)
-        .execute()
-    )
-    contratos = _safe_rows(contratos_resp)
-    contrato_ids = [row["id"] for row in contratos]
+    contrato_ids = contrato_ids_da_cota(supa, org_id, cota_id)
     if not contrato_ids:
         return {"ok": True, "items": [], "total": 0}
 
@@ -514,6 +529,60 @@ def list_pagamentos_by_cota(
     return {"ok": True, "items": items, "total": len(items)}
 
 
+def iter_pagamentos(
+    supa: Client,
+    *,
+    org_id: str,
+    contrato_ids: List[str],
+    page_size: int = 500,
+) -> Iterator[Dict[str, Any]]:
+    """Pagamentos dos contratos por keyset em (competencia, id), já enriquecidos.
+
+    Usado nas exportações: só uma página fica em memória por vez.
+    """
+    if not contrato_ids:
+        return
+    last: Optional[Tuple[str, str]] = None
+    while True:
+        query = (
+            supa.table("pagamentos")
+            .select("*")
+            .eq("org_id", org_id)
+            .in_("contrato_id", contrato_ids)
+        )
+        if last:
+            competencia, last_id = last
+            query = query.or_(f"competencia.gt.{competencia},and(competencia.eq.{competencia},id.gt.{last_id})")
+        rows = _safe_rows(query.order("competencia").order("id").limit(page_size).execute())
+        yield from _enrich_pagamento_rows(supa, org_id, rows)
+        if len(rows) < page_size:
+            return
+        last = (str(rows[-1]["competencia"]), str(rows[-1]["id"]))
+
+
+PAGAMENTOS_EXPORT_COLUMNS = [
+    ExportColumn("Competencia", "competencia"),
+    ExportColumn("Contrato", "contrato_numero"),
+    ExportColumn("Grupo", "grupo_codigo"),
+    ExportColumn("Cota", "numero_cota"),
+    ExportColumn("Cliente", "cliente_nome"),
+    ExportColumn("Tipo", "tipo"),
+    ExportColumn("Status", "status"),
+    ExportColumn("Valor", "valor", "dinheiro"),
+    ExportColumn("Vencimento", "vencimento"),
+    ExportColumn("Pago em", "pago_em"),
+    ExportColumn("Referencia", "referencia"),
+    ExportColumn("Origem", "origem"),
+    ExportColumn("Competencia comissao", "competencia_status"),
+    ExportColumn("Gera comissao", "gera_comissao"),
+    ExportColumn("Participou assembleia", "participou_assembleia"),
+    ExportColumn("Lancamentos", "lancamentos_total", "numero"),
+    ExportColumn("Repasses pendentes", "repasses_pendentes", "numero"),
+    ExportColumn("Observacoes", "observacoes"),
+    ExportColumn("ID", "id"),
+]
+
+
 def list_financeiro_contrato_options(
     supa: Client,
     *,
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import logging
 import re
 import unicodedata
-from datetime import datetime, timezone
-from decimal import Decimal
+from datetime import date, datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
 from typing import Any, Dict, List, Optional
 
 from fastapi import HTTPException, UploadFile, status
+from postgrest.exceptions import APIError
 from supabase import Client
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+FECHAMENTO_RPC = "repasse_fechamento_criar_lotes"
+# Página da leitura dos lançamentos elegíveis (keyset por id).
+FECHAMENTO_PAGE_SIZE = 1000
+MONEY_Q = Decimal("0.01")
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -128,6 +137,225 @@ def create_repasse_lote(
     return {"ok": True, "lote": lote, "repasses_pagos": len(ids)}
 
 
+def _money_str(value: Decimal) -> str:
+    return str(value.quantize(MONEY_Q, rounding=ROUND_HALF_UP))
+
+
+def _fetch_repasses_elegiveis(
+    supa: Client,
+    *,
+    org_id: str,
+    competencia_de: date,
+    competencia_ate: date,
+    parceiro_ids: List[str],
+) -> List[Dict[str, Any]]:
+    """Repasses pendentes de comissão já liberada no período, paginados por id."""
+    rows: List[Dict[str, Any]] = []
+    last_id: Optional[str] = None
+    while True:
+        query = (
+            supa.table("comissao_lancamentos")
+            .select("id, parceiro_id, valor_bruto, valor_imposto, valor_liquido")
+            .eq("org_id", org_id)
+            .eq("beneficiario_tipo", "parceiro")
+            .eq("repasse_status", "pendente")
+            .eq("status", "disponivel")
+            .gte("competencia_prevista", competencia_de.isoformat())
+            .lte("competencia_prevista", competencia_ate.isoformat())
+        )
+        if parceiro_ids:
+            query = query.in_("parceiro_id", parceiro_ids)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = _safe_rows(query.order("id").limit(FECHAMENTO_PAGE_SIZE).execute())
+        rows.extend(page)
+        if len(page) < FECHAMENTO_PAGE_SIZE:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def _agrupar_por_parceiro(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    grupos: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        if not row.get("parceiro_id"):
+            continue
+        grupo = grupos.setdefault(
+            row["parceiro_id"],
+            {
+                "lancamento_ids": [],
+                "bruto": Decimal("0"),
+                "imposto": Decimal("0"),
+                "liquido": Decimal("0"),
+            },
+        )
+        grupo["lancamento_ids"].append(row["id"])
+        grupo["bruto"] += Decimal(str(row.get("valor_bruto") or 0))
+        grupo["imposto"] += Decimal(str(row.get("valor_imposto") or 0))
+        grupo["liquido"] += Decimal(str(row.get("valor_liquido") or 0))
+    return grupos
+
+
+def _criar_lotes_um_a_um(
+    supa: Client,
+    *,
+    org_id: str,
+    grupos: Dict[str, Dict[str, Any]],
+    forma_pagamento: Optional[str],
+    observacoes: Optional[str],
+    actor_id: str,
+) -> List[Dict[str, Any]]:
+    """Sem a migration 014: um `create_repasse_lote` por parceiro (não atômico)."""
+    out: List[Dict[str, Any]] = []
+    for parceiro_id, grupo in grupos.items():
+        try:
+            result = create_repasse_lote(
+                supa,
+                org_id=org_id,
+                parceiro_id=parceiro_id,
+                lancamento_ids=grupo["lancamento_ids"],
+                forma_pagamento=forma_pagamento,
+                observacoes=observacoes,
+                actor_id=actor_id,
+            )
+        except HTTPException as exc:
+            if exc.status_code != 409:
+                raise
+            out.append({"parceiro_id": parceiro_id, "lote_id": None, "quantidade": 0, "total": 0})
+            continue
+        lote = result["lote"]
+        out.append(
+            {
+                "parceiro_id": parceiro_id,
+                "lote_id": lote["id"],
+                "quantidade": lote.get("quantidade", result["repasses_pagos"]),
+                "total": lote.get("total"),
+            }
+        )
+    return out
+
+
+def fechar_repasses(
+    supa: Client,
+    *,
+    org_id: str,
+    competencia_de: date,
+    competencia_ate: date,
+    parceiro_ids: Optional[List[str]] = None,
+    forma_pagamento: Optional[str] = None,
+    observacoes: Optional[str] = None,
+    previa: bool = False,
+    actor_id: str,
+) -> Dict[str, Any]:
+    """Fechamento do período para todos os parceiros (ou os informados): um lote
+    por parceiro com os repasses pendentes de comissão liberada.
+
+    Com `previa=True` só devolve o resumo por parceiro, sem gravar.
+    """
+    rows = _fetch_repasses_elegiveis(
+        supa,
+        org_id=org_id,
+        competencia_de=competencia_de,
+        competencia_ate=competencia_ate,
+        parceiro_ids=list(parceiro_ids or []),
+    )
+    grupos = _agrupar_por_parceiro(rows)
+    if not grupos:
+        return {
+            "ok": True,
+            "previa": previa,
+            "itens": [],
+            "totais": {"parceiros": 0, "lotes": 0, "repasses": 0, "total": "0.00"},
+        }
+
+    nomes = {
+        row["id"]: row.get("nome")
+        for row in _safe_rows(
+            supa.table("parceiros_corretores")
+            .select("id, nome")
+            .eq("org_id", org_id)
+            .in_("id", list(grupos))
+            .execute()
+        )
+    }
+
+    criados: Dict[str, Dict[str, Any]] = {}
+    if not previa:
+        forma = (forma_pagamento or "").strip() or None
+        obs = (observacoes or "").strip() or None
+        try:
+            resp = supa.rpc(
+                FECHAMENTO_RPC,
+                {
+                    "p_org_id": org_id,
+                    "p_lotes": [
+                        {"parceiro_id": parceiro_id, "lancamento_ids": grupo["lancamento_ids"]}
+                        for parceiro_id, grupo in grupos.items()
+                    ],
+                    "p_pago_em": _now_iso(),
+                    "p_actor_id": actor_id,
+                    "p_forma_pagamento": forma,
+                    "p_observacoes": obs,
+                },
+            ).execute()
+            lotes = getattr(resp, "data", None) or []
+        except APIError as exc:
+            if FECHAMENTO_RPC not in str(getattr(exc, "message", None) or exc).lower():
+                raise
+            logger.warning("repasse_fechamento_rpc_ausente", extra={"org_id": org_id})
+            lotes = _criar_lotes_um_a_um(
+                supa,
+                org_id=org_id,
+                grupos=grupos,
+                forma_pagamento=forma,
+                observacoes=obs,
+                actor_id=actor_id,
+            )
+        criados = {str(lote["parceiro_id"]): lote for lote in lotes}
+
+    itens: List[Dict[str, Any]] = []
+    total_geral = Decimal("0")
+    repasses = 0
+    for parceiro_id, grupo in sorted(grupos.items(), key=lambda item: (nomes.get(item[0]) or "", item[0])):
+        selecionados = len(grupo["lancamento_ids"])
+        item: Dict[str, Any] = {
+            "parceiro_id": parceiro_id,
+            "nome": nomes.get(parceiro_id),
+            "quantidade": selecionados,
+            "valor_bruto": _money_str(grupo["bruto"]),
+            "valor_imposto": _money_str(grupo["imposto"]),
+            "total": _money_str(grupo["liquido"]),
+        }
+        total = grupo["liquido"]
+        if not previa:
+            lote = criados.get(parceiro_id) or {}
+            quantidade = int(lote.get("quantidade") or 0)
+            total = Decimal(str(lote.get("total") or 0))
+            item.update(
+                {
+                    "lote_id": lote.get("lote_id"),
+                    "quantidade": quantidade,
+                    "total": _money_str(total),
+                    # mudaram de status entre a seleção e a gravação
+                    "ignorados": selecionados - quantidade,
+                }
+            )
+        total_geral += total
+        repasses += item["quantidade"]
+        itens.append(item)
+
+    return {
+        "ok": True,
+        "previa": previa,
+        "itens": itens,
+        "totais": {
+            "parceiros": len(itens),
+            "lotes": sum(1 for item in itens if item.get("lote_id")),
+            "repasses": repasses,
+            "total": _money_str(total_geral),
+        },
+    }
+
+
 def _get_lote_or_404(supa: Client, org_id: str, lote_id: str) -> Dict[str, Any]:
     resp = (
         supa.table("repasse_lotes").select("*").eq("org_id", org_id).eq("id", lote_id).limit(1).execute()
@@ -12,15 +12,17 @@ from __future__ import annotations
 
 import logging
 import re
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 from uuid import uuid4
 
-import requests
 from fastapi import HTTPException, status
 from supabase import Client
 
+from app.core import http_client
 from app.core.config import settings
+from app.services.lead_contact_service import find_lead_by_contact
 from app.services.whatsapp_quick_replies import extract_quick_replies
 
 logger = logging.getLogger(__name__)
@@ -105,7 +107,7 @@ def _require_meta_app() -> tuple[str, str]:
 
 
 def _graph_get(*, path: str, access_token: str, params: Optional[dict[str, Any]] = None) -> dict[str, Any]:
-    resp = requests.get(
+    resp = http_client.get(
         f"{_graph_base()}/{path.lstrip('/')}",
         params={**(params or {}), "access_token": access_token},
         timeout=20,
@@ -119,7 +121,7 @@ def _graph_get(*, path: str, access_token: str, params: Optional[dict[str, Any]]
 
 
 def _graph_post(*, path: str, access_token: str, data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
-    resp = requests.post(
+    resp = http_client.post(
         f"{_graph_base()}/{path.lstrip('/')}",
         params={"access_token": access_token},
         data=data or {},
@@ -149,7 +151,7 @@ def signup_config(*, connected: bool) -> dict[str, Any]:
 def exchange_signup_code(*, code: str) -> str:
     """Troca o code do Embedded Signup por um token de negócio (business token)."""
     app_id, app_secret = _require_meta_app()
-    resp = requests.get(
+    resp = http_client.get(
         f"{_graph_base()}/oauth/access_token",
         params={
             "client_id": app_id,
@@ -478,7 +480,7 @@ def _build_template_payload(*, to: str, template: dict[str, Any], nome: Optional
 def send_template_message(
     *, access_token: str, phone_number_id: str, payload: dict[str, Any]
 ) -> dict[str, Any]:
-    resp = requests.post(
+    resp = http_client.post(
         f"{_graph_base()}/{phone_number_id}/messages",
         headers={"Authorization": f"Bearer {access_token}"},
         json=payload,
@@ -756,7 +758,7 @@ def send_typing_indicator(*, access_token: str, phone_number_id: str, message_id
     if not message_id:
         return
     try:
-        requests.post(
+        http_client.post(
             f"{_graph_base()}/{phone_number_id}/messages",
             headers={"Authorization": f"Bearer {access_token}"},
             json={
@@ -774,31 +776,54 @@ def send_typing_indicator(*, access_token: str, phone_number_id: str, message_id
 def download_media(*, access_token: str, media_id: str) -> Optional[tuple[bytes, str]]:
     """Baixa a mídia (áudio/imagem) do WhatsApp. Retorna (bytes, mime) ou None."""
     try:
-        meta = requests.get(
-            f"{_graph_base()}/{media_id}",
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=20,
-        )
-        if meta.status_code >= 400:
-            return None
-        info = meta.json()
-        url = info.get("url")
-        mime = info.get("mime_type") or "application/octet-stream"
-        if not url:
-            return None
-        binr = requests.get(url, headers={"Authorization": f"Bearer {access_token}"}, timeout=30)
-        if binr.status_code >= 400:
-            return None
-        return binr.content, mime
+        with open_media_stream(access_token=access_token, media_id=media_id) as media:
+            if not media:
+                return None
+            chunks, mime, _size = media
+            return b"".join(chunks), mime
     except Exception as exc:  # noqa: BLE001
         logger.warning("whatsapp_download_media_falhou", extra={"error": str(exc)})
         return None
 
 
+@contextmanager
+def open_media_stream(
+    *, access_token: str, media_id: str
+) -> Iterator[Optional[tuple[Iterator[bytes], str, Optional[int]]]]:
+    """Abre o download da mídia em streaming: (pedaços, mime, tamanho) ou None.
+
+    Evita materializar o arquivo inteiro; os pedaços podem ir direto para o STT.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    info: dict[str, Any] = {}
+    try:
+        meta = http_client.get(f"{_graph_base()}/{media_id}", headers=headers, timeout=20)
+        payload = meta.json() if meta.status_code < 400 else {}
+        info = payload if isinstance(payload, dict) else {}
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("whatsapp_media_stream_falhou", extra={"error": str(exc)})
+    url = info.get("url")
+    if not url:
+        yield None
+        return
+
+    with http_client.stream("GET", url, headers=headers, timeout=30, endpoint="whatsapp.media_download") as binr:
+        if binr.status_code >= 400:
+            yield None
+            return
+        mime = info.get("mime_type") or binr.headers.get("Content-Type") or "application/octet-stream"
+        size = info.get("file_size") or binr.headers.get("Content-Length")
+        yield (
+            binr.iter_bytes(chunk_size=64 * 1024),
+            mime,
+            int(size) if size not in (None, "") else None,
+        )
+
+
 def upload_media(*, access_token: str, phone_number_id: str, data: bytes, mime: str, filename: str = "audio.ogg") -> Optional[str]:
     """Sobe uma mídia e retorna o media_id."""
     try:
-        resp = requests.post(
+        resp = http_client.post(
             f"{_graph_base()}/{phone_number_id}/media",
             headers={"Authorization": f"Bearer {access_token}"},
             data={"messaging_product": "whatsapp", "type": mime},
@@ -893,24 +918,10 @@ def _find_or_create_lead(
     supa: Client, org_id: str, phone: str, nome: Optional[str]
 ) -> tuple[Optional[dict[str, Any]], bool]:
     digits = re.sub(r"\D", "", phone or "")
-    candidates = {digits}
-    if digits.startswith("55") and len(digits) in (12, 13):
-        candidates.add(digits[2:])  # sem DDI
-    elif len(digits) in (10, 11):
-        candidates.add("55" + digits)
-
-    for cand in candidates:
-        resp = (
-            supa.table("leads")
-            .select("id, nome, telefone")
-            .eq("org_id", org_id)
-            .eq("telefone", cand)
-            .limit(1)
-            .execute()
-        )
-        rows = getattr(resp, "data", None) or []
-        if rows:
-            return rows[0], False
+    # Mesma chave da Meta/importação: acha o lead gravado com ou sem DDI.
+    existing = find_lead_by_contact(supa, org_id=org_id, telefone=digits, columns="id, nome, telefone")
+    if existing:
+        return existing, False
 
     lead_id = str(uuid4())
     payload = {
@@ -957,24 +968,8 @@ def _handle_inbound(
         return {}
 
     mtype = msg.get("type")
-    access_token = _trim(integration.get("access_token"))
-    phone_number_id = _trim(integration.get("phone_number_id"))
-    origem_audio = False
     text = _extract_message_text(msg)
 
-    # Áudio recebido: transcreve para texto (se habilitado).
-    if mtype == "audio" and settings.WHATSAPP_AUDIO_ENABLED and settings.OPENAI_API_KEY.strip():
-        media_id = (msg.get("audio") or {}).get("id")
-        if media_id:
-            media = download_media(access_token=access_token, media_id=media_id)
-            if media:
-                from app.ai import audio as ai_audio
-
-                transcript = ai_audio.transcrever(media[0], media[1])
-                if transcript:
-                    text = transcript
-                    origem_audio = True
-
     lead, created = _find_or_create_lead(supa, org_id, from_wa or "", contact_name)
     lead_id = lead.get("id") if lead else None
 
@@ -1004,6 +999,52 @@ def _handle_inbound(
         }
     ).execute()
 
+    # Áudio recebido: a transcrição é uma etapa assíncrona (não segura o webhook).
+    # Quando o texto chega, a própria etapa dispara a resposta (IA/fallbacks).
+    media_id = (msg.get("audio") or {}).get("id") if mtype == "audio" else None
+    if media_id and settings.WHATSAPP_AUDIO_ENABLED and settings.OPENAI_API_KEY.strip():
+        from app.services import whatsapp_transcription_service as transcription
+
+        transcription.enqueue_transcription(
+            supa=supa,
+            integration=integration,
+            wamid=wamid,
+            media_id=media_id,
+            from_wa=from_wa,
+            lead=lead,
+            created=created,
+        )
+        return {"lead_created": created, "auto_replied": False, "transcription_queued": True}
+
+    return respond_inbound(
+        supa=supa,
+        integration=integration,
+        wamid=wamid,
+        from_wa=from_wa,
+        mtype=mtype,
+        lead=lead,
+        created=created,
+        origem_audio=False,
+    )
+
+
+def respond_inbound(
+    *,
+    supa: Client,
+    integration: dict[str, Any],
+    wamid: Optional[str],
+    from_wa: Optional[str],
+    mtype: Optional[str],
+    lead: Optional[dict[str, Any]],
+    created: bool,
+    origem_audio: bool,
+) -> dict[str, Any]:
+    """Resposta a uma mensagem já registrada: IA, boas-vindas e rede de segurança."""
+    org_id = integration["org_id"]
+    lead_id = lead.get("id") if lead else None
+    access_token = _trim(integration.get("access_token"))
+    phone_number_id = _trim(integration.get("phone_number_id"))
+
     auto_replied = False
     ai_replied = False
     ai_failed = False
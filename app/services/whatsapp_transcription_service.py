@@ -0,0 +1,118 @@
+"""Etapa assíncrona de transcrição de áudio do WhatsApp.
+
+O webhook só registra a mensagem de áudio e enfileira aqui. Um pool de workers:
+1. abre o download da mídia em streaming (`open_media_stream`);
+2. manda os pedaços direto para o STT (`ai_audio.transcrever_stream`), que fatia
+   áudio longo e transcreve as fatias em paralelo;
+3. grava a transcrição no `body` da mensagem recebida;
+4. dispara a resposta (`respond_inbound`) — IA em áudio, ou o fallback de mídia
+   quando a transcrição falha, igual ao fluxo síncrono de antes.
+
+Assim a Meta recebe o 200 do webhook sem esperar o STT.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from supabase import Client
+
+from app.core.config import settings
+from app.core.jobs import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+_pool = WorkerPool("wa-transcription", lambda: settings.WHATSAPP_TRANSCRIPTION_WORKERS)
+
+
+def shutdown(wait: bool = False) -> None:
+    """Encerra o pool (usado no shutdown da aplicação)."""
+    _pool.shutdown(wait=wait)
+
+
+def transcribe_media(*, access_token: str, media_id: str) -> Optional[str]:
+    """Download em streaming -> STT. Retorna o texto ou None."""
+    from app.ai import audio as ai_audio
+    from app.services import whatsapp_service as wa
+
+    with wa.open_media_stream(access_token=access_token, media_id=media_id) as media:
+        if not media:
+            return None
+        chunks, mime, size = media
+        return ai_audio.transcrever_stream(chunks, mime, total_bytes=size)
+
+
+def run_transcription(
+    *,
+    supa: Client,
+    integration: dict[str, Any],
+    wamid: Optional[str],
+    media_id: str,
+    from_wa: Optional[str],
+    lead: Optional[dict[str, Any]],
+    created: bool,
+) -> dict[str, Any]:
+    """Corpo da etapa: transcreve, atualiza a mensagem e dispara a resposta."""
+    from app.services import whatsapp_service as wa
+
+    org_id = integration["org_id"]
+    transcript: Optional[str] = None
+    try:
+        transcript = transcribe_media(
+            access_token=str(integration.get("access_token") or "").strip(),
+            media_id=media_id,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("whatsapp_transcription_falhou", extra={"org_id": org_id, "error": str(exc)})
+
+    if transcript and wamid:
+        try:
+            supa.table("whatsapp_messages").update(
+                {"body": transcript, "updated_at": datetime.now(timezone.utc).isoformat()}
+            ).eq("wa_message_id", wamid).execute()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("whatsapp_transcription_persist_falhou", extra={"org_id": org_id, "error": str(exc)})
+
+    return wa.respond_inbound(
+        supa=supa,
+        integration=integration,
+        wamid=wamid,
+        from_wa=from_wa,
+        mtype="audio",
+        lead=lead,
+        created=created,
+        origem_audio=bool(transcript),
+    )
+
+
+def _run_safely(**kwargs: Any) -> dict[str, Any]:
+    try:
+        return run_transcription(**kwargs)
+    except Exception:  # noqa: BLE001 - worker não pode morrer com exceção solta
+        logger.exception("whatsapp_transcription_stage_error")
+        return {}
+
+
+def enqueue_transcription(
+    *,
+    supa: Client,
+    integration: dict[str, Any],
+    wamid: Optional[str],
+    media_id: str,
+    from_wa: Optional[str],
+    lead: Optional[dict[str, Any]],
+    created: bool,
+) -> Future:
+    """Agenda a transcrição no pool e retorna o Future (útil em testes)."""
+    return _pool.executor().submit(
+        _run_safely,
+        supa=supa,
+        integration=integration,
+        wamid=wamid,
+        media_id=media_id,
+        from_wa=from_wa,
+        lead=lead,
+        created=created,
+    )
@@ -0,0 +1,23 @@
+-- Chaves de contato normalizadas para deduplicação de leads.
+-- Espelho de app/services/lead_contact_service.py (phone_key/email_key):
+--   phone_key: só dígitos; 10/11 dígitos (nacional) ganham o DDI 55.
+--   email_key: minúsculo, sem espaços nas pontas.
+ALTER TABLE public.leads
+    ADD COLUMN IF NOT EXISTS phone_key text GENERATED ALWAYS AS (
+        CASE
+            WHEN length(regexp_replace(coalesce(telefone, ''), '\D', '', 'g')) IN (10, 11)
+                THEN '55' || regexp_replace(telefone, '\D', '', 'g')
+            ELSE nullif(regexp_replace(coalesce(telefone, ''), '\D', '', 'g'), '')
+        END
+    ) STORED,
+    ADD COLUMN IF NOT EXISTS email_key text GENERATED ALWAYS AS (
+        nullif(lower(btrim(email)), '')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_leads_org_phone_key
+    ON public.leads (org_id, phone_key)
+    WHERE phone_key IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_leads_org_email_key
+    ON public.leads (org_id, email_key)
+    WHERE email_key IS NOT NULL;
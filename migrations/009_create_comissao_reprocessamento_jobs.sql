@@ -0,0 +1,42 @@
+-- 009_create_comissao_reprocessamento_jobs.sql
+-- Jobs de reprocessamento de comissões em massa (app/services/comissao_reprocessamento_service.py)
+
+CREATE TABLE IF NOT EXISTS public.comissao_reprocessamento_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+
+    -- 'pendente' | 'executando' | 'concluido' | 'concluido_com_erros' | 'interrompido' | 'falhou'
+    status text NOT NULL DEFAULT 'pendente',
+    -- {escopo, contrato_ids?, cota_ids?, parceiro_ids?, modelo_id?}
+    filtro jsonb NOT NULL DEFAULT '{}',
+
+    total integer NOT NULL DEFAULT 0,
+    processados integer NOT NULL DEFAULT 0,
+    erros integer NOT NULL DEFAULT 0,
+    erro text,                              -- falha do job inteiro (não de um contrato)
+
+    iniciado_em timestamptz,
+    concluido_em timestamptz,
+    created_by uuid REFERENCES public.profiles(user_id),
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS comissao_reprocessamento_jobs_org_idx
+    ON public.comissao_reprocessamento_jobs(org_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS public.comissao_reprocessamento_job_itens (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id uuid NOT NULL REFERENCES public.comissao_reprocessamento_jobs(id) ON DELETE CASCADE,
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    contrato_id uuid NOT NULL REFERENCES public.contratos(id) ON DELETE CASCADE,
+
+    status text NOT NULL DEFAULT 'pendente', -- 'pendente' | 'ok' | 'erro'
+    erro text,
+    processado_em timestamptz,
+
+    UNIQUE (job_id, contrato_id)
+);
+
+CREATE INDEX IF NOT EXISTS comissao_reprocessamento_job_itens_status_idx
+    ON public.comissao_reprocessamento_job_itens(job_id, status);
@@ -0,0 +1,247 @@
+-- 010_create_comissao_resumos.sql
+-- Agregados de comissao_lancamentos mantidos por trigger a cada escrita.
+-- Lidos por app/services/comissao_service.py (ranking de parceiros, extrato e
+-- resumo da listagem), com os mesmos números da agregação em Python.
+--
+-- O trigger é por comando (transition tables): um insert/update em lote soma
+-- as variações por chave e faz um upsert por chave, não um por lançamento.
+-- Cada chave ainda é dividida em `fatia`s pelo contrato, para que os workers
+-- do reprocessamento em paralelo (contratos diferentes) não disputem a mesma
+-- linha do agregado. Quem lê soma as fatias.
+
+-- Totais por org/beneficiário/mês e status. `competencia` é a competencia_prevista
+-- do lançamento (sempre dia 1 do mês); NULL quando ainda não há previsão.
+CREATE TABLE IF NOT EXISTS public.comissao_resumo_mensal (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    beneficiario_tipo text NOT NULL,        -- 'empresa' | 'parceiro'
+    parceiro_id uuid,
+    competencia date,
+    status text,
+    repasse_status text,
+    fatia smallint NOT NULL DEFAULT 0,      -- comissao_resumo_fatia(contrato_id)
+
+    quantidade integer NOT NULL DEFAULT 0,
+    valor_bruto numeric NOT NULL DEFAULT 0,
+    valor_imposto numeric NOT NULL DEFAULT 0,
+    valor_liquido numeric NOT NULL DEFAULT 0,
+
+    updated_at timestamptz DEFAULT now(),
+
+    CONSTRAINT comissao_resumo_mensal_chave UNIQUE NULLS NOT DISTINCT
+        (org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia)
+);
+
+CREATE INDEX IF NOT EXISTS comissao_resumo_mensal_parceiro_idx
+    ON public.comissao_resumo_mensal(org_id, parceiro_id, competencia);
+
+-- Cotas em que o parceiro tem lançamento (base de vendas, volume e cancelamentos
+-- do ranking, que são métricas da cota e não somáveis por mês).
+CREATE TABLE IF NOT EXISTS public.comissao_parceiro_cotas (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    parceiro_id uuid NOT NULL REFERENCES public.parceiros_corretores(id) ON DELETE CASCADE,
+    cota_id uuid REFERENCES public.cotas(id) ON DELETE CASCADE,
+    lancamentos integer NOT NULL DEFAULT 0,
+
+    CONSTRAINT comissao_parceiro_cotas_chave UNIQUE NULLS NOT DISTINCT (org_id, parceiro_id, cota_id)
+);
+
+-- Fatias por chave do agregado. Mudar o número exige `comissao_resumo_recalcular`.
+CREATE OR REPLACE FUNCTION public.comissao_resumo_fatia(p_contrato_id uuid)
+RETURNS smallint
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT (abs(hashtext(coalesce(p_contrato_id::text, ''))) % 16)::smallint;
+$$;
+
+-- Variações de um comando: `antigos` saem (-1) e `novos` entram (+1).
+CREATE OR REPLACE FUNCTION public.comissao_resumo_delta(
+    antigos public.comissao_lancamentos[],
+    novos public.comissao_lancamentos[]
+)
+RETURNS TABLE (
+    org_id uuid,
+    beneficiario_tipo text,
+    parceiro_id uuid,
+    cota_id uuid,
+    competencia date,
+    status text,
+    repasse_status text,
+    fatia smallint,
+    quantidade integer,
+    valor_bruto numeric,
+    valor_imposto numeric,
+    valor_liquido numeric
+)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT l.org_id, l.beneficiario_tipo, l.parceiro_id, l.cota_id, l.competencia_prevista,
+           l.status, l.repasse_status, public.comissao_resumo_fatia(l.contrato_id),
+           l.sinal, l.sinal * coalesce(l.valor_bruto, 0), l.sinal * coalesce(l.valor_imposto, 0),
+           l.sinal * coalesce(l.valor_liquido, 0)
+    FROM (
+        SELECT a.*, -1 AS sinal FROM unnest(antigos) AS a
+        UNION ALL
+        SELECT n.*, 1 AS sinal FROM unnest(novos) AS n
+    ) AS l;
+$$;
+
+CREATE OR REPLACE FUNCTION public.comissao_resumo_aplicar(
+    antigos public.comissao_lancamentos[],
+    novos public.comissao_lancamentos[]
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Ordem fixa das chaves: dois comandos concorrentes travam as linhas na
+    -- mesma sequência (sem deadlock).
+    INSERT INTO public.comissao_resumo_mensal AS t (
+        org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia,
+        quantidade, valor_bruto, valor_imposto, valor_liquido
+    )
+    SELECT org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia,
+           sum(quantidade), sum(valor_bruto), sum(valor_imposto), sum(valor_liquido)
+    FROM public.comissao_resumo_delta(antigos, novos) AS d
+    GROUP BY org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia
+    HAVING sum(quantidade) <> 0 OR sum(valor_bruto) <> 0 OR sum(valor_imposto) <> 0 OR sum(valor_liquido) <> 0
+    ORDER BY org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia
+    ON CONFLICT ON CONSTRAINT comissao_resumo_mensal_chave DO UPDATE SET
+        quantidade = t.quantidade + excluded.quantidade,
+        valor_bruto = t.valor_bruto + excluded.valor_bruto,
+        valor_imposto = t.valor_imposto + excluded.valor_imposto,
+        valor_liquido = t.valor_liquido + excluded.valor_liquido,
+        updated_at = now();
+
+    DELETE FROM public.comissao_resumo_mensal AS t
+    USING (
+        SELECT DISTINCT org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia
+        FROM public.comissao_resumo_delta(antigos, novos) AS d
+    ) AS k
+    WHERE t.org_id = k.org_id
+      AND t.beneficiario_tipo = k.beneficiario_tipo
+      AND t.parceiro_id IS NOT DISTINCT FROM k.parceiro_id
+      AND t.competencia IS NOT DISTINCT FROM k.competencia
+      AND t.status IS NOT DISTINCT FROM k.status
+      AND t.repasse_status IS NOT DISTINCT FROM k.repasse_status
+      AND t.fatia = k.fatia
+      AND t.quantidade = 0;
+
+    INSERT INTO public.comissao_parceiro_cotas AS t (org_id, parceiro_id, cota_id, lancamentos)
+    SELECT org_id, parceiro_id, cota_id, sum(quantidade)
+    FROM public.comissao_resumo_delta(antigos, novos) AS d
+    WHERE beneficiario_tipo = 'parceiro' AND parceiro_id IS NOT NULL
+    GROUP BY org_id, parceiro_id, cota_id
+    HAVING sum(quantidade) <> 0
+    ORDER BY org_id, parceiro_id, cota_id
+    ON CONFLICT ON CONSTRAINT comissao_parceiro_cotas_chave DO UPDATE SET
+        lancamentos = t.lancamentos + excluded.lancamentos;
+
+    DELETE FROM public.comissao_parceiro_cotas AS t
+    USING (
+        SELECT DISTINCT org_id, parceiro_id, cota_id
+        FROM public.comissao_resumo_delta(antigos, novos) AS d
+        WHERE beneficiario_tipo = 'parceiro' AND parceiro_id IS NOT NULL
+    ) AS k
+    WHERE t.org_id = k.org_id
+      AND t.parceiro_id = k.parceiro_id
+      AND t.cota_id IS NOT DISTINCT FROM k.cota_id
+      AND t.lancamentos = 0;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.comissao_lancamentos_resumo_trigger()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Cada ramo só referencia as transition tables que o seu evento declara.
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.comissao_resumo_aplicar('{}', ARRAY(SELECT n FROM novos AS n));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.comissao_resumo_aplicar(ARRAY(SELECT a FROM antigos AS a), '{}');
+    ELSE
+        -- Só as linhas em que algum campo agregado mudou.
+        PERFORM public.comissao_resumo_aplicar(
+            ARRAY(
+                SELECT a FROM antigos AS a JOIN novos AS n ON n.id = a.id
+                WHERE (a.org_id, a.beneficiario_tipo, a.parceiro_id, a.cota_id, a.contrato_id,
+                       a.competencia_prevista, a.status, a.repasse_status,
+                       a.valor_bruto, a.valor_imposto, a.valor_liquido)
+                      IS DISTINCT FROM
+                      (n.org_id, n.beneficiario_tipo, n.parceiro_id, n.cota_id, n.contrato_id,
+                       n.competencia_prevista, n.status, n.repasse_status,
+                       n.valor_bruto, n.valor_imposto, n.valor_liquido)
+            ),
+            ARRAY(
+                SELECT n FROM antigos AS a JOIN novos AS n ON n.id = a.id
+                WHERE (a.org_id, a.beneficiario_tipo, a.parceiro_id, a.cota_id, a.contrato_id,
+                       a.competencia_prevista, a.status, a.repasse_status,
+                       a.valor_bruto, a.valor_imposto, a.valor_liquido)
+                      IS DISTINCT FROM
+                      (n.org_id, n.beneficiario_tipo, n.parceiro_id, n.cota_id, n.contrato_id,
+                       n.competencia_prevista, n.status, n.repasse_status,
+                       n.valor_bruto, n.valor_imposto, n.valor_liquido)
+            )
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables exigem um trigger por evento.
+DROP TRIGGER IF EXISTS comissao_lancamentos_resumo ON public.comissao_lancamentos;
+DROP TRIGGER IF EXISTS comissao_lancamentos_resumo_ins ON public.comissao_lancamentos;
+DROP TRIGGER IF EXISTS comissao_lancamentos_resumo_upd ON public.comissao_lancamentos;
+DROP TRIGGER IF EXISTS comissao_lancamentos_resumo_del ON public.comissao_lancamentos;
+CREATE TRIGGER comissao_lancamentos_resumo_ins
+    AFTER INSERT ON public.comissao_lancamentos
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.comissao_lancamentos_resumo_trigger();
+CREATE TRIGGER comissao_lancamentos_resumo_upd
+    AFTER UPDATE ON public.comissao_lancamentos
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.comissao_lancamentos_resumo_trigger();
+CREATE TRIGGER comissao_lancamentos_resumo_del
+    AFTER DELETE ON public.comissao_lancamentos
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION public.comissao_lancamentos_resumo_trigger();
+
+-- Recalcula os agregados da org a partir do ledger (carga inicial e conciliação).
+CREATE OR REPLACE FUNCTION public.comissao_resumo_recalcular(p_org_id uuid)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM public.comissao_resumo_mensal WHERE org_id = p_org_id;
+    DELETE FROM public.comissao_parceiro_cotas WHERE org_id = p_org_id;
+
+    INSERT INTO public.comissao_resumo_mensal (
+        org_id, beneficiario_tipo, parceiro_id, competencia, status, repasse_status, fatia,
+        quantidade, valor_bruto, valor_imposto, valor_liquido
+    )
+    SELECT org_id, beneficiario_tipo, parceiro_id, competencia_prevista, status, repasse_status,
+           public.comissao_resumo_fatia(contrato_id),
+           count(*),
+           sum(coalesce(valor_bruto, 0)),
+           sum(coalesce(valor_imposto, 0)),
+           sum(coalesce(valor_liquido, 0))
+    FROM public.comissao_lancamentos
+    WHERE org_id = p_org_id
+    GROUP BY org_id, beneficiario_tipo, parceiro_id, competencia_prevista, status, repasse_status,
+             public.comissao_resumo_fatia(contrato_id);
+
+    INSERT INTO public.comissao_parceiro_cotas (org_id, parceiro_id, cota_id, lancamentos)
+    SELECT org_id, parceiro_id, cota_id, count(*)
+    FROM public.comissao_lancamentos
+    WHERE org_id = p_org_id
+      AND beneficiario_tipo = 'parceiro'
+      AND parceiro_id IS NOT NULL
+    GROUP BY org_id, parceiro_id, cota_id;
+END;
+$$;
+
+SELECT public.comissao_resumo_recalcular(id) FROM public.orgs;
@@ -0,0 +1,52 @@
+-- 011_comissao_lancamentos_keyset.sql
+-- Paginação por keyset do ledger de comissões e totais agregados no banco.
+
+-- Ordem da listagem: (competencia_prevista, id), por org e por parceiro (extrato).
+CREATE INDEX IF NOT EXISTS comissao_lancamentos_org_competencia_id_idx
+    ON public.comissao_lancamentos(org_id, competencia_prevista, id);
+
+CREATE INDEX IF NOT EXISTS comissao_lancamentos_org_parceiro_competencia_id_idx
+    ON public.comissao_lancamentos(org_id, parceiro_id, competencia_prevista, id);
+
+-- Totais do filtro inteiro (não só da página), nos grupos de comissao_resumo_mensal.
+-- Usada para filtros que o agregado da migration 010 não cobre (contrato, cota).
+CREATE OR REPLACE FUNCTION public.comissao_lancamentos_totais(
+    p_org_id uuid,
+    p_parceiro_id uuid DEFAULT NULL,
+    p_contrato_id uuid DEFAULT NULL,
+    p_cota_id uuid DEFAULT NULL,
+    p_status text DEFAULT NULL,
+    p_repasse_status text DEFAULT NULL,
+    p_competencia_de date DEFAULT NULL,
+    p_competencia_ate date DEFAULT NULL
+)
+RETURNS TABLE (
+    beneficiario_tipo text,
+    status text,
+    repasse_status text,
+    quantidade bigint,
+    valor_bruto numeric,
+    valor_imposto numeric,
+    valor_liquido numeric
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT l.beneficiario_tipo,
+           l.status,
+           l.repasse_status,
+           count(*),
+           sum(coalesce(l.valor_bruto, 0)),
+           sum(coalesce(l.valor_imposto, 0)),
+           sum(coalesce(l.valor_liquido, 0))
+    FROM public.comissao_lancamentos l
+    WHERE l.org_id = p_org_id
+      AND (p_parceiro_id IS NULL OR l.parceiro_id = p_parceiro_id)
+      AND (p_contrato_id IS NULL OR l.contrato_id = p_contrato_id)
+      AND (p_cota_id IS NULL OR l.cota_id = p_cota_id)
+      AND (p_status IS NULL OR l.status = p_status)
+      AND (p_repasse_status IS NULL OR l.repasse_status = p_repasse_status)
+      AND (p_competencia_de IS NULL OR l.competencia_prevista >= p_competencia_de)
+      AND (p_competencia_ate IS NULL OR l.competencia_prevista <= p_competencia_ate)
+    GROUP BY l.beneficiario_tipo, l.status, l.repasse_status;
+$$;
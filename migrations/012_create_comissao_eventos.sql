@@ -0,0 +1,107 @@
+-- 012_create_comissao_eventos.sql
+-- Outbox de processamento de comissão após salvar pagamento
+-- (app/services/comissao_eventos_service.py).
+
+CREATE TABLE IF NOT EXISTS public.comissao_eventos (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    pagamento_id uuid NOT NULL REFERENCES public.pagamentos(id) ON DELETE CASCADE,
+    tipo text NOT NULL DEFAULT 'pagamento_salvo',
+
+    status text NOT NULL DEFAULT 'pendente',    -- 'pendente' | 'processando' | 'concluido' | 'falhou' | 'substituido'
+    versao integer NOT NULL DEFAULT 1,          -- salvamentos coalescidos neste evento
+    tentativas integer NOT NULL DEFAULT 0,
+    max_tentativas integer NOT NULL DEFAULT 5,
+    disponivel_em timestamptz NOT NULL DEFAULT now(),
+
+    actor_id uuid,
+    erro text,
+    resultado jsonb,
+    processado_em timestamptz,
+
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+-- Um evento pendente por pagamento: salvar de novo antes do worker pegar só
+-- incrementa `versao` (cada pagamento tem uma única competência).
+CREATE UNIQUE INDEX IF NOT EXISTS comissao_eventos_pendente_uniq
+    ON public.comissao_eventos(pagamento_id)
+    WHERE status = 'pendente';
+
+CREATE INDEX IF NOT EXISTS comissao_eventos_fila_idx
+    ON public.comissao_eventos(status, disponivel_em);
+
+CREATE INDEX IF NOT EXISTS comissao_eventos_pagamento_idx
+    ON public.comissao_eventos(pagamento_id, created_at DESC);
+
+CREATE OR REPLACE FUNCTION public.comissao_evento_enfileirar(
+    p_org_id uuid,
+    p_pagamento_id uuid,
+    p_actor_id uuid DEFAULT NULL
+)
+RETURNS public.comissao_eventos
+LANGUAGE sql
+AS $$
+    INSERT INTO public.comissao_eventos (org_id, pagamento_id, actor_id)
+    VALUES (p_org_id, p_pagamento_id, p_actor_id)
+    ON CONFLICT (pagamento_id) WHERE status = 'pendente' DO UPDATE SET
+        versao = public.comissao_eventos.versao + 1,
+        actor_id = excluded.actor_id,
+        disponivel_em = now(),
+        updated_at = now()
+    RETURNING *;
+$$;
+
+-- Grava o pagamento (insert quando p_pagamento_id é NULL) e enfileira o evento
+-- na mesma transação. `p_dados` é o payload de `_normalize_pagamento_payload`.
+CREATE OR REPLACE FUNCTION public.salvar_pagamento_com_evento(
+    p_org_id uuid,
+    p_pagamento_id uuid,
+    p_dados jsonb,
+    p_actor_id uuid DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_pagamento public.pagamentos;
+    v_evento public.comissao_eventos;
+BEGIN
+    IF p_pagamento_id IS NULL THEN
+        INSERT INTO public.pagamentos (
+            org_id, contrato_id, tipo, competencia, valor, pago_em, status,
+            vencimento, referencia, origem, observacoes, payload
+        )
+        SELECT p_org_id, r.contrato_id, r.tipo, r.competencia, r.valor, r.pago_em, r.status,
+               r.vencimento, r.referencia, r.origem, r.observacoes, r.payload
+        FROM jsonb_populate_record(NULL::public.pagamentos, p_dados) r
+        RETURNING * INTO v_pagamento;
+    ELSE
+        UPDATE public.pagamentos p SET
+            contrato_id = r.contrato_id,
+            tipo = r.tipo,
+            competencia = r.competencia,
+            valor = r.valor,
+            pago_em = r.pago_em,
+            status = r.status,
+            vencimento = r.vencimento,
+            referencia = r.referencia,
+            origem = r.origem,
+            observacoes = r.observacoes,
+            payload = r.payload
+        FROM jsonb_populate_record(NULL::public.pagamentos, p_dados) r
+        WHERE p.id = p_pagamento_id
+          AND p.org_id = p_org_id
+        RETURNING p.* INTO v_pagamento;
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'pagamento % nao encontrado', p_pagamento_id USING ERRCODE = 'P0002';
+        END IF;
+    END IF;
+
+    v_evento := public.comissao_evento_enfileirar(p_org_id, v_pagamento.id, p_actor_id);
+
+    RETURN jsonb_build_object('pagamento', to_jsonb(v_pagamento), 'evento', to_jsonb(v_evento));
+END;
+$$;
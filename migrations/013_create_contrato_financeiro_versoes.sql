@@ -0,0 +1,72 @@
+-- 013_create_contrato_financeiro_versoes.sql
+-- Versão por contrato dos dados da tela financeira (contrato, pagamentos,
+-- competências e lançamentos). Qualquer escrita nessas tabelas incrementa a
+-- versão; o cache do snapshot em app/services/comissao_competencia_service.py
+-- (`contrato_snapshot`) só reaproveita o snapshot enquanto a versão não muda.
+
+CREATE TABLE IF NOT EXISTS public.contrato_financeiro_versoes (
+    contrato_id uuid PRIMARY KEY REFERENCES public.contratos(id) ON DELETE CASCADE,
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    versao bigint NOT NULL DEFAULT 1,
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION public.contrato_financeiro_bump(p_org_id uuid, p_contrato_id uuid)
+RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO public.contrato_financeiro_versoes AS v (contrato_id, org_id)
+    SELECT p_contrato_id, p_org_id
+    WHERE p_contrato_id IS NOT NULL
+      AND EXISTS (SELECT 1 FROM public.contratos c WHERE c.id = p_contrato_id)
+    ON CONFLICT (contrato_id) DO UPDATE SET
+        versao = v.versao + 1,
+        updated_at = now();
+$$;
+
+CREATE OR REPLACE FUNCTION public.contrato_financeiro_versao_trigger()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_coluna text := TG_ARGV[0];
+    v_novo uuid;
+    v_antigo uuid;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_novo := (to_jsonb(NEW) ->> v_coluna)::uuid;
+        PERFORM public.contrato_financeiro_bump(NEW.org_id, v_novo);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_antigo := (to_jsonb(OLD) ->> v_coluna)::uuid;
+        IF TG_OP = 'DELETE' OR v_antigo IS DISTINCT FROM v_novo THEN
+            PERFORM public.contrato_financeiro_bump(OLD.org_id, v_antigo);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS contrato_financeiro_versao ON public.pagamentos;
+CREATE TRIGGER contrato_financeiro_versao
+    AFTER INSERT OR UPDATE OR DELETE ON public.pagamentos
+    FOR EACH ROW EXECUTE FUNCTION public.contrato_financeiro_versao_trigger('contrato_id');
+
+DROP TRIGGER IF EXISTS contrato_financeiro_versao ON public.cota_pagamento_competencias;
+CREATE TRIGGER contrato_financeiro_versao
+    AFTER INSERT OR UPDATE OR DELETE ON public.cota_pagamento_competencias
+    FOR EACH ROW EXECUTE FUNCTION public.contrato_financeiro_versao_trigger('contrato_id');
+
+DROP TRIGGER IF EXISTS contrato_financeiro_versao ON public.comissao_lancamentos;
+CREATE TRIGGER contrato_financeiro_versao
+    AFTER INSERT OR UPDATE OR DELETE ON public.comissao_lancamentos
+    FOR EACH ROW EXECUTE FUNCTION public.contrato_financeiro_versao_trigger('contrato_id');
+
+DROP TRIGGER IF EXISTS contrato_financeiro_versao ON public.contratos;
+CREATE TRIGGER contrato_financeiro_versao
+    AFTER INSERT OR UPDATE ON public.contratos
+    FOR EACH ROW EXECUTE FUNCTION public.contrato_financeiro_versao_trigger('id');
+
+INSERT INTO public.contrato_financeiro_versoes (contrato_id, org_id)
+SELECT id, org_id FROM public.contratos
+ON CONFLICT (contrato_id) DO NOTHING;
@@ -0,0 +1,86 @@
+-- 014_repasse_fechamento.sql
+-- Fechamento mensal de repasses em lote (app/services/repasse_lotes_service.py,
+-- `fechar_repasses`). O backend seleciona os lançamentos elegíveis numa consulta
+-- e agrupa por parceiro; esta função cria todos os lotes e marca os lançamentos
+-- numa única transação.
+--
+-- p_lotes: [{"parceiro_id": uuid, "lancamento_ids": [uuid, ...]}, ...]
+-- Os lançamentos são revalidados (e travados) aqui: o que deixou de estar com
+-- repasse pendente desde a seleção fica de fora, e o total do lote é o da linha
+-- travada, não o calculado no backend.
+
+CREATE INDEX IF NOT EXISTS comissao_lancamentos_repasse_pendente_idx
+    ON public.comissao_lancamentos(org_id, competencia_prevista, parceiro_id)
+    WHERE beneficiario_tipo = 'parceiro' AND repasse_status = 'pendente' AND status = 'disponivel';
+
+CREATE OR REPLACE FUNCTION public.repasse_fechamento_criar_lotes(
+    p_org_id uuid,
+    p_lotes jsonb,
+    p_pago_em timestamptz,
+    p_actor_id uuid DEFAULT NULL,
+    p_forma_pagamento text DEFAULT NULL,
+    p_observacoes text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_item jsonb;
+    v_parceiro uuid;
+    v_ids uuid[];
+    v_total numeric;
+    v_qtd integer;
+    v_lote_id uuid;
+    v_out jsonb := '[]'::jsonb;
+BEGIN
+    FOR v_item IN SELECT value FROM jsonb_array_elements(p_lotes) LOOP
+        v_parceiro := (v_item ->> 'parceiro_id')::uuid;
+
+        SELECT coalesce(array_agg(l.id), '{}'), coalesce(sum(coalesce(l.valor_liquido, 0)), 0), count(*)
+        INTO v_ids, v_total, v_qtd
+        FROM (
+            SELECT id, valor_liquido
+            FROM public.comissao_lancamentos
+            WHERE org_id = p_org_id
+              AND parceiro_id = v_parceiro
+              AND beneficiario_tipo = 'parceiro'
+              AND repasse_status = 'pendente'
+              AND status = 'disponivel'
+              AND id IN (SELECT jsonb_array_elements_text(v_item -> 'lancamento_ids')::uuid)
+            ORDER BY id
+            FOR UPDATE
+        ) l;
+
+        IF v_qtd = 0 THEN
+            v_out := v_out || jsonb_build_array(jsonb_build_object(
+                'parceiro_id', v_parceiro, 'lote_id', NULL, 'quantidade', 0, 'total', 0
+            ));
+            CONTINUE;
+        END IF;
+
+        INSERT INTO public.repasse_lotes (
+            org_id, parceiro_id, total, quantidade, forma_pagamento, observacoes, pago_em, actor_id
+        )
+        VALUES (
+            p_org_id, v_parceiro, v_total, v_qtd, p_forma_pagamento, p_observacoes, p_pago_em, p_actor_id
+        )
+        RETURNING id INTO v_lote_id;
+
+        -- Pagar o repasse quita a comissão correspondente (como em `create_repasse_lote`).
+        UPDATE public.comissao_lancamentos SET
+            repasse_status = 'pago',
+            repasse_pago_em = p_pago_em,
+            repasse_lote_id = v_lote_id,
+            status = 'pago',
+            pago_em = p_pago_em,
+            updated_at = p_pago_em
+        WHERE id = ANY(v_ids);
+
+        v_out := v_out || jsonb_build_array(jsonb_build_object(
+            'parceiro_id', v_parceiro, 'lote_id', v_lote_id, 'quantidade', v_qtd, 'total', v_total
+        ));
+    END LOOP;
+
+    RETURN v_out;
+END;
+$$;
@@ -0,0 +1,35 @@
+-- 015_create_cronograma_lote_jobs.sql
+-- Jobs de geração do cronograma de pagamentos em lote
+-- (app/services/cronograma_lote_service.py). O progresso é gravado a cada bloco
+-- de contratos; `erros_detalhe` guarda os primeiros contratos que falharam.
+
+CREATE TABLE IF NOT EXISTS public.cronograma_lote_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+
+    -- 'pendente' | 'executando' | 'concluido' | 'concluido_com_erros' | 'falhou'
+    status text NOT NULL DEFAULT 'pendente',
+    -- {contrato_ids, cota_ids} (ambos vazios = todos os contratos da org)
+    filtro jsonb NOT NULL DEFAULT '{}',
+
+    total integer NOT NULL DEFAULT 0,
+    processados integer NOT NULL DEFAULT 0,
+    pagamentos_criados integer NOT NULL DEFAULT 0,
+    competencias_ignoradas integer NOT NULL DEFAULT 0,
+    erros integer NOT NULL DEFAULT 0,
+    erros_detalhe jsonb NOT NULL DEFAULT '[]',  -- [{contrato_id, erro}]
+    erro text,                                  -- falha do job inteiro
+
+    iniciado_em timestamptz,
+    concluido_em timestamptz,
+    created_by uuid REFERENCES public.profiles(user_id),
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS cronograma_lote_jobs_org_idx
+    ON public.cronograma_lote_jobs(org_id, created_at DESC);
+
+-- Carga por bloco de contratos dos pagamentos já existentes.
+CREATE INDEX IF NOT EXISTS pagamentos_contrato_competencia_idx
+    ON public.pagamentos(org_id, contrato_id, competencia);
@@ -0,0 +1,73 @@
+-- 016_create_assembleia_calendario.sql
+-- Calendário de assembleias materializado por org
+-- (app/services/assembleia_calendario_service.py). Guarda a data prevista de
+-- cada regra de administradora (por produto ou genérica) e competência num
+-- horizonte móvel, já ajustada para dia útil com os feriados nacionais e os da
+-- org. A versão da org muda a cada escrita em `administradora_regras_lance` ou
+-- `agenda_feriados`; o backend só reaproveita as linhas da versão atual.
+--
+-- `produto` = '' representa a regra genérica (produto NULL na regra), para a
+-- chave única valer também para ela.
+
+CREATE TABLE IF NOT EXISTS public.assembleia_calendario_versoes (
+    org_id uuid PRIMARY KEY REFERENCES public.orgs(id) ON DELETE CASCADE,
+    versao bigint NOT NULL DEFAULT 1,
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.assembleia_calendario (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id) ON DELETE CASCADE,
+    administradora_id uuid NOT NULL,
+    produto text NOT NULL DEFAULT '',
+    competencia date NOT NULL,
+    assembleia_prevista date NOT NULL,
+    versao bigint NOT NULL,
+    created_at timestamptz DEFAULT now(),
+    UNIQUE (org_id, administradora_id, produto, competencia)
+);
+
+CREATE INDEX IF NOT EXISTS assembleia_calendario_org_versao_idx
+    ON public.assembleia_calendario(org_id, versao, competencia);
+
+CREATE OR REPLACE FUNCTION public.assembleia_calendario_bump(p_org_id uuid)
+RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO public.assembleia_calendario_versoes AS v (org_id)
+    SELECT p_org_id
+    WHERE p_org_id IS NOT NULL
+    ON CONFLICT (org_id) DO UPDATE SET
+        versao = v.versao + 1,
+        updated_at = now();
+$$;
+
+CREATE OR REPLACE FUNCTION public.assembleia_calendario_versao_trigger()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.assembleia_calendario_bump(NEW.org_id);
+    END IF;
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.org_id IS DISTINCT FROM NEW.org_id) THEN
+        PERFORM public.assembleia_calendario_bump(OLD.org_id);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS assembleia_calendario_versao ON public.administradora_regras_lance;
+CREATE TRIGGER assembleia_calendario_versao
+    AFTER INSERT OR UPDATE OR DELETE ON public.administradora_regras_lance
+    FOR EACH ROW EXECUTE FUNCTION public.assembleia_calendario_versao_trigger();
+
+DROP TRIGGER IF EXISTS assembleia_calendario_versao ON public.agenda_feriados;
+CREATE TRIGGER assembleia_calendario_versao
+    AFTER INSERT OR UPDATE OR DELETE ON public.agenda_feriados
+    FOR EACH ROW EXECUTE FUNCTION public.assembleia_calendario_versao_trigger();
+
+-- As datas em si são calculadas pelo backend na primeira leitura de cada versão.
+INSERT INTO public.assembleia_calendario_versoes (org_id)
+SELECT DISTINCT org_id FROM public.administradora_regras_lance
+ON CONFLICT (org_id) DO NOTHING;
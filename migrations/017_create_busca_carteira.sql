@@ -0,0 +1,98 @@
+-- 017_create_busca_carteira.sql
+-- Busca textual indexada (app/services/busca_service.py). O termo e as colunas
+-- passam por `busca_normalizar` (minúsculas, sem acento). Cada coluna buscada tem
+-- um índice GIN de trigramas, que atende o `LIKE '%termo%'`. O nome do lead tem
+-- também um índice tsvector em português, para casar palavras flexionadas.
+-- `busca_carteira` devolve pares (lead_id, cota_id) por relevância. Um lead sem
+-- cota vem com cota_id NULL; um lead encontrado pelo nome traz todas as suas
+-- cotas.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() não é IMMUTABLE; o dicionário explícito permite usá-la em índice.
+CREATE OR REPLACE FUNCTION public.busca_normalizar(p_texto text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, coalesce(p_texto, '')));
+$$;
+
+CREATE INDEX IF NOT EXISTS leads_busca_nome_trgm_idx
+    ON public.leads USING gin (public.busca_normalizar(nome) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS leads_busca_nome_tsv_idx
+    ON public.leads USING gin (to_tsvector('portuguese', public.busca_normalizar(nome)));
+CREATE INDEX IF NOT EXISTS cotas_busca_numero_trgm_idx
+    ON public.cotas USING gin (public.busca_normalizar(numero_cota) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS cotas_busca_grupo_trgm_idx
+    ON public.cotas USING gin (public.busca_normalizar(grupo_codigo) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS contratos_busca_numero_trgm_idx
+    ON public.contratos USING gin (public.busca_normalizar(numero) gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION public.busca_carteira(
+    p_org_id uuid,
+    p_q text,
+    p_limite integer DEFAULT 200
+)
+RETURNS TABLE (lead_id uuid, cota_id uuid, rank real)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH termo AS (
+        SELECT
+            public.busca_normalizar(p_q) AS q,
+            '%' || replace(replace(replace(public.busca_normalizar(p_q), '\', '\\'), '%', '\%'), '_', '\_') || '%' AS padrao,
+            plainto_tsquery('portuguese', public.busca_normalizar(p_q)) AS tsq
+    ),
+    por_lead AS (
+        SELECT
+            l.id AS lead_id,
+            greatest(
+                similarity(public.busca_normalizar(l.nome), t.q),
+                ts_rank(to_tsvector('portuguese', public.busca_normalizar(l.nome)), t.tsq)
+            ) AS rank
+        FROM public.leads l, termo t
+        WHERE l.org_id = p_org_id
+          AND (
+              public.busca_normalizar(l.nome) LIKE t.padrao
+              OR to_tsvector('portuguese', public.busca_normalizar(l.nome)) @@ t.tsq
+          )
+    ),
+    candidatos AS (
+        SELECT c.lead_id, c.id AS cota_id,
+            CASE
+                WHEN public.busca_normalizar(c.numero_cota) = t.q OR public.busca_normalizar(c.grupo_codigo) = t.q THEN 1.0
+                ELSE greatest(
+                    similarity(public.busca_normalizar(c.numero_cota), t.q),
+                    similarity(public.busca_normalizar(c.grupo_codigo), t.q)
+                )
+            END AS rank
+        FROM public.cotas c, termo t
+        WHERE c.org_id = p_org_id
+          AND (
+              public.busca_normalizar(c.numero_cota) LIKE t.padrao
+              OR public.busca_normalizar(c.grupo_codigo) LIKE t.padrao
+          )
+        UNION ALL
+        SELECT c.lead_id, c.id,
+            CASE
+                WHEN public.busca_normalizar(ct.numero) = t.q THEN 1.0
+                ELSE similarity(public.busca_normalizar(ct.numero), t.q)
+            END
+        FROM public.contratos ct
+        JOIN public.cotas c ON c.id = ct.cota_id, termo t
+        WHERE ct.org_id = p_org_id
+          AND public.busca_normalizar(ct.numero) LIKE t.padrao
+        UNION ALL
+        SELECT pl.lead_id, c.id, pl.rank
+        FROM por_lead pl
+        LEFT JOIN public.cotas c ON c.lead_id = pl.lead_id AND c.org_id = p_org_id
+    )
+    SELECT lead_id, cota_id, max(rank)::real AS rank
+    FROM candidatos
+    GROUP BY lead_id, cota_id
+    ORDER BY rank DESC, lead_id, cota_id
+    LIMIT greatest(p_limite, 1);
+$$;
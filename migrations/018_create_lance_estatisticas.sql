@@ -0,0 +1,55 @@
+-- 018_create_lance_estatisticas.sql
+-- Estatísticas pré-calculadas de lances vencedores
+-- (app/services/lance_estatisticas_service.py). O backend regrava os grupos
+-- afetados depois de cada assembleia (resultado de lance, contemplação); a
+-- listagem das cartas e o simulador da IA só leem estas tabelas.
+-- Percentuais em pontos percentuais (25.5 = 25,5%); taxa_contemplacao em fração.
+
+CREATE TABLE IF NOT EXISTS public.lance_estatisticas_mensais (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id) ON DELETE CASCADE,
+    administradora_id uuid NOT NULL,
+    grupo_codigo text NOT NULL,
+    competencia date NOT NULL,
+    lances_decididos integer NOT NULL DEFAULT 0,
+    lances_vencedores integer NOT NULL DEFAULT 0,
+    corte_percentual numeric(9, 4),
+    mediana_percentual numeric(9, 4),
+    maximo_percentual numeric(9, 4),
+    atualizado_em timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (org_id, administradora_id, grupo_codigo, competencia)
+);
+
+CREATE TABLE IF NOT EXISTS public.lance_estatisticas_grupos (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id) ON DELETE CASCADE,
+    administradora_id uuid NOT NULL,
+    grupo_codigo text NOT NULL,
+    produto text,
+    competencia_inicio date NOT NULL,
+    competencia_fim date NOT NULL,
+    assembleias integer NOT NULL DEFAULT 0,
+    lances_decididos integer NOT NULL DEFAULT 0,
+    lances_vencedores integer NOT NULL DEFAULT 0,
+    lance_p50 numeric(9, 4),
+    lance_p80 numeric(9, 4),
+    tendencia_pp_mes numeric(9, 4),
+    taxa_contemplacao numeric(9, 4),
+    atualizado_em timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (org_id, administradora_id, grupo_codigo)
+);
+
+CREATE INDEX IF NOT EXISTS lance_estatisticas_grupos_org_grupo_idx
+    ON public.lance_estatisticas_grupos(org_id, grupo_codigo);
+CREATE INDEX IF NOT EXISTS lance_estatisticas_grupos_org_produto_idx
+    ON public.lance_estatisticas_grupos(org_id, produto);
+
+-- Carga do histórico na reconstrução da org e no recálculo por grupo.
+CREATE INDEX IF NOT EXISTS lances_org_resultado_idx
+    ON public.lances(org_id, cota_id)
+    WHERE resultado IN ('contemplado', 'nao_contemplado');
+CREATE INDEX IF NOT EXISTS contemplacoes_org_lance_idx
+    ON public.contemplacoes(org_id, cota_id)
+    WHERE motivo = 'lance';
+CREATE INDEX IF NOT EXISTS cotas_org_grupo_idx
+    ON public.cotas(org_id, grupo_codigo);
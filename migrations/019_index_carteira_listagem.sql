@@ -0,0 +1,12 @@
+-- 019_index_carteira_listagem.sql
+-- Índices da listagem paginada da carteira (app/services/carteira_service.py).
+-- A página é lida por keyset em (entered_at desc, id desc). O enriquecimento
+-- busca, para a página inteira, as cotas dos leads e os contratos das cotas em
+-- ordem de created_at desc, e fica com a primeira linha de cada lead/cota.
+
+CREATE INDEX IF NOT EXISTS carteira_clientes_org_entered_idx
+    ON public.carteira_clientes(org_id, entered_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS cotas_org_lead_created_idx
+    ON public.cotas(org_id, lead_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS contratos_org_cota_created_idx
+    ON public.contratos(org_id, cota_id, created_at DESC);
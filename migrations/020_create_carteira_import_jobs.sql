@@ -0,0 +1,62 @@
+-- 020_create_carteira_import_jobs.sql
+-- Jobs de importação de carteira em segundo plano
+-- (app/services/carteira_import_job_service.py). O arquivo enviado é gravado
+-- em blocos de linhas; cada bloco é confirmado e marcado como checkpoint, e os
+-- blocos `pendente`/`erro` podem ser retomados. `erros_detalhe` guarda as
+-- linhas recusadas do bloco, usadas no relatório de erros.
+
+CREATE TABLE IF NOT EXISTS public.carteira_import_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+
+    -- 'recebendo' | 'pendente' | 'executando' | 'concluido' | 'concluido_com_erros' | 'falhou'
+    status text NOT NULL DEFAULT 'recebendo',
+    arquivo_nome text,
+    produto_padrao text NOT NULL DEFAULT 'imobiliario',
+    cabecalho text NOT NULL,                   -- linha de cabeçalho, repetida em cada bloco
+
+    total_linhas integer NOT NULL DEFAULT 0,   -- linhas após o cabeçalho
+    blocos_total integer NOT NULL DEFAULT 0,
+    processadas integer NOT NULL DEFAULT 0,    -- linhas de blocos concluídos
+    importadas integer NOT NULL DEFAULT 0,
+    com_erro integer NOT NULL DEFAULT 0,
+    ignoradas integer NOT NULL DEFAULT 0,
+    blocos_processados integer NOT NULL DEFAULT 0,
+    blocos_com_erro integer NOT NULL DEFAULT 0,
+    erro text,                                 -- falha do job inteiro (não de uma linha)
+
+    recebido_em timestamptz,                   -- NULL = upload não terminou
+    iniciado_em timestamptz,
+    concluido_em timestamptz,
+    created_by uuid REFERENCES public.profiles(user_id),
+    created_by_role text,
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS carteira_import_jobs_org_idx
+    ON public.carteira_import_jobs(org_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS public.carteira_import_job_blocos (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id uuid NOT NULL REFERENCES public.carteira_import_jobs(id) ON DELETE CASCADE,
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+
+    ordem integer NOT NULL,
+    primeira_linha integer NOT NULL,           -- número da 1ª linha do bloco no arquivo
+    total_linhas integer NOT NULL DEFAULT 0,
+    linhas text NOT NULL,
+
+    status text NOT NULL DEFAULT 'pendente',   -- 'pendente' | 'executando' | 'ok' | 'erro'
+    importadas integer NOT NULL DEFAULT 0,
+    com_erro integer NOT NULL DEFAULT 0,
+    ignoradas integer NOT NULL DEFAULT 0,
+    erros_detalhe jsonb NOT NULL DEFAULT '[]', -- [{linha, cliente_nome, erros}]
+    erro text,                                 -- falha do bloco inteiro
+    processado_em timestamptz,
+
+    UNIQUE (job_id, ordem)
+);
+
+CREATE INDEX IF NOT EXISTS carteira_import_job_blocos_status_idx
+    ON public.carteira_import_job_blocos(job_id, status, ordem);
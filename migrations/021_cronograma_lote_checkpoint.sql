@@ -0,0 +1,8 @@
+-- 021_cronograma_lote_checkpoint.sql
+-- Checkpoint da geração de cronogramas em lote
+-- (app/services/cronograma_lote_service.py). Os contratos são processados em
+-- ordem de id; a cada bloco o job guarda o último contrato gravado, e a
+-- retomada (`POST /financeiro/cronogramas/lote/{job_id}/retomar`) continua dali.
+
+ALTER TABLE public.cronograma_lote_jobs
+    ADD COLUMN IF NOT EXISTS ultimo_contrato_id uuid;
@@ -0,0 +1,18 @@
+-- 022_create_lance_estatisticas_pendencias.sql
+-- Grupos com estatísticas de lance a recalcular
+-- (app/services/lance_estatisticas_service.py). Os fluxos de lance e
+-- contemplação só marcam o grupo aqui; o worker embutido
+-- (LANCE_ESTATISTICAS_INTERVAL_SEC) recalcula e apaga a marcação. Marcar de
+-- novo um grupo já pendente só renova marcado_em.
+
+CREATE TABLE IF NOT EXISTS public.lance_estatisticas_pendencias (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id) ON DELETE CASCADE,
+    administradora_id uuid NOT NULL,
+    grupo_codigo text NOT NULL,
+    marcado_em timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (org_id, administradora_id, grupo_codigo)
+);
+
+CREATE INDEX IF NOT EXISTS lance_estatisticas_pendencias_marcado_idx
+    ON public.lance_estatisticas_pendencias(marcado_em);
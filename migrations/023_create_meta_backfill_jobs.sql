@@ -0,0 +1,28 @@
+-- 023_create_meta_backfill_jobs.sql
+-- Jobs do backfill de leads da Meta (app/services/meta_leads_backfill_service.py).
+-- O POST só cria o job; a varredura roda em segundo plano e o resultado fica
+-- aqui. O cursor de cada formulário continua em
+-- meta_lead_integrations.settings.backfill, então um job novo segue de onde o
+-- anterior parou.
+
+CREATE TABLE IF NOT EXISTS public.meta_backfill_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+    integration_id uuid NOT NULL REFERENCES public.meta_lead_integrations(id) ON DELETE CASCADE,
+
+    -- 'pendente' | 'executando' | 'concluido' | 'falhou'
+    status text NOT NULL DEFAULT 'pendente',
+    -- {max_pages, page_size, since, restart}
+    parametros jsonb NOT NULL DEFAULT '{}',
+    resultado jsonb,                            -- retorno de run_meta_backfill
+    erro text,
+
+    iniciado_em timestamptz,
+    concluido_em timestamptz,
+    created_by uuid REFERENCES public.profiles(user_id),
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS meta_backfill_jobs_integration_idx
+    ON public.meta_backfill_jobs(integration_id, created_at DESC);
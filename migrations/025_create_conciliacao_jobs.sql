@@ -0,0 +1,33 @@
+-- 025_create_conciliacao_jobs.sql
+-- Jobs de confirmação da conciliação bancária
+-- (app/services/conciliacao_bancaria_service.py). As baixas são gravadas em
+-- blocos de contratos; `ultimo_contrato_id` é o checkpoint da retomada.
+
+CREATE TABLE IF NOT EXISTS public.conciliacao_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES public.orgs(id),
+
+    -- 'pendente' | 'executando' | 'concluido' | 'concluido_com_erros' | 'falhou'
+    status text NOT NULL DEFAULT 'pendente',
+    -- {pagamento_id: {pago_em, valor_pago}}
+    baixas jsonb NOT NULL DEFAULT '{}',
+
+    total integer NOT NULL DEFAULT 0,
+    processados integer NOT NULL DEFAULT 0,
+    baixados integer NOT NULL DEFAULT 0,
+    ignorados integer NOT NULL DEFAULT 0,
+    contratos_processados integer NOT NULL DEFAULT 0,
+    erros integer NOT NULL DEFAULT 0,
+    erros_detalhe jsonb NOT NULL DEFAULT '[]',  -- [{contrato_id, erro}]
+    ultimo_contrato_id text,
+    erro text,                                  -- falha do job inteiro
+
+    iniciado_em timestamptz,
+    concluido_em timestamptz,
+    created_by uuid REFERENCES public.profiles(user_id),
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS conciliacao_jobs_org_idx
+    ON public.conciliacao_jobs(org_id, created_at DESC);
@@ -0,0 +1,20 @@
+-- 026_meta_backfill_jobs_ativo_unico.sql
+-- Um backfill ativo (pendente/executando) por integração. A checagem em
+-- `iniciar_backfill` não fecha a corrida entre dois POSTs simultâneos; o
+-- segundo insert esbarra neste índice e vira 409.
+
+-- Jobs ativos duplicados de antes do índice: fica o mais recente.
+UPDATE public.meta_backfill_jobs AS j
+   SET status = 'falhou', erro = 'Interrompido antes de concluir', updated_at = now()
+ WHERE j.status IN ('pendente', 'executando')
+   AND EXISTS (
+       SELECT 1
+         FROM public.meta_backfill_jobs AS n
+        WHERE n.integration_id = j.integration_id
+          AND n.status IN ('pendente', 'executando')
+          AND (n.created_at, n.id) > (j.created_at, j.id)
+   );
+
+CREATE UNIQUE INDEX IF NOT EXISTS meta_backfill_jobs_integration_ativo_idx
+    ON public.meta_backfill_jobs(integration_id)
+    WHERE status IN ('pendente', 'executando');
@@ -0,0 +1,129 @@
+-- 027_busca_carteira_filtros_lead.sql
+-- Filtros de lead dentro de `busca_carteira` (app/services/busca_service.py).
+-- O kanban (etapas visíveis) e a carteira (só leads em carteira_clientes)
+-- filtravam os leads depois do LIMIT da busca: quando os primeiros pares
+-- encontrados eram de leads fora do filtro, os que passavam ficavam de fora.
+-- `p_etapas` e `p_somente_carteira` valem antes do LIMIT e, com algum deles
+-- informado, o LIMIT conta leads distintos (todos os pares dos `p_limite`
+-- leads mais relevantes), não pares lead/cota. Sem eles, o resultado é o
+-- mesmo da migration 024.
+
+DROP FUNCTION IF EXISTS public.busca_carteira(uuid, text, integer, text, uuid, text, boolean);
+
+CREATE OR REPLACE FUNCTION public.busca_carteira(
+    p_org_id uuid,
+    p_q text,
+    p_limite integer DEFAULT 200,
+    p_status text DEFAULT NULL,
+    p_administradora_id uuid DEFAULT NULL,
+    p_produto text DEFAULT NULL,
+    p_somente_autorizadas boolean DEFAULT false,
+    p_etapas text[] DEFAULT NULL,
+    p_somente_carteira boolean DEFAULT false
+)
+RETURNS TABLE (lead_id uuid, cota_id uuid, rank real)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH termo AS (
+        SELECT
+            public.busca_normalizar(p_q) AS q,
+            '%' || replace(replace(replace(public.busca_normalizar(p_q), '\', '\\'), '%', '\%'), '_', '\_') || '%' AS padrao,
+            plainto_tsquery('portuguese', public.busca_normalizar(p_q)) AS tsq
+    ),
+    por_lead AS (
+        SELECT
+            l.id AS lead_id,
+            greatest(
+                similarity(public.busca_normalizar(l.nome), t.q),
+                ts_rank(to_tsvector('portuguese', public.busca_normalizar(l.nome)), t.tsq)
+            ) AS rank
+        FROM public.leads l, termo t
+        WHERE l.org_id = p_org_id
+          AND (
+              public.busca_normalizar(l.nome) LIKE t.padrao
+              OR to_tsvector('portuguese', public.busca_normalizar(l.nome)) @@ t.tsq
+          )
+    ),
+    candidatos AS (
+        SELECT c.lead_id, c.id AS cota_id,
+            CASE
+                WHEN public.busca_normalizar(c.numero_cota) = t.q OR public.busca_normalizar(c.grupo_codigo) = t.q THEN 1.0
+                ELSE greatest(
+                    similarity(public.busca_normalizar(c.numero_cota), t.q),
+                    similarity(public.busca_normalizar(c.grupo_codigo), t.q)
+                )
+            END AS rank
+        FROM public.cotas c, termo t
+        WHERE c.org_id = p_org_id
+          AND (
+              public.busca_normalizar(c.numero_cota) LIKE t.padrao
+              OR public.busca_normalizar(c.grupo_codigo) LIKE t.padrao
+          )
+        UNION ALL
+        SELECT c.lead_id, c.id,
+            CASE
+                WHEN public.busca_normalizar(ct.numero) = t.q THEN 1.0
+                ELSE similarity(public.busca_normalizar(ct.numero), t.q)
+            END
+        FROM public.contratos ct
+        JOIN public.cotas c ON c.id = ct.cota_id, termo t
+        WHERE ct.org_id = p_org_id
+          AND public.busca_normalizar(ct.numero) LIKE t.padrao
+        UNION ALL
+        SELECT pl.lead_id, c.id, pl.rank
+        FROM por_lead pl
+        LEFT JOIN public.cotas c ON c.lead_id = pl.lead_id AND c.org_id = p_org_id
+    ),
+    pares AS (
+        SELECT ca.lead_id, ca.cota_id, max(ca.rank)::real AS rank
+        FROM candidatos ca
+        LEFT JOIN public.cotas c ON c.id = ca.cota_id
+        WHERE (
+            (
+                p_status IS NULL
+                AND p_administradora_id IS NULL
+                AND p_produto IS NULL
+                AND NOT coalesce(p_somente_autorizadas, false)
+            ) OR (
+                c.id IS NOT NULL
+                AND (p_status IS NULL OR c.status = p_status)
+                AND (p_administradora_id IS NULL OR c.administradora_id = p_administradora_id)
+                AND (p_produto IS NULL OR c.produto = p_produto)
+                AND (NOT coalesce(p_somente_autorizadas, false) OR c.autorizacao_gestao)
+            )
+        )
+          AND (
+              p_etapas IS NULL
+              OR EXISTS (
+                  SELECT 1 FROM public.leads l
+                  WHERE l.id = ca.lead_id AND l.org_id = p_org_id AND l.etapa::text = ANY(p_etapas)
+              )
+          )
+          AND (
+              NOT coalesce(p_somente_carteira, false)
+              OR EXISTS (
+                  SELECT 1 FROM public.carteira_clientes cc
+                  WHERE cc.org_id = p_org_id AND cc.lead_id = ca.lead_id
+              )
+          )
+        GROUP BY ca.lead_id, ca.cota_id
+    ),
+    -- com filtro de lead, o limite conta leads distintos
+    leads_top AS (
+        SELECT p.lead_id
+        FROM pares p
+        WHERE p.lead_id IS NOT NULL
+        GROUP BY p.lead_id
+        ORDER BY max(p.rank) DESC, p.lead_id
+        LIMIT greatest(p_limite, 1)
+    )
+    SELECT p.lead_id, p.cota_id, p.rank
+    FROM pares p
+    WHERE (p_etapas IS NULL AND NOT coalesce(p_somente_carteira, false))
+       OR p.lead_id IN (SELECT lead_id FROM leads_top)
+    ORDER BY p.rank DESC, p.lead_id, p.cota_id
+    LIMIT CASE
+        WHEN p_etapas IS NULL AND NOT coalesce(p_somente_carteira, false) THEN greatest(p_limite, 1)
+    END;
+$$;
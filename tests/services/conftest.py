@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import re
+from copy import deepcopy
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+
+class FakeResponse:
+    def __init__(self, data: Any):
+        self.data = data
+
+
+def _split_top_level(expr: str) -> list[str]:
+    parts, depth, quoted, escaped, current = [], 0, False, False, ""
+    for char in expr:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted:
+            if char == "," and depth == 0:
+                parts.append(current)
+                current = ""
+                continue
+            depth += char == "("
+            depth -= char == ")"
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _like_regex(pattern: str) -> str:
+    """LIKE -> regex: `%` e `_` são curingas, `\\` escapa o caractere seguinte."""
+    regex, escaped = "", False
+    for char in pattern:
+        if escaped:
+            regex += re.escape(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            regex += ".*"
+        elif char == "_":
+            regex += "."
+        else:
+            regex += re.escape(char)
+    return regex
+
+
+def _parse_or(expr: str) -> list:
+    """`a.eq.1,and(b.gt.2,c.is.null),d.in.(x,"y")` -> árvore de condições do PostgREST."""
+    out = []
+    for part in _split_top_level(expr):
+        if part.startswith("and(") and part.endswith(")"):
+            out.append(("and", "", _parse_or(part[4:-1])))
+        elif part.startswith("or(") and part.endswith(")"):
+            out.append(("or", "", _parse_or(part[3:-1])))
+        else:
+            field, op, value = part.split(".", 2)
+            if op == "in" and value.startswith("(") and value.endswith(")"):
+                out.append((op, field, [_unquote(item) for item in _split_top_level(value[1:-1])]))
+            else:
+                out.append((op, field, None if value == "null" else _unquote(value)))
+    return out
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.filters: list[tuple[str, str, Any]] = []
+        self.operation = "select"
+        self.payload: Any = None
+        self.on_conflict: str | None = None
+        self.orders: list[tuple[str, bool]] = []
+        self.limit_value: int | None = None
+        self.range_value: tuple[int, int] | None = None
+        self.single_mode: str | None = None
+        self.count_mode: str | None = None
+
+    # filtros ---------------------------------------------------------------
+    def select(self, _columns: str = "*", count: str | None = None):
+        self.count_mode = count
+        return self
+
+    def eq(self, field: str, value: Any):
+        self.filters.append(("eq", field, value))
+        return self
+
+    def neq(self, field: str, value: Any):
+        self.filters.append(("neq", field, value))
+        return self
+
+    def in_(self, field: str, values: list[Any]):
+        self.filters.append(("in", field, list(values)))
+        return self
+
+    def is_(self, field: str, value: Any):
+        self.filters.append(("is", field, value))
+        return self
+
+    def gte(self, field: str, value: Any):
+        self.filters.append(("gte", field, value))
+        return self
+
+    def lte(self, field: str, value: Any):
+        self.filters.append(("lte", field, value))
+        return self
+
+    def gt(self, field: str, value: Any):
+        self.filters.append(("gt", field, value))
+        return self
+
+    def lt(self, field: str, value: Any):
+        self.filters.append(("lt", field, value))
+        return self
+
+    def ilike(self, field: str, pattern: str):
+        self.filters.append(("ilike", field, pattern))
+        return self
+
+    def or_(self, expr: str):
+        self.filters.append(("or", "", _parse_or(expr)))
+        return self
+
+    def order(self, field: str, desc: bool = False, **_kwargs: Any):
+        self.orders.append((field, desc))
+        return self
+
+    def limit(self, value: int):
+        self.limit_value = value
+        return self
+
+    def range(self, start: int, end: int):
+        self.range_value = (start, end)
+        return self
+
+    def maybe_single(self):
+        self.single_mode = "maybe"
+        return self
+
+    def single(self):
+        self.single_mode = "single"
+        return self
+
+    # escrita ---------------------------------------------------------------
+    def insert(self, payload: Any, returning: str | None = None, **_kwargs: Any):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload: Any, on_conflict: str | None = None, **_kwargs: Any):
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, payload: dict[str, Any]):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    # execução --------------------------------------------------------------
+    def _matches(self, row: dict[str, Any], filters: list | None = None) -> bool:
+        for op, field, value in self.filters if filters is None else filters:
+            if op == "and":
+                if not self._matches(row, value):
+                    return False
+                continue
+            if op == "or":
+                if not any(self._matches(row, [cond]) for cond in value):
+                    return False
+                continue
+            current = row.get(field)
+            if op == "eq" and str(current) != str(value):
+                return False
+            if op == "neq" and str(current) == str(value):
+                return False
+            if op == "in" and str(current) not in {str(item) for item in value}:
+                return False
+            if op == "is" and value in (None, "null") and current is not None:
+                return False
+            if op == "ilike":
+                regex = _like_regex(str(value))
+                if current is None or not re.fullmatch(regex, str(current), re.IGNORECASE | re.DOTALL):
+                    return False
+            if op in {"gte", "lte", "gt", "lt"}:
+                if current is None:
+                    return False
+                left, right = str(current), str(value)
+                if op == "gte" and not left >= right:
+                    return False
+                if op == "lte" and not left <= right:
+                    return False
+                if op == "gt" and not left > right:
+                    return False
+                if op == "lt" and not left < right:
+                    return False
+        return True
+
+    def execute(self) -> FakeResponse:
+        self.db.calls.append((self.table_name, self.operation))
+        table = self.db.tables.setdefault(self.table_name, [])
+
+        if self.operation in {"insert", "upsert"}:
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            keys = (self.on_conflict or "id").split(",")
+            for item in items:
+                row = deepcopy(item)
+                row.setdefault("id", str(uuid4()))
+                existing = None
+                if self.operation == "upsert":
+                    existing = next(
+                        (cur for cur in table if all(str(cur.get(k)) == str(row.get(k)) for k in keys)),
+                        None,
+                    )
+                if existing is not None:
+                    existing.update(row)
+                    out.append(deepcopy(existing))
+                else:
+                    table.append(row)
+                    out.append(deepcopy(row))
+            return FakeResponse(out)
+
+        rows = [row for row in table if self._matches(row)]
+
+        if self.operation == "update":
+            for row in rows:
+                row.update(deepcopy(self.payload))
+            return FakeResponse([deepcopy(row) for row in rows])
+
+        if self.operation == "delete":
+            self.db.tables[self.table_name] = [row for row in table if not self._matches(row)]
+            return FakeResponse([deepcopy(row) for row in rows])
+
+        result = [deepcopy(row) for row in rows]
+        for field, desc in reversed(self.orders):
+            result.sort(key=lambda item: (item.get(field) is None, str(item.get(field))), reverse=desc)
+        total = len(result)
+        if self.range_value is not None:
+            start, end = self.range_value
+            result = result[start:end + 1]
+        if self.limit_value is not None:
+            result = result[: self.limit_value]
+        if self.single_mode:
+            response = FakeResponse(result[0] if result else None)
+        else:
+            response = FakeResponse(result)
+        if self.count_mode:
+            response.count = total
+        return response
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict[str, Any]):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.db.calls.append((self.name, "rpc"))
+        handler = self.db.rpc_handlers[self.name]
+        return FakeResponse(handler(self.db, self.params))
+
+
+class FakeSupabase:
+    """Supabase em memória com o subconjunto do postgrest usado pelos services."""
+
+    def __init__(self, tables: dict[str, list[dict[str, Any]]] | None = None):
+        self.tables = deepcopy(tables or {})
+        self.calls: list[tuple[str, str]] = []
+        self.rpc_handlers: dict[str, Any] = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict[str, Any] | None = None) -> FakeRpc:
+        return FakeRpc(self, name, params or {})
+
+    def count_calls(self, table: str, operation: str | None = None) -> int:
+        return sum(1 for name, op in self.calls if name == table and (operation is None or op == operation))
+
+
+@pytest.fixture
+def fake_supabase():
+    return FakeSupabase
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app.services import assembleia_calendario_service as service
+from app.services import lances_service
+
+ORG = "org-1"
+HOJE = date(2024, 11, 10)
+
+
+@pytest.fixture(autouse=True)
+def _limpa_cache():
+    service._cache.clear()
+    yield
+    service._cache.clear()
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "administradora_regras_lance": [
+            # 15/11/2024 (sexta) é feriado nacional
+            {"id": "r-1", "org_id": ORG, "administradora_id": "adm-1", "produto": None,
+             "dia_base_assembleia": 15, "ajustar_fim_semana": True, "tipo_ajuste": "proximo_dia_util"},
+            {"id": "r-2", "org_id": ORG, "administradora_id": "adm-1", "produto": "auto",
+             "dia_base_assembleia": 18, "ajustar_fim_semana": True, "tipo_ajuste": "dia_util_anterior"},
+        ],
+        # feriado da org na segunda 18/11: o anterior cai no feriado de sexta e volta até quinta
+        "agenda_feriados": [{"id": "f-1", "org_id": ORG, "data": "2024-11-18"}],
+        "assembleia_calendario_versoes": [{"org_id": ORG, "versao": 1}],
+    }
+
+
+def test_ajuste_pula_fim_de_semana_e_feriados() -> None:
+    feriados = {date(2024, 11, 15), date(2024, 11, 18)}
+    assert service.ajustar_dia_util(date(2024, 11, 15), "proximo_dia_util", feriados) == date(2024, 11, 19)
+    assert service.ajustar_dia_util(date(2024, 11, 18), "dia_util_anterior", feriados) == date(2024, 11, 14)
+    # sem feriados, só o fim de semana (01/06/2024 é sábado)
+    assert service.ajustar_dia_util(date(2024, 6, 1), "proximo_dia_util") == date(2024, 6, 3)
+    assert service.ajustar_dia_util(date(2024, 6, 2), "dia_util_anterior") == date(2024, 5, 31)
+    assert service.ajustar_dia_util(date(2024, 6, 4), "dia_util_anterior") == date(2024, 6, 4)
+
+
+def test_calendario_materializa_e_reaproveita_a_versao(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    calendario = service.carregar_calendario(db, ORG, hoje=HOJE)
+    novembro = date(2024, 11, 1)
+    assert calendario.data_regra(calendario.regra("adm-1", None), novembro) == date(2024, 11, 19)
+    assert calendario.data_regra(calendario.regra("adm-1", "auto"), novembro) == date(2024, 11, 14)
+    assert calendario.regra("adm-1", "imovel")["id"] == "r-1"
+
+    meses = 1 + 12 + 24  # horizonte padrão
+    assert len(db.tables["assembleia_calendario"]) == 2 * meses
+    assert {row["produto"] for row in db.tables["assembleia_calendario"]} == {"", "auto"}
+
+    # outro processo (cache vazio) lê o materializado sem regravar
+    service._cache.clear()
+    upserts = db.count_calls("assembleia_calendario", "upsert")
+    regras = db.count_calls("administradora_regras_lance", "select")
+    relido = service.carregar_calendario(db, ORG, hoje=HOJE)
+    assert relido.datas == calendario.datas
+    assert db.count_calls("assembleia_calendario", "upsert") == upserts
+    # regras e feriados só quando alguém pede
+    assert db.count_calls("administradora_regras_lance", "select") == regras
+    assert relido.regra("adm-1", "auto")["id"] == "r-2"
+    assert db.count_calls("administradora_regras_lance", "select") == regras + 1
+    assert db.count_calls("agenda_feriados", "select") == 1  # só a montagem inicial
+
+    # mesma versão: nem consulta o materializado
+    selects = db.count_calls("assembleia_calendario", "select")
+    assert service.carregar_calendario(db, ORG, hoje=HOJE) is relido
+    assert db.count_calls("assembleia_calendario", "select") == selects
+
+
+def test_nova_versao_recalcula_e_descarta_a_antiga(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    service.carregar_calendario(db, ORG, hoje=HOJE)
+
+    db.tables["agenda_feriados"].clear()
+    db.tables["assembleia_calendario_versoes"][0]["versao"] = 2  # trigger da migration 016
+
+    calendario = service.carregar_calendario(db, ORG, hoje=HOJE)
+    assert calendario.data_regra(calendario.regra("adm-1", "auto"), date(2024, 11, 1)) == date(2024, 11, 18)
+    assert {row["versao"] for row in db.tables["assembleia_calendario"]} == {2}
+
+
+def test_resolve_assembleia_usa_feriados_tambem_no_dia_da_cota(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    calendario = service.carregar_calendario(db, ORG, hoje=HOJE)
+    cota = {"id": "cota-1", "administradora_id": "adm-1", "produto": "auto", "assembleia_dia": 15}
+
+    regra = lances_service.resolve_assembleia(
+        sb=db, org_id=ORG, cota=cota, competencia=date(2024, 11, 20), calendario=calendario
+    )
+
+    assert regra["origem"] == "cota"
+    assert regra["assembleia_prevista"] == date(2024, 11, 19)
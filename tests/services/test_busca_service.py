@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.security.auth import CurrentProfile
+from app.services import assembleia_calendario_service
+from app.services import busca_service as service
+from app.services import kanban_service, lances_service
+
+ORG = "org-1"
+PROFILE = CurrentProfile(user_id="user-1", org_id=ORG, role="gestor")
+
+
+@pytest.fixture(autouse=True)
+def _limpa_calendario():
+    assembleia_calendario_service._cache.clear()
+    yield
+    assembleia_calendario_service._cache.clear()
+
+
+def _cota(i: int, lead_id: str) -> dict:
+    return {
+        "id": f"cota-{i}",
+        "org_id": ORG,
+        "lead_id": lead_id,
+        "administradora_id": None,
+        "numero_cota": str(i),
+        "grupo_codigo": "G1",
+        "produto": "imovel",
+        "status": "ativa",
+        "created_at": f"2024-01-{i:02d}",
+    }
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "leads": [
+            {"id": "lead-1", "org_id": ORG, "nome": "João", "etapa": "novo"},
+            {"id": "lead-2", "org_id": ORG, "nome": "Maria", "etapa": "proposta"},
+            {"id": "lead-3", "org_id": ORG, "nome": "Joana", "etapa": "novo"},
+        ],
+        "cotas": [_cota(1, "lead-1"), _cota(2, "lead-2"), _cota(3, "lead-3")],
+    }
+
+
+def _rpc(resultado: list[dict]):
+    def handler(db, params):
+        handler.params = params
+        return resultado
+
+    return handler
+
+
+def test_sem_termo_nao_busca(fake_supabase) -> None:
+    db = fake_supabase()
+
+    assert service.buscar(db, org_id=ORG, q=None) is None
+    assert service.buscar(db, org_id=ORG, q="  a ") is None
+    assert db.calls == []
+
+
+def test_termo_normalizado_e_limite_vao_para_a_rpc(fake_supabase) -> None:
+    db = fake_supabase()
+    db.rpc_handlers[service.BUSCA_RPC] = handler = _rpc([
+        {"lead_id": "lead-3", "cota_id": "cota-3", "rank": 0.9},
+        {"lead_id": "lead-3", "cota_id": None, "rank": 0.9},
+        {"lead_id": "lead-1", "cota_id": "cota-1", "rank": "0.4"},
+    ])
+
+    resultado = service.buscar(db, org_id=ORG, q="  joao   silva ", limite=10)
+
+    assert handler.params == {"p_org_id": ORG, "p_q": "joao silva", "p_limite": 10}
+    assert service.cota_ids(resultado) == ["cota-3", "cota-1"]
+    assert service.lead_ids(resultado) == ["lead-3", "lead-1"]
+    assert resultado[2]["rank"] == 0.4
+
+
+def test_cartas_filtram_pelos_ids_da_busca_em_ordem_de_relevancia(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    db.rpc_handlers[service.BUSCA_RPC] = _rpc([
+        {"lead_id": "lead-3", "cota_id": "cota-3", "rank": 0.9},
+        {"lead_id": "lead-1", "cota_id": "cota-1", "rank": 0.4},
+    ])
+
+    result = lances_service.list_cartas_operacao(
+        sb=db, profile=PROFILE, competencia=date(2024, 6, 1), q="jo", page_size=1
+    )
+
+    assert result["total"] == 2
+    assert [item["cota_id"] for item in result["items"]] == ["cota-3"]
+    assert db.count_calls("leads", "select") == 0
+
+    segunda = lances_service.list_cartas_operacao(
+        sb=db, profile=PROFILE, competencia=date(2024, 6, 1), q="jo", page=2, page_size=1
+    )
+    assert [item["cota_id"] for item in segunda["items"]] == ["cota-1"]
+
+
+def test_filtros_das_cartas_vao_para_a_rpc(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    db.rpc_handlers[service.BUSCA_RPC] = handler = _rpc([{"lead_id": "lead-1", "cota_id": "cota-1", "rank": 0.4}])
+
+    lances_service.list_cartas_operacao(
+        sb=db, profile=PROFILE, competencia=date(2024, 6, 1), q="jo", produto="imovel", somente_autorizadas=True
+    )
+
+    assert handler.params == {
+        "p_org_id": ORG,
+        "p_q": "jo",
+        "p_limite": 200,
+        "p_status": "ativa",
+        "p_produto": "imovel",
+        "p_somente_autorizadas": True,
+    }
+
+
+def test_sem_indice_filtra_as_cotas_antes_do_limite(fake_supabase) -> None:
+    db = fake_supabase(
+        {
+            "leads": [],
+            "cotas": [
+                {**_cota(1, "lead-1"), "numero_cota": "G1-1", "status": "cancelada"},
+                {**_cota(2, "lead-2"), "numero_cota": "G1-2"},
+            ],
+            "contratos": [],
+        }
+    )
+
+    def sem_rpc(db, params):
+        raise APIError({"message": f"Could not find the function public.{service.BUSCA_RPC}", "code": "PGRST202"})
+
+    db.rpc_handlers[service.BUSCA_RPC] = sem_rpc
+
+    resultado = service.buscar(db, org_id=ORG, q="G1", limite=1, filtros_cota={"status": "ativa"})
+
+    assert service.cota_ids(resultado) == ["cota-2"]
+
+
+def test_kanban_mostra_so_os_leads_encontrados(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    db.rpc_handlers[service.BUSCA_RPC] = handler = _rpc([
+        {"lead_id": "lead-3", "cota_id": "cota-3", "rank": 0.9},
+        {"lead_id": "lead-1", "cota_id": "cota-1", "rank": 0.4},
+    ])
+
+    snapshot = kanban_service.build_kanban_snapshot(org_id=ORG, supa=db, q="jo")
+
+    # as etapas visíveis filtram antes do limite da busca
+    assert handler.params["p_etapas"] == list(kanban_service.MAIN_KANBAN_STAGES)
+
+    assert [card.id for card in snapshot.columns["novo"]] == ["lead-3", "lead-1"]
+    assert snapshot.columns["proposta"] == []
+
+    db.rpc_handlers[service.BUSCA_RPC] = _rpc([])
+    vazio = kanban_service.build_kanban_snapshot(org_id=ORG, supa=db, q="xyz")
+    assert all(cards == [] for cards in vazio.columns.values())
+
+
+def _sem_rpc(db, params):
+    raise APIError({"message": f"Could not find the function public.{service.BUSCA_RPC}", "code": "PGRST202"})
+
+
+def test_sem_indice_filtra_os_leads_e_limita_por_lead(fake_supabase) -> None:
+    data = tables()
+    data["leads"].append({"id": "lead-4", "org_id": ORG, "nome": "Jonas", "etapa": "perdido"})
+    data["cotas"].append({**_cota(4, "lead-1"), "numero_cota": "4"})
+    data["contratos"] = []
+    db = fake_supabase(data)
+    db.rpc_handlers[service.BUSCA_RPC] = _sem_rpc
+
+    resultado = service.buscar(db, org_id=ORG, q="jo", limite=1, filtros_lead={"etapas": ["novo"]})
+
+    # lead-4 (perdido) não ocupa o limite; o limite conta leads, com todas as cotas do lead
+    assert service.lead_ids(resultado) == ["lead-1"]
+    assert sorted(row["cota_id"] for row in resultado if row["cota_id"]) == ["cota-1", "cota-4"]
+
+
+def test_sem_indice_somente_carteira(fake_supabase) -> None:
+    data = tables()
+    data["contratos"] = []
+    data["carteira_clientes"] = [{"id": "cc-3", "org_id": ORG, "lead_id": "lead-3"}]
+    db = fake_supabase(data)
+    db.rpc_handlers[service.BUSCA_RPC] = _sem_rpc
+
+    resultado = service.buscar(db, org_id=ORG, q="jo", limite=1, filtros_lead={"somente_carteira": True})
+
+    assert service.lead_ids(resultado) == ["lead-3"]
+
+
+def test_sem_indice_curingas_do_termo_sao_literais(fake_supabase) -> None:
+    data = tables()
+    data["leads"].append({"id": "lead-4", "org_id": ORG, "nome": "100% Jo_ao", "etapa": "novo"})
+    data["contratos"] = []
+    db = fake_supabase(data)
+    db.rpc_handlers[service.BUSCA_RPC] = _sem_rpc
+
+    assert service.lead_ids(service.buscar(db, org_id=ORG, q="o_a", limite=10)) == ["lead-4"]
+    assert service.lead_ids(service.buscar(db, org_id=ORG, q="0% j", limite=10)) == ["lead-4"]
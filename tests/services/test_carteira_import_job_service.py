@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from app.security.auth import CurrentProfile
+from app.services import carteira_import_job_service as service
+from app.services import carteira_import_service
+
+ORG = "org-1"
+PROFILE = CurrentProfile(user_id="user-1", org_id=ORG, role="gestor")
+HEADER = "Cliente\tempresa\tgrupo\tcota\tvalor da cota"
+
+
+@pytest.fixture(autouse=True)
+def _patches(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(service, "LINHAS_POR_BLOCO", 2)
+    monkeypatch.setattr(carteira_import_service, "apply_lead_address_rules", lambda payload: payload)
+    monkeypatch.setattr(carteira_import_service, "normalize_cota_financial_payload", lambda payload: payload)
+
+
+def arquivo(*linhas: str) -> io.BytesIO:
+    return io.BytesIO("\n".join([HEADER, *linhas]).encode("utf-8-sig"))
+
+
+def linha(cliente: str, cota: str, grupo: str = "1001") -> str:
+    return f"{cliente}\tRodobens\t{grupo}\t{cota}\tR$ 100.000,00"
+
+
+def test_job_importa_em_blocos_e_reporta_erros(fake_supabase) -> None:
+    db = fake_supabase({})
+    upload = arquivo(
+        linha("Maria", "1"),
+        linha("João", "2"),
+        linha("Ana", "3", grupo=""),
+        "",
+        linha("Pedro", "4"),
+    )
+
+    job = service.criar_job(db, profile=PROFILE, arquivo=upload, nome_arquivo="carteira.tsv", produto_padrao="auto")
+    service.aguardar(job["id"], timeout=5)
+
+    status = service.status_importacao(db, org_id=ORG, job_id=job["id"])
+    item = status["item"]
+    assert item["status"] == "concluido_com_erros"
+    assert (item["total_linhas"], item["blocos_total"]) == (5, 3)
+    assert (item["processadas"], item["importadas"], item["com_erro"], item["ignoradas"]) == (5, 3, 1, 1)
+    assert status["percentual"] == 100.0
+    assert sorted(row["numero_cota"] for row in db.tables["cotas"]) == ["1", "2", "4"]
+    assert {row["produto"] for row in db.tables["cotas"]} == {"auto"}
+    # a mesma administradora serve os três blocos
+    assert len(db.tables["administradoras"]) == 1
+
+    erros = list(service.iter_erros(db, org_id=ORG, job_id=job["id"]))
+    assert erros == [{"linha": "4", "cliente_nome": "Ana", "erro": "Grupo é obrigatório."}]
+    assert not upload.closed
+
+
+def test_bloco_que_falha_e_retomado_sem_duplicar(fake_supabase, monkeypatch: pytest.MonkeyPatch) -> None:
+    db = fake_supabase({})
+    original = service.confirm_import
+    falhar = {"ativo": True}
+
+    def confirm_instavel(**kwargs):
+        resultado = original(**kwargs)
+        # o bloco grava e cai antes do checkpoint
+        if kwargs["primeira_linha"] == 4 and falhar["ativo"]:
+            raise RuntimeError("conexão perdida")
+        return resultado
+
+    monkeypatch.setattr(service, "confirm_import", confirm_instavel)
+    upload = arquivo(linha("Maria", "1"), linha("João", "2"), linha("Ana", "3"), linha("Pedro", "4"))
+
+    job = service.criar_job(db, profile=PROFILE, arquivo=upload, nome_arquivo=None, produto_padrao="imobiliario")
+    service.aguardar(job["id"], timeout=5)
+
+    item = service.status_importacao(db, org_id=ORG, job_id=job["id"])["item"]
+    assert item["status"] == "concluido_com_erros"
+    assert (item["processadas"], item["blocos_com_erro"]) == (2, 1)
+    assert list(service.iter_erros(db, org_id=ORG, job_id=job["id"])) == [
+        {"linha": "4-5", "cliente_nome": None, "erro": "Bloco não processado: conexão perdida"}
+    ]
+
+    falhar["ativo"] = False
+    service.retomar_importacao(db, org_id=ORG, job_id=job["id"], incluir_erros=True)
+    service.aguardar(job["id"], timeout=5)
+
+    item = service.status_importacao(db, org_id=ORG, job_id=job["id"])["item"]
+    assert item["status"] == "concluido"
+    assert (item["processadas"], item["importadas"], item["blocos_com_erro"]) == (4, 4, 0)
+    assert sorted(row["numero_cota"] for row in db.tables["cotas"]) == ["1", "2", "3", "4"]
+    assert len(db.tables["leads"]) == 4
+
+
+def test_arquivo_sem_dados(fake_supabase) -> None:
+    db = fake_supabase({})
+
+    with pytest.raises(service.HTTPException) as exc:
+        service.criar_job(db, profile=PROFILE, arquivo=io.BytesIO(b"\n\n"), nome_arquivo=None, produto_padrao="auto")
+
+    assert exc.value.status_code == 400
+    assert db.tables.get("carteira_import_jobs", []) == []
+
+
+def test_bloco_e_reivindicado_uma_vez_e_job_abandonado_e_retomado(fake_supabase) -> None:
+    db = fake_supabase({})
+    upload = arquivo(linha("Maria", "1"), linha("João", "2"), linha("Ana", "3"))
+    job = service.criar_job(db, profile=PROFILE, arquivo=upload, nome_arquivo=None, produto_padrao="imobiliario")
+    service.aguardar(job["id"], timeout=5)
+
+    # o processo morreu no meio do 2º bloco
+    bloco = next(row for row in db.tables[service.BLOCOS_TABLE] if row["ordem"] == 2)
+    bloco.update(status="pendente")
+    assert service._reivindicar_bloco(db, bloco["id"])["linhas"]
+    assert service._reivindicar_bloco(db, bloco["id"]) is None
+    db.tables[service.JOBS_TABLE][0].update(status="executando", updated_at="2024-01-01T00:00:00+00:00")
+
+    service.retomar_importacao(db, org_id=ORG, job_id=job["id"])
+    service.aguardar(job["id"], timeout=5)
+
+    item = service.status_importacao(db, org_id=ORG, job_id=job["id"])["item"]
+    assert (item["status"], item["processadas"]) == ("concluido", 3)
+    assert bloco["status"] == "ok"
+    assert len(db.tables["cotas"]) == 3
+
+
+def test_job_em_execucao_em_outro_processo_nao_e_retomado(fake_supabase) -> None:
+    db = fake_supabase({})
+    job = service.criar_job(
+        db, profile=PROFILE, arquivo=arquivo(linha("Maria", "1")), nome_arquivo=None, produto_padrao="imobiliario"
+    )
+    service.aguardar(job["id"], timeout=5)
+    db.tables[service.JOBS_TABLE][0].update(status="executando", updated_at="2099-01-01T00:00:00+00:00")
+
+    with pytest.raises(service.HTTPException) as exc:
+        service.retomar_importacao(db, org_id=ORG, job_id=job["id"], incluir_erros=True)
+    assert exc.value.status_code == 409
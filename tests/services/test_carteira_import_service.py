@@ -103,6 +103,8 @@ class FakeTableQuery:
         self._filters: list[tuple[str, str, object]] = []
         self._or_filters: list[list[tuple[str, str, object]]] = []
         self._limit: int | None = None
+        self._range: tuple[int, int] | None = None
+        self._order: str | None = None
         self._operation = "select"
         self._payload: Any = None
 
@@ -114,6 +116,10 @@ class FakeTableQuery:
         self._filters.append(("eq", field, value))
         return self
 
+    def in_(self, field: str, values: list[object]):
+        self._filters.append(("in", field, values))
+        return self
+
     def ilike(self, field: str, value: str):
         self._filters.append(("ilike", field, value))
         return self
@@ -131,10 +137,19 @@ class FakeTableQuery:
         self._or_filters.append(branches)
         return self
 
+    def order(self, field: str, desc: bool = False):
+        del desc
+        self._order = field
+        return self
+
     def limit(self, value: int):
         self._limit = value
         return self
 
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
     def insert(self, payload: Any, returning: str | None = None):
         del returning
         self._operation = "insert"
@@ -170,6 +185,10 @@ class FakeTableQuery:
             return FakeResponse(updated)
 
         rows = [deepcopy(row) for row in matched]
+        if self._order is not None:
+            rows.sort(key=lambda row: str(row.get(self._order) or ""))
+        if self._range is not None:
+            rows = rows[self._range[0] : self._range[1] + 1]
         if self._limit is not None:
             rows = rows[: self._limit]
         return FakeResponse(rows)
@@ -179,6 +198,8 @@ class FakeTableQuery:
             current = row.get(field)
             if op == "eq" and current != value:
                 return False
+            if op == "in" and str(current) not in {str(item) for item in value}:
+                return False
             if op == "ilike":
                 pattern = str(value).strip("%").lower()
                 if pattern not in str(current or "").lower():
@@ -233,26 +254,6 @@ def fake_sb() -> FakeSupabaseClient:
 
 @pytest.fixture(autouse=True)
 def service_patches(monkeypatch: pytest.MonkeyPatch):
-    def fake_ensure_carteira_cliente(*, supa, org_id: str, lead_id: str, origem_entrada: str, observacoes: str):
-        table = supa.tables.setdefault("carteira_clientes", [])
-        existing = next(
-            (row for row in table if row.get("org_id") == org_id and row.get("lead_id") == lead_id),
-            None,
-        )
-        if existing:
-            return {"created": False, "carteira_cliente": deepcopy(existing)}
-
-        row = {
-            "id": f"carteira_clientes-{len(table) + 1}",
-            "org_id": org_id,
-            "lead_id": lead_id,
-            "origem_entrada": origem_entrada,
-            "observacoes": observacoes,
-        }
-        table.append(row)
-        return {"created": True, "carteira_cliente": deepcopy(row)}
-
-    monkeypatch.setattr(service, "ensure_carteira_cliente", fake_ensure_carteira_cliente)
     monkeypatch.setattr(service, "apply_lead_address_rules", lambda payload: payload)
     monkeypatch.setattr(service, "normalize_cota_financial_payload", lambda payload: payload)
 
@@ -586,9 +587,9 @@ def test_confirm_uses_same_parser_as_preview(profile: CurrentProfile, fake_sb: F
     original = service.parse_import_rows
     calls: list[str] = []
 
-    def spy(raw_text: str, *, produto_padrao: service.ImportProduto):
+    def spy(raw_text: str, *, produto_padrao: service.ImportProduto, **kwargs: Any):
         calls.append(raw_text)
-        return original(raw_text, produto_padrao=produto_padrao)
+        return original(raw_text, produto_padrao=produto_padrao, **kwargs)
 
     monkeypatch.setattr(service, "parse_import_rows", spy)
     raw_text = build_tsv(make_row(), make_row(Cliente="Cliente Dois", grupo="1002", cota="56"))
@@ -660,3 +661,88 @@ def test_preview_basic_performance_with_200_rows(profile: CurrentProfile, fake_s
     assert preview.summary.erros > 0
     assert fake_sb.query_count < 1000
     assert elapsed < 2
+
+
+def test_preview_query_count_does_not_grow_with_rows(profile: CurrentProfile):
+    tables = {
+        "leads": [{"id": "lead-1", "org_id": "org-1", "nome": "Cliente 0"}],
+        "administradoras": [{"id": "adm-1", "org_id": "org-1", "nome": "Rodobens"}],
+        "grupos": [{"id": "grupo-1", "org_id": "org-1", "administradora_id": "adm-1", "codigo": "1001"}],
+        "cotas": [],
+        "contratos": [],
+        "contemplacoes": [],
+    }
+    counts = []
+    for total in (10, 200):
+        fake_sb = FakeSupabaseClient(tables)
+        raw_text = build_tsv(*[make_row(Cliente=f"Cliente {index}", cota=str(index)) for index in range(total)])
+        _, preview = service.build_import_preview(sb=fake_sb, profile=profile, raw_text=raw_text, produto_padrao="imobiliario")
+        counts.append(fake_sb.query_count)
+
+    assert counts[0] == counts[1]
+    assert preview.summary.clientes_encontrados == 1
+    assert preview.summary.grupos_a_criar == 0
+
+
+def test_confirm_inserts_each_table_in_bulk(profile: CurrentProfile, fake_sb: FakeSupabaseClient):
+    rows = [
+        make_row(
+            **{
+                "Cliente": f"Cliente {index}",
+                "grupo": f"G-{index % 3}",
+                "cota": str(index),
+                "Lance feito": "TRUE",
+                "TIPO DE LANCE": "FIXO",
+                "data ultimo lance": "10/09/2025",
+                "detalhes lance": "40%",
+                "CONTEMPLADA": "TRUE" if index % 2 else "",
+            }
+        )
+        for index in range(300)
+    ]
+
+    result = service.confirm_import(sb=fake_sb, profile=profile, raw_text=build_tsv(*rows), produto_padrao="imobiliario")
+
+    assert result.imported_rows == 300
+    assert result.failed_rows == 0
+    assert len(fake_sb.tables["leads"]) == 300
+    assert len(fake_sb.tables["carteira_clientes"]) == 300
+    assert len(fake_sb.tables["administradoras"]) == 1
+    assert len(fake_sb.tables["grupos"]) == 3
+    assert len(fake_sb.tables["cotas"]) == 300
+    assert len(fake_sb.tables["lances"]) == 300
+    assert len(fake_sb.tables["contemplacoes"]) == 150
+    assert fake_sb.query_count < 30
+    first = result.rows[0]
+    assert first.cota_id == fake_sb.tables["cotas"][0]["id"]
+    assert first.lead_id == fake_sb.tables["cotas"][0]["lead_id"]
+
+
+def test_confirm_failed_lead_insert_only_fails_its_rows(
+    profile: CurrentProfile,
+    fake_sb: FakeSupabaseClient,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    original_execute = FakeTableQuery.execute
+
+    def execute(self: FakeTableQuery):
+        payloads = self._payload if isinstance(self._payload, list) else [self._payload]
+        if self.table_name == "leads" and self._operation == "insert" and any(
+            payload.get("nome") == "Cliente Ruim" for payload in payloads
+        ):
+            raise RuntimeError("nome rejeitado")
+        return original_execute(self)
+
+    monkeypatch.setattr(FakeTableQuery, "execute", execute)
+    raw_text = build_tsv(
+        make_row(Cliente="Cliente Bom", cota="55"),
+        make_row(Cliente="Cliente Ruim", cota="56"),
+        make_row(Cliente="Cliente Ruim", cota="57"),
+    )
+
+    result = service.confirm_import(sb=fake_sb, profile=profile, raw_text=raw_text, produto_padrao="imobiliario")
+
+    assert result.imported_rows == 1
+    assert result.failed_rows == 2
+    assert [row.errors for row in result.rows if row.status == "erro"] == [["nome rejeitado"], ["nome rejeitado"]]
+    assert [row["numero_cota"] for row in fake_sb.tables["cotas"]] == ["55"]
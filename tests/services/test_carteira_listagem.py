@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import carteira_service as service
+
+ORG = "org-1"
+
+
+def tables() -> dict[str, list[dict]]:
+    carteira = []
+    leads = []
+    for i in range(1, 6):
+        leads.append({"id": f"lead-{i}", "org_id": ORG, "nome": f"Cliente {i}"})
+        carteira.append({
+            "id": f"cart-{i}",
+            "org_id": ORG,
+            "lead_id": f"lead-{i}",
+            "status": "ativo",
+            "origem_entrada": "manual",
+            # cart-2 e cart-3 empatam no entered_at: o id desempata
+            "entered_at": "2024-03-01" if i in (2, 3) else f"2024-0{i}-10",
+            "observacoes": None,
+            "leads": {"id": f"lead-{i}", "nome": f"Cliente {i}"},
+        })
+    return {
+        "leads": leads,
+        "carteira_clientes": carteira + [{
+            "id": "cart-outra", "org_id": "org-2", "lead_id": "lead-x", "status": "ativo",
+            "origem_entrada": "manual", "entered_at": "2024-09-01",
+        }],
+        "cotas": [
+            {"id": "cota-1a", "org_id": ORG, "lead_id": "lead-1", "administradora_id": "adm-1", "created_at": "2024-01-01"},
+            {"id": "cota-1b", "org_id": ORG, "lead_id": "lead-1", "administradora_id": "adm-2", "created_at": "2024-02-01"},
+            {"id": "cota-2", "org_id": ORG, "lead_id": "lead-2", "administradora_id": None, "created_at": "2024-01-05"},
+        ],
+        "contratos": [
+            {"id": "ct-old", "org_id": ORG, "cota_id": "cota-1b", "numero": "1", "created_at": "2024-02-02"},
+            {"id": "ct-new", "org_id": ORG, "cota_id": "cota-1b", "numero": "2", "created_at": "2024-02-10"},
+        ],
+        "administradoras": [
+            {"id": "adm-1", "org_id": ORG, "nome": "Adm 1"},
+            {"id": "adm-2", "org_id": ORG, "nome": "Adm 2"},
+        ],
+    }
+
+
+def test_enriquece_pagina_com_uma_consulta_por_tabela(fake_supabase):
+    db = fake_supabase(tables())
+
+    items, proximo, total = service.listar_carteira(db, ORG, limit=10)
+
+    assert proximo is None
+    assert total == 5
+    assert [item["carteira_id"] for item in items] == ["cart-5", "cart-4", "cart-3", "cart-2", "cart-1"]
+    cliente_1 = items[-1]
+    assert set(cliente_1) == {
+        "carteira_id", "lead_id", "status_carteira", "origem_entrada", "entered_at",
+        "observacoes", "lead", "cota", "contrato", "administradora",
+    }
+    assert cliente_1["cota"]["id"] == "cota-1b"
+    assert cliente_1["contrato"]["id"] == "ct-new"
+    assert cliente_1["administradora"]["nome"] == "Adm 2"
+    assert items[-2]["cota"]["id"] == "cota-2"
+    assert items[-2]["contrato"] is None and items[-2]["administradora"] is None
+    assert items[0]["cota"] is None
+    for tabela in ("carteira_clientes", "cotas", "contratos", "administradoras"):
+        assert db.count_calls(tabela, "select") == 1
+
+
+def test_cursor_percorre_a_carteira_sem_repetir(fake_supabase):
+    db = fake_supabase(tables())
+
+    vistos = []
+    totais = []
+    cursor = None
+    while True:
+        items, cursor, total = service.listar_carteira(db, ORG, limit=2, cursor=cursor)
+        vistos.extend(item["carteira_id"] for item in items)
+        totais.append(total)
+        if cursor is None:
+            break
+
+    assert vistos == ["cart-5", "cart-4", "cart-3", "cart-2", "cart-1"]
+    assert totais == [5, 5, 5]
+
+
+def test_sem_limit_devolve_a_carteira_inteira(fake_supabase, monkeypatch):
+    monkeypatch.setattr(service, "CARTEIRA_PAGE_MAX", 2)
+    db = fake_supabase(tables())
+
+    items, proximo, total = service.listar_carteira(db, ORG)
+
+    assert [item["carteira_id"] for item in items] == ["cart-5", "cart-4", "cart-3", "cart-2", "cart-1"]
+    assert (proximo, total) == (None, 5)
+    # lida em páginas, enriquecida de uma vez
+    assert db.count_calls("carteira_clientes", "select") == 3
+    assert db.count_calls("cotas", "select") == 1
+
+
+def test_busca_pagina_pelo_resultado_ordenado(fake_supabase):
+    db = fake_supabase(tables())
+    params = []
+
+    def busca(_db, rpc_params):
+        params.append(rpc_params)
+        return [
+            {"lead_id": "lead-2", "cota_id": "cota-2", "rank": 1.0},
+            {"lead_id": "lead-1", "cota_id": "cota-1b", "rank": 0.8},
+            {"lead_id": "lead-4", "cota_id": None, "rank": 0.3},
+        ]
+
+    db.rpc_handlers["busca_carteira"] = busca
+
+    primeira, cursor, total = service.listar_carteira(db, ORG, limit=2, q="cliente")
+    segunda, fim, _ = service.listar_carteira(db, ORG, limit=2, q="cliente", cursor=cursor)
+
+    assert total == 3
+    assert [item["lead_id"] for item in primeira] == ["lead-2", "lead-1"]
+    assert [item["lead_id"] for item in segunda] == ["lead-4"]
+    assert fim is None
+    # só leads da carteira entram no limite da busca
+    assert all(rpc_params["p_somente_carteira"] is True for rpc_params in params)
+
+
+def test_cursor_invalido(fake_supabase):
+    db = fake_supabase(tables())
+
+    with pytest.raises(HTTPException) as exc:
+        service.listar_carteira(db, ORG, cursor="nao-e-cursor")
+
+    assert exc.value.status_code == 400
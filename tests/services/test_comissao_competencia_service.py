@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from app.services import comissao_competencia_service as service
+
+ORG = "org-1"
+
+
+def base_tables() -> dict[str, list[dict]]:
+    competencias = [
+        {
+            "id": "comp-jan",
+            "org_id": ORG,
+            "contrato_id": "ctr-1",
+            "cota_id": "cota-1",
+            "competencia": "2024-01-01",
+            "gera_comissao": True,
+            "participou_assembleia": True,
+            "status": "elegivel_comissao",
+            "pagamento_id": "pag-1",
+            "payload": {"status_pagamento": "pago"},
+        },
+        {
+            "id": "comp-fev",
+            "org_id": ORG,
+            "contrato_id": "ctr-1",
+            "cota_id": "cota-1",
+            "competencia": "2024-02-01",
+            "gera_comissao": True,
+            "participou_assembleia": False,
+            "status": "paga_sem_assembleia",
+            "pagamento_id": "pag-2",
+            "payload": {"status_pagamento": "pago"},
+        },
+        {
+            "id": "comp-mar",
+            "org_id": ORG,
+            "contrato_id": "ctr-1",
+            "cota_id": "cota-1",
+            "competencia": "2024-03-01",
+            "gera_comissao": False,
+            "participou_assembleia": False,
+            "status": "aguardando_pagamento",
+            "pagamento_id": "pag-3",
+            "payload": {"status_pagamento": "previsto"},
+        },
+        {
+            "id": "comp-abr",
+            "org_id": ORG,
+            "contrato_id": "ctr-1",
+            "cota_id": "cota-1",
+            "competencia": "2024-04-01",
+            "gera_comissao": True,
+            "participou_assembleia": True,
+            "status": "elegivel_comissao",
+            "pagamento_id": "pag-4",
+            "payload": {"status_pagamento": "pago"},
+        },
+    ]
+    return {
+        "contratos": [{"id": "ctr-1", "org_id": ORG, "cota_id": "cota-1", "numero": "C-1", "status": "ativo"}],
+        "cotas": [
+            {
+                "id": "cota-1",
+                "org_id": ORG,
+                "valor_carta": "100000",
+                "data_adesao": "2024-01-10",
+                "assembleia_dia": 20,
+                "furo_meses": 0,
+            }
+        ],
+        "cota_comissao_config": [
+            {
+                "id": "cfg-1",
+                "org_id": ORG,
+                "cota_id": "cota-1",
+                "ativo": True,
+                "percentual_total": "5",
+                "primeira_competencia_regra": "mes_adesao",
+            }
+        ],
+        "cota_comissao_regras": [
+            {"id": "r1", "org_id": ORG, "cota_comissao_config_id": "cfg-1", "ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "percentual_comissao": "2"},
+            {"id": "r2", "org_id": ORG, "cota_comissao_config_id": "cfg-1", "ordem": 2, "tipo_evento": "proxima_cobranca", "offset_meses": 1, "percentual_comissao": "1.5"},
+            {"id": "r3", "org_id": ORG, "cota_comissao_config_id": "cfg-1", "ordem": 3, "tipo_evento": "proxima_cobranca", "offset_meses": 2, "percentual_comissao": "1.5"},
+        ],
+        "cota_comissao_parceiros": [
+            {
+                "id": "cp-1",
+                "org_id": ORG,
+                "cota_id": "cota-1",
+                "parceiro_id": "par-1",
+                "ativo": True,
+                "percentual_parceiro": "2",
+                "imposto_retido_pct": "10",
+                "created_at": "2024-01-01",
+            }
+        ],
+        "cota_pagamento_competencias": competencias,
+        "comissao_lancamentos": [
+            {
+                "id": "lanc-stale",
+                "org_id": ORG,
+                "contrato_id": "ctr-1",
+                "competencia_id": "comp-removida",
+                "origem_tipo": "pagamento_parcela",
+                "beneficiario_tipo": "empresa",
+                "parceiro_id": None,
+                "ordem": 9,
+                "status": "disponivel",
+                "repasse_status": "nao_aplicavel",
+                "valor_bruto": 10,
+            },
+            {
+                "id": "lanc-pago",
+                "org_id": ORG,
+                "contrato_id": "ctr-1",
+                "competencia_id": "comp-jan",
+                "regra_id": "r1",
+                "origem_tipo": "pagamento_parcela",
+                "beneficiario_tipo": "parceiro",
+                "parceiro_id": "par-1",
+                "ordem": 1,
+                "status": "disponivel",
+                "repasse_status": "pago",
+                "valor_bruto": 999,
+            },
+        ],
+    }
+
+
+def legacy_reprocess(db) -> None:
+    for comp in service.fetch_competencias_contrato(db, ORG, "ctr-1"):
+        service.processar_comissao_competencia(db, org_id=ORG, competencia_id=comp["id"])
+
+
+def snapshot(db) -> dict:
+    fields = (
+        "status",
+        "repasse_status",
+        "competencia_id",
+        "competencia_real",
+        "competencia_prevista",
+        "regra_id",
+        "observacoes",
+        "valor_bruto",
+        "valor_imposto",
+        "valor_liquido",
+    )
+    out = {}
+    for row in db.tables["comissao_lancamentos"]:
+        key = (row.get("ordem"), row.get("beneficiario_tipo"), row.get("parceiro_id"))
+        out[key] = {
+            field: (str(Decimal(str(row[field]))) if field.startswith("valor") and row.get(field) is not None else row.get(field))
+            for field in fields
+        }
+    return out
+
+
+def test_batch_engine_matches_per_competencia_processing(fake_supabase) -> None:
+    legacy = fake_supabase(base_tables())
+    legacy_reprocess(legacy)
+
+    batch = fake_supabase(base_tables())
+    result = service.reprocessar_comissoes_contrato(batch, org_id=ORG, contrato_id="ctr-1")
+
+    expected = snapshot(legacy)
+    actual = snapshot(batch)
+    stale = actual.pop((9, "empresa", None))
+    expected.pop((9, "empresa", None))
+    assert actual == expected
+    assert stale["status"] == "cancelado"
+    assert result["lancamentos_cancelados_sem_competencia"] == 1
+    assert [item["competencia_id"] for item in result["competencias_processadas"]] == [
+        "comp-jan",
+        "comp-fev",
+        "comp-mar",
+        "comp-abr",
+    ]
+    assert result["competencias_processadas"][3]["reason"] == "Nenhuma regra corresponde à competência"
+    # repasse já pago é preservado e auditado
+    assert actual[(1, "parceiro", "par-1")]["valor_bruto"] == "999"
+    assert any(row["action"] == "paid_repasse_conflict_preserved" for row in batch.tables["audit_logs"])
+
+
+def test_batch_engine_writes_in_bulk_and_is_idempotent(fake_supabase) -> None:
+    db = fake_supabase(base_tables())
+    service.reprocessar_comissoes_contrato(db, org_id=ORG, contrato_id="ctr-1")
+
+    writes = sum(db.count_calls("comissao_lancamentos", op) for op in ("insert", "update", "upsert"))
+    assert db.count_calls("comissao_lancamentos", "select") == 1
+    assert writes <= 4
+
+    db.calls.clear()
+    service.reprocessar_comissoes_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    assert sum(db.count_calls("comissao_lancamentos", op) for op in ("insert", "update", "upsert")) == 0
+
+
+def test_batch_insert_keeps_columns_absent_from_a_row(fake_supabase) -> None:
+    db = fake_supabase({})
+    store = service._LancamentosContrato([])
+    store.inserir({"org_id": ORG, "ordem": 1, "beneficiario_tipo": "empresa", "status": "previsto"})
+    store.inserir({"org_id": ORG, "ordem": 2, "beneficiario_tipo": "parceiro", "parceiro_id": "par-1"})
+    store.inserir({"org_id": ORG, "ordem": 3, "beneficiario_tipo": "empresa", "status": "previsto"})
+
+    service._gravar_lancamentos_em_lote(db, org_id=ORG, store=store)
+
+    parceiro = next(row for row in db.tables["comissao_lancamentos"] if row["ordem"] == 2)
+    assert "status" not in parceiro  # fica com o default do banco, não NULL
+    assert db.count_calls("comissao_lancamentos", "insert") == 2
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+from app.services import comissao_eventos_service as service
+
+ORG = "org-1"
+
+
+def _salvar_handler(db, params):
+    """Simula a RPC: grava o pagamento e coalesce no evento pendente."""
+    dados = dict(params["p_dados"])
+    pagamentos = db.tables.setdefault("pagamentos", [])
+    if params["p_pagamento_id"] is None:
+        pagamento = {**dados, "id": str(uuid4())}
+        pagamentos.append(pagamento)
+    else:
+        pagamento = next(row for row in pagamentos if row["id"] == params["p_pagamento_id"])
+        pagamento.update(dados)
+    eventos = db.tables.setdefault("comissao_eventos", [])
+    now = datetime.now(timezone.utc).isoformat()
+    evento = next(
+        (row for row in eventos if row["pagamento_id"] == pagamento["id"] and row["status"] == "pendente"),
+        None,
+    )
+    if evento:
+        evento.update({"versao": evento["versao"] + 1, "updated_at": now, "disponivel_em": now})
+    else:
+        evento = {
+            "id": str(uuid4()),
+            "org_id": params["p_org_id"],
+            "pagamento_id": pagamento["id"],
+            "actor_id": params["p_actor_id"],
+            "status": "pendente",
+            "versao": 1,
+            "tentativas": 0,
+            "max_tentativas": 3,
+            "disponivel_em": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        eventos.append(evento)
+    return {"pagamento": dict(pagamento), "evento": dict(evento)}
+
+
+def _db(fake_supabase):
+    db = fake_supabase({"pagamentos": [], "comissao_eventos": []})
+    db.rpc_handlers[service.SALVAR_RPC] = _salvar_handler
+    return db
+
+
+def test_salvar_enfileira_sem_processar_e_coalesce(fake_supabase, monkeypatch) -> None:
+    chamadas = []
+    monkeypatch.setattr(
+        service.comissao_competencia_service,
+        "processar_pagamento_para_comissao",
+        lambda supa, **kwargs: chamadas.append(kwargs) or {"competencia": {"id": "comp-1"}, "processamento": {"processed": True, "total_itens": 2}},
+    )
+    db = _db(fake_supabase)
+
+    saved = service.salvar_pagamento_com_evento(
+        db, org_id=ORG, pagamento_id=None, dados={"org_id": ORG, "valor": "10.00"}, actor_id="u1"
+    )
+    pagamento_id = saved["pagamento"]["id"]
+    assert saved["processamento"]["status"] == "pendente"
+    assert chamadas == []
+
+    service.salvar_pagamento_com_evento(
+        db, org_id=ORG, pagamento_id=pagamento_id, dados={"org_id": ORG, "valor": "12.00"}, actor_id="u1"
+    )
+    assert len(db.tables["comissao_eventos"]) == 1
+    assert db.tables["comissao_eventos"][0]["versao"] == 2
+
+    result = service.processar_eventos(db)
+    assert result == {"processed": 1, "concluido": 1}
+    assert len(chamadas) == 1
+
+    status = service.status_processamento_pagamento(db, org_id=ORG, pagamento_id=pagamento_id)
+    assert status["processamento"]["status"] == "concluido"
+    assert status["processamento"]["resultado"]["competencia_id"] == "comp-1"
+    assert status["processamento"]["resultado"]["total_itens"] == 2
+
+    assert service.processar_eventos(db) == {"processed": 0}
+
+
+def test_erro_transitorio_reagenda_com_backoff_ate_falhar(fake_supabase, monkeypatch) -> None:
+    def explode(supa, **kwargs):
+        raise RuntimeError("timeout")
+
+    monkeypatch.setattr(service.comissao_competencia_service, "processar_pagamento_para_comissao", explode)
+    db = _db(fake_supabase)
+    saved = service.salvar_pagamento_com_evento(db, org_id=ORG, pagamento_id=None, dados={"org_id": ORG})
+    evento = db.tables["comissao_eventos"][0]
+
+    assert service.processar_eventos(db) == {"processed": 1, "reagendado": 1}
+    assert evento["status"] == "pendente"
+    assert evento["tentativas"] == 1
+    assert evento["erro"] == "timeout"
+    assert evento["disponivel_em"] > datetime.now(timezone.utc).isoformat()
+    # ainda no backoff: não é pego de novo
+    assert service.processar_eventos(db) == {"processed": 0}
+
+    for _ in range(2):
+        evento["disponivel_em"] = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+        service.processar_eventos(db)
+    assert evento["status"] == "falhou"
+    assert evento["tentativas"] == 3
+    status = service.status_processamento_pagamento(db, org_id=ORG, pagamento_id=saved["pagamento"]["id"])
+    assert status["processamento"]["erro"] == "timeout"
+
+
+def test_erro_de_dado_falha_sem_retentativa(fake_supabase, monkeypatch) -> None:
+    def invalido(supa, **kwargs):
+        raise HTTPException(400, "Competência inválida")
+
+    monkeypatch.setattr(service.comissao_competencia_service, "processar_pagamento_para_comissao", invalido)
+    db = _db(fake_supabase)
+    service.salvar_pagamento_com_evento(db, org_id=ORG, pagamento_id=None, dados={"org_id": ORG})
+
+    assert service.processar_eventos(db) == {"processed": 1, "falhou": 1}
+    assert db.tables["comissao_eventos"][0]["erro"] == "Competência inválida"
+
+
+def test_evento_abandonado_em_processando_e_retomado(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(
+        service.comissao_competencia_service,
+        "processar_pagamento_para_comissao",
+        lambda supa, **kwargs: {"competencia": {"id": "comp-1"}, "processamento": {"processed": True}},
+    )
+    antigo = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    db = fake_supabase(
+        {
+            "comissao_eventos": [
+                {
+                    "id": "ev-1",
+                    "org_id": ORG,
+                    "pagamento_id": "pag-1",
+                    "status": "processando",
+                    "versao": 1,
+                    "tentativas": 1,
+                    "max_tentativas": 5,
+                    "disponivel_em": antigo,
+                    "updated_at": antigo,
+                }
+            ]
+        }
+    )
+
+    assert service.processar_eventos(db) == {"processed": 1, "concluido": 1}
+    assert db.tables["comissao_eventos"][0]["tentativas"] == 2
+
+
+def test_reivindicacao_e_condicional_em_versao_e_tentativas(fake_supabase) -> None:
+    db = _db(fake_supabase)
+    saved = service.salvar_pagamento_com_evento(db, org_id=ORG, pagamento_id=None, dados={"org_id": ORG})
+    lido_a = dict(db.tables["comissao_eventos"][0])
+    lido_b = dict(lido_a)
+
+    # salvamento coalescido depois da leitura: a versão lida ficou velha
+    service.salvar_pagamento_com_evento(db, org_id=ORG, pagamento_id=saved["pagamento"]["id"], dados={"org_id": ORG})
+    assert service._reivindicar(db, lido_a) is None
+
+    atual = dict(db.tables["comissao_eventos"][0])
+    assert service._reivindicar(db, atual)["status"] == "processando"
+    # o segundo worker leu a mesma linha, mas perdeu a corrida
+    assert service._reivindicar(db, dict(atual)) is None
+    assert service._reivindicar(db, lido_b) is None
+    assert db.tables["comissao_eventos"][0]["tentativas"] == 1
+
+
+def test_sem_migration_volta_ao_processamento_sincrono(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(
+        service.comissao_competencia_service,
+        "processar_pagamento_para_comissao",
+        lambda supa, **kwargs: {"competencia": {"id": "comp-1"}, "processamento": {"processed": True}},
+    )
+    db = fake_supabase({"pagamentos": []})
+
+    def ausente(db, params):
+        raise APIError({"message": "Could not find the function public.salvar_pagamento_com_evento", "code": "PGRST202"})
+
+    db.rpc_handlers[service.SALVAR_RPC] = ausente
+
+    saved = service.salvar_pagamento_com_evento(db, org_id=ORG, pagamento_id=None, dados={"org_id": ORG})
+    assert saved["processamento"]["status"] == "concluido"
+    assert saved["processamento"]["sincrono"] is True
+    assert len(db.tables["pagamentos"]) == 1
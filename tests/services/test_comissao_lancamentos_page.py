@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import comissao_service as service
+
+ORG = "org-1"
+
+
+def ledger() -> list[dict]:
+    rows = []
+    competencias = ["2024-02-01", "2024-01-01", None, "2024-01-01", "2024-03-01", None, "2024-02-01"]
+    for idx, competencia in enumerate(competencias):
+        rows.append(
+            {
+                "id": f"l-{idx:02d}",
+                "org_id": ORG,
+                "contrato_id": "ctr-1" if idx % 2 else "ctr-2",
+                "cota_id": "cota-1",
+                "beneficiario_tipo": "parceiro",
+                "parceiro_id": "par-1",
+                "ordem": idx + 1,
+                "competencia_prevista": competencia,
+                "status": "previsto" if idx % 3 else "disponivel",
+                "repasse_status": "pendente" if idx % 3 else "pago",
+                "valor_bruto": "100.005",
+                "valor_imposto": "10",
+                "valor_liquido": "90.005",
+            }
+        )
+    return rows
+
+
+def ordered_ids(rows: list[dict]) -> list[str]:
+    return [row["id"] for row in sorted(rows, key=lambda r: (r["competencia_prevista"] is None, r["competencia_prevista"] or "", r["id"]))]
+
+
+def test_keyset_pages_cover_ledger_once_in_order(fake_supabase) -> None:
+    db = fake_supabase({"comissao_lancamentos": ledger()})
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = service.fetch_lancamentos_page(db, ORG, limit=2, cursor=cursor)
+        seen.extend(row["id"] for row in rows)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert seen == ordered_ids(ledger())
+    assert pages == 4
+
+    rows, cursor = service.fetch_lancamentos_page(db, ORG, limit=10, contrato_id="ctr-1")
+    assert [row["id"] for row in rows] == ordered_ids([r for r in ledger() if r["contrato_id"] == "ctr-1"])
+    assert cursor is None
+
+    with pytest.raises(HTTPException):
+        service.fetch_lancamentos_page(db, ORG, cursor="nao-e-cursor")
+
+
+def test_totais_cover_whole_filter_not_only_page(fake_supabase) -> None:
+    db = fake_supabase({"comissao_lancamentos": ledger()})
+
+    def rpc_totais(database, params):
+        rows = [r for r in database.tables["comissao_lancamentos"] if r["contrato_id"] == params["p_contrato_id"]]
+        return service._grupos_de_lancamentos(rows)
+
+    db.rpc_handlers[service.LANCAMENTOS_TOTAIS_RPC] = rpc_totais
+
+    totais = service.totais_lancamentos(db, ORG, contrato_id="ctr-1")
+    esperado = service.summarize_lancamentos([r for r in ledger() if r["contrato_id"] == "ctr-1"])
+
+    assert totais["resumo"] == esperado
+    assert totais["por_repasse_status"]["pendente"]["quantidade"] == 2
+    assert totais["por_status"]["disponivel"] == {"quantidade": 1, "valor_bruto": "100.01", "valor_liquido": "90.01"}
+    assert db.count_calls(service.LANCAMENTOS_TOTAIS_RPC, "rpc") == 1
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services import comissao_reprocessamento_service as service
+
+ORG = "org-1"
+
+
+def base_tables() -> dict[str, list[dict]]:
+    return {
+        "contratos": [
+            {"id": "ctr-1", "org_id": ORG, "cota_id": "cota-1"},
+            {"id": "ctr-2", "org_id": ORG, "cota_id": "cota-2"},
+            {"id": "ctr-3", "org_id": ORG, "cota_id": "cota-3"},
+        ],
+        "cota_comissao_config": [
+            {"id": "cfg-1", "org_id": ORG, "cota_id": "cota-1", "percentual_total": "5", "ativo": True},
+            {"id": "cfg-2", "org_id": ORG, "cota_id": "cota-2", "percentual_total": "4", "ativo": True},
+            {"id": "cfg-3", "org_id": ORG, "cota_id": "cota-3", "percentual_total": "4", "ativo": True},
+        ],
+        "cota_comissao_regras": [
+            {"org_id": ORG, "cota_comissao_config_id": "cfg-1", "ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "percentual_comissao": "2.5"},
+            {"org_id": ORG, "cota_comissao_config_id": "cfg-1", "ordem": 2, "tipo_evento": "proxima_cobranca", "offset_meses": 1, "percentual_comissao": "2.5"},
+            {"org_id": ORG, "cota_comissao_config_id": "cfg-2", "ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "percentual_comissao": "2"},
+            {"org_id": ORG, "cota_comissao_config_id": "cfg-2", "ordem": 2, "tipo_evento": "proxima_cobranca", "offset_meses": 1, "percentual_comissao": "2"},
+            {"org_id": ORG, "cota_comissao_config_id": "cfg-3", "ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "percentual_comissao": "4"},
+        ],
+        "cota_comissao_parceiros": [
+            {"org_id": ORG, "cota_id": "cota-3", "parceiro_id": "par-1"},
+        ],
+        "comissao_modelos": [
+            {
+                "id": "mod-1",
+                "org_id": ORG,
+                "percentual_total": 5,
+                "regras": [
+                    {"ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "proporcao": 50},
+                    {"ordem": 2, "tipo_evento": "proxima_cobranca", "offset_meses": 1, "proporcao": 50},
+                ],
+            }
+        ],
+    }
+
+
+def test_resolve_contratos_por_modelo_parceiro_e_org(fake_supabase) -> None:
+    db = fake_supabase(base_tables())
+
+    # cfg-2 usa outro total, mas mantém as proporções 50/50 do modelo
+    assert service.resolver_contratos_afetados(db, ORG, {"escopo": "modelo", "modelo_id": "mod-1"}) == ["ctr-1", "ctr-2"]
+    assert service.resolver_contratos_afetados(db, ORG, {"escopo": "parceiros", "parceiro_ids": ["par-1"]}) == ["ctr-3"]
+    assert sorted(service.resolver_contratos_afetados(db, ORG, {"escopo": "todos"})) == ["ctr-1", "ctr-2", "ctr-3"]
+
+
+def test_contratos_de_outra_org_sao_recusados(fake_supabase) -> None:
+    tables = base_tables()
+    tables["contratos"].append({"id": "ctr-9", "org_id": "org-2", "cota_id": "cota-9"})
+    db = fake_supabase(tables)
+
+    filtro = {"escopo": "contratos", "contrato_ids": ["ctr-2", "ctr-1", "ctr-2"]}
+    assert service.resolver_contratos_afetados(db, ORG, filtro) == ["ctr-2", "ctr-1"]
+
+    with pytest.raises(service.HTTPException) as exc:
+        service.iniciar_reprocessamento(db, org_id=ORG, filtro={"escopo": "contratos", "contrato_ids": ["ctr-1", "ctr-9"]})
+    assert exc.value.status_code == 404
+    assert db.tables.get(service.JOBS_TABLE, []) == []
+
+
+def test_job_registra_erros_e_retoma_apenas_falhas(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase(base_tables())
+    chamadas: list[str] = []
+    falhar = {"ctr-2"}
+
+    def fake_reprocessar(_supa, *, org_id, contrato_id, actor_id=None):
+        chamadas.append(contrato_id)
+        if contrato_id in falhar:
+            raise RuntimeError("falha simulada")
+        return {"ok": True}
+
+    monkeypatch.setattr(service.comissao_competencia_service, "reprocessar_comissoes_contrato", fake_reprocessar)
+
+    job = service.iniciar_reprocessamento(db, org_id=ORG, filtro={"escopo": "todos"}, actor_id="user-1")
+    service.aguardar(job["id"], timeout=5)
+
+    status = service.status_reprocessamento(db, org_id=ORG, job_id=job["id"])
+    assert status["item"]["status"] == "concluido_com_erros"
+    assert (status["item"]["total"], status["item"]["processados"], status["item"]["erros"]) == (3, 3, 1)
+    assert [(item["contrato_id"], item["erro"]) for item in status["erros"]] == [("ctr-2", "falha simulada")]
+
+    # sem incluir_erros não há pendentes: nada é reexecutado
+    chamadas.clear()
+    service.retomar_reprocessamento(db, org_id=ORG, job_id=job["id"])
+    service.aguardar(job["id"], timeout=5)
+    assert chamadas == []
+
+    falhar.clear()
+    service.retomar_reprocessamento(db, org_id=ORG, job_id=job["id"], incluir_erros=True)
+    service.aguardar(job["id"], timeout=5)
+    assert chamadas == ["ctr-2"]
+
+    status = service.status_reprocessamento(db, org_id=ORG, job_id=job["id"])
+    assert status["item"]["status"] == "concluido"
+    assert (status["item"]["processados"], status["item"]["erros"]) == (3, 0)
+    assert status["percentual"] == 100.0
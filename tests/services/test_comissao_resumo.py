@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from app.core import supabase_lote
+from app.services import comissao_service as service
+
+ORG = "org-1"
+
+PARCEIROS = {"par-1": {"nome": "Ana"}, "par-2": {"nome": "Bruno"}}
+COTAS = {
+    "cota-1": {"status": "ativa", "valor_carta": "100000", "data_adesao": "2024-01-10"},
+    "cota-2": {"status": "cancelada", "valor_carta": "50000", "data_adesao": "2024-03-05"},
+    "cota-3": {"status": "ativa", "valor_carta": "80000", "data_adesao": "2023-11-20"},
+}
+
+
+def lanc(cota_id, beneficiario, parceiro_id, competencia, status, repasse, bruto, imposto=0):
+    return {
+        "org_id": ORG,
+        "cota_id": cota_id,
+        "beneficiario_tipo": beneficiario,
+        "parceiro_id": parceiro_id,
+        "competencia_prevista": competencia,
+        "status": status,
+        "repasse_status": repasse,
+        "valor_bruto": bruto,
+        "valor_imposto": imposto,
+        "valor_liquido": bruto - imposto,
+        # embeds que o PostgREST devolveria no select do ranking
+        "parceiros_corretores": PARCEIROS.get(parceiro_id),
+        "cotas": COTAS[cota_id],
+    }
+
+
+LANCAMENTOS = [
+    lanc("cota-1", "empresa", None, "2024-01-01", "disponivel", "nao_aplicavel", 2000),
+    lanc("cota-1", "parceiro", "par-1", "2024-01-01", "disponivel", "pago", 800, 80),
+    lanc("cota-1", "parceiro", "par-1", "2024-02-01", "previsto", "pendente", 600, 60),
+    lanc("cota-2", "parceiro", "par-1", "2024-03-01", "previsto", "pendente", 400, 40),
+    lanc("cota-2", "parceiro", "par-1", None, "previsto", "pendente", 100, 10),
+    lanc("cota-3", "parceiro", "par-2", "2023-12-01", "disponivel", "pago", 300, 30),
+    lanc("cota-3", "parceiro", "par-2", "2024-02-01", "cancelado", "cancelado", 300, 30),
+]
+
+
+def rollups(lancamentos: list[dict]) -> dict[str, list[dict]]:
+    """Espelho em Python do trigger da migration 010 (a cota faz o papel do contrato na fatia)."""
+    mensal: dict[tuple, dict] = {}
+    cotas: dict[tuple, dict] = {}
+    for row in lancamentos:
+        key = (
+            row["beneficiario_tipo"],
+            row["parceiro_id"],
+            row["competencia_prevista"],
+            row["status"],
+            row["repasse_status"],
+            row["cota_id"],
+        )
+        acc = mensal.setdefault(
+            key,
+            {
+                "org_id": ORG,
+                "beneficiario_tipo": key[0],
+                "parceiro_id": key[1],
+                "competencia": key[2],
+                "status": key[3],
+                "repasse_status": key[4],
+                "fatia": key[5],
+                "quantidade": 0,
+                "valor_bruto": Decimal("0"),
+                "valor_imposto": Decimal("0"),
+                "valor_liquido": Decimal("0"),
+            },
+        )
+        acc["quantidade"] += 1
+        for field in ("valor_bruto", "valor_imposto", "valor_liquido"):
+            acc[field] += Decimal(str(row[field]))
+        if row["beneficiario_tipo"] == "parceiro" and row["parceiro_id"]:
+            item = cotas.setdefault(
+                (row["parceiro_id"], row["cota_id"]),
+                {
+                    "org_id": ORG,
+                    "parceiro_id": row["parceiro_id"],
+                    "cota_id": row["cota_id"],
+                    "lancamentos": 0,
+                    "parceiros_corretores": row["parceiros_corretores"],
+                    "cotas": row["cotas"],
+                },
+            )
+            item["lancamentos"] += 1
+    return {
+        service.RESUMO_MENSAL_TABLE: [
+            {**row, "id": f"rm-{i:03d}", **{k: str(v) for k, v in row.items() if k.startswith("valor")}}
+            for i, row in enumerate(mensal.values())
+        ],
+        service.PARCEIRO_COTAS_TABLE: [{**row, "id": f"pc-{i:03d}"} for i, row in enumerate(cotas.values())],
+    }
+
+
+def test_ranking_from_rollups_matches_ledger(fake_supabase) -> None:
+    db = fake_supabase({"comissao_lancamentos": LANCAMENTOS, **rollups(LANCAMENTOS)})
+
+    for periodo in [(None, None), (date(2024, 1, 1), date(2024, 2, 29)), (date(2024, 3, 1), None)]:
+        db.calls.clear()
+        expected = service._parceiros_ranking_ledger(db, ORG, *periodo)
+        actual = service.parceiros_ranking(db, ORG, *periodo)
+        assert actual == expected
+        assert db.count_calls("comissao_lancamentos") == 1  # só a chamada do ledger acima
+
+    ana = service.parceiros_ranking(db, ORG)[0]
+    assert (ana["nome"], ana["repasse_pago"], ana["repasse_pendente"], ana["taxa_cancelamento"]) == ("Ana", "720.00", "900.00", "50.0")
+
+
+def test_resumo_from_rollups_matches_summarize(fake_supabase) -> None:
+    db = fake_supabase({"comissao_lancamentos": LANCAMENTOS, **rollups(LANCAMENTOS)})
+
+    def filtrar(rows, parceiro_id=None, repasse_status=None, competencia_de=None, competencia_ate=None):
+        out = []
+        for row in rows:
+            comp = row["competencia_prevista"]
+            if parceiro_id and row["parceiro_id"] != parceiro_id:
+                continue
+            if repasse_status and row["repasse_status"] != repasse_status:
+                continue
+            if competencia_de and (comp is None or comp < competencia_de.isoformat()):
+                continue
+            if competencia_ate and (comp is None or comp > competencia_ate.isoformat()):
+                continue
+            out.append(row)
+        return out
+
+    cenarios = [
+        {},
+        {"parceiro_id": "par-1"},
+        {"repasse_status": "pendente"},
+        {"competencia_de": date(2024, 1, 1), "competencia_ate": date(2024, 2, 1)},
+    ]
+    for filtros in cenarios:
+        db.calls.clear()
+        esperado = service.summarize_lancamentos(filtrar(LANCAMENTOS, **filtros))
+        assert service.totais_lancamentos(db, ORG, **filtros)["resumo"] == esperado
+        assert db.count_calls("comissao_lancamentos") == 0
+
+
+def test_agregados_lidos_em_paginas(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase({"comissao_lancamentos": LANCAMENTOS, **rollups(LANCAMENTOS)})
+    esperado_ranking = service.parceiros_ranking(db, ORG)
+    esperado_resumo = service.totais_lancamentos(db, ORG)["resumo"]
+    monkeypatch.setattr(supabase_lote, "PAGE_SIZE", 2)
+    db.calls.clear()
+
+    assert service.parceiros_ranking(db, ORG) == esperado_ranking
+    assert service.totais_lancamentos(db, ORG)["resumo"] == esperado_resumo
+    # páginas curtas: nada fica de fora por causa do max-rows
+    assert db.count_calls(service.RESUMO_MENSAL_TABLE, "select") > 2
+    assert db.count_calls(service.PARCEIRO_COTAS_TABLE, "select") > 1
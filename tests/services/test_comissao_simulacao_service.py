@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from app.schemas.comissoes import ComissaoSimulacaoIn
+from app.services import comissao_simulacao_service as service
+
+ORG = "org-1"
+
+
+def carteira(n_cotas: int = 1) -> dict[str, list[dict]]:
+    tables: dict[str, list[dict]] = {
+        "cotas": [],
+        "contratos": [],
+        "cota_comissao_config": [],
+        "cota_comissao_regras": [],
+        "cota_comissao_parceiros": [],
+        "parceiros_corretores": [{"id": "par-1", "org_id": ORG, "nome": "Parceiro Um"}],
+    }
+    for i in range(1, n_cotas + 1):
+        tables["cotas"].append(
+            {
+                "id": f"cota-{i}",
+                "org_id": ORG,
+                "status": "ativa",
+                "valor_carta": "100000",
+                "data_adesao": "2024-01-10",
+                "assembleia_dia": 20,
+                "furo_meses": 0,
+            }
+        )
+        tables["contratos"].append({"id": f"ctr-{i}", "org_id": ORG, "cota_id": f"cota-{i}"})
+        tables["cota_comissao_config"].append(
+            {
+                "id": f"cfg-{i}",
+                "org_id": ORG,
+                "cota_id": f"cota-{i}",
+                "ativo": True,
+                "percentual_total": "5",
+                "primeira_competencia_regra": "mes_adesao",
+            }
+        )
+        for ordem, tipo, offset, pct in (
+            (1, "adesao", 0, "2"),
+            (2, "proxima_cobranca", 1, "1.5"),
+            (3, "proxima_cobranca", 2, "1.5"),
+        ):
+            tables["cota_comissao_regras"].append(
+                {
+                    "id": f"r{ordem}-{i}",
+                    "org_id": ORG,
+                    "cota_comissao_config_id": f"cfg-{i}",
+                    "ordem": ordem,
+                    "tipo_evento": tipo,
+                    "offset_meses": offset,
+                    "percentual_comissao": pct,
+                }
+            )
+        tables["cota_comissao_parceiros"].append(
+            {
+                "id": f"cp-{i}",
+                "org_id": ORG,
+                "cota_id": f"cota-{i}",
+                "parceiro_id": "par-1",
+                "ativo": True,
+                "percentual_parceiro": "2",
+                "imposto_retido_pct": "10",
+                "created_at": "2024-01-01",
+            }
+        )
+    return tables
+
+
+def _beneficiario(result: dict, tipo: str) -> dict:
+    return next(item for item in result["beneficiarios"] if item["beneficiario_tipo"] == tipo)
+
+
+def test_simula_mudanca_de_percentual_do_parceiro(fake_supabase) -> None:
+    db = fake_supabase(carteira())
+    body = ComissaoSimulacaoIn(parceiros=[{"parceiro_id": "par-1", "percentual_parceiro": "1"}])
+
+    result = service.simular_comissoes(db, ORG, body)
+
+    parceiro = _beneficiario(result, "parceiro")
+    assert parceiro["nome"] == "Parceiro Um"
+    assert [mes["competencia"] for mes in parceiro["meses"]] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    jan = parceiro["meses"][0]
+    assert jan["atual"] == {"valor_bruto": "800.00", "valor_imposto": "80.00", "valor_liquido": "720.00"}
+    assert jan["proposto"] == {"valor_bruto": "400.00", "valor_imposto": "40.00", "valor_liquido": "360.00"}
+    assert jan["diferenca"]["valor_bruto"] == "-400.00"
+    assert parceiro["total"]["atual"]["valor_bruto"] == "2000.00"
+
+    empresa = _beneficiario(result, "empresa")
+    assert empresa["meses"][0]["atual"]["valor_bruto"] == "1200.00"
+    assert empresa["meses"][0]["proposto"]["valor_bruto"] == "1600.00"
+    # o caixa total do mês não muda: só a divisão empresa/parceiro
+    assert result["meses"][0]["diferenca"]["valor_bruto"] == "0.00"
+    assert result["resumo"]["cotas_avaliadas"] == 1
+    assert result["resumo"]["cotas_alteradas"] == 1
+    assert db.calls and all(op == "select" for _, op in db.calls)
+
+
+def test_simula_novas_parcelas_e_filtra_periodo(fake_supabase) -> None:
+    db = fake_supabase(carteira())
+    body = ComissaoSimulacaoIn(
+        regras=[{"ordem": 1, "tipo_evento": "adesao", "offset_meses": 0, "proporcao": "100"}],
+        competencia_ate="2024-02-01",
+    )
+
+    result = service.simular_comissoes(db, ORG, body)
+
+    assert [mes["competencia"] for mes in result["meses"]] == ["2024-01-01", "2024-02-01"]
+    jan, fev = result["meses"]
+    assert jan["atual"]["valor_bruto"] == "2000.00"
+    assert jan["proposto"]["valor_bruto"] == "5000.00"
+    assert fev["proposto"]["valor_bruto"] == "0.00"
+    assert fev["diferenca"]["valor_bruto"] == "-1500.00"
+    parceiro = _beneficiario(result, "parceiro")
+    assert parceiro["meses"][0]["proposto"]["valor_imposto"] == "200.00"
+
+
+def test_carrega_a_carteira_em_lote(fake_supabase) -> None:
+    db = fake_supabase(carteira(n_cotas=30))
+    db.tables["cotas"][0]["status"] = "cancelada"
+    db.tables["contratos"].pop()
+
+    result = service.simular_comissoes(db, ORG, ComissaoSimulacaoIn(percentual_total="6"))
+
+    assert result["resumo"]["cotas_avaliadas"] == 28
+    assert result["resumo"]["cotas_inativas"] == 1
+    assert result["resumo"]["cotas_sem_contrato"] == 1
+    for table in ("cotas", "contratos", "cota_comissao_regras", "cota_comissao_parceiros"):
+        assert db.count_calls(table, "select") == 1
+    jan = result["meses"][0]
+    assert jan["atual"]["valor_bruto"] == str(28 * 2000) + ".00"
+    assert jan["proposto"]["valor_bruto"] == str(28 * 2400) + ".00"
+
+
+def test_filtra_cotas_na_consulta_das_configs(fake_supabase) -> None:
+    db = fake_supabase(carteira(n_cotas=3))
+    db.tables["cota_comissao_config"][1]["ativo"] = False
+    consultas = []
+    table_original = db.table
+
+    def table(name):
+        query = table_original(name)
+        if name == "cota_comissao_config":
+            consultas.append(query)
+        return query
+
+    db.table = table
+
+    result = service.simular_comissoes(
+        db, ORG, ComissaoSimulacaoIn(cota_ids=["cota-1", "cota-2"], percentual_total="6")
+    )
+
+    assert result["resumo"]["cotas_avaliadas"] == 1
+    assert [query.filters for query in consultas] == [
+        [("eq", "org_id", ORG), ("in", "cota_id", ["cota-1", "cota-2"]), ("eq", "ativo", True)]
+    ]
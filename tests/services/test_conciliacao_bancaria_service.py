@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from app.services import conciliacao_bancaria_service as service
+
+ORG = "org-1"
+
+
+def _campo(linha: list[str], inicio: int, valor: str) -> None:
+    """Grava `valor` a partir da posição `inicio` (1-based, como no layout)."""
+    linha[inicio - 1:inicio - 1 + len(valor)] = list(valor)
+
+
+def cnab240(titulos: list[dict]) -> bytes:
+    linhas = ["0" * 240]
+    for titulo in titulos:
+        t = [" "] * 240
+        _campo(t, 8, "3")
+        _campo(t, 14, "T")
+        _campo(t, 16, titulo.get("movimento", "06"))
+        _campo(t, 38, titulo.get("nosso_numero", "NN1").ljust(20))
+        _campo(t, 59, titulo["documento"].rjust(15, "0"))
+        _campo(t, 74, titulo["vencimento"])
+        _campo(t, 82, str(titulo["valor_centavos"]).rjust(15, "0"))
+        u = [" "] * 240
+        _campo(u, 8, "3")
+        _campo(u, 14, "U")
+        _campo(u, 78, str(titulo.get("pago_centavos", titulo["valor_centavos"])).rjust(15, "0"))
+        _campo(u, 146, titulo.get("credito", "12032024"))
+        linhas.extend(["".join(t), "".join(u)])
+    linhas.append("9" * 240)
+    return ("\r\n".join(linhas) + "\r\n").encode("latin-1")
+
+
+def cnab400(documento: str, vencimento: str, valor_centavos: int) -> bytes:
+    header = "0" + " " * 399
+    d = [" "] * 400
+    _campo(d, 1, "1")
+    _campo(d, 109, "06")
+    _campo(d, 111, "110324")
+    _campo(d, 117, documento.ljust(10))
+    _campo(d, 147, vencimento)
+    _campo(d, 153, str(valor_centavos).rjust(13, "0"))
+    _campo(d, 254, str(valor_centavos).rjust(13, "0"))
+    _campo(d, 296, "120324")
+    return "\n".join([header, "".join(d), "9" * 400]).encode("latin-1")
+
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240318120000[-3:BRT]
+<TRNAMT>1500.00
+<FITID>abc-1
+<MEMO>PIX RECEBIDO CTR-200 MARIA
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240318
+<TRNAMT>-80.00
+<FITID>abc-2
+<MEMO>TARIFA
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "contratos": [
+            {"id": "ctr-1", "org_id": ORG, "numero": "100"},
+            {"id": "ctr-2", "org_id": ORG, "numero": "CTR-200"},
+        ],
+        "pagamentos": [
+            {"id": "p-1", "org_id": ORG, "contrato_id": "ctr-1", "tipo": "parcela_mensal", "status": "previsto",
+             "competencia": "2024-03-01", "vencimento": "2024-03-10", "valor": "1000.00"},
+            {"id": "p-2", "org_id": ORG, "contrato_id": "ctr-1", "tipo": "parcela_mensal", "status": "previsto",
+             "competencia": "2024-04-01", "vencimento": "2024-04-10", "valor": "1000.00"},
+            {"id": "p-3", "org_id": ORG, "contrato_id": "ctr-1", "tipo": "parcela_mensal", "status": "pago",
+             "competencia": "2024-02-01", "vencimento": "2024-02-10", "valor": "1000.00"},
+            {"id": "p-4", "org_id": ORG, "contrato_id": "ctr-2", "tipo": "parcela_mensal", "status": "inadimplente",
+             "competencia": "2024-03-01", "vencimento": "2024-03-15", "valor": "1500.00"},
+        ],
+        "conciliacao_jobs": [],
+    }
+
+
+def test_cnab240_concilia_por_contrato_valor_e_vencimento(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    arquivo = cnab240(
+        [
+            {"documento": "100", "vencimento": "10032024", "valor_centavos": 100000},
+            # mesmo contrato/valor sem vencimento igual: fica com a parcela ainda livre mais próxima
+            {"documento": "100", "vencimento": "05042024", "valor_centavos": 100000},
+            {"documento": "999", "vencimento": "10032024", "valor_centavos": 100000},
+            {"documento": "100", "vencimento": "10032024", "valor_centavos": 100000, "movimento": "02"},
+        ]
+    )
+
+    result = service.previa_conciliacao(db, org_id=ORG, stream=io.BytesIO(arquivo))
+
+    assert result["formato"] == "cnab240"
+    assert [(p["pagamento_id"], p["confianca"]) for p in result["propostas"]] == [
+        ("p-1", "exata"),
+        ("p-2", "provavel"),
+    ]
+    assert result["propostas"][0]["data_pagamento"] == "2024-03-12"
+    assert result["totais"]["sem_contrato"] == 1
+    assert result["totais"]["ignoradas"] == 1
+    assert result["totais"]["parcelas_abertas"] == 3
+    assert all(op == "select" for _, op in db.calls)
+
+
+def test_cnab400_e_ofx(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    cnab = service.previa_conciliacao(db, org_id=ORG, stream=io.BytesIO(cnab400("0000000100", "100324", 100000)))
+    assert cnab["formato"] == "cnab400"
+    assert [p["pagamento_id"] for p in cnab["propostas"]] == ["p-1"]
+
+    ofx = service.previa_conciliacao(db, org_id=ORG, stream=io.BytesIO(OFX))
+    assert ofx["formato"] == "ofx"
+    assert [(p["pagamento_id"], p["referencia"]) for p in ofx["propostas"]] == [("p-4", "abc-1")]
+    assert ofx["totais"]["ignoradas"] == 1
+
+
+def test_ofx_em_linha_unica_lido_em_blocos(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(service, "OFX_READ_SIZE", 7)
+    db = fake_supabase(tables())
+    xml = b'<?xml version="1.0"?>' + b"".join(line.strip() for line in OFX.splitlines()[3:])
+
+    result = service.previa_conciliacao(db, org_id=ORG, stream=io.BytesIO(xml))
+
+    assert [p["pagamento_id"] for p in result["propostas"]] == ["p-4"]
+
+
+@pytest.fixture
+def comissao(monkeypatch) -> dict[str, list]:
+    chamadas: dict[str, list] = {"competencias": [], "contratos": []}
+    monkeypatch.setattr(
+        service.comissao_competencia_service,
+        "upsert_competencia_from_pagamento",
+        lambda supa, **kwargs: chamadas["competencias"].append(kwargs["pagamento_id"]),
+    )
+    monkeypatch.setattr(
+        service.comissao_competencia_service,
+        "reprocessar_comissoes_contrato",
+        lambda supa, **kwargs: chamadas["contratos"].append(kwargs["contrato_id"]),
+    )
+    return chamadas
+
+
+def test_confirmar_baixa_em_bloco_e_reprocessa_cada_contrato_uma_vez(fake_supabase, comissao) -> None:
+    db = fake_supabase(tables())
+
+    job = service.iniciar_confirmacao(
+        db,
+        org_id=ORG,
+        itens=[
+            {"pagamento_id": "p-1", "pago_em": "2024-03-12", "valor_pago": "1002.50"},
+            {"pagamento_id": "p-2", "pago_em": "2024-03-12", "valor_pago": "1002.50"},
+            {"pagamento_id": "p-4", "pago_em": "2024-03-18"},
+            {"pagamento_id": "p-3", "pago_em": "2024-03-12"},  # já pago
+        ],
+        actor_id="user-1",
+    )
+    service.aguardar(job["id"], timeout=5)
+
+    status = service.status_confirmacao(db, org_id=ORG, job_id=job["id"])
+    item = status["item"]
+    assert (item["status"], item["baixados"], item["ignorados"], item["contratos_processados"]) == (
+        "concluido",
+        3,
+        1,
+        2,
+    )
+    assert status["percentual"] == 100.0
+    assert "baixas" not in item
+    # um update por (data, valor pago), não um por pagamento
+    assert db.count_calls("pagamentos", "update") == 2
+    assert sorted(comissao["competencias"]) == ["p-1", "p-2", "p-4"]
+    assert sorted(comissao["contratos"]) == ["ctr-1", "ctr-2"]
+    pagamentos = {row["id"]: row for row in db.tables["pagamentos"]}
+    assert (pagamentos["p-1"]["status"], pagamentos["p-1"]["pago_em"], pagamentos["p-1"]["valor"]) == (
+        "pago",
+        "2024-03-12",
+        "1002.50",
+    )
+    assert (pagamentos["p-4"]["status"], pagamentos["p-4"]["valor"]) == ("pago", "1500.00")
+
+
+def test_retomada_refaz_a_comissao_do_bloco_interrompido(fake_supabase, comissao, monkeypatch) -> None:
+    monkeypatch.setattr(service, "BAIXAS_POR_BLOCO", 1)
+    db = fake_supabase(tables())
+    # o processo morreu depois de baixar p-4 (ctr-2) e antes da comissão; ctr-1 já tinha terminado
+    next(row for row in db.tables["pagamentos"] if row["id"] == "p-4")["status"] = "pago"
+    db.tables["conciliacao_jobs"].append(
+        {
+            "id": "job-1",
+            "org_id": ORG,
+            "status": "executando",
+            "baixas": {
+                "p-1": {"pago_em": "2024-03-12", "valor_pago": None},
+                "p-4": {"pago_em": "2024-03-18", "valor_pago": None},
+            },
+            "total": 2,
+            "processados": 1,
+            "baixados": 1,
+            "ignorados": 0,
+            "contratos_processados": 1,
+            "erros": 0,
+            "erros_detalhe": [],
+            "ultimo_contrato_id": "ctr-1",
+            "created_by": "user-1",
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        }
+    )
+
+    service.retomar_confirmacao(db, org_id=ORG, job_id="job-1")
+    service.aguardar("job-1", timeout=5)
+
+    job = service.get_job_or_404(db, ORG, "job-1")
+    assert (job["status"], job["processados"], job["contratos_processados"]) == ("concluido", 2, 2)
+    assert comissao["competencias"] == ["p-4"]
+    assert comissao["contratos"] == ["ctr-2"]
+    assert db.count_calls("pagamentos", "update") == 0
+
+
+def test_erro_na_comissao_fica_no_job(fake_supabase, comissao, monkeypatch) -> None:
+    def falha(supa, **kwargs):
+        raise service.HTTPException(400, "Contrato sem regra")
+
+    monkeypatch.setattr(service.comissao_competencia_service, "reprocessar_comissoes_contrato", falha)
+    db = fake_supabase(tables())
+
+    job = service.iniciar_confirmacao(
+        db, org_id=ORG, itens=[{"pagamento_id": "p-1", "pago_em": "2024-03-12"}], actor_id="user-1"
+    )
+    service.aguardar(job["id"], timeout=5)
+
+    job = service.get_job_or_404(db, ORG, job["id"])
+    assert (job["status"], job["baixados"], job["erros"]) == ("concluido_com_erros", 1, 1)
+    assert job["erros_detalhe"] == [{"contrato_id": "ctr-1", "erro": "Contrato sem regra"}]
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services import comissao_competencia_service as service
+
+ORG = "org-1"
+TABELAS_DO_SNAPSHOT = ("contratos", "pagamentos", "cota_pagamento_competencias", "comissao_lancamentos")
+
+
+@pytest.fixture(autouse=True)
+def _limpa_cache():
+    service._snapshot_cache.clear()
+    yield
+    service._snapshot_cache.clear()
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "contratos": [{"id": "ctr-1", "org_id": ORG, "cota_id": "cota-1", "numero": "C-1"}],
+        "pagamentos": [
+            {"id": "pag-1", "org_id": ORG, "contrato_id": "ctr-1", "competencia": "2024-01-01", "pago_em": "2024-01-05"},
+        ],
+        "cota_pagamento_competencias": [
+            {"id": "comp-1", "org_id": ORG, "contrato_id": "ctr-1", "competencia": "2024-01-01", "updated_at": "2024-01-06"},
+        ],
+        "comissao_lancamentos": [
+            {
+                "id": "l-1",
+                "org_id": ORG,
+                "contrato_id": "ctr-1",
+                "beneficiario_tipo": "empresa",
+                "ordem": 1,
+                "status": "disponivel",
+                "repasse_status": "nao_aplicavel",
+                "valor_bruto": "1200",
+                "valor_imposto": "0",
+                "valor_liquido": "1200",
+                "competencia_real": "2024-01-01",
+            },
+            {
+                "id": "l-2",
+                "org_id": ORG,
+                "contrato_id": "ctr-1",
+                "beneficiario_tipo": "parceiro",
+                "parceiro_id": "par-1",
+                "ordem": 1,
+                "status": "disponivel",
+                "repasse_status": "pendente",
+                "valor_bruto": "800",
+                "valor_imposto": "80",
+                "valor_liquido": "720",
+                "competencia_real": "2024-01-01",
+            },
+        ],
+        "contrato_financeiro_versoes": [{"contrato_id": "ctr-1", "org_id": ORG, "versao": 1}],
+    }
+
+
+def _loads(db) -> dict[str, int]:
+    return {table: db.count_calls(table, "select") for table in TABELAS_DO_SNAPSHOT}
+
+
+def test_financeiro_monta_as_tres_visoes_com_uma_carga(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    result = service.financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")
+
+    assert _loads(db) == {table: 1 for table in TABELAS_DO_SNAPSHOT}
+    assert result["competencias"]["total"] == 1
+    assert result["resumo"]["totais"]["total_bruto"] == "2000.00"
+    assert result["resumo"]["totais"]["parceiro"]["imposto"] == "80.00"
+    assert result["resumo"]["quantidades"]["por_repasse_status"] == {"nao_aplicavel": 1, "pendente": 1}
+    assert [item["tipo"] for item in result["timeline"]["items"]] == [
+        "lancamento_comissao",
+        "lancamento_comissao",
+        "pagamento",
+        "competencia",
+    ]
+    assert service.timeline_contrato(db, org_id=ORG, contrato_id="ctr-1")["items"] == result["timeline"]["items"]
+
+
+def test_cache_vale_ate_a_versao_do_contrato_mudar(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    service.listar_competencias_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    resumo = service.resumo_financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    service.timeline_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    assert _loads(db) == {table: 1 for table in TABELAS_DO_SNAPSHOT}
+
+    # o chamador pode alterar a resposta sem contaminar o cache
+    resumo["items"].clear()
+    assert len(service.resumo_financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")["items"]) == 2
+
+    db.tables["comissao_lancamentos"][0]["status"] = "pago"
+    db.tables["contrato_financeiro_versoes"][0]["versao"] = 2  # trigger da migration 013
+
+    resumo = service.resumo_financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    assert resumo["quantidades"]["por_status"] == {"pago": 1, "disponivel": 1}
+    assert _loads(db) == {table: 2 for table in TABELAS_DO_SNAPSHOT}
+
+
+def test_sem_versao_nao_usa_cache(fake_supabase) -> None:
+    data = tables()
+    data["contrato_financeiro_versoes"] = []
+    db = fake_supabase(data)
+
+    service.resumo_financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")
+    service.resumo_financeiro_contrato(db, org_id=ORG, contrato_id="ctr-1")
+
+    assert db.count_calls("comissao_lancamentos", "select") == 2
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.services import comissao_eventos_service
+from app.services import cronograma_lote_service as service
+
+ORG = "org-1"
+
+
+def carteira(n_contratos: int = 3) -> dict[str, list[dict]]:
+    tables: dict[str, list[dict]] = {
+        "contratos": [],
+        "cotas": [],
+        "cota_comissao_config": [],
+        "cota_comissao_regras": [],
+        "cota_pagamento_pulos": [],
+        "contemplacoes": [],
+        "pagamentos": [],
+        "comissao_eventos": [],
+        "cronograma_lote_jobs": [],
+    }
+    for i in range(1, n_contratos + 1):
+        tables["contratos"].append({"id": f"ctr-{i}", "org_id": ORG, "cota_id": f"cota-{i}"})
+        tables["cotas"].append(
+            {
+                "id": f"cota-{i}",
+                "org_id": ORG,
+                "status": "ativa",
+                "valor_carta": "100000",
+                "data_adesao": "2024-01-10",
+                "assembleia_dia": 20,
+                "furo_meses": 0,
+            }
+        )
+        tables["cota_comissao_config"].append(
+            {
+                "id": f"cfg-{i}",
+                "org_id": ORG,
+                "cota_id": f"cota-{i}",
+                "ativo": True,
+                "percentual_total": "5",
+                "primeira_competencia_regra": "mes_adesao",
+            }
+        )
+        for ordem, tipo, offset, pct in (
+            (1, "adesao", 0, "2"),
+            (2, "proxima_cobranca", 1, "1.5"),
+            (3, "proxima_cobranca", 2, "1.5"),
+        ):
+            tables["cota_comissao_regras"].append(
+                {
+                    "id": f"r{ordem}-{i}",
+                    "org_id": ORG,
+                    "cota_comissao_config_id": f"cfg-{i}",
+                    "ordem": ordem,
+                    "tipo_evento": tipo,
+                    "offset_meses": offset,
+                    "percentual_comissao": pct,
+                }
+            )
+    return tables
+
+
+def _competencias(db, contrato_id: str) -> list[str]:
+    return sorted(row["competencia"] for row in db.tables["pagamentos"] if row["contrato_id"] == contrato_id)
+
+
+def test_gera_so_o_que_falta_em_lote(fake_supabase) -> None:
+    data = carteira(n_contratos=3)
+    # ctr-2: regra 1 já tem parcela e fevereiro foi pulado
+    data["pagamentos"].append(
+        {
+            "id": "pag-existente",
+            "org_id": ORG,
+            "contrato_id": "ctr-2",
+            "tipo": "parcela_mensal",
+            "competencia": "2024-01-01",
+            "status": "pago",
+            "payload": {"source_module": "financeiro_cronograma_comissao", "regra_id": "r1-2"},
+        }
+    )
+    data["cota_pagamento_pulos"].append({"org_id": ORG, "contrato_id": "ctr-2", "competencia": "2024-02-01"})
+    # ctr-3: sem configuração de comissão
+    data["cota_comissao_config"] = [row for row in data["cota_comissao_config"] if row["cota_id"] != "cota-3"]
+    db = fake_supabase(data)
+    progresso = []
+
+    result = service.gerar_cronogramas(
+        db,
+        org_id=ORG,
+        contrato_ids=["ctr-1", "ctr-2", "ctr-3"],
+        actor_id="user-1",
+        progresso=lambda contadores: progresso.append(dict(contadores)),
+    )
+
+    assert _competencias(db, "ctr-1") == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    # pulo em fevereiro empurra as parcelas 2 e 3 para março e abril
+    assert _competencias(db, "ctr-2") == ["2024-01-01", "2024-03-01", "2024-04-01"]
+    novo = next(row for row in db.tables["pagamentos"] if row["contrato_id"] == "ctr-1" and row["competencia"] == "2024-01-01")
+    assert novo["valor"] == "2000.00"
+    assert novo["vencimento"] == "2024-01-20"
+    assert novo["payload"]["regra_id"] == "r1-1"
+
+    assert result["pagamentos_criados"] == 5
+    assert result["competencias_ignoradas"] == 1
+    assert result["erros"] == 1
+    assert result["erros_detalhe"] == [
+        {"contrato_id": "ctr-3", "erro": "A cota não possui configuração ativa de comissão"}
+    ]
+    assert progresso[-1]["processados"] == 3
+    assert db.count_calls("pagamentos", "insert") == 1
+    assert db.count_calls("comissao_eventos", "insert") == 1
+    assert len(db.tables["comissao_eventos"]) == 5
+
+
+def test_rodar_de_novo_nao_duplica(fake_supabase) -> None:
+    db = fake_supabase(carteira(n_contratos=2))
+
+    service.gerar_cronogramas(db, org_id=ORG, contrato_ids=["ctr-1", "ctr-2"], actor_id="user-1")
+    segunda = service.gerar_cronogramas(db, org_id=ORG, contrato_ids=["ctr-1", "ctr-2"], actor_id="user-1")
+
+    assert segunda["pagamentos_criados"] == 0
+    assert segunda["competencias_ignoradas"] == 6
+    assert len(db.tables["pagamentos"]) == 6
+
+
+def test_job_grava_progresso_por_bloco(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(service, "CONTRATOS_POR_BLOCO", 2)
+    db = fake_supabase(carteira(n_contratos=5))
+
+    job = service.iniciar_geracao(db, org_id=ORG, actor_id="user-1")
+    service.aguardar(job["id"], timeout=5)
+
+    status = service.status_geracao(db, org_id=ORG, job_id=job["id"])
+    assert status["item"]["status"] == "concluido"
+    assert status["item"]["total"] == 5
+    assert status["item"]["pagamentos_criados"] == 15
+    assert status["percentual"] == 100.0
+    # carga em lote: uma consulta de regras por bloco, não por contrato
+    assert db.count_calls("cota_comissao_regras", "select") == 3
+
+
+def test_job_ja_reivindicado_nao_roda_de_novo(fake_supabase) -> None:
+    db = fake_supabase(carteira(n_contratos=2))
+    db.tables["cronograma_lote_jobs"].append(
+        {"id": "job-1", "org_id": ORG, "status": "executando", "filtro": {}, "updated_at": "2099-01-01T00:00:00+00:00"}
+    )
+
+    service._jobs.disparar(db, "job-1", service.executar_job)
+    service.aguardar("job-1", timeout=5)
+
+    assert db.tables["pagamentos"] == []
+    with pytest.raises(service.HTTPException) as exc:
+        service.retomar_geracao(db, org_id=ORG, job_id="job-1")
+    assert exc.value.status_code == 409
+
+
+def test_retomada_continua_do_ultimo_bloco(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(service, "CONTRATOS_POR_BLOCO", 2)
+    db = fake_supabase(carteira(n_contratos=5))
+    db.tables["cronograma_lote_jobs"].append(
+        {
+            "id": "job-1",
+            "org_id": ORG,
+            "status": "executando",  # processo morreu depois do 1º bloco
+            "filtro": {"contrato_ids": [], "cota_ids": []},
+            "total": 5,
+            "processados": 2,
+            "pagamentos_criados": 6,
+            "competencias_ignoradas": 0,
+            "erros": 0,
+            "erros_detalhe": [],
+            "ultimo_contrato_id": "ctr-2",
+            "created_by": "user-1",
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        }
+    )
+
+    service.retomar_geracao(db, org_id=ORG, job_id="job-1")
+    service.aguardar("job-1", timeout=5)
+
+    job = service.get_job_or_404(db, ORG, "job-1")
+    assert (job["status"], job["processados"], job["pagamentos_criados"]) == ("concluido", 5, 15)
+    assert job["ultimo_contrato_id"] == "ctr-5"
+    assert sorted({row["contrato_id"] for row in db.tables["pagamentos"]}) == ["ctr-3", "ctr-4", "ctr-5"]
+
+
+def test_retomada_enfileira_as_parcelas_do_bloco_interrompido(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(service, "CONTRATOS_POR_BLOCO", 2)
+    db = fake_supabase(carteira(n_contratos=4))
+
+    def queda(*_args, **_kwargs):
+        raise RuntimeError("processo morreu")
+
+    # 2º bloco (ctr-3, ctr-4): parcelas gravadas, processo cai antes do outbox
+    with monkeypatch.context() as m:
+        m.setattr(comissao_eventos_service, "enfileirar_eventos_novos", queda)
+        with pytest.raises(RuntimeError):
+            service.gerar_cronogramas(
+                db, org_id=ORG, contrato_ids=["ctr-3", "ctr-4"], actor_id="user-1", job_id="job-1"
+            )
+    orfaos = sorted(row["id"] for row in db.tables["pagamentos"])
+    assert len(orfaos) == 6 and db.tables["comissao_eventos"] == []
+
+    db.tables["cronograma_lote_jobs"].append(
+        {
+            "id": "job-1",
+            "org_id": ORG,
+            "status": "executando",
+            "filtro": {"contrato_ids": [], "cota_ids": []},
+            "total": 4,
+            "processados": 2,
+            "pagamentos_criados": 6,
+            "competencias_ignoradas": 0,
+            "erros": 0,
+            "erros_detalhe": [],
+            "ultimo_contrato_id": "ctr-2",
+            "created_by": "user-1",
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        }
+    )
+
+    service.retomar_geracao(db, org_id=ORG, job_id="job-1")
+    service.aguardar("job-1", timeout=5)
+
+    job = service.get_job_or_404(db, ORG, "job-1")
+    assert (job["status"], job["pagamentos_criados"]) == ("concluido", 12)
+    # nada duplicado, e toda parcela do bloco interrompido tem evento
+    assert sorted(row["id"] for row in db.tables["pagamentos"]) == orfaos
+    assert sorted(row["pagamento_id"] for row in db.tables["comissao_eventos"]) == orfaos
+
+
+def test_sem_outbox_processa_na_hora(fake_supabase, monkeypatch) -> None:
+    processados = []
+    monkeypatch.setattr(
+        comissao_eventos_service.comissao_competencia_service,
+        "processar_pagamento_para_comissao",
+        lambda supa, **kwargs: processados.append(kwargs["pagamento_id"]),
+    )
+    db = fake_supabase(carteira(n_contratos=1))
+    original_table = db.table
+
+    def table(name):
+        if name == "comissao_eventos":
+            raise APIError({"message": 'relation "public.comissao_eventos" does not exist', "code": "42P01"})
+        return original_table(name)
+
+    monkeypatch.setattr(db, "table", table)
+
+    service.gerar_cronogramas(db, org_id=ORG, contrato_ids=["ctr-1"], actor_id="user-1")
+
+    assert len(processados) == 3
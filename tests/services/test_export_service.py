@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from app.services import comissao_service, export_service
+from app.services.export_service import ExportColumn
+
+COLUMNS = [
+    ExportColumn("Nome", "nome"),
+    ExportColumn("Valor", "valor", "dinheiro"),
+    ExportColumn("Qtd", "qtd", "numero"),
+]
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def rows(total: int, consumed: list[int] | None = None):
+    for idx in range(total):
+        if consumed is not None:
+            consumed.append(idx)
+        yield {"nome": f"Parceiro; \"{idx}\" & <cia>", "valor": "100.005", "qtd": idx}
+
+
+def test_csv_streams_in_chunks_with_summary_money_format() -> None:
+    consumed: list[int] = []
+    stream = export_service.iter_csv(COLUMNS, rows(export_service.FLUSH_EVERY * 2 + 5, consumed))
+
+    header = next(stream)
+    assert header.startswith(b"\xef\xbb\xbfNome;Valor;Qtd")
+    first = next(stream)
+    assert len(consumed) == export_service.FLUSH_EVERY  # não leu tudo antes de responder
+
+    body = (header + first + b"".join(stream)).decode("utf-8-sig")
+    lines = body.splitlines()
+    assert len(lines) == export_service.FLUSH_EVERY * 2 + 6
+    assert lines[1] == '"Parceiro; ""0"" & <cia>";100.01;0'
+    assert comissao_service.summarize_lancamentos(
+        [{"beneficiario_tipo": "empresa", "valor_bruto": "100.005"}]
+    )["total_bruto_empresa"] == "100.01"
+
+
+def test_xlsx_is_a_valid_workbook() -> None:
+    payload = b"".join(export_service.iter_xlsx(COLUMNS, rows(3), sheet_name="Extrato"))
+
+    with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+        assert "[Content_Types].xml" in archive.namelist()
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+
+    assert workbook.find("m:sheets/m:sheet", NS).get("name") == "Extrato"
+    data_rows = sheet.findall("m:sheetData/m:row", NS)
+    assert len(data_rows) == 4
+    nome, valor, qtd = data_rows[1].findall("m:c", NS)
+    assert nome.find("m:is/m:t", NS).text == 'Parceiro; "0" & <cia>'
+    assert (valor.get("s"), valor.find("m:v", NS).text) == ("1", "100.01")
+    assert qtd.find("m:v", NS).text == "0"
+
+
+def test_text_cells_that_look_like_formulas_are_escaped() -> None:
+    hostile = [
+        {"nome": "=HYPERLINK(\"http://x\")", "valor": "-10.5", "qtd": -3},
+        {"nome": "@SUM(A1)", "valor": "+1", "qtd": "n/a"},
+        {"nome": "-2+3", "valor": None, "qtd": None},
+    ]
+
+    csv_lines = b"".join(export_service.iter_csv(COLUMNS, hostile)).decode("utf-8-sig").splitlines()
+    assert csv_lines[1:] == ['"\'=HYPERLINK(""http://x"")";-10.50;-3', "'@SUM(A1);1.00;n/a", "'-2+3;;"]
+
+    payload = b"".join(export_service.iter_xlsx(COLUMNS, hostile))
+    with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+    nome, valor, qtd = sheet.findall("m:sheetData/m:row", NS)[1].findall("m:c", NS)
+    assert nome.find("m:is/m:t", NS).text == "'=HYPERLINK(\"http://x\")"
+    assert (valor.find("m:v", NS).text, qtd.find("m:v", NS).text) == ("-10.50", "-3")
+
+
+def test_iter_lancamentos_pages_through_ledger(fake_supabase) -> None:
+    ledger = [
+        {
+            "id": f"l-{idx:03d}",
+            "org_id": "org-1",
+            "beneficiario_tipo": "parceiro",
+            "parceiro_id": "par-1",
+            "competencia_prevista": f"2024-{idx % 12 + 1:02d}-01",
+            "valor_bruto": "10",
+        }
+        for idx in range(25)
+    ]
+    db = fake_supabase({"comissao_lancamentos": ledger})
+
+    exported = list(comissao_service.iter_lancamentos(db, "org-1", page_size=10, parceiro_id="par-1"))
+
+    assert sorted(row["id"] for row in exported) == sorted(row["id"] for row in ledger)
+    assert db.count_calls("comissao_lancamentos", "select") == 3
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app.ai import tools
+from app.security.auth import CurrentProfile
+from app.services import assembleia_calendario_service
+from app.services import lance_estatisticas_service as service
+from app.services import lances_service
+
+ORG = "org-1"
+PROFILE = CurrentProfile(user_id="user-1", org_id=ORG, role="gestor")
+
+
+@pytest.fixture(autouse=True)
+def _limpa_calendario():
+    assembleia_calendario_service._cache.clear()
+    yield
+    assembleia_calendario_service._cache.clear()
+
+
+def _cota(i: int, administradora_id: str = "adm-1", grupo_codigo: str = "G1", **extra) -> dict:
+    row = {
+        "id": f"cota-{i}",
+        "org_id": ORG,
+        "administradora_id": administradora_id,
+        "grupo_codigo": grupo_codigo,
+        "numero_cota": str(i),
+        "produto": "imovel",
+        "status": "ativa",
+        "created_at": f"2024-01-{i:02d}",
+    }
+    row.update(extra)
+    return row
+
+
+def _lance(i: int, cota: int, data: str, resultado: str, percentual) -> dict:
+    return {
+        "id": f"l-{i}",
+        "org_id": ORG,
+        "cota_id": f"cota-{cota}",
+        "assembleia_data": data,
+        "resultado": resultado,
+        "percentual": percentual,
+    }
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "cotas": [
+            _cota(1), _cota(2), _cota(3), _cota(4), _cota(7),
+            _cota(5, grupo_codigo="G2"),
+            _cota(6, administradora_id="adm-2"),
+        ],
+        "lances": [
+            _lance(1, 1, "2024-01-20", "contemplado", 30),
+            _lance(2, 2, "2024-01-20", "nao_contemplado", 20),
+            _lance(3, 2, "2024-02-20", "contemplado", 40),
+            _lance(4, 3, "2024-02-20", "nao_contemplado", 10),
+            _lance(5, 3, "2024-03-20", "contemplado", 50),
+            _lance(6, 4, "2024-03-20", "contemplado", 45),
+            _lance(7, 5, "2024-03-20", "pendente", 15),
+            _lance(8, 6, "2024-03-20", "contemplado", 20),
+        ],
+        "contemplacoes": [
+            # o percentual da contemplação prevalece sobre o do lance
+            {"id": "ct-1", "org_id": ORG, "cota_id": "cota-2", "motivo": "lance", "lance_percentual": 35, "data": "2024-02-20"},
+            {"id": "ct-2", "org_id": ORG, "cota_id": "cota-5", "motivo": "sorteio", "lance_percentual": None, "data": "2024-03-20"},
+        ],
+    }
+
+
+def test_percentil_e_tendencia() -> None:
+    assert service.percentil([], 0.5) is None
+    assert service.percentil([10.0], 0.8) == 10.0
+    assert service.percentil([30.0, 35.0, 45.0], 0.8) == pytest.approx(41.0)
+    assert service.tendencia([(0, 30.0)]) is None
+    assert service.tendencia([(0, 30.0), (1, 35.0), (2, 45.0)]) == pytest.approx(7.5)
+
+
+def test_reconstruir_grava_mensal_e_resumo_por_grupo(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    assert service.reconstruir_estatisticas(db, org_id=ORG) == {"grupos": 2, "competencias": 4}
+
+    grupos = {(row["administradora_id"], row["grupo_codigo"]): row for row in db.tables[service.GRUPOS_TABLE]}
+    g1 = grupos[("adm-1", "G1")]
+    assert g1["lance_p50"] == "35.0000"
+    assert g1["lance_p80"] == "41.0000"
+    assert g1["tendencia_pp_mes"] == "7.5000"
+    assert g1["taxa_contemplacao"] == "0.6667"
+    assert (g1["assembleias"], g1["lances_decididos"], g1["lances_vencedores"]) == (3, 6, 4)
+    assert (g1["competencia_inicio"], g1["competencia_fim"]) == ("2024-01-01", "2024-03-01")
+    assert g1["produto"] == "imovel"
+    assert grupos[("adm-2", "G1")]["lance_p50"] == "20.0000"
+    assert ("adm-1", "G2") not in grupos  # só lance pendente e contemplação por sorteio
+
+    mensais = {
+        row["competencia"]: row
+        for row in db.tables[service.MENSAIS_TABLE]
+        if row["administradora_id"] == "adm-1"
+    }
+    assert mensais["2024-02-01"]["corte_percentual"] == "35.0000"
+    assert mensais["2024-03-01"]["mediana_percentual"] == "47.5000"
+
+
+def test_janela_considera_so_os_ultimos_meses(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    _, grupos = service.calcular_estatisticas(
+        cotas={row["id"]: row for row in db.tables["cotas"]},
+        lances=db.tables["lances"],
+        contemplacoes=db.tables["contemplacoes"],
+        janela_meses=2,
+    )
+
+    g1 = grupos[("adm-1", "G1")]
+    assert g1["competencia_inicio"] == date(2024, 2, 1)
+    assert g1["lance_p50"] == pytest.approx(40.0)
+
+
+def test_contemplacao_atualiza_so_o_grupo_da_cota(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    service.reconstruir_estatisticas(db, org_id=ORG)
+    outro_grupo = next(row for row in db.tables[service.GRUPOS_TABLE] if row["administradora_id"] == "adm-2")
+
+    lances_service.contemplar_cota(
+        sb=db,
+        profile=PROFILE,
+        cota_id="cota-7",
+        data=date(2024, 4, 22),
+        motivo="lance",
+        lance_percentual=60,
+        competencia=date(2024, 4, 1),
+    )
+
+    # a requisição só marca o grupo; o worker recalcula
+    assert [(row["administradora_id"], row["grupo_codigo"]) for row in db.tables[service.PENDENCIAS_TABLE]] == [
+        ("adm-1", "G1")
+    ]
+    assert db.count_calls(service.GRUPOS_TABLE, "upsert") == 1  # só a reconstrução
+    assert service.processar_pendencias(db) == {"processed": 1, "falhas": 0}
+    assert db.tables[service.PENDENCIAS_TABLE] == []
+
+    grupos = {(row["administradora_id"], row["grupo_codigo"]): row for row in db.tables[service.GRUPOS_TABLE]}
+    assert grupos[("adm-1", "G1")]["competencia_fim"] == "2024-04-01"
+    assert grupos[("adm-1", "G1")]["assembleias"] == 4
+    assert grupos[("adm-2", "G1")] == outro_grupo
+
+    # resultado revisto: o grupo sem histórico decidido sai das tabelas
+    db.tables["lances"][-1]["resultado"] = "desconsiderado"
+    service.atualizar_apos_assembleia(db, org_id=ORG, cota_ids=["cota-6"])
+    service.processar_pendencias(db)
+    assert all(row["administradora_id"] != "adm-2" for row in db.tables[service.GRUPOS_TABLE])
+    assert all(row["administradora_id"] != "adm-2" for row in db.tables[service.MENSAIS_TABLE])
+
+
+def test_listagem_e_simulador_leem_o_pre_calculado(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    service.reconstruir_estatisticas(db, org_id=ORG)
+    lances_antes = db.count_calls("lances", "select")
+
+    result = lances_service.list_cartas_operacao(sb=db, profile=PROFILE, competencia=date(2024, 4, 1), page_size=50)
+    por_cota = {item["cota_id"]: item for item in result["items"]}
+    assert por_cota["cota-1"]["lance_p80"] == "41.0000"
+    assert por_cota["cota-5"]["lance_p50"] is None
+    assert db.count_calls(service.GRUPOS_TABLE, "select") == 2  # reconstrução + listagem
+
+    simulacao = tools.simular_consorcio(produto="imovel", valor_credito=100000, supa=db, org_id=ORG)
+    referencia = simulacao["referencia_lances"]
+    assert referencia["grupos_com_historico"] == 2
+    assert referencia["lance_p50"] == 27.5  # mediana dos p50 dos grupos (35 e 20)
+    assert db.count_calls("lances", "select") == lances_antes
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app.security.auth import CurrentProfile
+from app.services import assembleia_calendario_service
+from app.services import lances_service as service
+
+ORG = "org-1"
+PROFILE = CurrentProfile(user_id="user-1", org_id=ORG, role="gestor")
+COMPETENCIA = date(2024, 6, 1)
+
+
+@pytest.fixture(autouse=True)
+def _limpa_calendario():
+    assembleia_calendario_service._cache.clear()
+    yield
+    assembleia_calendario_service._cache.clear()
+
+
+def _cota(i: int, **extra) -> dict:
+    row = {
+        "id": f"cota-{i}",
+        "org_id": ORG,
+        "lead_id": None,
+        "administradora_id": "adm-1",
+        "numero_cota": str(i),
+        "grupo_codigo": "G1",
+        "produto": "imovel",
+        "status": "ativa",
+        "assembleia_dia": None,
+        "created_at": f"2024-01-{i:02d}",
+    }
+    row.update(extra)
+    return row
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "cotas": [
+            _cota(1),
+            _cota(2, produto="auto"),
+            _cota(3, assembleia_dia=15),
+            _cota(4, administradora_id="adm-2"),
+            _cota(5, administradora_id=None),
+        ],
+        "administradora_regras_lance": [
+            {"id": "r-gen", "org_id": ORG, "administradora_id": "adm-1", "produto": None,
+             "dia_base_assembleia": 10, "ajustar_fim_semana": True, "tipo_ajuste": "proximo_dia_util"},
+            {"id": "r-imovel", "org_id": ORG, "administradora_id": "adm-1", "produto": "imovel",
+             "dia_base_assembleia": 22, "ajustar_fim_semana": True, "tipo_ajuste": "dia_util_anterior"},
+        ],
+        "cota_lance_competencias": [
+            {"id": "c-1", "org_id": ORG, "cota_id": "cota-1", "competencia": "2024-06-01", "status_mes": "feito"},
+            {"id": "c-2", "org_id": ORG, "cota_id": "cota-2", "competencia": "2024-05-01", "status_mes": "feito"},
+        ],
+        "cota_lance_fixo_opcoes": [
+            {"id": "o-1", "org_id": ORG, "cota_id": "cota-1", "ativo": True, "ordem": 2, "percentual": 30},
+            {"id": "o-2", "org_id": ORG, "cota_id": "cota-1", "ativo": True, "ordem": 1, "percentual": 20},
+            {"id": "o-3", "org_id": ORG, "cota_id": "cota-1", "ativo": False, "ordem": 0, "percentual": 50},
+            {"id": "o-4", "org_id": ORG, "cota_id": "cota-3", "ativo": True, "ordem": 1, "percentual": 25},
+        ],
+    }
+
+
+def _esperado_por_cota(db) -> dict[str, dict]:
+    """O que a listagem devolvia consultando cada cota separadamente."""
+    out = {}
+    for cota in db.tables["cotas"]:
+        controle = service.get_controle_mensal(sb=db, org_id=ORG, cota_id=cota["id"], competencia=COMPETENCIA)
+        regra = service.resolve_assembleia(sb=db, org_id=ORG, cota=cota, competencia=COMPETENCIA)
+        out[cota["id"]] = {
+            "status_mes": (controle or {}).get("status_mes", "pendente"),
+            "assembleia_dia_origem": regra["origem"],
+            "assembleia_dia": regra["dia_base_assembleia"],
+            "assembleia_prevista": regra["assembleia_prevista"],
+            "opcoes_lance_fixo": service.get_opcoes_lance_fixo(sb=db, org_id=ORG, cota_id=cota["id"]),
+        }
+    return out
+
+
+def test_listagem_usa_uma_consulta_por_tabela_e_mantem_a_resposta(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    result = service.list_cartas_operacao(sb=db, profile=PROFILE, competencia=COMPETENCIA)
+
+    assert result["total"] == 5
+    for table in ("cota_lance_competencias", "administradora_regras_lance", "cota_lance_fixo_opcoes"):
+        assert db.count_calls(table, "select") == 1
+
+    esperado = _esperado_por_cota(db)
+    for item in result["items"]:
+        assert {key: item[key] for key in esperado[item["cota_id"]]} == esperado[item["cota_id"]]
+
+    por_cota = {item["cota_id"]: item for item in result["items"]}
+    assert por_cota["cota-1"]["assembleia_prevista"] == date(2024, 6, 21)  # regra do produto, sábado -> sexta
+    assert por_cota["cota-2"]["assembleia_dia"] == 10  # sem regra do produto: genérica
+    assert por_cota["cota-3"]["assembleia_dia_origem"] == "cota"
+    assert por_cota["cota-4"]["tem_pendencia_configuracao"] is True
+    assert [o["id"] for o in por_cota["cota-1"]["opcoes_lance_fixo"]] == ["o-2", "o-1"]
+    assert por_cota["cota-2"]["status_mes"] == "pendente"
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from datetime import date
+
+from app.core import supabase_lote
+from app.security.auth import CurrentProfile
+from app.services import lances_service as service
+
+ORG = "org-1"
+PROFILE = CurrentProfile(user_id="user-1", org_id=ORG, role="gestor")
+COMPETENCIA = date(2024, 6, 1)
+ASSEMBLEIA = date(2024, 6, 20)
+
+
+def _cota(i: int, **extra) -> dict:
+    row = {
+        "id": f"cota-{i}",
+        "org_id": ORG,
+        "status": "ativa",
+        "valor_carta": 100000,
+        "embutido_permitido": False,
+        "embutido_max_percent": None,
+        "fgts_permitido": False,
+    }
+    row.update(extra)
+    return row
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "cotas": [_cota(1), _cota(2), _cota(3), _cota(4, status="cancelada")],
+        "cota_lance_fixo_opcoes": [
+            {"id": "op-1", "org_id": ORG, "cota_id": "cota-3", "ativo": True, "ordem": 1, "percentual": 25},
+        ],
+        "cota_lance_competencias": [
+            {"id": "ctl-2", "org_id": ORG, "cota_id": "cota-2", "competencia": "2024-06-01", "status_mes": "planejado"},
+        ],
+    }
+
+
+def _lance(cota_id: str, valor: int, **extra) -> dict:
+    item = {
+        "cota_id": cota_id,
+        "assembleia_data": ASSEMBLEIA,
+        "tipo": "livre",
+        "percentual": None,
+        "valor": valor,
+        "base_calculo": "saldo_devedor",
+        "pagamento": {"composicao": {"proprio": valor}},
+        "resultado": None,
+        "observacoes_competencia": None,
+        "cota_lance_fixo_opcao_id": None,
+    }
+    item.update(extra)
+    return item
+
+
+def test_lote_valida_com_estado_pre_carregado_e_grava_em_blocos(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    result = service.registrar_competencia_lote(
+        sb=db,
+        profile=PROFILE,
+        competencia=COMPETENCIA,
+        controles=[
+            {"cota_id": "cota-2", "status_mes": "sem_lance", "observacoes": "sem recurso"},
+            {"cota_id": "cota-1", "status_mes": "planejado"},
+            {"cota_id": "cota-9", "status_mes": "planejado"},
+        ],
+        lances=[
+            _lance("cota-1", 5000, observacoes_competencia="ok"),
+            _lance("cota-2", 5000, pagamento={"composicao": {"proprio": 4000}}),
+            _lance("cota-3", 25000, tipo="fixo", cota_lance_fixo_opcao_id="op-1"),
+            _lance("cota-4", 1000),
+            _lance("cota-3", 1000, tipo="fixo", cota_lance_fixo_opcao_id="op-x"),
+        ],
+    )
+
+    assert result["lances_registrados"] == 2
+    assert result["controles_gravados"] == 3
+    assert [(e["tipo"], e["indice"], e["cota_id"]) for e in result["erros"]] == [
+        ("controle", 1, "cota-1"),
+        ("controle", 2, "cota-9"),
+        ("lance", 1, "cota-2"),
+        ("lance", 3, "cota-4"),
+        ("lance", 4, "cota-3"),
+    ]
+    assert result["erros"][0]["erro"] == "Cota com lance registrado neste lote"
+
+    # uma consulta por tabela e uma escrita por bloco
+    assert db.count_calls("cotas", "select") == 1
+    assert db.count_calls("cota_lance_fixo_opcoes", "select") == 1
+    assert db.count_calls("cota_lance_competencias", "select") == 1
+    assert db.count_calls("lances", "insert") == 1
+    assert db.count_calls("cotas", "update") == 1
+    assert db.count_calls("cota_lance_competencias", "upsert") == 1
+    assert db.count_calls("cota_lance_competencias", "insert") == 1
+
+    lances = {row["cota_id"]: row for row in db.tables["lances"]}
+    assert lances["cota-3"]["percentual"] == 25
+    assert lances["cota-1"]["created_by"] == "user-1"
+
+    controles = {row["cota_id"]: row for row in db.tables["cota_lance_competencias"]}
+    assert controles["cota-2"]["id"] == "ctl-2"
+    assert controles["cota-2"]["status_mes"] == "sem_lance"
+    assert controles["cota-1"]["status_mes"] == "feito"
+    assert controles["cota-1"]["lance_id"] == lances["cota-1"]["id"]
+    assert controles["cota-1"]["assembleia_prevista"] == "2024-06-20"
+    assert controles["cota-1"]["observacoes"] == "ok"
+
+    cotas = {row["id"]: row for row in db.tables["cotas"]}
+    assert cotas["cota-1"]["data_ultimo_lance"] == "2024-06-20"
+    assert "data_ultimo_lance" not in cotas["cota-2"]
+
+
+def test_bloco_com_falha_e_regravado_linha_a_linha(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase(tables())
+    monkeypatch.setattr(supabase_lote, "LOTE_CHUNK", 10)
+    table_original = db.table
+
+    class _Falha(Exception):
+        pass
+
+    def table(name):
+        query = table_original(name)
+        execute = query.execute
+
+        def _execute():
+            if name == "lances" and query.operation == "insert":
+                if any(row["cota_id"] == "cota-3" for row in query.payload):
+                    raise _Falha("violates check constraint")
+            return execute()
+
+        query.execute = _execute
+        return query
+
+    db.table = table
+
+    result = service.registrar_competencia_lote(
+        sb=db,
+        profile=PROFILE,
+        competencia=COMPETENCIA,
+        controles=[],
+        lances=[_lance("cota-1", 5000), _lance("cota-3", 25000, tipo="fixo", cota_lance_fixo_opcao_id="op-1")],
+    )
+
+    assert result["lances_registrados"] == 1
+    assert [(e["indice"], e["cota_id"]) for e in result["erros"]] == [(1, "cota-3")]
+    assert result["erros"][0]["erro"].startswith("Não foi possível registrar o lance")
+    assert [row["cota_id"] for row in db.tables["lances"]] == ["cota-1"]
+
+
+def test_cargas_e_update_em_blocos_de_cota(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(supabase_lote, "QUERY_CHUNK", 2)
+    data = tables()
+    data["cota_lance_fixo_opcoes"] += [
+        {"id": "op-2", "org_id": ORG, "cota_id": "cota-3", "ativo": True, "ordem": 1, "percentual": 30},
+        {"id": "op-0", "org_id": ORG, "cota_id": "cota-3", "ativo": True, "ordem": 0, "percentual": 10},
+    ]
+    db = fake_supabase(data)
+
+    result = service.registrar_competencia_lote(
+        sb=db,
+        profile=PROFILE,
+        competencia=COMPETENCIA,
+        controles=[],
+        lances=[_lance("cota-1", 5000), _lance("cota-2", 5000), _lance("cota-3", 5000)],
+    )
+
+    assert result["lances_registrados"] == 3
+    # 3 cotas em blocos de 2: duas consultas por tabela e dois updates de data_ultimo_lance
+    assert db.count_calls("cotas", "select") == 2
+    assert db.count_calls("cota_lance_fixo_opcoes", "select") == 2
+    assert db.count_calls("cota_lance_competencias", "select") == 2
+    assert db.count_calls("cotas", "update") == 2
+    assert all(row.get("data_ultimo_lance") == "2024-06-20" for row in db.tables["cotas"][:3])
+
+    opcoes = service.prefetch_opcoes_lance_fixo(sb=db, org_id=ORG, cota_ids=["cota-3"])
+    assert [row["id"] for row in opcoes["cota-3"]] == ["op-0", "op-2", "op-1"]
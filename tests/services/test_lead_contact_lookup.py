@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from app.services.lead_contact_service import match_lead, resolve_leads_by_contacts
+
+ORG = "org-1"
+
+
+def lead(lead_id: str, telefone: str | None, email: str | None, org_id: str = ORG) -> dict:
+    return {
+        "id": lead_id,
+        "org_id": org_id,
+        "nome": lead_id,
+        "telefone": telefone,
+        "email": email,
+        "phone_key": "55" + telefone if telefone else None,
+        "email_key": email.lower() if email else None,
+        "created_at": f"2026-01-0{lead_id[-1]}",
+    }
+
+
+def test_resolve_usa_listas_in_do_filtro_or(fake_supabase) -> None:
+    db = fake_supabase(
+        {
+            "leads": [
+                lead("lead-1", "11987654321", None),
+                lead("lead-2", None, "ana,silva@exemplo.com"),
+                lead("lead-3", "11900000000", None),
+                lead("lead-4", "11987654321", None, org_id="org-2"),
+            ]
+        }
+    )
+
+    index = resolve_leads_by_contacts(
+        db,
+        org_id=ORG,
+        contacts=[("(11) 98765-4321", None), (None, "Ana,Silva@exemplo.com"), ("11911111111", None)],
+    )
+
+    assert match_lead(index, telefone="11987654321")["id"] == "lead-1"
+    assert match_lead(index, email="ana,silva@exemplo.com")["id"] == "lead-2"
+    assert match_lead(index, telefone="11900000000") is None
+    assert db.count_calls("leads", "select") == 1
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+from app.services import meta_leads_backfill_service as service
+
+ORG = "org-1"
+INTEGRATION = {"id": "int-1", "org_id": ORG, "page_id": "page-1", "provider": "meta", "settings": {}}
+
+
+def test_backfill_roda_em_segundo_plano_e_guarda_o_resultado(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase({"meta_lead_integrations": [INTEGRATION], service.JOBS_TABLE: []})
+    chamadas = []
+
+    def fake_run(supa, *, integration, max_pages, page_size, since, restart, progresso):
+        chamadas.append((integration["id"], max_pages, page_size, restart))
+        return {"ok": True, "integration_id": integration["id"], "page_id": "page-1", "completed": True,
+                "forms": [], "created": 2, "updated": 0, "skipped": 1, "errors": 0}
+
+    monkeypatch.setattr(service, "run_meta_backfill", fake_run)
+
+    job = service.iniciar_backfill(db, integration=INTEGRATION, max_pages=5, page_size=50, actor_id="user-1")
+    service.aguardar(job["id"], timeout=5)
+
+    assert chamadas == [("int-1", 5, 50, False)]
+    status = service.status_backfill(db, org_id=ORG, integration_id="int-1", job_id=job["id"])
+    assert status["status"] == "concluido"
+    assert status["em_execucao"] is False
+    assert status["resultado"]["created"] == 2
+
+
+def test_um_backfill_por_integracao(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase({"meta_lead_integrations": [INTEGRATION], service.JOBS_TABLE: []})
+    liberar = threading.Event()
+
+    def fake_run(supa, **_kwargs):
+        liberar.wait(5)
+        return {"ok": True, "integration_id": "int-1", "page_id": "page-1", "completed": True}
+
+    monkeypatch.setattr(service, "run_meta_backfill", fake_run)
+
+    job = service.iniciar_backfill(db, integration=INTEGRATION)
+    try:
+        with pytest.raises(HTTPException) as exc:
+            service.iniciar_backfill(db, integration=INTEGRATION)
+        assert exc.value.status_code == 409
+    finally:
+        liberar.set()
+        service.aguardar(job["id"], timeout=5)
+    assert [row["status"] for row in db.tables[service.JOBS_TABLE]] == ["concluido"]
+
+
+def test_job_recebe_heartbeat_a_cada_pagina(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase({"meta_lead_integrations": [INTEGRATION], service.JOBS_TABLE: []})
+    vistos = []
+
+    def fake_run(supa, *, progresso, **_kwargs):
+        for pagina in (1, 2):
+            supa.table(service.JOBS_TABLE).update({"updated_at": "2000-01-01T00:00:00+00:00"}).execute()
+            progresso({"form_id": "form-1", "pages": pagina})
+            job = supa.table(service.JOBS_TABLE).select("*").execute().data[0]
+            vistos.append((job["updated_at"] > "2000-01-01", job["resultado"]))
+        return {"ok": True, "integration_id": "int-1", "page_id": "page-1", "completed": True}
+
+    monkeypatch.setattr(service, "run_meta_backfill", fake_run)
+
+    job = service.iniciar_backfill(db, integration=INTEGRATION)
+    service.aguardar(job["id"], timeout=5)
+
+    assert vistos == [
+        (True, {"em_andamento": {"form_id": "form-1", "pages": 1}}),
+        (True, {"em_andamento": {"form_id": "form-1", "pages": 2}}),
+    ]
+
+
+def test_corrida_no_indice_unico_vira_409(fake_supabase, monkeypatch) -> None:
+    db = fake_supabase({"meta_lead_integrations": [INTEGRATION], service.JOBS_TABLE: []})
+    original_table = db.table
+
+    def table(name):
+        query = original_table(name)
+        if name == service.JOBS_TABLE:
+            def insert(_payload):
+                raise APIError(
+                    {
+                        "message": f'duplicate key value violates unique constraint "{service.JOB_ATIVO_INDEX}"',
+                        "code": "23505",
+                    }
+                )
+
+            query.insert = insert
+        return query
+
+    monkeypatch.setattr(db, "table", table)
+
+    with pytest.raises(HTTPException) as exc:
+        service.iniciar_backfill(db, integration=INTEGRATION)
+    assert exc.value.status_code == 409
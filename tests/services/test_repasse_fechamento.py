@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from postgrest.exceptions import APIError
+
+from app.services import repasse_lotes_service as service
+
+ORG = "org-1"
+
+
+def _lancamento(id_: str, parceiro_id: str, liquido: str, **extra) -> dict:
+    row = {
+        "id": id_,
+        "org_id": ORG,
+        "beneficiario_tipo": "parceiro",
+        "parceiro_id": parceiro_id,
+        "status": "disponivel",
+        "repasse_status": "pendente",
+        "competencia_prevista": "2024-03-01",
+        "valor_bruto": str(Decimal(liquido) * 2),
+        "valor_imposto": str(Decimal(liquido)),
+        "valor_liquido": liquido,
+    }
+    row.update(extra)
+    return row
+
+
+def tables() -> dict[str, list[dict]]:
+    return {
+        "comissao_lancamentos": [
+            _lancamento("l-1", "par-1", "100"),
+            _lancamento("l-2", "par-1", "50.5"),
+            _lancamento("l-3", "par-2", "30"),
+            _lancamento("l-4", "par-2", "99", status="previsto"),
+            _lancamento("l-5", "par-2", "99", competencia_prevista="2024-05-01"),
+            _lancamento("l-6", "par-1", "99", repasse_status="pago"),
+        ],
+        "parceiros_corretores": [
+            {"id": "par-1", "org_id": ORG, "nome": "Ana"},
+            {"id": "par-2", "org_id": ORG, "nome": "Bruno"},
+        ],
+        "repasse_lotes": [],
+    }
+
+
+def _fechar(db, **kwargs):
+    params = {
+        "org_id": ORG,
+        "competencia_de": date(2024, 3, 1),
+        "competencia_ate": date(2024, 3, 1),
+        "actor_id": "user-1",
+    }
+    params.update(kwargs)
+    return service.fechar_repasses(db, **params)
+
+
+def test_previa_resume_por_parceiro_sem_gravar(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    result = _fechar(db, previa=True)
+
+    assert [(item["nome"], item["quantidade"], item["total"]) for item in result["itens"]] == [
+        ("Ana", 2, "150.50"),
+        ("Bruno", 1, "30.00"),
+    ]
+    assert result["itens"][0]["valor_bruto"] == "301.00"
+    assert result["totais"] == {"parceiros": 2, "lotes": 0, "repasses": 3, "total": "180.50"}
+    assert all(op == "select" for _, op in db.calls)
+
+
+def test_fechamento_chama_a_funcao_uma_vez_para_todos(fake_supabase) -> None:
+    db = fake_supabase(tables())
+    chamadas = []
+
+    def criar_lotes(db, params):
+        chamadas.append(params)
+        # par-2 teve o lançamento pago entre a seleção e a gravação
+        return [
+            {"parceiro_id": "par-1", "lote_id": "lote-1", "quantidade": 2, "total": 150.5},
+            {"parceiro_id": "par-2", "lote_id": None, "quantidade": 0, "total": 0},
+        ]
+
+    db.rpc_handlers[service.FECHAMENTO_RPC] = criar_lotes
+
+    result = _fechar(db, forma_pagamento=" pix ")
+
+    assert len(chamadas) == 1
+    assert chamadas[0]["p_forma_pagamento"] == "pix"
+    assert {item["parceiro_id"]: sorted(item["lancamento_ids"]) for item in chamadas[0]["p_lotes"]} == {
+        "par-1": ["l-1", "l-2"],
+        "par-2": ["l-3"],
+    }
+    ana, bruno = result["itens"]
+    assert (ana["lote_id"], ana["quantidade"], ana["total"], ana["ignorados"]) == ("lote-1", 2, "150.50", 0)
+    assert (bruno["lote_id"], bruno["quantidade"], bruno["ignorados"]) == (None, 0, 1)
+    assert result["totais"] == {"parceiros": 2, "lotes": 1, "repasses": 2, "total": "150.50"}
+    assert db.count_calls("comissao_lancamentos", "select") == 1
+
+
+def test_filtra_parceiros_e_pagina_por_id(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(service, "FECHAMENTO_PAGE_SIZE", 2)
+    db = fake_supabase(tables())
+
+    result = _fechar(db, previa=True, parceiro_ids=["par-1"])
+
+    assert [item["parceiro_id"] for item in result["itens"]] == ["par-1"]
+    assert result["itens"][0]["quantidade"] == 2
+    assert db.count_calls("comissao_lancamentos", "select") == 2
+
+
+def test_sem_migration_cria_um_lote_por_parceiro(fake_supabase) -> None:
+    db = fake_supabase(tables())
+
+    def ausente(db, params):
+        raise APIError({"message": "Could not find the function public.repasse_fechamento_criar_lotes", "code": "PGRST202"})
+
+    db.rpc_handlers[service.FECHAMENTO_RPC] = ausente
+
+    result = _fechar(db)
+
+    assert result["totais"]["lotes"] == 2
+    assert len(db.tables["repasse_lotes"]) == 2
+    pagos = {row["id"] for row in db.tables["comissao_lancamentos"] if row["repasse_status"] == "pago"}
+    assert pagos == {"l-1", "l-2", "l-3", "l-6"}
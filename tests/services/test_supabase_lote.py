@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from app.core import supabase_lote
+from app.core.supabase_lote import fetch_in, gravar_em_blocos, select_paginado
+
+ORG = "org-1"
+
+
+def test_fetch_in_le_cada_bloco_em_paginas(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(supabase_lote, "PAGE_SIZE", 3)
+    monkeypatch.setattr(supabase_lote, "QUERY_CHUNK", 2)
+    db = fake_supabase(
+        {
+            "lances": [
+                {"id": f"l-{i:02d}", "org_id": ORG, "cota_id": f"c-{i % 3}"} for i in range(10)
+            ]
+            + [{"id": "l-99", "org_id": "org-2", "cota_id": "c-0"}]
+        }
+    )
+
+    rows = fetch_in(db, "lances", ORG, "cota_id", ["c-0", "c-1", "c-2", None, "c-0"])
+
+    assert sorted(row["id"] for row in rows) == [f"l-{i:02d}" for i in range(10)]
+    # bloco c-0/c-1 (7 linhas) em 3 páginas, bloco c-2 (3 linhas) em 2
+    assert db.count_calls("lances", "select") == 5
+
+
+def test_select_paginado_ordena_e_desempata_por_id(fake_supabase, monkeypatch) -> None:
+    monkeypatch.setattr(supabase_lote, "PAGE_SIZE", 2)
+    db = fake_supabase(
+        {
+            "cotas": [
+                {"id": "c-1", "org_id": ORG, "created_at": "2026-01-01"},
+                {"id": "c-2", "org_id": ORG, "created_at": "2026-01-02"},
+                {"id": "c-3", "org_id": ORG, "created_at": "2026-01-02"},
+            ]
+        }
+    )
+
+    rows = select_paginado(
+        lambda: db.table("cotas").select("*").eq("org_id", ORG), order="created_at", desc=True
+    )
+
+    assert [row["id"] for row in rows] == ["c-2", "c-3", "c-1"]
+
+
+def test_gravar_em_blocos_regrava_linha_a_linha_o_bloco_com_falha() -> None:
+    def escrever(payloads):
+        if any(payload["n"] == 3 for payload in payloads):
+            raise ValueError("falhou")
+        return [dict(payload, id=f"id-{payload['n']}") for payload in payloads]
+
+    erros: list[dict] = []
+    gravadas = gravar_em_blocos(
+        escrever,
+        [(n, {"n": n}) for n in range(5)],
+        erros,
+        lambda origem, exc: {"origem": origem, "erro": str(exc)},
+        tamanho=2,
+    )
+
+    assert [origem for origem, _ in gravadas] == [0, 1, 2, 4]
+    assert gravadas[2][1]["id"] == "id-2"
+    assert erros == [{"origem": 3, "erro": "falhou"}]
@@ -0,0 +1,130 @@
+import re
+import struct
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from app.ai import audio
+from app.core.config import settings
+
+
+def ogg_page(granule: int, body: bytes) -> bytes:
+    segments = []
+    remaining = len(body)
+    while remaining >= 255:
+        segments.append(255)
+        remaining -= 255
+    segments.append(remaining)
+    header = b"OggS" + bytes([0, 0]) + struct.pack("<qIII", granule, 1, 0, 0) + bytes([len(segments)])
+    return header + bytes(segments) + body
+
+
+def build_ogg(n_pages: int, page_size: int = 300) -> bytes:
+    pages = [ogg_page(0, b"OpusHead" + b"\x00" * 11), ogg_page(0, b"OpusTags" + b"\x00" * 8)]
+    for index in range(n_pages):
+        marker = f"P{index:03d}".encode()
+        pages.append(ogg_page(960 * (index + 1), marker + b"\x01" * (page_size - len(marker))))
+    return b"".join(pages)
+
+
+class StubSTTHandler(BaseHTTPRequestHandler):
+    bodies: list[bytes] = []
+
+    def do_POST(self) -> None:  # noqa: N802
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body.extend(self.rfile.read(size))
+                self.rfile.readline()
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        StubSTTHandler.bodies.append(bytes(body))
+
+        markers = re.findall(rb"P\d{3}", bytes(body))
+        text = markers[0].decode() if markers else "audio curto"
+        payload = ('{"text": "%s"}' % text).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *_args) -> None:
+        return
+
+
+class StreamingTranscriptionTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSTTHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        StubSTTHandler.bodies = []
+        host, port = self.server.server_address
+        patched = settings.model_copy(
+            update={
+                "OPENAI_API_KEY": "test-key",
+                "OPENAI_API_BASE": f"http://{host}:{port}",
+                "OPENAI_STT_CHUNK_BYTES": 1000,
+                "OPENAI_STT_MAX_PARALLEL": 3,
+            }
+        )
+        patcher = mock.patch.object(audio, "settings", patched)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_small_audio_is_streamed_in_a_single_request(self) -> None:
+        data = build_ogg(2)
+        pieces = [data[i:i + 50] for i in range(0, len(data), 50)]
+
+        text = audio.transcrever_stream(iter(pieces), "audio/ogg", total_bytes=len(data))
+
+        self.assertEqual(text, "P000")
+        self.assertEqual(len(StubSTTHandler.bodies), 1)
+        self.assertIn(data, StubSTTHandler.bodies[0])
+        self.assertIn(b'name="model"', StubSTTHandler.bodies[0])
+
+    def test_long_ogg_is_split_by_page_and_joined_in_order(self) -> None:
+        data = build_ogg(9)
+        pieces = [data[i:i + 128] for i in range(0, len(data), 128)]
+
+        text = audio.transcrever_stream(iter(pieces), "audio/ogg", total_bytes=None)
+
+        self.assertEqual(text, "P000 P004 P008")
+        self.assertEqual(len(StubSTTHandler.bodies), 3)
+        for body in StubSTTHandler.bodies:
+            self.assertIn(b"OpusHead", body)
+            self.assertIn(b"OpusTags", body)
+
+    def test_invalid_ogg_falls_back_to_single_request(self) -> None:
+        data = b"not an ogg stream" * 200
+
+        text = audio.transcrever_stream(iter([data[:100], data[100:]]), "audio/ogg", total_bytes=None)
+
+        self.assertEqual(text, "audio curto")
+        self.assertEqual(len(StubSTTHandler.bodies), 1)
+        self.assertIn(data, StubSTTHandler.bodies[0])
+
+    def test_split_ogg_stream_repeats_header_pages(self) -> None:
+        parts = list(audio.split_ogg_stream([build_ogg(4)], max_bytes=600))
+
+        self.assertEqual(len(parts), 2)
+        for part in parts:
+            self.assertTrue(part.startswith(b"OggS"))
+            self.assertIn(b"OpusHead", part[:64])
+
+
+if __name__ == "__main__":
+    unittest.main()
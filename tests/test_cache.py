@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+from app.core import cache
+from app.core.cache import MISS, VersionedCache
+
+
+class VersionedCacheTests(unittest.TestCase):
+    def test_entry_is_valid_only_for_its_version(self) -> None:
+        store = VersionedCache()
+        store.put("ctr-1", {"linhas": [1]}, versao=3)
+
+        self.assertEqual(store.get("ctr-1", versao=3), {"linhas": [1]})
+        self.assertIs(store.get("ctr-1", versao=4), MISS)
+        self.assertIs(store.get("ctr-2", versao=3), MISS)
+
+    def test_values_are_copied_unless_disabled(self) -> None:
+        store = VersionedCache()
+        value = {"linhas": [1]}
+        store.put("k", value)
+        value["linhas"].append(2)
+        store.get("k")["linhas"].append(3)
+        self.assertEqual(store.get("k"), {"linhas": [1]})
+
+        shared = VersionedCache(copiar=False)
+        shared.put("k", value)
+        self.assertIs(shared.get("k"), value)
+
+    def test_ttl(self) -> None:
+        store = VersionedCache()
+        with mock.patch.object(cache.time, "monotonic", return_value=100.0):
+            store.put("a", None, ttl=10)
+            self.assertIsNone(store.get("a"))  # None cacheado não é MISS
+        with mock.patch.object(cache.time, "monotonic", return_value=111.0):
+            self.assertIs(store.get("a"), MISS)
+
+    def test_max_items_drops_least_recently_used(self) -> None:
+        store = VersionedCache()
+        store.put("a", 1, max_items=2)
+        store.put("b", 2, max_items=2)
+        store.get("a")
+        store.put("c", 3, max_items=2)
+
+        self.assertEqual((store.get("a"), store.get("b"), store.get("c")), (1, MISS, 3))
+        store.discard(lambda key: key == "a")
+        self.assertIs(store.get("a"), MISS)
+
+    def test_put_with_stale_generation_is_dropped(self) -> None:
+        store = VersionedCache()
+        geracao = store.geracao()
+        store.discard(lambda key: key == "outra")
+        store.put("a", 1, geracao=geracao)
+        self.assertIs(store.get("a"), MISS)
+
+        store.put("a", 2, geracao=store.geracao())
+        self.assertEqual(store.get("a"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+
+from app.core import http_client
+from app.core.config import settings
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls: list[str] = []
+    ports: set[int] = set()
+
+    def _reply(self) -> None:
+        StubGraphHandler.calls.append(f"{self.command} {self.path}")
+        StubGraphHandler.ports.add(self.client_address[1])
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", "/v22.0/media/123456")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        throttled = self.path.startswith("/throttled") and len(StubGraphHandler.calls) == 1
+        body = b'{"ok": true}'
+        self.send_response(429 if throttled else 200)
+        if throttled:
+            self.send_header("Retry-After", "0")
+        self.send_header("X-App-Usage", '{"call_count": 42, "total_time": 7}')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *_args) -> None:
+        return
+
+
+class SharedHttpClientTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        host, port = cls.server.server_address
+        cls.base = f"http://{host}:{port}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        http_client.close_all()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        StubGraphHandler.calls = []
+        StubGraphHandler.ports = set()
+        http_client.close_all()
+        http_client.reset_metrics()
+        patcher = mock.patch.object(
+            http_client,
+            "settings",
+            settings.model_copy(update={"HTTP_CLIENT_MAX_RETRIES": 2, "HTTP_CLIENT_MAX_RETRY_AFTER_SEC": 0.01}),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_retries_on_429_and_honours_retry_after(self) -> None:
+        response = http_client.get(f"{self.base}/throttled/123456")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(StubGraphHandler.calls), 2)
+
+    def test_post_is_not_retried_unless_idempotent(self) -> None:
+        response = http_client.post(f"{self.base}/throttled/123456", json={"a": 1})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(StubGraphHandler.calls), 1)
+
+    def test_connections_are_reused_per_host(self) -> None:
+        for _ in range(5):
+            http_client.get(f"{self.base}/v22.0/998877665544/messages")
+
+        self.assertEqual(len(StubGraphHandler.ports), 1)
+        self.assertIs(http_client.get_client(f"{self.base}/x"), http_client.get_client(f"{self.base}/y"))
+
+    def test_metrics_group_ids_and_keep_rate_limit_usage(self) -> None:
+        http_client.get(f"{self.base}/v22.0/111111/messages")
+        http_client.get(f"{self.base}/v22.0/222222/messages")
+
+        snapshot = http_client.metrics_snapshot()
+        host = self.base.split("://", 1)[1]
+        endpoint = snapshot["endpoints"][f"{host}/v22.0/:id/messages"]
+        self.assertEqual(endpoint["count"], 2)
+        self.assertEqual(sum(endpoint["buckets_ms"].values()), 2)
+        self.assertEqual(snapshot["rate_limits"][host]["x-app-usage"]["call_count"], 42)
+
+    def test_redirects_are_followed(self) -> None:
+        response = http_client.get(f"{self.base}/redirect/123456")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StubGraphHandler.calls, ["GET /redirect/123456", "GET /v22.0/media/123456"])
+
+    def test_retry_after_accepts_http_dates(self) -> None:
+        headers = httpx.Headers({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+
+        self.assertEqual(http_client.retry_after_seconds(headers), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+from app.services.lead_contact_service import (
+    find_lead_by_contact,
+    match_lead,
+    phone_key,
+    remember_lead,
+    resolve_leads_by_contacts,
+)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeLeadsQuery:
+    def __init__(self, client: "FakeLeadsClient"):
+        self.client = client
+        self.or_filter = ""
+
+    def select(self, _columns: str):
+        return self
+
+    def eq(self, _field: str, _value: object):
+        return self
+
+    def or_(self, value: str):
+        self.or_filter = value
+        return self
+
+    def order(self, _field: str, desc: bool = False):
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.or_filter)
+        return FakeResponse([row for row in self.client.rows if self._matches(row)])
+
+    def _matches(self, row: dict) -> bool:
+        pkey = phone_key(row.get("telefone"))
+        ekey = (row.get("email") or "").strip().lower()
+        return bool(
+            (pkey and "phone_key.in.(" in self.or_filter and pkey in self.or_filter)
+            or (ekey and f'"{ekey}"' in self.or_filter)
+        )
+
+
+class FakeLeadsClient:
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.queries: list[str] = []
+
+    def table(self, name: str):
+        assert name == "leads"
+        return FakeLeadsQuery(self)
+
+
+class LeadContactKeyTests(unittest.TestCase):
+    def test_phone_key_matches_with_or_without_ddi(self) -> None:
+        self.assertEqual(phone_key("(11) 98765-4321"), "5511987654321")
+        self.assertEqual(phone_key("5511987654321"), "5511987654321")
+        self.assertEqual(phone_key("p:+55 11 98765-4321"), "5511987654321")
+        self.assertIsNone(phone_key(""))
+
+    def test_bulk_resolver_uses_one_query_for_many_contacts(self) -> None:
+        client = FakeLeadsClient(
+            [
+                {"id": "lead-wa", "telefone": "5511987654321", "email": None},
+                {"id": "lead-email", "telefone": None, "email": "Ana@Exemplo.com"},
+            ]
+        )
+
+        index = resolve_leads_by_contacts(
+            client,
+            org_id="org-1",
+            contacts=[("11987654321", None), (None, " ana@exemplo.com "), ("21999990000", "novo@x.com")],
+        )
+
+        self.assertEqual(len(client.queries), 1)
+        self.assertEqual(match_lead(index, telefone="11 98765-4321")["id"], "lead-wa")
+        self.assertEqual(match_lead(index, email="ANA@exemplo.com")["id"], "lead-email")
+        self.assertIsNone(match_lead(index, telefone="21999990000", email="novo@x.com"))
+
+    def test_phone_match_wins_over_email_and_remembered_leads_are_found(self) -> None:
+        client = FakeLeadsClient(
+            [
+                {"id": "lead-email", "telefone": None, "email": "ana@exemplo.com"},
+                {"id": "lead-phone", "telefone": "11987654321", "email": None},
+            ]
+        )
+
+        found = find_lead_by_contact(client, org_id="org-1", telefone="5511987654321", email="ana@exemplo.com")
+        self.assertEqual(found["id"], "lead-phone")
+
+        index: dict = {}
+        remember_lead(index, {"id": "novo", "telefone": "21999990000", "email": None})
+        self.assertEqual(match_lead(index, telefone="5521999990000")["id"], "novo")
+
+    def test_empty_contact_does_not_query(self) -> None:
+        client = FakeLeadsClient([])
+
+        self.assertIsNone(find_lead_by_contact(client, org_id="org-1", telefone="", email=None))
+        self.assertEqual(client.queries, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
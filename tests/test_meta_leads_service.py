@@ -1,9 +1,13 @@
+import json
 import unittest
 from copy import deepcopy
+from unittest import mock
 
 from app.services.kanban_service import build_kanban_snapshot
+from app.services import meta_leads_backfill_service, meta_leads_service
 from app.services.meta_leads_service import (
     _build_meta_ads_context,
+    _fetch_meta_lead_details_batch,
     _build_meta_diagnostic_payload,
     _parse_meta_field_data,
     normalize_phone,
@@ -58,6 +62,10 @@ class FakeTableQuery:
         self._payload = payload
         return self
 
+    def delete(self):
+        self._operation = "delete"
+        return self
+
     def execute(self):
         table = self.client.tables.setdefault(self.table_name, [])
 
@@ -68,6 +76,10 @@ class FakeTableQuery:
 
         rows = [row for row in table if self._matches(row)]
 
+        if self._operation == "delete":
+            table[:] = [row for row in table if not self._matches(row)]
+            return FakeResponse(rows)
+
         if self._operation == "update":
             updated = []
             for row in rows:
@@ -229,6 +241,227 @@ class MetaDiagnosticMergeTests(unittest.TestCase):
         self.assertEqual(saved["extras"]["meta_ads"]["leadgen_id"], "meta-lead-1")
 
 
+class FakeHttpResponse:
+    def __init__(self, status_code: int, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class MetaGraphBatchTests(unittest.TestCase):
+    def test_batch_fans_results_back_with_partial_failures(self) -> None:
+        items = [
+            {"code": 200, "body": json.dumps({"id": "lead-ok", "field_data": []})},
+            {"code": 400, "body": json.dumps({"error": {"message": "sem permissão"}})},
+            None,
+        ]
+        with mock.patch.object(
+            meta_leads_service.http_client, "post", return_value=FakeHttpResponse(200, items)
+        ) as post:
+            results = _fetch_meta_lead_details_batch(
+                leadgen_ids=["lead-ok", "lead-denied", "lead-timeout"],
+                access_token="token",
+            )
+
+        self.assertEqual(post.call_count, 1)
+        batch = json.loads(post.call_args.kwargs["data"]["batch"])
+        self.assertEqual(batch[1]["relative_url"].split("?")[0], "lead-denied")
+        self.assertEqual(results["lead-ok"]["id"], "lead-ok")
+        self.assertIsInstance(results["lead-denied"], RuntimeError)
+        self.assertIn("400", str(results["lead-denied"]))
+        self.assertIsInstance(results["lead-timeout"], RuntimeError)
+
+    def test_batch_splits_in_chunks_of_fifty_and_isolates_failed_call(self) -> None:
+        leadgen_ids = [f"lead-{index}" for index in range(120)]
+
+        def fake_post(_url, **kwargs):
+            batch = json.loads(kwargs["data"]["batch"])
+            if len(batch) == 20:
+                return FakeHttpResponse(500, {"error": "instável"})
+            return FakeHttpResponse(
+                200,
+                [
+                    {"code": 200, "body": json.dumps({"id": item["relative_url"].split("?")[0]})}
+                    for item in batch
+                ],
+            )
+
+        with mock.patch.object(meta_leads_service.http_client, "post", side_effect=fake_post) as post:
+            results = _fetch_meta_lead_details_batch(leadgen_ids=leadgen_ids, access_token="token")
+
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(results["lead-49"]["id"], "lead-49")
+        self.assertEqual(results["lead-99"]["id"], "lead-99")
+        self.assertIsInstance(results["lead-100"], RuntimeError)
+        self.assertIsInstance(results["lead-119"], RuntimeError)
+
+
+class MetaBackfillTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pages = {
+            None: {
+                "data": [{"id": "lg-1"}, {"id": "lg-2"}],
+                "paging": {"cursors": {"after": "c1"}, "next": "https://graph/next"},
+            },
+            "c1": {"data": [{"id": "lg-3"}], "paging": {"cursors": {"after": "c2"}}},
+        }
+        self.requested_cursors: list[object] = []
+        self.ingested: list[str] = []
+
+        def fake_graph(*, method, path, access_token, params=None, data=None):
+            self.assertEqual(path, "form-1/leads")
+            cursor = (params or {}).get("after")
+            self.requested_cursors.append(cursor)
+            return self.pages[cursor]
+
+        def fake_ingest(_supa, *, integration, form_id, lead_data, contact_index):
+            self.ingested.append(lead_data["id"])
+            return {"ok": True, "action": "created"}
+
+        def fake_merge(_supa, *, integration, updates):
+            integration["settings"] = {**(integration.get("settings") or {}), **updates}
+            return integration
+
+        for name, fake in (
+            ("_meta_graph_request", fake_graph),
+            ("_ingest_backfilled_lead", fake_ingest),
+            ("_merge_integration_settings", fake_merge),
+            ("_page_contact_index", lambda *_args, **_kwargs: {}),
+        ):
+            patcher = mock.patch.object(meta_leads_backfill_service, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.integration = {"id": "int-1", "org_id": "org-1", "page_id": "page-1", "settings": {}}
+        self.supa = FakeSupabaseClient(
+            {
+                "meta_webhook_events": [
+                    {"integration_id": "int-1", "leadgen_id": "lg-2", "status": "processed"},
+                    {"integration_id": "int-1", "leadgen_id": "lg-3", "status": "error"},
+                ]
+            }
+        )
+
+    def test_skips_known_leadgen_ids_and_checkpoints_cursor(self) -> None:
+        stats = meta_leads_backfill_service.backfill_form(
+            self.supa,
+            integration=self.integration,
+            form_id="form-1",
+            access_token="token",
+            max_pages=1,
+        )
+
+        self.assertEqual(self.ingested, ["lg-1"])
+        self.assertEqual(stats["skipped"], 1)
+        self.assertFalse(stats["completed"])
+        checkpoint = self.integration["settings"]["backfill"]["form-1"]
+        self.assertEqual(checkpoint["status"], "partial")
+        self.assertEqual(checkpoint["cursor"], "c1")
+
+    def test_resumes_from_checkpoint_and_skips_events_in_any_status(self) -> None:
+        meta_leads_backfill_service.backfill_form(
+            self.supa, integration=self.integration, form_id="form-1", access_token="token", max_pages=1
+        )
+        stats = meta_leads_backfill_service.backfill_form(
+            self.supa, integration=self.integration, form_id="form-1", access_token="token"
+        )
+
+        self.assertEqual(self.requested_cursors, [None, "c1"])
+        self.assertEqual(self.ingested, ["lg-1"])  # lg-3 tem evento com erro: fica com o webhook
+        self.assertEqual(stats["skipped"], 1)
+        self.assertTrue(stats["completed"])
+        checkpoint = self.integration["settings"]["backfill"]["form-1"]
+        self.assertEqual(checkpoint["status"], "completed")
+        self.assertEqual(checkpoint["created"], 1)
+        self.assertEqual(checkpoint["skipped"], 2)
+
+
+class MetaIntegrationCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        meta_leads_service.invalidate_meta_integration_cache()
+        self.addCleanup(meta_leads_service.invalidate_meta_integration_cache)
+        patcher = mock.patch.object(
+            meta_leads_service,
+            "_query_meta_integration",
+            side_effect=lambda _supa, *, page_id, form_id: {
+                "id": "int-1",
+                "page_id": page_id,
+                "form_id": form_id,
+                "settings": {"subscription": {"subscribed": True}},
+            },
+        )
+        self.query = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_from_same_page_hits_database_once(self) -> None:
+        for _ in range(5):
+            row = meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id="form-1")
+            row["settings"]["subscription"]["subscribed"] = False
+
+        self.assertEqual(self.query.call_count, 1)
+        cached = meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id="form-1")
+        self.assertTrue(cached["settings"]["subscription"]["subscribed"])
+
+    def test_invalidation_is_scoped_to_page(self) -> None:
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-2", form_id=None)
+
+        meta_leads_service.invalidate_meta_integration_cache("page-1")
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-2", form_id=None)
+
+        self.assertEqual(self.query.call_count, 3)
+
+    def test_delete_invalidates_cached_integration(self) -> None:
+        integration = meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        integration["org_id"] = "org-1"
+
+        with mock.patch.object(meta_leads_service, "unsubscribe_meta_page"):
+            meta_leads_service.delete_meta_integration(FakeSupabaseClient({}), integration=integration)
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_read_racing_an_invalidation_is_not_cached(self) -> None:
+        def leitura_durante_invalidacao(_supa, *, page_id, form_id):
+            # o update grava e invalida enquanto esta leitura ainda devolve o valor antigo
+            meta_leads_service.invalidate_meta_integration_cache(page_id)
+            return {"id": "int-1", "page_id": page_id, "form_id": form_id, "settings": {}}
+
+        self.query.side_effect = leitura_durante_invalidacao
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_settings_write_invalidates_after_the_update(self) -> None:
+        integration = meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+
+        class WebhookDuringWrite(FakeSupabaseClient):
+            """Um webhook lê (e recacheia) a integração enquanto o update roda."""
+
+            def table(self, name):
+                meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+                return super().table(name)
+
+        supa = WebhookDuringWrite({"meta_lead_integrations": [dict(integration)]})
+        meta_leads_service._record_subscription_result(supa, integration=integration, subscribed=False)
+        antes = self.query.call_count
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        self.assertEqual(self.query.call_count, antes + 1)
+
+        # checkpoint do backfill também grava settings
+        meta_leads_service._merge_integration_settings(
+            supa, integration=integration, updates={"backfill": {"form-1": {"status": "running"}}}
+        )
+        antes = self.query.call_count
+        meta_leads_service.resolve_meta_integration(object(), page_id="page-1", form_id=None)
+        self.assertEqual(self.query.call_count, antes + 1)
+
+
 class KanbanMetaFieldsTests(unittest.TestCase):
     def test_return_meta_fields_in_kanban_snapshot(self) -> None:
         supa = FakeSupabaseClient(